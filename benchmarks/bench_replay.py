@@ -0,0 +1,373 @@
+"""
+<Program Name>
+  bench_replay
+
+<Purpose>
+  End-to-end replay benchmark.  For each workload a synthetic strace trace is
+  generated (see synthetic_traces.py), the freestanding target program in
+  target.c is started under ptrace, and every system call it makes is
+  validated against the trace and replayed through the existing handlers.
+  The replay is timed and reported as system calls per second, once per
+  transfer backend (ptrace word copies vs process_vm_readv()/writev() bulk
+  transfers), along with a per handler breakdown from ReplayProfiler.
+
+  Each run is also made in each tracing mode: "syscall" stops the target at
+  every system call entry and exit, "seccomp" starts it under the filter
+  from seccomp_filter.py so calls the handlers only let through don't stop
+  it at all, and "sysemu" resumes it with PTRACE_SYSEMU so replayed calls
+  are never run and stop it only once.  The number of tracer stops is
+  reported for comparison.
+
+  The target is built with -m32 since the handlers implement the i386
+  system call ABI, so this needs a compiler that can produce 32-bit static
+  binaries and a kernel that can run them.
+
+  Usage:
+    python benchmarks/bench_replay.py [--workloads file,poll]
+                                      [--iterations 2000]
+                                      [--backends ptrace,bulk]
+                                      [--modes syscall,seccomp,sysemu]
+                                      [--verify hash]
+                                      [--output bench_replay_output.txt]
+
+"""
+
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+
+from syscallreplay import syscallreplay as cint
+from syscallreplay import file_handlers
+from syscallreplay import seccomp_filter
+from syscallreplay import util
+from syscallreplay.handler_registry import HANDLERS, SOCKETCALL
+from syscallreplay.output_sink import set_output_sink, SINK_DISCARD
+from syscallreplay.profiler import ReplayProfiler
+from syscallreplay.trace_parser import parse_line
+from syscallreplay.verification import (set_write_verification,
+                                        VERIFY_OFF,
+                                        VERIFY_SAMPLED,
+                                        VERIFY_HASH,)
+
+import synthetic_traces
+
+
+BACKENDS = ('ptrace', 'bulk')
+
+MODES = ('syscall', 'seccomp', 'sysemu')
+
+EXIT_GROUP = 252
+
+TARGET_CFLAGS = ['-m32', '-O2', '-static', '-nostdlib', '-fno-pie', '-no-pie',
+                 '-fno-stack-protector']
+
+
+def build_target(build_dir):
+  """
+  <Purpose>
+    Compile target.c into build_dir.
+
+  <Returns>
+    The path to the target binary
+
+  """
+
+  source = os.path.join(BENCHMARK_DIR, 'target.c')
+  binary = os.path.join(build_dir, 'target')
+  compiler = os.environ.get('CC', 'gcc')
+  futex_section = '-Wl,--section-start=.futex_word={:#x}'.format(
+      synthetic_traces.FUTEX_ADDRESS)
+  subprocess.check_call([compiler] + TARGET_CFLAGS +
+                        [futex_section, '-o', binary, source])
+  return binary
+
+
+def spawn_target(binary, workload, iterations, allowed=None):
+  """
+  <Purpose>
+    Start the target under ptrace and wait for the stop that follows its
+    execve().  If allowed is given the target runs under a seccomp filter
+    that lets those system calls through.
+
+  <Returns>
+    The target's pid
+
+  """
+
+  if allowed is not None:
+    return seccomp_filter.spawn_filtered([binary, workload, str(iterations)],
+                                         allowed)
+  pid = os.fork()
+  if pid == 0:
+    try:
+      cint.traceme()
+      os.execv(binary, [binary, workload, str(iterations)])
+    finally:
+      os._exit(127)
+  _, status = os.waitpid(pid, 0)
+  if not os.WIFSTOPPED(status):
+    raise RuntimeError('Target did not stop after exec')
+  # Needed for PTRACE_GET_SYSCALL_INFO to recognise system call stops
+  cint.set_options(pid, cint.PTRACE_O_TRACESYSGOOD | cint.PTRACE_O_EXITKILL)
+  return pid
+
+
+def _next_entry(pid, mode):
+  if mode == 'seccomp':
+    return seccomp_filter.next_seccomp_stop(pid)
+  kind, _, syscall_id, args, _ = util.step(pid)
+  if kind in (cint.STOP_EXITED, cint.STOP_KILLED):
+    raise util.ReplayDeltaError('Target exited before the trace was '
+                                'exhausted')
+  if kind != cint.STOP_SYSCALL_ENTRY:
+    raise util.ReplayDeltaError('Expected a system call entry, got stop '
+                                'kind {}'.format(kind))
+  return syscall_id, args
+
+
+def _next_exit(pid):
+  kind, _, _, _, _ = util.step(pid, 0, cint.PTRACE_SYSCALL)
+  if kind != cint.STOP_SYSCALL_EXIT:
+    raise util.ReplayDeltaError('Expected a system call exit, got stop '
+                                'kind {}'.format(kind))
+
+
+def replay(pid, syscall_objects, handlers, mode='syscall'):
+  """
+  <Purpose>
+    Replay syscall_objects against the stopped target, one system call
+    entry at a time, the same way the injector drives the handlers.
+    handlers is a HandlerRegistry.  In seccomp mode the target is running
+    under a filter and syscall_objects must only hold the calls it stops
+    for; in sysemu mode system call suppression must be set to sysemu.
+
+  <Returns>
+    The number of times the target stopped
+
+  """
+
+  stops = 0
+  noops = util.replay_counters['noops']
+  for index, syscall_object in enumerate(syscall_objects):
+    syscall_id, args = _next_entry(pid, mode)
+    stops += 1
+    cint.syscall_index = index
+    cint.entering_syscall = True
+    subcall_id = None
+    if syscall_id == SOCKETCALL:
+      subcall_id = args[0]
+      util.validate_subcall(subcall_id, syscall_object)
+    else:
+      util.validate_syscall(syscall_id, syscall_object)
+    handler = handlers.get_entry_handler(syscall_id, subcall_id)
+    if handler is None:
+      raise NotImplementedError('No entry handler for {}'
+                                .format(syscall_object.name))
+    handler(syscall_id, syscall_object, pid)
+    if cint.entering_syscall:
+      # The handler let the call run rather than replaying it, so step to
+      # its exit and give the exit handler a look
+      if mode == 'sysemu':
+        stops += util.run_emulated_syscall(pid)
+      _next_exit(pid)
+      stops += 1
+      exit_handler = handlers.get_exit_handler(syscall_id, subcall_id)
+      if exit_handler is not None:
+        exit_handler(syscall_id, syscall_object, pid)
+  if mode != 'sysemu':
+    # Every noop stops the target once more, at the exit of its getpid()
+    stops += util.replay_counters['noops'] - noops
+  return stops
+
+
+def finish_target(pid, mode='syscall'):
+  """
+  <Purpose>
+    Make sure the target's next system call is exit_group(), i.e. the trace
+    covered everything it did, then get rid of it.
+
+  <Returns>
+    Nothing
+
+  """
+
+  try:
+    syscall_id, _ = _next_entry(pid, mode)
+    if syscall_id != EXIT_GROUP:
+      raise util.ReplayDeltaError('Target made system call {} after the end '
+                                  'of the trace'.format(syscall_id))
+  finally:
+    try:
+      os.kill(pid, signal.SIGKILL)
+      os.waitpid(pid, 0)
+    except OSError:
+      pass
+
+
+def run_workload(binary, workload, iterations, backend, mode='syscall'):
+  """
+  <Purpose>
+    Generate, parse and replay one workload with the given transfer
+    backend and tracing mode.
+
+  <Returns>
+    A result dict with the replay rate, the number of tracer stops, the C
+    module's transfer counters and the profiler's per handler rows
+
+  """
+
+  lines = synthetic_traces.generate_trace(workload, iterations)
+  syscall_objects = [parse_line(line) for line in lines]
+  util.precompute_return_values(syscall_objects)
+  file_handlers.compile_write_digests(syscall_objects)
+  allowed = None
+  replayed = syscall_objects
+  if mode == 'seccomp':
+    allowed = seccomp_filter.allowed_syscalls(syscall_objects)
+    replayed = seccomp_filter.stopping_syscalls(syscall_objects, allowed)
+  profiler = ReplayProfiler()
+  handlers = HANDLERS.wrapped(profiler.wrap)
+  cint.set_transfer_backend(backend)
+  if mode == 'sysemu':
+    util.set_syscall_suppression(util.SUPPRESS_SYSEMU)
+  pid = spawn_target(binary, workload, iterations, allowed)
+  cint.reset_counters()
+  try:
+    start = timeit.default_timer()
+    stops = replay(pid, replayed, handlers, mode)
+    elapsed = timeit.default_timer() - start
+  finally:
+    try:
+      finish_target(pid, mode)
+    finally:
+      util.set_syscall_suppression(util.SUPPRESS_GETPID)
+  counters = cint.get_counters()
+  return {'workload': workload,
+          'backend': backend,
+          'mode': mode,
+          'iterations': iterations,
+          'syscalls': len(syscall_objects),
+          'stops': stops,
+          'elapsed': elapsed,
+          'syscalls_per_second': len(syscall_objects) / elapsed,
+          'counters': counters,
+          'handlers': profiler.rows(),
+          'report': profiler.report()}
+
+
+def _print_result(result):
+  counters = result['counters']
+  print('{:<8} {:<8} {:<8} {:>8} {:>8} {:>10.3f} {:>14.1f} {:>10} {:>8} '
+        '{:>12} {:>12}'
+        .format(result['workload'],
+                result['backend'],
+                result['mode'],
+                result['syscalls'],
+                result['stops'],
+                result['elapsed'],
+                result['syscalls_per_second'],
+                counters['ptrace_calls'],
+                counters['process_vm_calls'],
+                counters['bytes_read'],
+                counters['bytes_written']))
+  sys.stdout.flush()
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark end-to-end replay '
+                                               'of synthetic traces')
+  parser.add_argument('--workloads',
+                      default=','.join(synthetic_traces.WORKLOADS),
+                      help='comma separated workloads to run (default all)')
+  parser.add_argument('--iterations', type=int, default=2000,
+                      help='loop iterations per workload')
+  parser.add_argument('--backends', default=','.join(BACKENDS),
+                      help='comma separated transfer backends to compare')
+  parser.add_argument('--modes', default=','.join(MODES),
+                      help='comma separated tracing modes to compare')
+  parser.add_argument('--verify',
+                      choices=(VERIFY_OFF, VERIFY_SAMPLED, VERIFY_HASH),
+                      default=VERIFY_HASH,
+                      help='write payload verification policy')
+  parser.add_argument('--output', default='bench_replay_output.txt',
+                      help='where to write the JSON results')
+  args = parser.parse_args()
+  workloads = args.workloads.split(',')
+  backends = args.backends.split(',')
+  modes = args.modes.split(',')
+  unknown = (set(workloads) - set(synthetic_traces.WORKLOADS)) | \
+            (set(backends) - set(BACKENDS)) | \
+            (set(modes) - set(MODES))
+  if unknown:
+    parser.error('Unknown workloads, backends or modes: {}'
+                 .format(', '.join(sorted(unknown))))
+
+  set_write_verification(args.verify)
+  set_output_sink(SINK_DISCARD)
+  build_dir = tempfile.mkdtemp(prefix='syscallreplay-bench-')
+  results = []
+  failures = []
+  try:
+    binary = build_target(build_dir)
+    print('{:<8} {:<8} {:<8} {:>8} {:>8} {:>10} {:>14} {:>10} {:>8} {:>12} '
+          '{:>12}'
+          .format('workload', 'backend', 'mode', 'calls', 'stops',
+                  'time (s)', 'calls/s', 'ptrace', 'vm', 'bytes in',
+                  'bytes out'))
+    for workload in workloads:
+      for backend in backends:
+        for mode in modes:
+          try:
+            result = run_workload(binary, workload, args.iterations, backend,
+                                  mode)
+          except (util.ReplayDeltaError, NotImplementedError,
+                  cint.error) as e:
+            failures.append({'workload': workload,
+                             'backend': backend,
+                             'mode': mode,
+                             'error': '{}: {}'.format(type(e).__name__, e)})
+            print('{:<8} {:<8} {:<8} FAILED: {}'.format(workload, backend,
+                                                         mode, e))
+            continue
+          results.append(result)
+          _print_result(result)
+  finally:
+    shutil.rmtree(build_dir)
+
+  for result in results:
+    print('\n{} ({} backend, {} mode)'.format(result['workload'],
+                                              result['backend'],
+                                              result['mode']))
+    print(result.pop('report'))
+  with open(args.output, 'w') as f:
+    json.dump({'benchmark': 'replay',
+               'timestamp': time.time(),
+               'host': {'machine': platform.machine(),
+                        'kernel': platform.release(),
+                        'python': platform.python_version()},
+               'iterations': args.iterations,
+               'verify': args.verify,
+               'results': results,
+               'failures': failures},
+              f,
+              indent=2)
+  print('Results written to {}'.format(args.output))
+  if failures:
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,383 @@
+"""
+<Program Name>
+  bench_transfer
+
+<Purpose>
+  Microbenchmarks for the syscallreplay extension's transfer primitives.  A
+  local child is forked and stopped under ptrace (using the module's own
+  traceme() or attach()), then each primitive is timed against it across a
+  range of payload sizes.  Per call latency, throughput and the number of
+  ptrace()/process_vm_*() calls each call made are printed and written out
+  as JSON so runs can be compared for regressions.
+
+  Usage:
+    python benchmarks/bench_transfer.py [--sizes 16,4K,1M] [--mode attach]
+                                        [--primitives copy_string,...]
+                                        [--output bench_output.txt]
+
+"""
+
+
+from __future__ import print_function
+import argparse
+import ctypes
+import json
+import mmap
+import os
+import platform
+import signal
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from syscallreplay import syscallreplay as cint
+
+
+# 16 bytes to 16 megabytes in powers of four
+DEFAULT_SIZES = [16 * 4 ** i for i in range(11)]
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 * 1024}
+
+
+class iovec(ctypes.Structure):
+  _fields_ = [('iov_base', ctypes.c_void_p),
+              ('iov_len', ctypes.c_size_t)]
+
+
+class TransferFixture(object):
+  """
+  <Purpose>
+    Memory shared with the child by virtue of fork(): a data region as large
+    as the largest payload, a NUL terminated string of each payload size for
+    copy_string(), and a single iovec covering the data region for
+    populate_readv_vectors().  Everything is laid out before the fork so the
+    child has the same contents at the same addresses.
+
+  """
+
+  def __init__(self, sizes):
+    max_size = max(sizes)
+    string_bytes = sum(sizes)
+    length = max_size + string_bytes + ctypes.sizeof(iovec)
+    self._map = mmap.mmap(-1, length, flags=mmap.MAP_PRIVATE)
+    base = ctypes.addressof(ctypes.c_char.from_buffer(self._map))
+    self.data_addr = base
+    ctypes.memset(self.data_addr, ord('x'), max_size)
+    self.string_addrs = {}
+    offset = max_size
+    for size in sizes:
+      ctypes.memset(base + offset, ord('s'), size - 1)
+      ctypes.memset(base + offset + size - 1, 0, 1)
+      self.string_addrs[size] = base + offset
+      offset += size
+    self.iov_addr = base + offset
+    iovec.from_address(self.iov_addr).iov_base = self.data_addr
+    iovec.from_address(self.iov_addr).iov_len = max_size
+    self.pid = None
+
+
+def spawn_stopped_child(mode):
+  """
+  <Purpose>
+    Fork a child that sits still while it is traced.  In traceme mode the
+    child asks to be traced and stops itself; in attach mode it waits to be
+    attached to.
+
+  <Returns>
+    The child's pid, stopped and traced
+
+  """
+
+  pid = os.fork()
+  if pid == 0:
+    try:
+      if mode == 'traceme':
+        cint.traceme()
+        os.kill(os.getpid(), signal.SIGSTOP)
+      else:
+        while True:
+          signal.pause()
+    finally:
+      os._exit(0)
+  if mode == 'attach':
+    cint.attach(pid)
+  os.waitpid(pid, 0)
+  return pid
+
+
+def _copy_address_range(fixture, size):
+  start = fixture.data_addr
+  return lambda: cint.copy_address_range(fixture.pid, start, start + size)
+
+
+def _digest_address_range(fixture, size):
+  start = fixture.data_addr
+  return lambda: cint.digest_address_range(fixture.pid, start, start + size)
+
+
+def _copy_string(fixture, size):
+  addr = fixture.string_addrs[size]
+  return lambda: cint.copy_string(fixture.pid, addr)
+
+
+def _populate_char_buffer(fixture, size):
+  payload = 'p' * size
+  return lambda: cint.populate_char_buffer(fixture.pid,
+                                           fixture.data_addr,
+                                           payload)
+
+
+def _populate_strace_string(fixture, size):
+  # Every byte escaped, the worst case for the decoder
+  token = '"' + '\\x70' * size + '"'
+  return lambda: cint.populate_strace_string(fixture.pid,
+                                             fixture.data_addr,
+                                             token)
+
+
+def _populate_from_fd(fixture, size):
+  # The closure keeps the file open for as long as the primitive is timed
+  payload = tempfile.TemporaryFile()
+  payload.write('f' * size)
+  payload.flush()
+  return lambda: cint.populate_from_fd(fixture.pid,
+                                       fixture.data_addr,
+                                       payload.fileno(),
+                                       size)
+
+
+def _populate_readv_vectors(fixture, size):
+  iovs = [{'iov_data': 'v' * size, 'iov_len': size}]
+  return lambda: cint.populate_readv_vectors(fixture.pid,
+                                             fixture.iov_addr,
+                                             iovs)
+
+
+def _peek_register(fixture):
+  return lambda: cint.peek_register(fixture.pid, cint.RAX)
+
+
+def _poke_register(fixture):
+  return lambda: cint.poke_register(fixture.pid, cint.RAX, 0)
+
+
+def _populate_timeval_structure(fixture):
+  return lambda: cint.populate_timeval_structure(fixture.pid,
+                                                 fixture.data_addr,
+                                                 1234,
+                                                 5678)
+
+
+def _populate_timespec_structure(fixture):
+  return lambda: cint.populate_timespec_structure(fixture.pid,
+                                                  fixture.data_addr,
+                                                  1234,
+                                                  5678)
+
+
+def _populate_tms_structure(fixture):
+  return lambda: cint.populate_tms_structure(fixture.pid,
+                                             fixture.data_addr,
+                                             1, 2, 3, 4)
+
+
+def _populate_winsize_structure(fixture):
+  return lambda: cint.populate_winsize_structure(fixture.pid,
+                                                 fixture.data_addr,
+                                                 24, 80, 0, 0)
+
+
+def _populate_uname_structure(fixture):
+  return lambda: cint.populate_uname_structure(fixture.pid,
+                                               fixture.data_addr,
+                                               'Linux',
+                                               'bench',
+                                               '4.0.0',
+                                               '#1 SMP',
+                                               'x86_64',
+                                               '(none)')
+
+
+def _populate_rlimit_structure(fixture):
+  return lambda: cint.populate_rlimit_structure(fixture.pid,
+                                                fixture.data_addr,
+                                                1024,
+                                                4096)
+
+
+# Primitives whose cost depends on the payload size
+SIZED_PRIMITIVES = [('copy_address_range', _copy_address_range),
+                    ('digest_address_range', _digest_address_range),
+                    ('copy_string', _copy_string),
+                    ('populate_char_buffer', _populate_char_buffer),
+                    ('populate_strace_string', _populate_strace_string),
+                    ('populate_from_fd', _populate_from_fd),
+                    ('populate_readv_vectors', _populate_readv_vectors)]
+
+# Primitives that move a fixed amount of data per call
+FIXED_PRIMITIVES = [('peek_register', _peek_register),
+                    ('poke_register', _poke_register),
+                    ('populate_timeval_structure', _populate_timeval_structure),
+                    ('populate_timespec_structure',
+                     _populate_timespec_structure),
+                    ('populate_tms_structure', _populate_tms_structure),
+                    ('populate_winsize_structure', _populate_winsize_structure),
+                    ('populate_uname_structure', _populate_uname_structure),
+                    ('populate_rlimit_structure', _populate_rlimit_structure)]
+
+
+def measure(call, min_time, repeat):
+  """
+  <Purpose>
+    Time call().  The iteration count is grown until one batch takes at
+    least min_time, then the batch is repeated and the fastest kept.  The
+    C module's transfer counters are sampled over a single call.
+
+  <Returns>
+    A dict of iterations, per call latency in seconds and per call ptrace()
+    and process_vm_*() counts
+
+  """
+
+  cint.reset_counters()
+  call()
+  counters = cint.get_counters()
+  iterations = 1
+  while True:
+    elapsed = _time_batch(call, iterations)
+    if elapsed >= min_time:
+      break
+    iterations *= 2 if elapsed > min_time / 10 else 10
+  best = elapsed
+  for _ in range(repeat - 1):
+    best = min(best, _time_batch(call, iterations))
+  return {'iterations': iterations,
+          'latency': best / iterations,
+          'ptrace_calls': counters['ptrace_calls'],
+          'process_vm_calls': counters['process_vm_calls']}
+
+
+def _time_batch(call, iterations):
+  start = timeit.default_timer()
+  for _ in xrange(iterations):
+    call()
+  return timeit.default_timer() - start
+
+
+def parse_sizes(text):
+  sizes = []
+  for token in text.split(','):
+    token = token.strip().upper()
+    multiplier = 1
+    if token[-1:] in SIZE_SUFFIXES:
+      multiplier = SIZE_SUFFIXES[token[-1]]
+      token = token[:-1]
+    size = int(token) * multiplier
+    if size < 1:
+      raise argparse.ArgumentTypeError('Sizes must be positive')
+    sizes.append(size)
+  return sorted(set(sizes))
+
+
+def run(sizes, primitives, mode, min_time, repeat):
+  """
+  <Purpose>
+    Benchmark the selected primitives against a freshly forked child.
+
+  <Returns>
+    A list of result dicts, one per primitive and payload size
+
+  """
+
+  # The child is a copy of this interpreter, so its addresses are 64 bits
+  # wide
+  cint.set_tracee_arch(cint.AUDIT_ARCH_X86_64)
+  fixture = TransferFixture(sizes)
+  fixture.pid = spawn_stopped_child(mode)
+  results = []
+  try:
+    for name, setup in SIZED_PRIMITIVES:
+      if name not in primitives:
+        continue
+      for size in sizes:
+        result = measure(setup(fixture, size), min_time, repeat)
+        result.update({'primitive': name,
+                       'size': size,
+                       'throughput': size / result['latency']})
+        results.append(result)
+        _print_result(result)
+    for name, setup in FIXED_PRIMITIVES:
+      if name not in primitives:
+        continue
+      result = measure(setup(fixture), min_time, repeat)
+      result.update({'primitive': name, 'size': None, 'throughput': None})
+      results.append(result)
+      _print_result(result)
+  finally:
+    os.kill(fixture.pid, signal.SIGKILL)
+    os.waitpid(fixture.pid, 0)
+  return results
+
+
+def _print_result(result):
+  size = '-' if result['size'] is None else result['size']
+  throughput = ('-' if result['throughput'] is None
+                else '{:.1f}'.format(result['throughput'] / (1024 * 1024)))
+  print('{:<30} {:>10} {:>14.3f} {:>12} {:>10} {:>8}'
+        .format(result['primitive'],
+                size,
+                result['latency'] * 1e6,
+                throughput,
+                result['ptrace_calls'],
+                result['process_vm_calls']))
+  sys.stdout.flush()
+
+
+def main():
+  all_primitives = [name for name, _ in SIZED_PRIMITIVES + FIXED_PRIMITIVES]
+  parser = argparse.ArgumentParser(description='Benchmark the syscallreplay '
+                                               'transfer primitives')
+  parser.add_argument('--sizes', type=parse_sizes, default=DEFAULT_SIZES,
+                      help='comma separated payload sizes, K and M suffixes '
+                           'allowed (default 16 to 16M in powers of four)')
+  parser.add_argument('--primitives', default=','.join(all_primitives),
+                      help='comma separated primitives to run (default all)')
+  parser.add_argument('--mode', choices=('traceme', 'attach'),
+                      default='traceme',
+                      help='how the child comes under ptrace')
+  parser.add_argument('--min-time', type=float, default=0.1,
+                      help='minimum seconds per timed batch')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='timed batches per measurement, fastest is kept')
+  parser.add_argument('--output', default='bench_output.txt',
+                      help='where to write the JSON results')
+  args = parser.parse_args()
+  primitives = args.primitives.split(',')
+  unknown = set(primitives) - set(all_primitives)
+  if unknown:
+    parser.error('Unknown primitives: {}'.format(', '.join(sorted(unknown))))
+
+  print('{:<30} {:>10} {:>14} {:>12} {:>10} {:>8}'
+        .format('primitive', 'size', 'latency (us)', 'MiB/s', 'ptrace', 'vm'))
+  results = run(args.sizes, primitives, args.mode, args.min_time, args.repeat)
+  with open(args.output, 'w') as f:
+    json.dump({'benchmark': 'transfer',
+               'timestamp': time.time(),
+               'host': {'machine': platform.machine(),
+                        'kernel': platform.release(),
+                        'python': platform.python_version()},
+               'mode': args.mode,
+               'min_time': args.min_time,
+               'repeat': args.repeat,
+               'results': results},
+              f,
+              indent=2)
+  print('Results written to {}'.format(args.output))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,142 @@
+"""
+<Program Name>
+  synthetic_traces
+
+<Purpose>
+  Generate strace format traces for the replay benchmark.  Each workload
+  describes exactly the sequence of system calls benchmarks/target.c makes
+  when run with the same workload name and iteration count, so the trace can
+  be replayed against the target through the existing handlers.
+
+  Workloads:
+    file    -- read()/write()/_llseek() of a fixed size payload
+    time    -- time(), gettimeofday(), clock_gettime() and times()
+    poll    -- epoll_wait() and poll() on a single descriptor
+    socket  -- setsockopt(), getsockopt() and send() through socketcall()
+    futex   -- mostly futex() wake ups, which the handlers let run, with a
+               time() call after every FUTEX_WAKES_PER_TIME of them
+
+  The traces follow the i386 system call ABI the handlers implement.
+
+"""
+
+
+import random
+
+
+WORKLOADS = ('file', 'time', 'poll', 'socket', 'futex')
+
+# Must agree with benchmarks/target.c
+FILE_PAYLOAD_SIZE = 512
+SEND_PAYLOAD_SIZE = 64
+START_TIME = 1500000000
+FUTEX_ADDRESS = 0x0a000000
+FUTEX_WAKES_PER_TIME = 9
+
+
+def strace_escape(data):
+  """
+  <Purpose>
+    Render a byte string the way strace -xx style output does for the
+    characters handlers care about: printable characters as themselves and
+    everything else (plus quotes and backslashes) as \\xNN escapes.
+
+  <Returns>
+    The escaped string wrapped in double quotes
+
+  """
+
+  out = []
+  for c in data:
+    if ' ' <= c <= '~' and c not in '"\\':
+      out.append(c)
+    else:
+      out.append('\\x{:02x}'.format(ord(c)))
+  return '"' + ''.join(out) + '"'
+
+
+def _payload(size, seed):
+  rng = random.Random(seed)
+  return ''.join(chr(rng.randint(0, 255)) for _ in range(size))
+
+
+def file_workload(iterations):
+  payload = strace_escape(_payload(FILE_PAYLOAD_SIZE, 'file'))
+  for _ in xrange(iterations):
+    yield 'read(3, {}, {}) = {}'.format(payload,
+                                        FILE_PAYLOAD_SIZE,
+                                        FILE_PAYLOAD_SIZE)
+    yield 'write(4, {}, {}) = {}'.format(payload,
+                                         FILE_PAYLOAD_SIZE,
+                                         FILE_PAYLOAD_SIZE)
+    yield '_llseek(3, 0, [0], SEEK_SET) = 0'
+  yield 'close(3) = 0'
+  yield 'close(4) = 0'
+
+
+def time_workload(iterations):
+  for i in xrange(iterations):
+    now = START_TIME + i
+    yield 'time([{0}]) = {0}'.format(now)
+    yield 'gettimeofday({{{}, {}}}, NULL) = 0'.format(now, i % 1000000)
+    yield 'clock_gettime(CLOCK_MONOTONIC, {{{}, {}}}) = 0'.format(
+        i, (i * 1000) % 1000000000)
+    yield ('times({{tms_utime={}, tms_stime={}, tms_cutime=0, '
+           'tms_cstime=0}}) = {}'.format(i, i // 2, 430000000 + i))
+
+
+def poll_workload(iterations):
+  yield 'epoll_create(1) = 5'
+  yield 'epoll_ctl(5, EPOLL_CTL_ADD, 3, {EPOLLIN, {u32=3, u64=3}}) = 0'
+  for _ in xrange(iterations):
+    yield 'epoll_wait(5, [{EPOLLIN, {u32=3, u64=3}}], 16, 0) = 1'
+    yield 'poll([{fd=3, events=POLLIN}], 1, 0) = 0 (Timeout)'
+
+
+def socket_workload(iterations):
+  payload = strace_escape(_payload(SEND_PAYLOAD_SIZE, 'socket'))
+  yield ('bind(3, {sa_family=AF_INET, sin_port=htons(8080), '
+         'sin_addr=inet_addr("127.0.0.1")}, 16) = 0')
+  yield 'listen(3, 5) = 0'
+  for _ in xrange(iterations):
+    yield 'setsockopt(3, SOL_SOCKET, SO_REUSEADDR, [1], 4) = 0'
+    yield 'getsockopt(3, SOL_SOCKET, SO_ERROR, [0], [4]) = 0'
+    yield 'send(4, {}, {}, 0) = {}'.format(payload,
+                                           SEND_PAYLOAD_SIZE,
+                                           SEND_PAYLOAD_SIZE)
+  yield 'shutdown(4, SHUT_RDWR) = 0'
+
+
+def futex_workload(iterations):
+  for i in xrange(iterations):
+    for _ in xrange(FUTEX_WAKES_PER_TIME):
+      yield 'futex({:#x}, FUTEX_WAKE, 1) = 0'.format(FUTEX_ADDRESS)
+    yield 'time([{0}]) = {0}'.format(START_TIME + i)
+
+
+_GENERATORS = {'file': file_workload,
+               'time': time_workload,
+               'poll': poll_workload,
+               'socket': socket_workload,
+               'futex': futex_workload}
+
+
+def generate_trace(workload, iterations):
+  """
+  <Purpose>
+    Generate the trace lines for a workload.
+
+  <Returns>
+    A list of strace format lines, without newlines
+
+  """
+
+  if workload not in _GENERATORS:
+    raise ValueError('Unknown workload: {}'.format(workload))
+  return list(_GENERATORS[workload](iterations))
+
+
+def write_trace(workload, iterations, path):
+  with open(path, 'w') as f:
+    for line in generate_trace(workload, iterations):
+      f.write(line + '\n')
@@ -0,0 +1,210 @@
+/*
+ * Target program for the end-to-end replay benchmark.
+ *
+ * Makes exactly the system calls benchmarks/synthetic_traces.py describes for
+ * a workload and iteration count, then exits.  It is built freestanding
+ * (-nostdlib -static) and issues system calls directly so there is no libc
+ * start up noise ahead of the calls being replayed.  Every buffer lives in
+ * static storage so all addresses handed to the kernel are below 2GB, which
+ * is what the handlers' 32-bit register reads expect.
+ *
+ * The handlers implement the i386 system call convention, so this is built
+ * with -m32.
+ *
+ *   target <file|time|poll|socket|futex> <iterations>
+ */
+
+#if !defined(__i386__)
+#error "target.c implements the i386 system call ABI; build it with -m32"
+#endif
+
+#define NR_read 3
+#define NR_write 4
+#define NR_close 6
+#define NR_time 13
+#define NR_times 43
+#define NR_gettimeofday 78
+#define NR_socketcall 102
+#define NR_futex 240
+#define NR_llseek 140
+#define NR_poll 168
+#define NR_exit_group 252
+#define NR_epoll_create 254
+#define NR_epoll_ctl 255
+#define NR_epoll_wait 256
+#define NR_clock_gettime 265
+
+#define SYS_BIND 2
+#define SYS_LISTEN 4
+#define SYS_SEND 9
+#define SYS_SHUTDOWN 13
+#define SYS_SETSOCKOPT 14
+#define SYS_GETSOCKOPT 15
+
+#define FUTEX_WAKE 1
+
+#define FILE_PAYLOAD_SIZE 512
+#define SEND_PAYLOAD_SIZE 64
+#define FUTEX_WAKES_PER_TIME 9
+
+/* The replay side fills structures using the tracer's (x86-64) layouts,
+ * which are larger than the i386 ones, so leave room behind every buffer. */
+#define SLACK 64
+
+static long syscall5(long nr, long a, long b, long c, long d, long e) {
+    long ret;
+    __asm__ volatile("int $0x80"
+                     : "=a"(ret)
+                     : "a"(nr), "b"(a), "c"(b), "d"(c), "S"(d), "D"(e)
+                     : "memory");
+    return ret;
+}
+
+#define syscall0(nr) syscall5(nr, 0, 0, 0, 0, 0)
+#define syscall1(nr, a) syscall5(nr, (long)(a), 0, 0, 0, 0)
+#define syscall2(nr, a, b) syscall5(nr, (long)(a), (long)(b), 0, 0, 0)
+#define syscall3(nr, a, b, c) \
+    syscall5(nr, (long)(a), (long)(b), (long)(c), 0, 0)
+#define syscall4(nr, a, b, c, d) \
+    syscall5(nr, (long)(a), (long)(b), (long)(c), (long)(d), 0)
+
+static unsigned char buffer[FILE_PAYLOAD_SIZE + SLACK];
+static unsigned char scratch[SLACK * 4];
+static long long llseek_result[1 + SLACK / sizeof(long long)];
+static unsigned long params[6 + SLACK / sizeof(unsigned long)];
+static unsigned char events[16 * 12 + SLACK];
+static int pollfds[2 + SLACK / sizeof(int)];
+static int optval[1 + SLACK / sizeof(int)];
+static int optlen[1 + SLACK / sizeof(int)];
+static unsigned char sockaddr[16 + SLACK];
+/* Linked at FUTEX_ADDRESS in synthetic_traces.py (see bench_replay.py) so the
+ * trace knows its address */
+static int futex_word __attribute__((section(".futex_word"), used)) = 1;
+
+static int streq(const char *a, const char *b) {
+    while(*a && *a == *b) {
+        a++;
+        b++;
+    }
+    return *a == *b;
+}
+
+static long to_long(const char *s) {
+    long n = 0;
+    while(*s >= '0' && *s <= '9') {
+        n = n * 10 + (*s++ - '0');
+    }
+    return n;
+}
+
+static long socketcall(int call, long a, long b, long c, long d, long e) {
+    params[0] = a;
+    params[1] = b;
+    params[2] = c;
+    params[3] = d;
+    params[4] = e;
+    return syscall2(NR_socketcall, call, params);
+}
+
+static void file_workload(long iterations) {
+    long i;
+    for(i = 0; i < iterations; i++) {
+        syscall3(NR_read, 3, buffer, FILE_PAYLOAD_SIZE);
+        syscall3(NR_write, 4, buffer, FILE_PAYLOAD_SIZE);
+        syscall5(NR_llseek, 3, 0, 0, (long)llseek_result, 0);
+    }
+    syscall1(NR_close, 3);
+    syscall1(NR_close, 4);
+}
+
+static void time_workload(long iterations) {
+    long i;
+    for(i = 0; i < iterations; i++) {
+        syscall1(NR_time, scratch);
+        syscall2(NR_gettimeofday, scratch, 0);
+        syscall2(NR_clock_gettime, 1, scratch);
+        syscall1(NR_times, scratch);
+    }
+}
+
+static void poll_workload(long iterations) {
+    long i;
+    /* EPOLLIN, u64 = 3 */
+    static unsigned int event[3 + SLACK / sizeof(int)] = { 1, 3, 0 };
+    syscall1(NR_epoll_create, 1);
+    syscall4(NR_epoll_ctl, 5, 1, 3, event);
+    pollfds[0] = 3;
+    pollfds[1] = 1;
+    for(i = 0; i < iterations; i++) {
+        syscall4(NR_epoll_wait, 5, events, 16, 0);
+        syscall3(NR_poll, pollfds, 1, 0);
+    }
+}
+
+static void socket_workload(long iterations) {
+    long i;
+    socketcall(SYS_BIND, 3, (long)sockaddr, 16, 0, 0);
+    socketcall(SYS_LISTEN, 3, 5, 0, 0, 0);
+    for(i = 0; i < iterations; i++) {
+        optval[0] = 1;
+        socketcall(SYS_SETSOCKOPT, 3, 1, 2, (long)optval, 4);
+        optlen[0] = 4;
+        socketcall(SYS_GETSOCKOPT, 3, 1, 4, (long)optval, (long)optlen);
+        socketcall(SYS_SEND, 4, (long)buffer, SEND_PAYLOAD_SIZE, 0, 0);
+    }
+    socketcall(SYS_SHUTDOWN, 4, 2, 0, 0, 0);
+}
+
+static void futex_workload(long iterations) {
+    long i;
+    long j;
+    for(i = 0; i < iterations; i++) {
+        for(j = 0; j < FUTEX_WAKES_PER_TIME; j++) {
+            syscall3(NR_futex, &futex_word, FUTEX_WAKE, 1);
+        }
+        syscall1(NR_time, scratch);
+    }
+}
+
+void start_c(long *sp) {
+    int argc = (int)sp[0];
+    char **argv = (char **)&sp[1];
+    long iterations;
+    int status = 0;
+    if(argc != 3) {
+        syscall1(NR_exit_group, 2);
+    }
+    iterations = to_long(argv[2]);
+    if(streq(argv[1], "file")) {
+        file_workload(iterations);
+    }
+    else if(streq(argv[1], "time")) {
+        time_workload(iterations);
+    }
+    else if(streq(argv[1], "poll")) {
+        poll_workload(iterations);
+    }
+    else if(streq(argv[1], "socket")) {
+        socket_workload(iterations);
+    }
+    else if(streq(argv[1], "futex")) {
+        futex_workload(iterations);
+    }
+    else {
+        status = 2;
+    }
+    syscall1(NR_exit_group, status);
+    for(;;) {
+    }
+}
+
+__asm__(".text\n"
+        ".global _start\n"
+        "_start:\n"
+        "    xorl %ebp, %ebp\n"
+        "    movl %esp, %eax\n"
+        "    andl $-16, %esp\n"
+        "    subl $12, %esp\n"
+        "    pushl %eax\n"
+        "    call start_c\n"
+        "    hlt\n");
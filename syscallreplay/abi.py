@@ -0,0 +1,114 @@
+"""
+<Program Name>
+  abi
+
+<Purpose>
+  Describe, for each tracee architecture, where system call arguments are
+  passed.  An Abi holds an ArgumentSlot per argument of every system call
+  and socketcall subcall: the register it is passed in, or its offset in the
+  socketcall() parameter block, and the mask that takes it, fetched signed,
+  to its unsigned value at its width.
+  The tables are built once, at import, so validating an argument is an
+  index into an argument vector fetched with fetch_arguments() in util
+  rather than a lookup worked out per call.
+
+  Calls are indexed by their i386 numbers, the numbers handlers are
+  registered under (see handler_registry).  On x86-64 there's no
+  socketcall(), so its subcalls take their arguments in registers like any
+  other call.
+
+"""
+
+
+import collections
+
+import syscallreplay as cint
+
+from syscall_dict import SOCKET_SUBCALLS
+from syscall_dict import SYSCALLS
+
+
+ARCH_I386 = 'i386'
+ARCH_X86_64 = 'x86_64'
+
+TRACEE_ARCHES = (ARCH_I386, ARCH_X86_64)
+
+
+ArgumentSlot = collections.namedtuple('ArgumentSlot',
+                                      ['register', 'offset', 'mask'])
+
+
+# The number of parameters each socketcall subcall reads from its parameter
+# block
+SUBCALL_ARGUMENT_COUNTS = {
+  'socket': 3,
+  'bind': 3,
+  'connect': 3,
+  'listen': 2,
+  'accept': 3,
+  'getsockname': 3,
+  'getpeername': 3,
+  'socketpair': 4,
+  'send': 4,
+  'recv': 4,
+  'sendto': 6,
+  'recvfrom': 6,
+  'shutdown': 2,
+  'setsockopt': 5,
+  'getsockopt': 5,
+  'sendmsg': 3,
+  'recvmsg': 3,
+  'accept4': 4,
+  'recvmmsg': 5,
+  'sendmmsg': 4,
+}
+
+
+class Abi(object):
+  """
+  <Purpose>
+    Where one architecture passes system call arguments, and the few other
+    numbers the replay needs to know about it.
+
+  """
+
+  def __init__(self, arch, audit_arch, word_width, getpid, registers,
+               socketcall_block):
+    self.arch = arch
+    self.audit_arch = audit_arch
+    self.word_width = word_width
+    self.word_mask = (1 << (8 * word_width)) - 1
+    self.getpid = getpid
+    self.registers = tuple(getattr(cint, name) for name in registers)
+    # Whether socketcall subcalls read their parameters from a block in
+    # memory rather than from registers
+    self.socketcall_block = socketcall_block
+    register_slots = tuple(ArgumentSlot(register, None, self.word_mask)
+                           for register in self.registers)
+    self.syscall_arguments = [None] * (max(SYSCALLS) + 1)
+    for num in SYSCALLS:
+      self.syscall_arguments[num] = register_slots
+    self.subcall_arguments = [None] * (max(SOCKET_SUBCALLS) + 1)
+    for num, name in SOCKET_SUBCALLS.iteritems():
+      count = SUBCALL_ARGUMENT_COUNTS[name[4:]]
+      if socketcall_block:
+        # The block is an array of ints
+        self.subcall_arguments[num] = tuple(
+            ArgumentSlot(None, pos * 4, 0xffffffff)
+            for pos in range(count))
+      else:
+        self.subcall_arguments[num] = register_slots[:count]
+
+
+  def argument_slots(self, syscall_id, subcall_id=None):
+    if subcall_id is not None:
+      return self.subcall_arguments[subcall_id]
+    return self.syscall_arguments[syscall_id]
+
+
+ABIS = {
+  ARCH_I386: Abi(ARCH_I386, cint.AUDIT_ARCH_I386, 4, 20,
+                 ('EBX', 'ECX', 'EDX', 'ESI', 'EDI', 'EBP'), True),
+  ARCH_X86_64: Abi(ARCH_X86_64, cint.AUDIT_ARCH_X86_64, 8, 39,
+                   ('RDI', 'RSI', 'RDX', 'R10', 'R8', 'R9'), False),
+}
@@ -0,0 +1,276 @@
+"""
+<Program Name>
+  checkpoint
+
+<Purpose>
+  Checkpoint a replay so it can be picked up again part way through the
+  trace without replaying everything before that point.
+
+  A checkpoint is taken at a system call entry, before the call's handler
+  runs.  The call is swapped for a fork(), the same way brk_entry_handler
+  swaps brk() for mmap2(), and the copy of the target this makes is parked
+  at its first stop, never to run.  The target's registers are then put
+  back and it is made to enter the original call again, so the replay
+  carries on as though nothing had happened.  The replay-side state at that
+  point (cint.syscall_index, cint.entering_syscall, cint.injected_state, the
+  replay counters and, if the caller has one, the file descriptor table) is
+  copied into the checkpoint alongside the saved registers.
+
+  Resuming forks the parked copy in turn, points the new process back at
+  the checkpointed call and puts the replay-side state back, so a
+  checkpoint can be resumed from any number of times.  The new process is
+  left at the entry of the checkpointed call for the replay loop to handle
+  as usual.
+
+  The target must be single threaded when a checkpoint is taken (fork()
+  only copies the calling thread), be an i386 process, and be traced with
+  PTRACE_O_TRACESYSGOOD.  Under sysemu suppression the target is stopped
+  at a PTRACE_SYSEMU entry, where the kernel has already decided to skip
+  the call, so the fork() is made by rewinding the call as
+  run_emulated_syscall() does, and the target is left at PTRACE_SYSEMU
+  entries like the replay loop expects.  Parked copies are children of the target, so a
+  target that waits for any of its children will see them.
+
+  Checkpointing every 100000 calls:
+    checkpoints = Checkpointer(interval=100000, options=options)
+    ... at each system call entry, before the handler runs:
+    checkpoints.maybe_checkpoint(pid, cint.syscall_index)
+    ... later:
+    pid = checkpoints.nearest(3000000).resume(options)
+
+"""
+
+
+import bisect
+import copy
+import os
+import signal
+
+import syscallreplay as cint
+
+from util import get_syscall_suppression
+from util import ReplayDeltaError
+from util import replay_counters
+from util import require_i386_tracee
+from util import SUPPRESS_SYSEMU
+
+
+FORK = 2
+
+# The registers a system call entry depends on (i386 ABI)
+CHECKPOINT_REGISTERS = (cint.EBX, cint.ECX, cint.EDX, cint.ESI, cint.EDI,
+                        cint.EBP, cint.ORIG_EAX, cint.EIP)
+
+# int $0x80 and sysenter are both two bytes long
+SYSCALL_INSTRUCTION_SIZE = 2
+
+
+def _save_registers(pid):
+  return dict((register, cint.peek_register(pid, register))
+              for register in CHECKPOINT_REGISTERS)
+
+
+def _aim_at_syscall(pid, registers, syscall_id):
+  # Point pid back at the instruction the checkpointed call was made with,
+  # with its arguments in place, so resuming it makes syscall_id
+  for register in CHECKPOINT_REGISTERS:
+    if register not in (cint.ORIG_EAX, cint.EIP):
+      cint.poke_register(pid, register, registers[register])
+  cint.poke_register(pid, cint.EIP,
+                     registers[cint.EIP] - SYSCALL_INSTRUCTION_SIZE)
+  cint.poke_register(pid, cint.EAX, syscall_id)
+  # Keep the kernel from treating the stop pid is at as a call to restart
+  cint.poke_register(pid, cint.ORIG_EAX, -1)
+
+
+def _entry_request():
+  # The request the replay loop reaches system call entries with.  Under
+  # sysemu suppression the kernel decides to skip a call when it stops at
+  # its entry, so the target has to be left at that kind of stop.
+  if get_syscall_suppression() == SUPPRESS_SYSEMU:
+    return cint.PTRACE_SYSEMU
+  return cint.PTRACE_SYSCALL
+
+
+def _enter_syscall(pid, syscall_id, request=cint.PTRACE_SYSCALL,
+                   from_sysemu=False):
+  kind, _, nr, _, _ = cint.step(pid, 0, request)
+  if from_sysemu and kind == cint.STOP_SYSCALL_EXIT:
+    # Some kernels report an exit stop for the emulated call first
+    kind, _, nr, _, _ = cint.step(pid, 0, request)
+  if kind != cint.STOP_SYSCALL_ENTRY or nr != syscall_id:
+    raise ReplayDeltaError('Expected pid {} to enter system call {}, got '
+                           'stop kind {} ({})'
+                           .format(pid, syscall_id, kind, nr))
+
+
+def _fork(pid):
+  # pid is at the entry of a fork().  Run it, leaving pid at its exit and
+  # the new process at its first stop.
+  kind, _, event, _, child = cint.step(pid, 0, cint.PTRACE_SYSCALL)
+  if kind != cint.STOP_EVENT or event != cint.PTRACE_EVENT_FORK:
+    raise ReplayDeltaError('Injected fork() in pid {} did not report a new '
+                           'process (stop kind {})'.format(pid, kind))
+  kind, _, _, _, _ = cint.step(pid, 0, cint.PTRACE_SYSCALL)
+  if kind != cint.STOP_SYSCALL_EXIT:
+    raise ReplayDeltaError('Injected fork() in pid {} did not exit (stop '
+                           'kind {})'.format(pid, kind))
+  kind, _, sig, _, _ = cint.wait_stop(child)
+  if kind != cint.STOP_SIGNAL or sig != signal.SIGSTOP:
+    raise ReplayDeltaError('Forked pid {} did not stop on creation (stop '
+                           'kind {})'.format(child, kind))
+  return child
+
+
+def _snapshot_state(fds):
+  return copy.deepcopy({'syscall_index': getattr(cint, 'syscall_index', None),
+                        'entering_syscall': getattr(cint, 'entering_syscall',
+                                                    True),
+                        'injected_state': getattr(cint, 'injected_state',
+                                                  None),
+                        'replay_counters': replay_counters,
+                        'fds': fds})
+
+
+class Checkpoint(object):
+  """
+  <Purpose>
+    A parked copy of the target stopped just before a system call, and the
+    replay-side state to go with it.
+
+  """
+
+  def __init__(self, pid, registers, state):
+    self.pid = pid
+    self.registers = registers
+    self.state = state
+    self.syscall_index = state['syscall_index']
+
+
+  def resume(self, options):
+    """
+    <Purpose>
+      Start a new copy of the target from this checkpoint, traced with
+      options, and put the replay-side state back as it was when the
+      checkpoint was taken.
+
+    <Returns>
+      The new process's pid, stopped at the entry of the checkpointed call,
+      and a copy of the file descriptor table taken with the checkpoint
+
+    """
+
+    require_i386_tracee('Checkpointing')
+    cint.set_options(self.pid, options | cint.PTRACE_O_TRACEFORK)
+    _aim_at_syscall(self.pid, self.registers, FORK)
+    _enter_syscall(self.pid, FORK)
+    pid = _fork(self.pid)
+    cint.set_options(pid, options)
+    _aim_at_syscall(pid, self.registers, self.registers[cint.ORIG_EAX])
+    _enter_syscall(pid, self.registers[cint.ORIG_EAX], _entry_request())
+    state = copy.deepcopy(self.state)
+    cint.syscall_index = state['syscall_index']
+    cint.entering_syscall = state['entering_syscall']
+    if state['injected_state'] is not None:
+      cint.injected_state = state['injected_state']
+    replay_counters.clear()
+    replay_counters.update(state['replay_counters'])
+    return pid, state['fds']
+
+
+  def discard(self):
+    try:
+      os.kill(self.pid, signal.SIGKILL)
+      os.waitpid(self.pid, cint.WALL)
+    except OSError:
+      pass
+
+
+def take_checkpoint(pid, options, fds=None):
+  """
+  <Purpose>
+    Checkpoint pid, traced with options and stopped at the entry of a system
+    call its handler hasn't seen yet.  pid is left at the same stop.
+
+  <Returns>
+    A Checkpoint
+
+  """
+
+  require_i386_tracee('Checkpointing')
+  registers = _save_registers(pid)
+  state = _snapshot_state(fds)
+  cint.set_options(pid, options | cint.PTRACE_O_TRACEFORK)
+  try:
+    cint.poke_register(pid, cint.ORIG_EAX, FORK)
+    if get_syscall_suppression() == SUPPRESS_SYSEMU:
+      # The kernel has already decided to skip the call pid is stopped at,
+      # so back it up and make the fork() for real, the way
+      # run_emulated_syscall() reruns a call
+      cint.rewind_syscall(pid)
+      _enter_syscall(pid, FORK, from_sysemu=True)
+    parked = _fork(pid)
+    _aim_at_syscall(pid, registers, registers[cint.ORIG_EAX])
+    _enter_syscall(pid, registers[cint.ORIG_EAX], _entry_request())
+  finally:
+    cint.set_options(pid, options)
+  return Checkpoint(parked, registers, state)
+
+
+class Checkpointer(object):
+  """
+  <Purpose>
+    Take checkpoints at chosen trace indices, or every interval calls, and
+    find the one to resume from.
+
+  """
+
+  def __init__(self, options, indices=(), interval=None):
+    self.options = options
+    self.indices = set(indices)
+    self.interval = interval
+    self.checkpoints = {}
+
+
+  def maybe_checkpoint(self, pid, syscall_index, fds=None):
+    """
+    <Purpose>
+      Checkpoint pid if syscall_index is one of the chosen indices.  Call at
+      every system call entry, before the handler runs.
+
+    <Returns>
+      The Checkpoint taken, or None
+
+    """
+
+    if syscall_index in self.checkpoints:
+      return None
+    if syscall_index not in self.indices \
+       and (not self.interval or syscall_index % self.interval != 0):
+      return None
+    checkpoint = take_checkpoint(pid, self.options, fds)
+    self.checkpoints[syscall_index] = checkpoint
+    return checkpoint
+
+
+  def nearest(self, syscall_index):
+    """
+    <Purpose>
+      Find the latest checkpoint taken at or before syscall_index.
+
+    <Returns>
+      A Checkpoint, or None if there isn't one
+
+    """
+
+    indices = sorted(self.checkpoints)
+    position = bisect.bisect_right(indices, syscall_index)
+    if position == 0:
+      return None
+    return self.checkpoints[indices[position - 1]]
+
+
+  def discard(self):
+    for checkpoint in self.checkpoints.values():
+      checkpoint.discard()
+    self.checkpoints = {}
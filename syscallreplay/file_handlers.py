@@ -8,6 +8,7 @@ Handlers for file-related system calls
 
 from __future__ import print_function
 from time import strptime, mktime
+import collections
 import re
 
 from getdents_parser import parse_getdents_structure
@@ -25,10 +26,24 @@ from util import (cleanup_quotes,
                   noop_current_syscall,
                   apply_return_conditions,
                   cleanup_return_value,
+                  decoded_structure,
                   validate_integer_argument,
+                  validate_arguments,
+                  peek_argument,
+                  trace_integer,
+                  trace_string,
+                  populate_trace_string,
                   find_arg_matching_string,
                   string_time_to_int,
-                  stop_for_debug,)
+                  stop_for_debug,
+                  unsigned_word,)
+from output_sink import (OUTPUT_FDS,
+                         replay_output,)
+from payload_store import populate_stored_payload
+from payload_store import populate_stored_vectors
+from verification import (should_verify_payload,
+                          check_payload_digest,
+                          compile_payload_digests,)
 
 
 def eventfd2_entry_handler(syscall_id, syscall_object, pid):
@@ -65,8 +80,7 @@ def ftruncate_entry_handler(syscall_id, syscall_object, pid):
   """
 
   logging.debug('Entering ftruncate entry handler')
-  validate_integer_argument(pid, syscall_object, 0, 0)
-  validate_integer_argument(pid, syscall_object, 1, 1)
+  validate_arguments(pid, syscall_object, syscall_id, integers=(0, 1))
   if should_replay_based_on_fd(int(syscall_object.args[0].value)):
     logging.debug('Replaying this system call')
     noop_current_syscall(pid)
@@ -107,8 +121,7 @@ def ftruncate64_entry_handler(syscall_id, syscall_object, pid):
   """
 
   logging.debug('Entering ftruncate entry handler')
-  validate_integer_argument(pid, syscall_object, 0, 0)
-  validate_integer_argument(pid, syscall_object, 1, 1)
+  validate_arguments(pid, syscall_object, syscall_id, integers=(0, 1))
   if should_replay_based_on_fd(int(syscall_object.args[0].value)):
     logging.debug('Replaying this system call')
     noop_current_syscall(pid)
@@ -232,6 +245,7 @@ def writev_entry_handler(syscall_id, syscall_object, pid):
   """Replay Always
   Checks:
   0: int file descriptor: The file descriptor being read from
+  1: struct iovec *iov: buffer contents (per verification policy)
   2: size_t length: Length of bytes to write
   Sets:
   return value: number of bytes read or -1 (error)
@@ -245,28 +259,26 @@ def writev_entry_handler(syscall_id, syscall_object, pid):
   validate_integer_argument(pid, syscall_object, 0, 0)
   # Validate iovec count
   validate_integer_argument(pid, syscall_object, len(syscall_object.args)-1, 2)
-  #vectors = int(syscall_object.args[-1].value)
-  #args = syscall_object.args[1:-1]
-  #logging.debug(args)
-  #datas = [args[x].value for x in range(0, len(args), 2)]
-  #datas[0] = datas[0].lstrip('[{')
-  #datas = [x.lstrip('{') for x in datas]
-  #datas = [x.lstrip('"').rstrip('"') for x in datas]
-  #datas = [x.decode('string-escape').encode('hex') for x in datas]
-  #lengths = [args[x].value for x in range(1, len(args), 2)]
-  #lengths[0] = lengths[0][0]
-  #lengths = [int(x.rstrip('}]')) for x in lengths]
-  #logging.debug('Vectors: %d', vectors)
-  #logging.debug('Datas: %s', datas)
-  #logging.debug('Lengths: %s', lengths)
-  #addr = cint.peek_register(pid, cint.RCX)
-  #logging.debug('Addr: %d', addr)
-  #vector_addresses = []
-  #for i in range(vectors):
-  #  vector_addresses.append(cint.peek_address(pid, addr + (i * 8)))
-  ## We may need to copy buffers over manually at some point.
-  ## Working for now.
-  #fd = int(syscall_object.args[0].value)
+  written = syscall_object.ret[0]
+  if written != -1 and should_verify_payload():
+    addr = cint.peek_register(pid, cint.RCX)
+    logging.debug('Addr: %x', unsigned_word(addr))
+    iov_count = int(syscall_object.args[-1].value)
+    # Stream the bytes written from every iov_base buffer in the child
+    # through one digest and compare it against the trace payloads as a
+    # whole
+    check_payload_digest(syscall_object,
+                         _writev_trace_payload,
+                         cint.digest_writev_vectors(pid,
+                                                    addr,
+                                                    iov_count,
+                                                    written),
+                         lambda: _writev_execution_payload(pid,
+                                                           syscall_object))
+  _replay_written_output(syscall_object,
+                         _writev_trace_payload,
+                         lambda: _writev_execution_payload(pid,
+                                                           syscall_object))
   noop_current_syscall(pid)
   apply_return_conditions(pid, syscall_object)
 
@@ -375,8 +387,7 @@ def read_entry_handler(syscall_id, syscall_object, pid):
   """
 
   logging.debug('read entry handler')
-  validate_integer_argument(pid, syscall_object, 0, 0)
-  validate_integer_argument(pid, syscall_object, 2, 2)
+  validate_arguments(pid, syscall_object, syscall_id, integers=(0, 2))
   fd = cint.peek_register(pid, cint.RDI)
   fd_from_trace = syscall_object.args[0].value
   logging.debug('File descriptor from execution: %s', fd)
@@ -384,24 +395,22 @@ def read_entry_handler(syscall_id, syscall_object, pid):
   ret_val = cleanup_return_value(syscall_object.ret[0])
   noop_current_syscall(pid)
   if ret_val != -1:
-    # file descriptor
-    validate_integer_argument(pid, syscall_object, 0, 0)
-    # bytes to read
-    validate_integer_argument(pid, syscall_object, 2, 2)
     buffer_address = cint.peek_register_unsigned(pid, cint.RCX)
     buffer_size_from_execution = cint.peek_register(pid, cint.RDX)
     buffer_size_from_trace = int(syscall_object.args[2].value)
-    logging.debug('Address: %x', buffer_address & 0xffffffff)
+    logging.debug('Address: %x', unsigned_word(buffer_address))
     logging.debug('Buffer size from execution: %d', buffer_size_from_execution)
     logging.debug('Buffer size from trace: %d', buffer_size_from_trace)
-    data = syscall_object.args[1].value
-    data = cleanup_quotes(data)
-    data = data.decode('string_escape')
-    if len(data) != ret_val:
-      raise ReplayDeltaError('Decoded bytes length ({}) does not '
-                             'equal return value from trace ({})'
-                             .format(len(data), ret_val))
-    cint.populate_char_buffer(pid, buffer_address, data)
+    # strace cuts long buffers short, so prefer the payload store's copy
+    if not populate_stored_payload(pid, buffer_address, ret_val):
+      decoded_length = populate_trace_string(pid,
+                                             buffer_address,
+                                             syscall_object.args[1],
+                                             ret_val)
+      if decoded_length != ret_val:
+        raise ReplayDeltaError('Decoded bytes length ({}) does not '
+                               'equal return value from trace ({})'
+                               .format(decoded_length, ret_val))
   apply_return_conditions(pid, syscall_object)
 
 
@@ -410,12 +419,16 @@ def readv_entry_handler(syscall_id, syscall_object, pid):
   validate_integer_argument(pid, syscall_object, 0, 0)
   if syscall_object.ret[0] != -1:
     addr = cint.peek_register(pid, cint.RCX)
-    logging.debug('Addr: %x', addr & 0xffffffff)
-    iovs = _collect_readv_iovs(syscall_object)
-    print(len(iovs[1]['iov_data']))
-    print(iovs)
+    logging.debug('Addr: %x', unsigned_word(addr))
     noop_current_syscall(pid)
-    cint.populate_readv_vectors(pid, addr, iovs)
+    # strace cuts long buffers short, so prefer the payload store's copy
+    if not populate_stored_vectors(pid,
+                                   addr,
+                                   int(syscall_object.args[-1].value),
+                                   syscall_object.ret[0]):
+      iovs = _collect_readv_iovs(syscall_object)
+      logging.debug('Number of iovs: %d', len(iovs))
+      cint.populate_readv_vectors(pid, addr, iovs)
     apply_return_conditions(pid, syscall_object)
   else:
     swap_trace_fd_to_execution_fd(pid, 0, syscall_object)
@@ -425,12 +438,12 @@ def _collect_readv_iovs(syscall_object):
   iov_count = int(syscall_object.args[-1].value)
   tmp = []
   for i in range(1, len(syscall_object.args)-1, 2):
-    iov_data = syscall_object.args[i].value.split('"', 1)[1]
-    iov_data = iov_data.rsplit('"', 1)[0].decode('string-escape')
+    iov_data = trace_string(syscall_object.args[i])
     iov_len = syscall_object.args[i+1].value
     if isinstance(iov_len, list):
       iov_len = iov_len[0]
-    iov_len = int(iov_len.strip('\'[]{}'))
+    # strace prints iov_len=N, posix-omni-parser leaves just N
+    iov_len = int(iov_len.strip('\'[]{}').split('=')[-1])
     if len(iov_data) != iov_len:
       raise ReplayDeltaError('Length of parsed iov_data ({}) does not '
                              'match specified length ({})'
@@ -442,10 +455,76 @@ def _collect_readv_iovs(syscall_object):
   return tmp
 
 
+def _cut_short(arg):
+  # strace marks strings it truncated at its -s length with ... after the
+  # closing quote
+  return arg.value.endswith('"...')
+
+
+def _write_trace_payload(syscall_object):
+  if _cut_short(syscall_object.args[1]):
+    return None
+  return trace_string(syscall_object.args[1])
+
+
+def _writev_trace_payload(syscall_object):
+  # The iov_base strings in order, skipping the iov_len tokens.  strace only
+  # prints the bytes a writev() wrote, so together they're the payload
+  buffers = [arg for arg in syscall_object.args[1:-1]
+             if isinstance(arg.value, str) and '"' in arg.value]
+  if any(_cut_short(arg) for arg in buffers):
+    return None
+  return ''.join([trace_string(arg) for arg in buffers])
+
+
+WRITE_TRACE_PAYLOADS = {'write': _write_trace_payload,
+                        'writev': _writev_trace_payload}
+
+
+def _write_execution_payload(pid):
+  bytes_addr = cint.peek_register(pid, cint.RCX)
+  bytes_len = cint.peek_register(pid, cint.RDX)
+  return cint.copy_address_range(pid, bytes_addr, bytes_addr + bytes_len)
+
+
+def _writev_execution_payload(pid, syscall_object):
+  # The bytes the call wrote, out of every iov_base buffer in the child
+  return cint.gather_writev_vectors(pid,
+                                    cint.peek_register(pid, cint.RCX),
+                                    int(syscall_object.args[-1].value),
+                                    syscall_object.ret[0])
+
+
+def _replay_written_output(syscall_object, trace_payload, execution_payload):
+  fd = int(syscall_object.args[0].value)
+  written = syscall_object.ret[0]
+  if fd in OUTPUT_FDS and written > 0:
+    data = trace_payload(syscall_object)
+    if data is None:
+      # strace cut the payload short, so take it from the child instead
+      data = execution_payload()
+    replay_output(fd, data[:written])
+
+
+def compile_write_digests(syscall_objects):
+  """
+  <Purpose>
+    Precompute the payload digests write verification compares against so
+    the trace payloads don't need to be decoded during replay.
+
+  <Returns>
+    The number of system call objects that were given a digest
+
+  """
+
+  return compile_payload_digests(syscall_objects, WRITE_TRACE_PAYLOADS)
+
+
 def write_entry_handler(syscall_id, syscall_object, pid):
   """Replay Always
   Checks:
   0: int file descriptor: The file descriptor being written to
+  1: const void *buf: buffer contents (per verification policy)
   2: size_t length: Length of bytes to write
   Sets:
   return value: number of bytes written or -1 (error)
@@ -456,22 +535,22 @@ def write_entry_handler(syscall_id, syscall_object, pid):
   """
 
   logging.debug('write entry handler')
-  validate_integer_argument(pid, syscall_object, 0, 0)
-  validate_integer_argument(pid, syscall_object, 2, 2)
-  bytes_addr = cint.peek_register(pid, cint.RCX)
-  bytes_len = cint.peek_register(pid, cint.RDX)
-  bytes_from_trace = cleanup_quotes(syscall_object.args[1].value)
-  bytes_from_execution = cint.copy_address_range(pid, bytes_addr, bytes_addr + bytes_len)
-  bytes_from_trace = bytes_from_trace.decode('string-escape')
-  if bytes_from_trace != bytes_from_execution:
-    logging.warning ('Bytes from trace don\'t match bytes from execution!')
-    logging.debug(bytes_from_trace.encode('hex'))
-    logging.debug(bytes_from_execution.encode('hex'))
-  fd = int(syscall_object.args[0].value)
-  if fd == 1 or fd == 2:
-    print('####   Output   ####')
-    print(bytes_from_trace, rnd='')
-    print('#### rnd Output ####')
+  validate_arguments(pid, syscall_object, syscall_id, integers=(0, 2))
+  if should_verify_payload():
+    bytes_addr = cint.peek_register(pid, cint.RCX)
+    bytes_len = cint.peek_register(pid, cint.RDX)
+    bytes_end = bytes_addr + bytes_len
+    execution_digest = (bytes_len,
+                        cint.digest_address_range(pid, bytes_addr, bytes_end))
+    check_payload_digest(syscall_object,
+                         _write_trace_payload,
+                         execution_digest,
+                         lambda: cint.copy_address_range(pid,
+                                                         bytes_addr,
+                                                         bytes_end))
+  _replay_written_output(syscall_object,
+                         _write_trace_payload,
+                         lambda: _write_execution_payload(pid))
   noop_current_syscall(pid)
   apply_return_conditions(pid, syscall_object)
 
@@ -633,7 +712,7 @@ def statfs64_entry_handler(syscall_id, syscall_object, pid):
 
     logging.debug('f_flags: %d', f_flags)
     logging.debug('pid: %d', pid)
-    logging.debug('addr: %x', addr & 0xffffffff)
+    logging.debug('addr: %x', unsigned_word(addr))
     cint.populate_statfs64_structure(pid,
                                      addr,
                                      f_type,
@@ -687,22 +766,16 @@ def validate_string_argument(pid,
                              exec_len_arg):
   logging.debug('Validating string argument (trace position: {}, '\
                 'execution position: {}'
-                .format(trace_arg, exec_arg))
+                .format(trace_buf_arg, exec_buf_arg))
 
   validate_integer_argument(pid, syscall_object, 0, 0)
-  POS_TO_REG = {0: cint.RDI,
-                1: cint.RSI,
-                2: cint.RDX,
-                3: cint.R10,
-                4: cint.R8}
 
-  trace_len = int(syscall_object[trace_len_arg])
-  trace_data = cleanup_quotes(syscall_object[trace_buf_arg].value).decode('string-escape')
+  trace_len = trace_integer(syscall_object.args[trace_len_arg])
+  trace_data = trace_string(syscall_object.args[trace_buf_arg])
 
-  exec_len = cint.peek_register(pid, POS_TO_REG[exec_len_arg])
-  exec_data = cint.copy_address_range(pid,
-                                      cint.peek_register(pid, POS_TO_REG[exec_buf_arg]),
-                                      exec_len)
+  exec_len = peek_argument(pid, exec_len_arg)
+  exec_addr = unsigned_word(peek_argument(pid, exec_buf_arg))
+  exec_data = cint.copy_address_range(pid, exec_addr, exec_addr + exec_len)
 
   logging.debug('Length from trace: {}\n'
                 'Length from trace: {}\n'
@@ -818,131 +891,157 @@ def _parse_statlike_call_time(value):
   # Otherwise, we try the standard parsing we've used in the past
   return string_time_to_int(value)
 
-def _handle_statlike_call(syscall_id_, syscall_object, pid):
-  buf_addr = cint.peek_register_unsigned(pid, cint.RSI)
-  logging.debug('RSI: %x', buf_addr)
-  noop_current_syscall(pid)
-  if syscall_object.ret[0] == -1:
-    logging.debug('Got unsuccessful stat-like call')
-  else:
-    logging.debug('Got successful stat-like call')
-    # There should always be an st_dev
-    idx, arg = find_arg_matching_string(syscall_object.args[1:],
-                                        'st_dev')[0]
-    st_dev1 = arg
-    st_dev1 = int(st_dev1.split('(')[1])
-    # must increment idx by 2 in order to account for slicing out the
-    # initial file descriptor
-    st_dev2 = syscall_object.args[idx+2].value
-    st_dev2 = int(st_dev2.strip(')'))
-    logging.debug('st_dev1: %s', st_dev1)
-    logging.debug('st_dev2: %s', st_dev2)
-
-    # st_rdev is optional
-    st_rdev1 = 0
-    st_rdev2 = 0
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_rdev')
-    if len(r) > 0:
-      idx, arg = r[0]
-      logging.debug('We have a st_rdev argument')
-      st_rdev1 = arg
-      st_rdev1 = int(st_rdev1.split('(')[1])
-      st_rdev2 = syscall_object.args[idx+2].value
-      st_rdev2 = int(st_rdev2.strip(')'))
-      logging.debug('st_rdev1: %d', st_rdev1)
-      logging.debug('st_rdev2: %d', st_rdev2)
-
-    # st_ino
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_ino')
-    idx, arg = r[0]
-    st_ino = int(arg.split('=')[1])
-    logging.debug('st_ino: %d', st_ino)
-
-    # st_mode
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_mode')
-    idx, arg = r[0]
-    st_mode = int(cleanup_st_mode(arg.split('=')[1]))
-    logging.debug('st_mode: %d', st_mode)
-
-    # st_nlink
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_nlink')
-    idx, arg = r[0]
-    st_nlink = int(arg.split('=')[1])
-    logging.debug('st_nlink: %d', st_nlink)
+StatFields = collections.namedtuple('StatFields',
+                                    ['st_dev1', 'st_dev2', 'st_ino', 'st_mode',
+                                     'st_nlink', 'st_uid', 'st_gid',
+                                     'st_rdev1', 'st_rdev2', 'st_size',
+                                     'st_blksize', 'st_blocks', 'st_atime',
+                                     'st_mtime', 'st_ctime'])
 
-    # st_uid
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_uid')
-    idx, arg = r[0]
-    st_uid = int(arg.split('=')[1])
-    logging.debug('st_uid: %d', st_uid)
 
-    # st_gid
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_gid')
-    idx, arg = r[0]
-    st_gid = int(arg.split('=')[1])
-    logging.debug('st_gid: %d', st_gid)
+def parse_stat_fields(syscall_object):
+  """
+  <Purpose>
+    Pull the fields of the stat structure out of a successful stat-like
+    call.  The parallel trace parser runs this ahead of time and stores the
+    result on the system call object as decoded.
 
-    # st_blocksize
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_blksize')
-    idx, arg = r[0]
-    st_blksize = int(arg.split('=')[1])
-    logging.debug('st_blksize: %d', st_blksize)
+  <Returns>
+    A StatFields namedtuple
 
-    # st_blocks
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_blocks')
-    idx, arg = r[0]
-    st_blocks = int(arg.split('=')[1])
-    logging.debug('st_block: %d', st_blocks)
+  """
 
-    # st_size is optional
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_size')
-    if len(r) >= 1:
-      idx, arg = r[0]
-      st_size = int(arg.split('=')[1])
-      logging.debug('st_size: %d', st_size)
-    else:
-      st_size = 0
-      logging.debug('optional st_size not present')
-    # st_atime
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_atime')
+  # There should always be an st_dev
+  idx, arg = find_arg_matching_string(syscall_object.args[1:],
+                                      'st_dev')[0]
+  st_dev1 = arg
+  st_dev1 = int(st_dev1.split('(')[1])
+  # must increment idx by 2 in order to account for slicing out the
+  # initial file descriptor
+  st_dev2 = syscall_object.args[idx+2].value
+  st_dev2 = int(st_dev2.strip(')'))
+  logging.debug('st_dev1: %s', st_dev1)
+  logging.debug('st_dev2: %s', st_dev2)
+
+  # st_rdev is optional
+  st_rdev1 = 0
+  st_rdev2 = 0
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_rdev')
+  if len(r) > 0:
     idx, arg = r[0]
-    value = arg.split('=')[1]
-    st_atime = _parse_statlike_call_time(value)
-    logging.debug('st_atime: %d', st_atime)
-
-    # st_mtime
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_mtime')
+    logging.debug('We have a st_rdev argument')
+    st_rdev1 = arg
+    st_rdev1 = int(st_rdev1.split('(')[1])
+    st_rdev2 = syscall_object.args[idx+2].value
+    st_rdev2 = int(st_rdev2.strip(')'))
+    logging.debug('st_rdev1: %d', st_rdev1)
+    logging.debug('st_rdev2: %d', st_rdev2)
+
+  # st_ino
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_ino')
+  idx, arg = r[0]
+  st_ino = int(arg.split('=')[1])
+  logging.debug('st_ino: %d', st_ino)
+
+  # st_mode
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_mode')
+  idx, arg = r[0]
+  st_mode = int(cleanup_st_mode(arg.split('=')[1]))
+  logging.debug('st_mode: %d', st_mode)
+
+  # st_nlink
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_nlink')
+  idx, arg = r[0]
+  st_nlink = int(arg.split('=')[1])
+  logging.debug('st_nlink: %d', st_nlink)
+
+  # st_uid
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_uid')
+  idx, arg = r[0]
+  st_uid = int(arg.split('=')[1])
+  logging.debug('st_uid: %d', st_uid)
+
+  # st_gid
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_gid')
+  idx, arg = r[0]
+  st_gid = int(arg.split('=')[1])
+  logging.debug('st_gid: %d', st_gid)
+
+  # st_blocksize
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_blksize')
+  idx, arg = r[0]
+  st_blksize = int(arg.split('=')[1])
+  logging.debug('st_blksize: %d', st_blksize)
+
+  # st_blocks
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_blocks')
+  idx, arg = r[0]
+  st_blocks = int(arg.split('=')[1])
+  logging.debug('st_block: %d', st_blocks)
+
+  # st_size is optional
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_size')
+  if len(r) >= 1:
     idx, arg = r[0]
-    st_mtime = _parse_statlike_call_time(value)
-    logging.debug('st_mtime: %d', st_mtime)
+    st_size = int(arg.split('=')[1])
+    logging.debug('st_size: %d', st_size)
+  else:
+    st_size = 0
+    logging.debug('optional st_size not present')
+  # st_atime
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_atime')
+  idx, arg = r[0]
+  value = arg.split('=')[1]
+  st_atime = _parse_statlike_call_time(value)
+  logging.debug('st_atime: %d', st_atime)
+
+  # st_mtime
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_mtime')
+  idx, arg = r[0]
+  st_mtime = _parse_statlike_call_time(value)
+  logging.debug('st_mtime: %d', st_mtime)
+
+  # st_ctime
+  r = find_arg_matching_string(syscall_object.args[1:], 'st_ctime')
+  idx, arg = r[0]
+  value = arg.split('=')[1].strip('}')
+  st_ctime = _parse_statlike_call_time(value)
+  logging.debug('st_ctime: %d', st_ctime)
+
+  return StatFields(st_dev1, st_dev2, st_ino, st_mode, st_nlink, st_uid,
+                    st_gid, st_rdev1, st_rdev2, st_size, st_blksize,
+                    st_blocks, st_atime, st_mtime, st_ctime)
 
-    # st_ctime
-    r = find_arg_matching_string(syscall_object.args[1:], 'st_ctime')
-    idx, arg = r[0]
-    value = arg.split('=')[1].strip('}')
-    st_ctime = _parse_statlike_call_time(value)
-    logging.debug('st_ctime: %d', st_ctime)
 
+def _handle_statlike_call(syscall_id_, syscall_object, pid):
+  buf_addr = cint.peek_register_unsigned(pid, cint.RSI)
+  logging.debug('RSI: %x', buf_addr)
+  noop_current_syscall(pid)
+  if syscall_object.ret[0] == -1:
+    logging.debug('Got unsuccessful stat-like call')
+  else:
+    logging.debug('Got successful stat-like call')
+    fields = decoded_structure(syscall_object, parse_stat_fields)
     logging.debug('pid: %d', pid)
     logging.debug('addr: %x', buf_addr)
     cint.enable_debug_output(10)
     cint.populate_stat64_struct(pid,
                                 buf_addr,
-                                int(st_dev1),
-                                int(st_dev2),
-                                st_ino,
-                                st_mode,
-                                st_nlink,
-                                st_uid,
-                                st_gid,
-                                int(st_rdev1),
-                                int(st_rdev2),
-                                st_size,
-                                st_blksize,
-                                st_blocks,
-                                st_atime,
-                                st_mtime,
-                                st_ctime)
+                                int(fields.st_dev1),
+                                int(fields.st_dev2),
+                                fields.st_ino,
+                                fields.st_mode,
+                                fields.st_nlink,
+                                fields.st_uid,
+                                fields.st_gid,
+                                int(fields.st_rdev1),
+                                int(fields.st_rdev2),
+                                fields.st_size,
+                                fields.st_blksize,
+                                fields.st_blocks,
+                                fields.st_atime,
+                                fields.st_mtime,
+                                fields.st_ctime)
     cint.disable_debug_output()
   apply_return_conditions(pid, syscall_object)
 
@@ -955,7 +1054,7 @@ def fstatat64_entry_handler(syscall_id, syscall_object, pid):
       return
   # At this point we replay calls with either AT_FDCWD or replay fds
   buf_addr = cint.peek_register(pid, cint.RDX)
-  logging.debug('RDX: %x', (buf_addr & 0xffffffff))
+  logging.debug('RDX: %x', unsigned_word(buf_addr))
   # TODO: Check path name
   if syscall_object.ret[0] == -1:
     logging.debug('Got unsuccessful fstatat64 call')
@@ -1139,9 +1238,8 @@ def lstat64_entry_handler(syscall_id, syscall_object, pid):
 
 def fchown_entry_handler(syscall_id, syscall_object, pid):
   logging.debug('Entering fchown entry handler')
-  validate_integer_argument(pid, syscall_object, 0, 0)
   # TODO: Validate second argument here. Issue -> it is a flags object
-  validate_integer_argument(pid, syscall_object, 2, 2)
+  validate_arguments(pid, syscall_object, syscall_id, integers=(0, 2))
   logging.debug('Replaying this system call')
   noop_current_syscall(pid)
   apply_return_conditions(pid, syscall_object)
@@ -1168,11 +1266,10 @@ def flistxattr_entry_handler(syscall_id, syscall_object, pid):
       logging.debug('buffer address: %x', buffer_address)
       # if param 2 is NULL, we don't populate
       if buffer_address != 0:
-        data = cleanup_quotes(syscall_object.args[1].value)
-        if data == 'NULL':
+        if syscall_object.args[1].value == 'NULL':
           data = ''
         else:
-          data = data.decode('string-escape')
+          data = trace_string(syscall_object.args[1])
         logging.debug('data: %s', data)
         cint.populate_char_buffer(pid,
                                   buffer_address,
@@ -1210,11 +1307,10 @@ def fgetxattr_entry_handler(syscall_id, syscall_object, pid):
       logging.debug('buffer address: %x', buffer_address)
       # if param 2 is NULL, we don't populate
       if buffer_address != 0:
-        data = cleanup_quotes(syscall_object.args[1].value)
-        if data == 'NULL':
+        if syscall_object.args[1].value == 'NULL':
           data = ''
         else:
-          data = data.decode('string-escape')
+          data = trace_string(syscall_object.args[1])
         logging.debug('data: %s', data)
         cint.populate_char_buffer(pid,
                                   buffer_address,
@@ -1288,7 +1384,7 @@ def getdents64_entry_handler(syscall_id, syscall_object, pid):
   logging.debug('addr: %x', addr)
   retlen = int(syscall_object.ret[0])
   if syscall_object.args[1].value != '[]':
-    data = parse_getdents_structure(syscall_object)
+    data = decoded_structure(syscall_object, parse_getdents_structure)
     cint.populate_getdents64_structure(pid, addr, data, retlen)
   noop_current_syscall(pid)
   apply_return_conditions(pid, syscall_object)
@@ -1324,9 +1420,9 @@ def getdents_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('Replaying this system call')
     logging.debug('PID: %d', pid)
     addr = cint.peek_register(pid, cint.RSI)
-    logging.debug('addr: %x', addr & 0xffffffff)
+    logging.debug('addr: %x', unsigned_word(addr))
     retlen = int(syscall_object.ret[0])
-    data = parse_getdents_structure(syscall_object)
+    data = decoded_structure(syscall_object, parse_getdents_structure)
     if len(data) > 0:
       cint.populate_getdents_structure(pid, addr, data, retlen)
     noop_current_syscall(pid)
@@ -1386,6 +1482,25 @@ def _cleanup_f_type(t):
       raise ReplayDeltaError('Could not clean up f_type: ({})', t)
 
 
+FCNTL64_RETURN_ONLY_OPERATIONS = ('F_GETFL', 'F_SETFL', 'F_SETFD', 'F_SETLKW',
+                                  'F_SETLK64', 'F_SETLKW64')
+
+
+def fcntl64_parse(syscall_object):
+  """Parse stage of the fcntl64 handler: the operation from the trace, which
+  must be one the handler knows how to replay.
+  """
+  operation = syscall_object.args[1].value
+  # posix-omni-parser hands flag arguments back as a list
+  if isinstance(operation, list):
+    operation = operation[0]
+  operation = operation.strip('[]\'')
+  if (operation not in FCNTL64_RETURN_ONLY_OPERATIONS
+      and operation not in ('F_GETFD', 'F_DUPFD')):
+    raise NotImplementedError('Unimplemented fcntl64 operation {}' .format(operation))
+  return operation
+
+
 def fcntl64_entry_handler(syscall_id, syscall_object, pid):
   """Replay Always
   Checks:
@@ -1401,18 +1516,14 @@ def fcntl64_entry_handler(syscall_id, syscall_object, pid):
   logging.debug('Entering fcntl64 entry handler')
   validate_integer_argument(pid, syscall_object, 0, 0)
   trace_fd = int(syscall_object.args[0].value)
-  operation = syscall_object.args[1].value[0].strip('[]\'')
+  operation = fcntl64_parse(syscall_object)
   noop_current_syscall(pid)
-  if (operation == 'F_GETFL' or operation == 'F_SETFL'
-    or operation == 'F_SETFD' or operation == 'F_SETLKW'
-    or operation == 'F_SETLK64' or operation == 'F_SETLKW64'):
+  if operation in FCNTL64_RETURN_ONLY_OPERATIONS:
     apply_return_conditions(pid, syscall_object)
   elif (operation == 'F_GETFD'):
     _fcntl_f_getfd_handler(pid, syscall_object)
   elif operation == 'F_DUPFD':
     _fcntl_f_dupfd_handler(pid, syscall_object)
-  else:
-    raise NotImplementedError('Unimplemented fcntl64 operation {}' .format(operation))
 
 
 def _fcntl_f_dupfd_handler(pid, syscall_object):
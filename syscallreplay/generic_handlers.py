@@ -99,7 +99,7 @@ def check_return_value_exit_handler(syscall_id, syscall_object, pid):
     if errno_retval == ret_from_execution:
       return
   if ret_from_execution < 0:
-    ret_from_execution &= 0xffffffff
+    ret_from_execution = util.unsigned_word(ret_from_execution)
   if ret_from_execution != ret_from_trace:
     raise util.ReplayDeltaError('Return value from execution ({}, {:02x}) '
       'differs from return value from trace '
@@ -0,0 +1,475 @@
+"""
+<Program Name>
+  handler_registry
+
+<Purpose>
+  Map system call numbers (and socketcall subcall ids) to the functions that
+  replay them.  The tables are plain lists indexed by system call id so
+  dispatching a stop is a single index operation rather than a name lookup
+  across the handler modules.
+
+  At import time every handler module is scanned and its functions are
+  registered by the naming convention the modules already follow:
+    <name>_entry_handler            entry handler
+    <name>_exit_handler             exit handler
+    <name>_subcall_entry_handler    socketcall subcall entry handler
+    <name>_parse                    the handler's parse stage, which only
+                                    looks at the trace and raises
+                                    NotImplementedError for what the
+                                    handler can't replay
+    <name>_forger                   forger used when injecting state
+    <name>_entry_debug_printer      debug printer
+
+  Handlers are registered under i386 numbers.  Stops of an x86-64 tracee are
+  dispatched to the handler for the i386 call of the same name (socket calls
+  to the socketcall subcall's) through dispatch_ids(), but only for the
+  calls in X86_64_PORTED_SYSCALLS.  Most handlers still peek i386 argument
+  registers by name or fill in i386 structures, so x86-64 stops of any other
+  call are reported as having no handler.
+
+  Plugins can add or replace handlers with register_handler() or
+  register_module(), and find_unhandled_syscalls() scans a parsed trace for
+  calls nothing is registered for so they can be reported before a replay
+  starts.
+
+"""
+
+
+import collections
+import re
+
+from syscall_dict import SOCKET_SUBCALLS
+from syscall_dict import SYSCALLS
+from syscall_dict import SYSCALLS_X86_64
+from util import ARCH_X86_64
+from util import get_tracee_arch
+from util import logging
+
+import file_handlers
+import generic_handlers
+import kernel_handlers
+import multiplex_handlers
+import recv_handlers
+import send_handlers
+import socket_handlers
+import time_handlers
+
+
+SOCKETCALL = 102
+
+SYSCALL_TABLE_SIZE = max(SYSCALLS) + 1
+SUBCALL_TABLE_SIZE = max(SOCKET_SUBCALLS) + 1
+
+SYSCALL_NUMBERS = {name[4:]: num for num, name in SYSCALLS.iteritems()}
+SUBCALL_NUMBERS = {name[4:]: num for num, name in SOCKET_SUBCALLS.iteritems()}
+
+# strace names (less any leading underscores, which handler names drop too)
+# that differ from the kernel's name for the same call
+STRACE_NAME_ALIASES = {
+  'newselect': 'select',
+  'mmap': 'old_mmap',
+  'uname': 'newuname',
+  'olduname': 'uname',
+  'oldolduname': 'olduname',
+  'stat': 'newstat',
+  'lstat': 'newlstat',
+  'fstat': 'newfstat',
+  'oldstat': 'stat',
+  'oldlstat': 'lstat',
+  'oldfstat': 'fstat',
+  'getuid32': 'getuid',
+  'getgid32': 'getgid',
+  'geteuid32': 'geteuid',
+  'getegid32': 'getegid',
+  'fchown32': 'fchown',
+  'getresuid32': 'getresuid',
+  'getresgid32': 'getresgid',
+}
+
+# x86-64 names that differ from the name of the i386 call handled the same way
+X86_64_NAME_ALIASES = {
+  'mmap': 'mmap2',
+}
+
+# The i386 calls whose handlers are safe to run against an x86-64 tracee:
+# they read their arguments through peek_argument(), validate_arguments()
+# and friends or extract_socketcall_parameters() in util, and write nothing
+# whose layout differs between the two architectures.  Add a call here once
+# its handlers are ported.  Handlers that call should_replay_based_on_fd()
+# stay out until that helper exists.
+X86_64_PORTED_SYSCALLS = frozenset([
+  'close',
+  'epoll_create',
+  'epoll_ctl',
+  'eventfd2',
+  'fchmod',
+  'fchown',
+  'futex',
+  'mkdir',
+  'set_tid_address',
+  'timer_delete',
+  'socket',
+  'bind',
+  'connect',
+  'listen',
+  'accept',
+  'getsockname',
+  'getpeername',
+  'shutdown',
+  'setsockopt',
+  'getsockopt',
+])
+
+HANDLER_NAME_RE = re.compile(r'^(?P<name>\w+?)_(?P<kind>subcall_entry|entry|exit)'
+                             r'_handler$')
+FORGER_NAME_RE = re.compile(r'^(?P<name>\w+)_forger$')
+PARSER_NAME_RE = re.compile(r'^(?P<name>\w+?)(?:_subcall)?_parse$')
+DEBUG_PRINTER_NAME_RE = re.compile(r'^(?P<name>\w+?)(?:_entry)?_debug_printer$')
+
+HANDLER_MODULES = (file_handlers,
+                   generic_handlers,
+                   kernel_handlers,
+                   multiplex_handlers,
+                   recv_handlers,
+                   send_handlers,
+                   socket_handlers,
+                   time_handlers)
+
+
+def resolve_syscall_name(name):
+  """
+  <Purpose>
+    Turn a system call name, as strace or a handler's name spells it, into
+    the numbers used to dispatch it.  Socket calls made through socketcall()
+    resolve to the socketcall number and their subcall id.
+
+  <Returns>
+    A (syscall_id, subcall_id) tuple, subcall_id being None for ordinary
+    system calls, or None if the name isn't known
+
+  """
+
+  name = name.lstrip('_')
+  name = STRACE_NAME_ALIASES.get(name, name)
+  if name in SYSCALL_NUMBERS:
+    return (SYSCALL_NUMBERS[name], None)
+  if name in SUBCALL_NUMBERS:
+    return (SOCKETCALL, SUBCALL_NUMBERS[name])
+  return None
+
+
+def _x86_64_syscall_ids():
+  ids = [None] * (max(SYSCALLS_X86_64) + 1)
+  for num, name in SYSCALLS_X86_64.iteritems():
+    name = X86_64_NAME_ALIASES.get(name[4:], name[4:])
+    if name not in X86_64_PORTED_SYSCALLS:
+      continue
+    if name in SUBCALL_NUMBERS:
+      ids[num] = (SOCKETCALL, SUBCALL_NUMBERS[name])
+    else:
+      ids[num] = resolve_syscall_name(name)
+  return ids
+
+
+# The (syscall_id, subcall_id) each x86-64 system call number is dispatched
+# as, or None for calls with no i386 counterpart or whose handlers aren't
+# ported.  Socket calls go to the
+# socketcall subcall handlers, which read their parameters through
+# util.extract_socketcall_parameters().
+X86_64_SYSCALL_IDS = _x86_64_syscall_ids()
+
+
+def dispatch_ids(syscall_id, args):
+  """
+  <Purpose>
+    Turn the system call number and arguments of a stop of the tracee into
+    the ids handlers are registered under, for the tracee architecture
+    util.set_tracee_arch() selected.
+
+  <Returns>
+    A (syscall_id, subcall_id) tuple, or None for an x86-64 call with no i386
+    counterpart or no ported handlers
+
+  """
+
+  if get_tracee_arch() == ARCH_X86_64:
+    return _slot(X86_64_SYSCALL_IDS, syscall_id)
+  if syscall_id == SOCKETCALL:
+    return (SOCKETCALL, args[0])
+  return (syscall_id, None)
+
+
+class HandlerRegistry(object):
+  """
+  <Purpose>
+    Tables of entry handlers, exit handlers, parse stages, forgers and debug
+    printers indexed by system call id, with separate handler and parse
+    stage tables for socketcall subcalls.  Unset slots are None.
+
+  """
+
+  def __init__(self):
+    self.entry_handlers = [None] * SYSCALL_TABLE_SIZE
+    self.exit_handlers = [None] * SYSCALL_TABLE_SIZE
+    self.parsers = [None] * SYSCALL_TABLE_SIZE
+    self.forgers = [None] * SYSCALL_TABLE_SIZE
+    self.debug_printers = [None] * SYSCALL_TABLE_SIZE
+    self.subcall_entry_handlers = [None] * SUBCALL_TABLE_SIZE
+    self.subcall_exit_handlers = [None] * SUBCALL_TABLE_SIZE
+    self.subcall_parsers = [None] * SUBCALL_TABLE_SIZE
+
+
+  def register_handler(self, syscall, entry_handler=None, exit_handler=None,
+                       forger=None, debug_printer=None, subcall=False,
+                       override=False, parser=None):
+    """
+    <Purpose>
+      Register functions for a system call, given by name or number.  A
+      number is taken to be a socketcall subcall id if subcall is True;
+      names of socket calls are recognised automatically.  Replacing a
+      function that is already registered requires override=True.
+
+    <Returns>
+      The (syscall_id, subcall_id) the functions were registered under
+
+    """
+
+    if isinstance(syscall, basestring):
+      ids = resolve_syscall_name(syscall)
+      if ids is None:
+        raise ValueError('Unknown system call: {}'.format(syscall))
+    elif subcall:
+      ids = (SOCKETCALL, syscall)
+    else:
+      ids = (syscall, None)
+    syscall_id, subcall_id = ids
+    if subcall_id is not None:
+      if subcall_id not in SOCKET_SUBCALLS:
+        raise ValueError('Unknown socketcall subcall: {}'.format(subcall_id))
+      if forger is not None or debug_printer is not None:
+        raise ValueError('Forgers and debug printers are registered against '
+                         'socketcall itself, not its subcalls')
+      slots = ((self.subcall_entry_handlers, entry_handler),
+               (self.subcall_exit_handlers, exit_handler),
+               (self.subcall_parsers, parser))
+      index = subcall_id
+    else:
+      if syscall_id not in SYSCALLS:
+        raise ValueError('Unknown system call number: {}'.format(syscall_id))
+      slots = ((self.entry_handlers, entry_handler),
+               (self.exit_handlers, exit_handler),
+               (self.parsers, parser),
+               (self.forgers, forger),
+               (self.debug_printers, debug_printer))
+      index = syscall_id
+    for table, function in slots:
+      if function is None:
+        continue
+      if table[index] is not None and table[index] is not function \
+         and not override:
+        raise ValueError('{} is already registered for {}, pass override=True '
+                         'to replace it'.format(table[index].__name__,
+                                                _describe(ids)))
+      table[index] = function
+    return ids
+
+
+  def register_module(self, module, override=False):
+    """
+    <Purpose>
+      Register every function defined in module that follows the handler
+      naming convention.  Functions named for calls we don't know about are
+      skipped.
+
+    <Returns>
+      The number of functions registered
+
+    """
+
+    registered = 0
+    for attr, function in vars(module).items():
+      if not callable(function) or \
+         getattr(function, '__module__', None) != module.__name__:
+        continue
+      kwargs = None
+      match = HANDLER_NAME_RE.match(attr)
+      if match:
+        name = match.group('name')
+        kind = match.group('kind')
+        if kind == 'exit':
+          kwargs = {'exit_handler': function}
+        else:
+          kwargs = {'entry_handler': function}
+        if kind == 'subcall_entry' and name not in SUBCALL_NUMBERS:
+          kwargs = None
+      match = PARSER_NAME_RE.match(attr)
+      if match:
+        name = match.group('name')
+        kwargs = {'parser': function}
+      match = FORGER_NAME_RE.match(attr)
+      if match:
+        name = match.group('name')
+        kwargs = {'forger': function}
+      match = DEBUG_PRINTER_NAME_RE.match(attr)
+      if match:
+        name = match.group('name')
+        kwargs = {'debug_printer': function}
+      if kwargs is None:
+        continue
+      ids = resolve_syscall_name(name)
+      if ids is None or (ids[1] is not None and
+                         ('forger' in kwargs or 'debug_printer' in kwargs)):
+        logging.debug('Not registering %s.%s: no matching system call',
+                      module.__name__, attr)
+        continue
+      self.register_handler(name, override=override, **kwargs)
+      registered += 1
+    return registered
+
+
+  def get_entry_handler(self, syscall_id, subcall_id=None):
+    """
+    <Purpose>
+      Find the entry handler for a stop.  For socketcall, pass the subcall
+      id from EBX as subcall_id.
+
+    <Returns>
+      The handler, or None
+
+    """
+
+    if syscall_id == SOCKETCALL and subcall_id is not None:
+      return _slot(self.subcall_entry_handlers, subcall_id)
+    return _slot(self.entry_handlers, syscall_id)
+
+
+  def get_exit_handler(self, syscall_id, subcall_id=None):
+    if syscall_id == SOCKETCALL and subcall_id is not None:
+      return _slot(self.subcall_exit_handlers, subcall_id)
+    return _slot(self.exit_handlers, syscall_id)
+
+
+  def get_parser(self, syscall_id, subcall_id=None):
+    if syscall_id == SOCKETCALL and subcall_id is not None:
+      return _slot(self.subcall_parsers, subcall_id)
+    return _slot(self.parsers, syscall_id)
+
+
+  def get_forger(self, syscall_id):
+    return _slot(self.forgers, syscall_id)
+
+
+  def get_debug_printer(self, syscall_id):
+    return _slot(self.debug_printers, syscall_id)
+
+
+  def find_unhandled(self, syscall_objects):
+    """
+    <Purpose>
+      Scan parsed system call objects for calls with no registered entry
+      handler, including names that don't map to a known system call.
+
+    <Returns>
+      An OrderedDict mapping each unhandled name to the trace indices it
+      appears at, in order of first appearance
+
+    """
+
+    unhandled = collections.OrderedDict()
+    for index, syscall_object in enumerate(syscall_objects):
+      ids = resolve_syscall_name(syscall_object.name)
+      if ids is None or self.get_entry_handler(*ids) is None:
+        unhandled.setdefault(syscall_object.name, []).append(index)
+    return unhandled
+
+
+  def wrapped(self, wrapper):
+    """
+    <Purpose>
+      Copy the registry with every handler passed through wrapper, e.g.
+      ReplayProfiler.wrap.  Parse stages, forgers and debug printers are
+      copied as is.
+
+    <Returns>
+      A new HandlerRegistry
+
+    """
+
+    registry = HandlerRegistry()
+    for attr in ('entry_handlers', 'exit_handlers',
+                 'subcall_entry_handlers', 'subcall_exit_handlers'):
+      setattr(registry, attr, [wrapper(h) if h is not None else None
+                               for h in getattr(self, attr)])
+    registry.parsers = list(self.parsers)
+    registry.subcall_parsers = list(self.subcall_parsers)
+    registry.forgers = list(self.forgers)
+    registry.debug_printers = list(self.debug_printers)
+    return registry
+
+
+def _slot(table, index):
+  if 0 <= index < len(table):
+    return table[index]
+  return None
+
+
+def _describe(ids):
+  syscall_id, subcall_id = ids
+  if subcall_id is not None:
+    return 'socketcall subcall {}'.format(SOCKET_SUBCALLS[subcall_id][4:])
+  return SYSCALLS[syscall_id][4:]
+
+
+HANDLERS = HandlerRegistry()
+for _module in HANDLER_MODULES:
+  HANDLERS.register_module(_module)
+
+
+def register_handler(syscall, entry_handler=None, exit_handler=None,
+                     forger=None, debug_printer=None, subcall=False,
+                     override=False, parser=None):
+  """
+  <Purpose>
+    Register functions for a system call in the default registry.  See
+    HandlerRegistry.register_handler().
+
+  <Returns>
+    The (syscall_id, subcall_id) the functions were registered under
+
+  """
+
+  return HANDLERS.register_handler(syscall, entry_handler, exit_handler,
+                                   forger, debug_printer, subcall, override,
+                                   parser)
+
+
+def register_module(module, override=False):
+  """
+  <Purpose>
+    Register a plugin module's conventionally named functions in the default
+    registry.
+
+  <Returns>
+    The number of functions registered
+
+  """
+
+  return HANDLERS.register_module(module, override)
+
+
+def find_unhandled_syscalls(syscall_objects):
+  """
+  <Purpose>
+    Report the calls in a parsed trace the default registry has no entry
+    handler for, logging a summary.
+
+  <Returns>
+    An OrderedDict mapping each unhandled name to its trace indices
+
+  """
+
+  unhandled = HANDLERS.find_unhandled(syscall_objects)
+  for name, indices in unhandled.iteritems():
+    logging.warning('No handler for %s (%d calls, first at trace index %d)',
+                    name, len(indices), indices[0])
+  return unhandled
@@ -54,7 +54,9 @@ from __future__ import print_function
 
 import sys
 import logging
+import re
 
+from os_dict import FUTEX_OP_TO_INT
 from os_dict import IOCTLS_INT_TO_IOCTL
 from os_dict import SIGNAL_INT_TO_SIG
 from os_dict import SIGPROCMASK_INT_TO_CMD
@@ -72,7 +74,9 @@ from util import (ReplayDeltaError,
                   validate_integer_argument,
                   validate_address_argument,
                   validate_return_value,
-                  next_syscall,)
+                  next_syscall,
+                  peek_argument,
+                  unsigned_word,)
 
 # Track whether the flags and prot of injected state brk() records are
 # supported.  Store this result here once we have done this one time so we
@@ -151,7 +155,7 @@ def brk_entry_handler(syscall_id, syscall_object, pid):
 
     # Advance to our crafted mmap's exit
     cint.syscall(pid, 0)
-    next_syscall()
+    next_syscall(pid)
 
     # Record the new mapping we have put in place
     cint.injected_state['brks'].append({u'start': last_map_end,
@@ -259,7 +263,7 @@ def rt_sigaction_entry_handler(syscall_id, syscall_object, pid):
 
         # buffer address
         old_action_addr = cint.peek_register(pid, cint.RDX)
-        logging.debug("Old Action Address: 0x%x" % (old_action_addr & 0xffffffff))
+        logging.debug("Old Action Address: 0x%x" % unsigned_word(old_action_addr))
 
         # done with registers so can noop now
         noop_current_syscall(pid)
@@ -295,7 +299,7 @@ def rt_sigaction_entry_handler(syscall_id, syscall_object, pid):
             old_sa_handler = default_handler_int
         else:
             old_sa_handler = int(old_sa_handler_str, 16)
-        logging.debug("Old Handler: 0x%x" % (old_sa_handler & 0xffffffff))
+        logging.debug("Old Handler: 0x%x" % unsigned_word(old_sa_handler))
 
 
         # sa_mask
@@ -316,7 +320,7 @@ def rt_sigaction_entry_handler(syscall_id, syscall_object, pid):
         if restorer_value_in_trace:
             restorer_str = old_action_args[3].value.strip('}')
             old_sa_restorer = int(restorer_str, 16)
-            logging.debug("Restorer: 0x%x " % (old_sa_restorer & 0xffffffff))
+            logging.debug("Restorer: 0x%x " % unsigned_word(old_sa_restorer))
         else:
             logging.debug("No restorer found")
 
@@ -347,9 +351,9 @@ def getresuid_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('euid: %d', euid)
     logging.debug('suid: %d', suid)
 
-    logging.debug('ruid addr: %x', ruid_addr & 0xffffffff)
-    logging.debug('ruid addr: %x', euid_addr & 0xffffffff)
-    logging.debug('ruid addr: %x', suid_addr & 0xffffffff)
+    logging.debug('ruid addr: %x', unsigned_word(ruid_addr))
+    logging.debug('ruid addr: %x', unsigned_word(euid_addr))
+    logging.debug('ruid addr: %x', unsigned_word(suid_addr))
     noop_current_syscall(pid)
 
     cint.populate_unsigned_int(pid, ruid_addr, ruid)
@@ -371,9 +375,9 @@ def getresgid_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('euid: %d', euid)
     logging.debug('suid: %d', suid)
 
-    logging.debug('ruid addr: %x', ruid_addr & 0xffffffff)
-    logging.debug('ruid addr: %x', euid_addr & 0xffffffff)
-    logging.debug('ruid addr: %x', suid_addr & 0xffffffff)
+    logging.debug('ruid addr: %x', unsigned_word(ruid_addr))
+    logging.debug('ruid addr: %x', unsigned_word(euid_addr))
+    logging.debug('ruid addr: %x', unsigned_word(suid_addr))
     noop_current_syscall(pid)
 
     cint.populate_unsigned_int(pid, ruid_addr, ruid)
@@ -384,10 +388,10 @@ def getresgid_entry_handler(syscall_id, syscall_object, pid):
 
 def set_tid_address_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering set_tid_address_entry_handler')
-    # POSIX-omni-parser treats this argument as a hex string with no 0x
-    # We have to do manual cleanup here
-    addr_from_trace = int('0x' + syscall_object.args[0].value, 16)
-    addr_from_execution = cint.peek_register(pid, cint.RDI) & 0xffffffff
+    # strace prints the address with a 0x prefix and posix-omni-parser
+    # strips it; int() with base 16 takes either form
+    addr_from_trace = int(syscall_object.args[0].value, 16)
+    addr_from_execution = unsigned_word(peek_argument(pid, 0))
     logging.debug('Address from trace: %x', addr_from_trace)
     logging.debug('Address from execution: %x', addr_from_execution)
     if addr_from_trace != addr_from_execution:
@@ -399,7 +403,7 @@ def set_tid_address_entry_handler(syscall_id, syscall_object, pid):
 
 def set_tid_address_exit_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering set_tid_address_exit_handler')
-    addr_from_trace = int('0x' + syscall_object.args[0].value, 16)
+    addr_from_trace = int(syscall_object.args[0].value, 16)
     tid_from_trace = int(syscall_object.ret[0])
     # We have to use the address from the trace here for two reasons:
     #  1. We already confirmed at the traces matches execution in this regard
@@ -413,10 +417,27 @@ def set_tid_address_exit_handler(syscall_id, syscall_object, pid):
     apply_return_conditions(pid, syscall_object)
 
 
+def _futex_op_to_int(op):
+    # strace spells private operations FUTEX_WAIT_PRIVATE etc. and ORs
+    # FUTEX_CLOCK_REALTIME on with |.  Operations it can't decode are
+    # printed as numbers, e.g. 0x8c /* FUTEX_??? */
+    value = 0
+    for name in re.sub(r'/\*.*?\*/', '', op).split('|'):
+        name = name.strip()
+        if name[:1].isdigit():
+            value |= int(name, 0)
+            continue
+        if name.endswith('_PRIVATE'):
+            name = name[:-len('_PRIVATE')]
+            value |= FUTEX_OP_TO_INT['FUTEX_PRIVATE_FLAG']
+        value |= FUTEX_OP_TO_INT[name]
+    return value
+
+
 def futex_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering futex entry handler')
-    addr_from_trace = int('0x' + syscall_object.args[0].value, 16)
-    addr_from_execution = cint.peek_register(pid, cint.RDI) & 0xffffffff
+    addr_from_trace = int(syscall_object.args[0].value, 16)
+    addr_from_execution = unsigned_word(peek_argument(pid, 0))
     logging.debug('Address from trace: %x', addr_from_trace)
     logging.debug('Address from execution: %x', addr_from_execution)
     if addr_from_trace != addr_from_execution:
@@ -424,12 +445,21 @@ def futex_entry_handler(syscall_id, syscall_object, pid):
                                'address from execution ({})'
                                .format(addr_from_trace,
                                        addr_from_execution))
+    # With several threads waking and waiting on the same word the address
+    # alone doesn't tell which side of the exchange a thread is on
+    op_from_trace = _futex_op_to_int(syscall_object.args[1].value)
+    op_from_execution = unsigned_word(peek_argument(pid, 1))
+    if op_from_trace != op_from_execution:
+        raise ReplayDeltaError('Futex operation from trace ({}) does not '
+                               'match operation from execution ({})'
+                               .format(op_from_trace,
+                                       op_from_execution))
 
 
 def futex_exit_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering futex exit handler')
     ret_val_from_trace = syscall_object.ret[0]
-    ret_val_from_execution = cint.peek_register(pid, cint.RAX) & 0xffffffff
+    ret_val_from_execution = unsigned_word(cint.peek_register(pid, cint.RAX))
     if ret_val_from_trace != ret_val_from_execution:
         raise ReplayDeltaError('Return value from trace ({}) does not match '
                                'return value from execution ({})'
@@ -582,7 +612,7 @@ def ioctl_entry_handler(syscall_id, syscall_object, pid):
     validate_integer_argument(pid, syscall_object, 0, 0)
     trace_fd = int(syscall_object.args[0].value)
     edx = cint.peek_register(pid, cint.RDX)
-    logging.debug('edx: %x', edx & 0xffffffff)
+    logging.debug('edx: %x', unsigned_word(edx))
     addr = edx
     noop_current_syscall(pid)
     if syscall_object.ret[0] != -1:
@@ -636,9 +666,11 @@ def _validate_ioctl_cmd(cmd_t, cmd_e):
                                .format(cmd_t, cmd_e))
 
 
-def prlimit64_entry_handler(syscall_id, syscall_object, pid):
-    logging.debug('Entering prlimit64 entry handler')
-    validate_integer_argument(pid, syscall_object, 0, 0)
+def prlimit64_parse(syscall_object):
+    """Parse stage of the prlimit64 handler.  Only setting RLIMIT_CORE or
+    getting RLIMIT_NOFILE, not both at once, can be replayed.  Returns None
+    for a new limit or the (rlim_cur, rlim_max) old limit from the trace.
+    """
     have_new_limit = False
     have_old_limit = False
     if(syscall_object.args[2].value != 'NULL'
@@ -655,8 +687,7 @@ def prlimit64_entry_handler(syscall_id, syscall_object, pid):
         if syscall_object.args[1].value != 'RLIMIT_CORE':
             raise NotImplementedError('prlimit commands with a new limit only '
                                       'support RLIMIT_CORE')
-        noop_current_syscall(pid)
-        apply_return_conditions(pid, syscall_object)
+        return None
     elif not have_new_limit and have_old_limit:
         if syscall_object.args[1].value != 'RLIMIT_NOFILE':
             raise NotImplementedError('prlimit commands other than '
@@ -667,14 +698,26 @@ def prlimit64_entry_handler(syscall_id, syscall_object, pid):
         rlim_max = rlim_max.split('*')
         rlim_max = int(rlim_max[0]) * int(rlim_max[1].strip('}'))
         logging.debug('rlim_max: %d', rlim_max)
+        return (rlim_cur, rlim_max)
+    else:
+        raise NotImplementedError('prlimit64 calls with both a new and old '
+                                  'limit are not supported')
+
+
+def prlimit64_entry_handler(syscall_id, syscall_object, pid):
+    logging.debug('Entering prlimit64 entry handler')
+    validate_integer_argument(pid, syscall_object, 0, 0)
+    old_limit = prlimit64_parse(syscall_object)
+    if old_limit is None:
+        noop_current_syscall(pid)
+        apply_return_conditions(pid, syscall_object)
+    else:
+        rlim_cur, rlim_max = old_limit
         addr = cint.peek_register(pid, cint.R10)
-        logging.debug('addr: %x', addr & 0xFFFFFFFF)
+        logging.debug('addr: %x', unsigned_word(addr))
         noop_current_syscall(pid)
         cint.populate_rlimit_structure(pid, addr, rlim_cur, rlim_max)
         apply_return_conditions(pid, syscall_object)
-    else:
-        raise NotImplementedError('prlimit64 calls with both a new and old '
-                                  'limit are not supported')
 
 
 def mmap2_entry_handler(syscall_id, syscall_object, pid):
@@ -703,7 +746,7 @@ def mmap2_entry_handler(syscall_id, syscall_object, pid):
 def _forge_mmap_with_backing_file(pid, syscall_object, bf):
     # Preserve the registers mmap uses for parameters
     map_start_addr = int(syscall_object.ret[0], 16)
-    logging.debug('Map start address: %x', map_start_addr & 0xffffffff)
+    logging.debug('Map start address: %x', unsigned_word(map_start_addr))
     map_size = int(syscall_object.args[1].value)
     logging.debug('Map size: %d', map_size)
     prot = cint.peek_register(pid, cint.RDX)
@@ -736,7 +779,7 @@ def _forge_mmap_with_backing_file(pid, syscall_object, bf):
 
     # Advance to our crafted mmap's exit
     cint.syscall(pid, 0)
-    next_syscall()
+    next_syscall(pid)
 
     # Copy contents of file into new mapping
     f = open(bf, 'rb')
@@ -776,7 +819,7 @@ def mmap2_exit_handler(syscall_id, syscall_object, pid):
     logging.debug('Return value from execution %x', ret_from_execution)
     logging.debug('Return value from trace %x', ret_from_trace)
     if ret_from_execution < 0:
-        ret_from_execution &= 0xffffffff
+        ret_from_execution = unsigned_word(ret_from_execution)
     if ret_from_execution != ret_from_trace:
         logging.debug('Return value from execution (%d, %x) differs '
                       'from return value from trace (%d, %x)',
@@ -786,17 +829,24 @@ def mmap2_exit_handler(syscall_id, syscall_object, pid):
                       ret_from_trace)
 
 
-def sched_getaffinity_entry_handler(syscall_id, syscall_object, pid):
-    logging.debug('Entering sched_getaffinity entry handler')
-    # We don't validate the first argument because the PID,
-    # which is different for some reason?
-    validate_integer_argument(pid, syscall_object, 1, 1)
+def sched_getaffinity_parse(syscall_object):
+    """Parse stage of the sched_getaffinity handler: the cpu_set value from
+    the trace.  Multi-value cpu_sets can't be replayed.
+    """
     try:
-        cpu_set_val = int(syscall_object.args[2].value.strip('{}'))
+        return int(syscall_object.args[2].value.strip('{}'))
     except ValueError:
         raise NotImplementedError('handler cannot deal with multi-value '
                                   'cpu_sets: {}'
                                   .format(syscall_object.args[2]))
+
+
+def sched_getaffinity_entry_handler(syscall_id, syscall_object, pid):
+    logging.debug('Entering sched_getaffinity entry handler')
+    # We don't validate the first argument because the PID,
+    # which is different for some reason?
+    validate_integer_argument(pid, syscall_object, 1, 1)
+    cpu_set_val = sched_getaffinity_parse(syscall_object)
     cpu_set_addr = cint.peek_register(pid, cint.RDX)
     logging.debug('cpu_set value: %d', cpu_set_val)
     logging.debug('cpu_set address: %d', cpu_set_addr)
@@ -891,7 +941,7 @@ def mmap2_entry_debug_printer(pid, orig_eax, syscall_object):
 
 def munmap_entry_debug_printer(pid, orig_eax, syscall_object):
     logging.debug('This call tried munmap address: %x length: %d',
-                  cint.peek_register(pid, cint.RDI) & 0xFFFFFFFF,
+                  unsigned_word(cint.peek_register(pid, cint.RDI)),
                   cint.peek_register(pid, cint.RSI))
 
 
@@ -909,8 +959,8 @@ def rt_sigaction_entry_debug_printer(pid, orig_eax, syscall_object):
     oldact_addr = cint.peek_register(pid, cint.RDX)
     ret = cint.peek_register(pid, cint.RAX)
     logging.debug("This call has signum: %s", SIGNAL_INT_TO_SIG[signum])
-    logging.debug("New act address: 0x%x", newact_addr & 0xffffffff)
-    logging.debug("Old act address: 0x%x", oldact_addr & 0xffffffff)
+    logging.debug("New act address: 0x%x", unsigned_word(newact_addr))
+    logging.debug("Old act address: 0x%x", unsigned_word(oldact_addr))
     logging.debug("Return value: %d, ret")
 
 
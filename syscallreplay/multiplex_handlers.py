@@ -3,12 +3,48 @@ import logging
 import re
 
 from util import *
+from os_dict import EPOLL_EVENT_TO_NUM
 from poll_parser import (
     parse_poll_results,
     parse_poll_input,
 )
 
 
+def select_parse(syscall_object):
+    """Parse stage of the select handler: the descriptors select() reported
+    ready and the time it reported left, if any.  Reported exceptfds can't
+    be replayed.  Returns (readfds, writefds, (seconds, microseconds) or
+    None).
+    """
+    readfds = []
+    writefds = []
+    left = None
+    if syscall_object.ret[0] == '?' or int(syscall_object.ret[0]) == 0:
+        return readfds, writefds, left
+    ol = syscall_object.original_line
+    ret_line = ol.split('=')[1]
+    ret_line = ret_line.split('(')[1].strip(')')
+    in_substr = re.search(r'in \[(\d\s?)*\]', ret_line)
+    if in_substr:
+        in_substr = in_substr.group(0)
+        in_fds = in_substr.split(' ')[1:]
+        readfds = [int(x.strip('[]')) for x in in_fds]
+    out_substr = re.search(r'out \[(\d\s?)*\]', ret_line)
+    if out_substr:
+        out_substr = out_substr.group(0)
+        out_fds = out_substr.split(' ')[1:]
+        writefds = [int(x.strip('[]')) for x in out_fds]
+    if 'exc' in ret_line:
+        raise NotImplementedError('outfds and exceptfds not supported')
+    left_substr = re.search(r'left \{[0-9]*, [0-9]*\}$', ret_line)
+    if left_substr:
+        left_substr = ol[ol.rfind('left'):]
+        left_substr = left_substr.split('{')[1]
+        left = (int(left_substr.split(',')[0]),
+                int(left_substr.split(',')[1].strip(' ').rstrip('})')))
+    return readfds, writefds, left
+
+
 def select_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering select entry handler')
     while syscall_object.ret[0] == '?':
@@ -33,33 +69,12 @@ def select_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('writefds addr: %x', writefds_addr)
     exceptfds_addr = cint.peek_register_unsigned(pid, cint.ESI)
     logging.debug('exceptfds addr: %x', exceptfds_addr)
-    readfds = []
-    writefds = []
     exceptfds = []
-    if int(syscall_object.ret[0]) != 0:
-        ol = syscall_object.original_line
-        ret_line = ol.split('=')[1]
-        ret_line = ret_line.split('(')[1].strip(')')
-        in_substr = re.search(r'in \[(\d\s?)*\]', ret_line)
-        if in_substr:
-            in_substr = in_substr.group(0)
-            in_fds = in_substr.split(' ')[1:]
-            readfds = [int(x.strip('[]')) for x in in_fds]
-        out_substr = re.search(r'out \[(\d\s?)*\]', ret_line)
-        if out_substr:
-            out_substr = out_substr.group(0)
-            out_fds = out_substr.split(' ')[1:]
-            writefds = [int(x.strip('[]')) for x in out_fds]
-        if 'exc' in ret_line:
-            raise NotImplementedError('outfds and exceptfds not supported')
-        left_substr = re.search(r'left \{[0-9]*, [0-9]*\}$', ret_line)
-        if left_substr and timeval_addr != 0:
-            left_substr = ol[ol.rfind('left'):]
-            left_substr = left_substr.split('{')[1]
-            seconds = int(left_substr.split(',')[0])
-            microseconds = int(left_substr.split(',')[1].strip(' ').rstrip('})'))
-    else:
+    readfds, writefds, left = select_parse(syscall_object)
+    if int(syscall_object.ret[0]) == 0:
         logging.debug('Select call timed out')
+    elif left and timeval_addr != 0:
+        seconds, microseconds = left
     logging.debug('Populating bitmaps')
     logging.debug('readfds: %s', readfds)
     logging.debug('writefds: %s', writefds)
@@ -97,7 +112,7 @@ def poll_entry_handler(syscall_id, syscall_object, pid):
         logging.debug('Poll call timed out')
     else:
         in_pollfds = parse_poll_input(syscall_object)
-        out_pollfds = parse_poll_results(syscall_object)
+        out_pollfds = decoded_structure(syscall_object, parse_poll_results)
         logging.debug('Input pollfds: %s', in_pollfds)
         logging.debug('Returned event: %s', out_pollfds)
         logging.debug('Pollfd array address: %s', array_address)
@@ -163,23 +178,12 @@ def epoll_ctl_entry_handler(syscall_id, syscall_object, pid):
     apply_return_conditions(pid, syscall_object)
 
 
-def epoll_wait_entry_handler(syscall_id, syscall_object, pid):
-    """Replay Always
-    Checks:
-    0: epfd: epoll instance file descriptor
-    2: maxevents: number of events that can be returned
-    3: timeout: how long to wait before returning with no results
-    Sets:
-    return value: Number of file desciptors with events or -1 (failure)
-    errno
-
-    Not Implemented:
+def epoll_wait_parse(syscall_object):
+    """Parse stage of the epoll_wait handler: the events epoll_wait()
+    returned, as a list of {'event': name, 'data': {'u32': ..., 'u64': ...}}
+    dicts.  Only single events with matching u32 and u64 data can be
+    replayed.
     """
-
-    logging.debug('Entering epoll_wait entry_handler')
-    validate_integer_argument(pid, syscall_object, 0, 0)
-    validate_integer_argument(pid, syscall_object, -2, 2)
-    validate_integer_argument(pid, syscall_object, -1, 3)
     struct_str = syscall_object.original_line
     struct_str = struct_str[struct_str.find(',')+1:]
     struct_str = struct_str[:struct_str.rfind(',')]
@@ -191,7 +195,7 @@ def epoll_wait_entry_handler(syscall_id, syscall_object, pid):
         closing_curl_index = struct_str.find('}') + 1
         event = struct_str[1:struct_str.find(',')]
         if '|' in event:
-            raise NotImplementError('multiple events unsupported')
+            raise NotImplementedError('multiple events unsupported')
         data_struct_start = struct_str[1:].find('{') + 1
         data_struct_end = closing_curl_index
         data_struct = struct_str[data_struct_start:data_struct_end]
@@ -207,10 +211,30 @@ def epoll_wait_entry_handler(syscall_id, syscall_object, pid):
     try:
         for i in events:
             if int(i['data']['u32']) != 0xFFFFFFFF & int(i['data']['u64']):
-                raise NotImplementError('differing u32 and u64 unsupported')
+                raise NotImplementedError('differing u32 and u64 unsupported')
     except KeyError:
         raise NotImplementedError('both u32 and u64 required')
+    return events
 
+
+def epoll_wait_entry_handler(syscall_id, syscall_object, pid):
+    """Replay Always
+    Checks:
+    0: epfd: epoll instance file descriptor
+    2: maxevents: number of events that can be returned
+    3: timeout: how long to wait before returning with no results
+    Sets:
+    return value: Number of file desciptors with events or -1 (failure)
+    errno
+
+    Not Implemented:
+    """
+
+    logging.debug('Entering epoll_wait entry_handler')
+    validate_integer_argument(pid, syscall_object, 0, 0)
+    validate_integer_argument(pid, syscall_object, -2, 2)
+    validate_integer_argument(pid, syscall_object, -1, 3)
+    events = epoll_wait_parse(syscall_object)
     addr = cint.peek_register(pid, cint.ECX)
     logging.debug('addr: %x', addr)
     noop_current_syscall(pid)
@@ -229,9 +253,9 @@ def select_entry_debug_printer(pid, orig_eax, syscall_object):
     writefds_addr = cint.peek_register(pid, cint.EDX)
     exceptfds_addr = cint.peek_register(pid, cint.EDI)
     logging.debug("nfds: %d", cint.peek_register(pid, cint.EBX))
-    logging.debug("readfds_addr: %x", readfds_addr & 0xffffffff)
-    logging.debug("writefds_addr: %x", writefds_addr & 0xffffffff)
-    logging.debug("exceptfds_addr: %x", exceptfds_addr & 0xffffffff)
+    logging.debug("readfds_addr: %x", unsigned_word(readfds_addr))
+    logging.debug("writefds_addr: %x", unsigned_word(writefds_addr))
+    logging.debug("exceptfds_addr: %x", unsigned_word(exceptfds_addr))
     if readfds_addr != 0:
         logging.debug("readfds: %s",
                       cint.get_select_fds(pid, readfds_addr))
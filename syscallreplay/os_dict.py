@@ -437,3 +437,25 @@ EPOLL_EVENT_TO_NUM = {
 
 
 EPOLL_NUM_TO_EVENT = {y: x for x, y in EPOLL_EVENT_TO_NUM.iteritems()}
+
+
+FUTEX_OP_TO_INT = {
+  'FUTEX_WAIT': 0,
+  'FUTEX_WAKE': 1,
+  'FUTEX_FD': 2,
+  'FUTEX_REQUEUE': 3,
+  'FUTEX_CMP_REQUEUE': 4,
+  'FUTEX_WAKE_OP': 5,
+  'FUTEX_LOCK_PI': 6,
+  'FUTEX_UNLOCK_PI': 7,
+  'FUTEX_TRYLOCK_PI': 8,
+  'FUTEX_WAIT_BITSET': 9,
+  'FUTEX_WAKE_BITSET': 10,
+  'FUTEX_WAIT_REQUEUE_PI': 11,
+  'FUTEX_CMP_REQUEUE_PI': 12,
+  # Flags strace prints OR'd onto the operation
+  'FUTEX_PRIVATE_FLAG': 128,
+  'FUTEX_CLOCK_REALTIME': 256
+}
+
+FUTEX_INT_TO_OP = {y: x for x, y in FUTEX_OP_TO_INT.iteritems()}
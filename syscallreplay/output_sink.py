@@ -0,0 +1,177 @@
+"""
+<Program Name>
+  output_sink
+
+<Purpose>
+  Collect the bytes a replayed program writes to stdout and stderr and pass
+  them on to a configurable destination.  Output is buffered and written out
+  once a threshold is crossed, when the sink is replaced, or at exit, so an
+  output heavy program isn't held up by console writes during replay.
+
+  Supported sinks:
+    fd       -- write to a file descriptor.  By default each stream goes to
+                the same descriptor it was written to in the trace
+    file     -- append both streams to a file, given as a path or an open
+                file object
+    discard  -- throw the output away
+
+"""
+
+
+import atexit
+import os
+
+from util import logging
+
+
+SINK_FD = 'fd'
+SINK_FILE = 'file'
+SINK_DISCARD = 'discard'
+
+OUTPUT_SINKS = (SINK_FD, SINK_FILE, SINK_DISCARD)
+
+OUTPUT_FDS = (1, 2)
+
+DEFAULT_FLUSH_THRESHOLD = 64 * 1024
+
+
+class OutputSink(object):
+  """
+  <Purpose>
+    Buffer replayed stdout/stderr output and write it to its destination in
+    as few calls as possible.  Chunks are kept in the order they were
+    written and consecutive chunks bound for the same descriptor are joined
+    before being written, so interleaving between the two streams is
+    preserved.
+
+  """
+
+  def __init__(self, kind=SINK_FD, target=None,
+               threshold=DEFAULT_FLUSH_THRESHOLD):
+    if kind not in OUTPUT_SINKS:
+      raise ValueError('Unknown output sink: {}'.format(kind))
+    if kind == SINK_FILE and target is None:
+      raise ValueError('A file output sink needs a path or file object')
+    self.kind = kind
+    self.target = target
+    self.threshold = threshold
+    self._chunks = []
+    self._buffered = 0
+    self._file = None
+    self._owns_file = False
+    if kind == SINK_FILE:
+      if isinstance(target, basestring):
+        self._file = open(target, 'ab')
+        self._owns_file = True
+      else:
+        self._file = target
+
+
+  def write(self, fd, data):
+    if self.kind == SINK_DISCARD or not data:
+      return
+    self._chunks.append((fd, data))
+    self._buffered += len(data)
+    if self._buffered >= self.threshold:
+      self.flush()
+
+
+  def flush(self):
+    if not self._chunks:
+      return
+    chunks = self._chunks
+    self._chunks = []
+    self._buffered = 0
+    if self.kind == SINK_FILE:
+      self._file.write(''.join([data for _, data in chunks]))
+      self._file.flush()
+      return
+    run_fd = chunks[0][0]
+    run = []
+    for fd, data in chunks:
+      if fd != run_fd:
+        self._write_fd(run_fd, ''.join(run))
+        run_fd = fd
+        run = []
+      run.append(data)
+    self._write_fd(run_fd, ''.join(run))
+
+
+  def close(self):
+    self.flush()
+    if self._owns_file:
+      self._file.close()
+      self._owns_file = False
+
+
+  def _write_fd(self, fd, data):
+    if self.target is not None:
+      fd = self.target
+    while data:
+      written = os.write(fd, data)
+      data = data[written:]
+
+
+_sink = {'current': OutputSink()}
+
+
+def set_output_sink(kind, target=None, threshold=DEFAULT_FLUSH_THRESHOLD):
+  """
+  <Purpose>
+    Replace the sink replayed stdout/stderr output is sent to.  Anything
+    still buffered in the old sink is written out first.
+
+  <Returns>
+    The new OutputSink
+
+  """
+
+  sink = OutputSink(kind, target, threshold)
+  _sink['current'].close()
+  _sink['current'] = sink
+  return sink
+
+
+def get_output_sink():
+  """
+  <Purpose>
+    Get the sink replayed stdout/stderr output is currently sent to.
+
+  <Returns>
+    The active OutputSink
+
+  """
+
+  return _sink['current']
+
+
+def replay_output(fd, data):
+  """
+  <Purpose>
+    Hand the payload of a replayed write to the output sink if it was bound
+    for stdout or stderr.
+
+  <Returns>
+    None
+
+  """
+
+  if fd in OUTPUT_FDS:
+    logging.debug('Replaying %d bytes of output to fd %d', len(data), fd)
+    _sink['current'].write(fd, data)
+
+
+def flush_output():
+  """
+  <Purpose>
+    Write out anything buffered in the active output sink.
+
+  <Returns>
+    None
+
+  """
+
+  _sink['current'].flush()
+
+
+atexit.register(flush_output)
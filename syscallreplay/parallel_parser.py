@@ -0,0 +1,146 @@
+"""
+<Program Name>
+  parallel_parser
+
+<Purpose>
+  Parse large strace traces across a multiprocessing pool.  The file is cut
+  into byte ranges that each worker re-aligns to line boundaries, so the
+  parent never reads the trace itself.  Workers parse their lines with
+  trace_parser and also run the structure decoders the handlers would
+  otherwise run during replay (poll results, getdents entries, stat
+  fields), storing the result on each system call object as decoded where
+  handlers pick it up through util.decoded_structure().
+
+  Workers send back compact tuples rather than pickled objects and the
+  parent rebuilds TraceSyscall objects from them in trace order.
+
+"""
+
+
+import multiprocessing
+import os
+
+from file_handlers import parse_stat_fields
+from getdents_parser import parse_getdents_structure
+from poll_parser import parse_poll_results
+from trace_parser import parse_line
+from trace_parser import TraceArgument
+from trace_parser import TraceSyscall
+
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Decoders run ahead of time, by system call name.  A decoder that fails
+# just leaves the call undecoded; the handler will decode it (and fail) if
+# it ever gets that far.
+STRUCTURE_DECODERS = {
+  'poll': parse_poll_results,
+  'getdents': parse_getdents_structure,
+  'getdents64': parse_getdents_structure,
+  'fstat64': parse_stat_fields,
+  'stat64': parse_stat_fields,
+  'lstat64': parse_stat_fields,
+}
+
+
+def decode_structure(syscall_object):
+  """
+  <Purpose>
+    Run the structure decoder for syscall_object's system call, if it has
+    one.
+
+  <Returns>
+    The decoded structure, or None if there is no decoder or it failed
+
+  """
+
+  decoder = STRUCTURE_DECODERS.get(syscall_object.name)
+  if decoder is None:
+    return None
+  try:
+    return decoder(syscall_object)
+  except (ValueError, IndexError, KeyError):
+    return None
+
+
+def _parse_chunk(chunk):
+  path, start, end = chunk
+  records = []
+  with open(path, 'rb') as f:
+    if start > 0:
+      # Skip the line straddling start; the previous chunk owns it
+      f.seek(start - 1)
+      f.readline()
+    position = f.tell()
+    while position < end:
+      line = f.readline()
+      if not line:
+        break
+      position += len(line)
+      syscall_object = parse_line(line)
+      if syscall_object is None:
+        continue
+      records.append((syscall_object.name,
+                      [a.value for a in syscall_object.args],
+                      syscall_object.ret,
+                      syscall_object.original_line,
+                      syscall_object.pid,
+                      decode_structure(syscall_object)))
+  return records
+
+
+def _record_to_syscall(record):
+  name, args, ret, original_line, pid, decoded = record
+  syscall_object = TraceSyscall(name,
+                                [TraceArgument(a) for a in args],
+                                ret,
+                                original_line,
+                                pid)
+  if decoded is not None:
+    syscall_object.decoded = decoded
+  return syscall_object
+
+
+def _chunks(path, chunk_bytes):
+  size = os.path.getsize(path)
+  for start in xrange(0, size, chunk_bytes):
+    yield (path, start, min(start + chunk_bytes, size))
+
+
+def iter_trace_parallel(path, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+  """
+  <Purpose>
+    Parse the strace output at path with a pool of processes worker
+    processes (the number of CPUs by default), chunk_bytes of the file at a
+    time.
+
+  <Returns>
+    A generator of TraceSyscall objects in trace order
+
+  """
+
+  pool = multiprocessing.Pool(processes)
+  try:
+    for records in pool.imap(_parse_chunk, _chunks(path, chunk_bytes)):
+      for record in records:
+        yield _record_to_syscall(record)
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+
+
+def parse_trace_parallel(path, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+  """
+  <Purpose>
+    Parse every complete system call in the strace output at path across a
+    process pool.  See iter_trace_parallel().
+
+  <Returns>
+    A list of TraceSyscall objects in trace order
+
+  """
+
+  return list(iter_trace_parallel(path, processes, chunk_bytes))
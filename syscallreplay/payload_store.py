@@ -0,0 +1,405 @@
+"""
+<Program Name>
+  payload_store
+
+<Purpose>
+  Keep the full payloads of calls whose buffers strace cut short in a
+  sidecar directory next to the trace.  strace truncates strings at its -s
+  length, so a trace recorded with a small -s (fast to write, small on disk)
+  can't replay the data large reads returned.  strace's -e read= and -e
+  write= options dump every byte of those buffers as hex after the call
+  though, and build_payload_store() turns the dumps into a store the read
+  and readv handlers fill the child's buffers from instead of the trace,
+  and write verification checks writes strace cut short against.
+
+  The store is content addressed: each payload is a blob named after its
+  sha256 digest, so identical payloads are kept once, and an index maps the
+  trace index of a call (its position among the trace's complete calls, as
+  cint.syscall_index counts them) to the digest of its payload.
+    <directory>/index                  "<trace index> <digest>" lines
+    <directory>/blobs/<xx>/<rest>      payloads, xx the digest's first two
+                                       hex digits
+  Payloads are streamed into blobs as they are built and out of them into
+  the child in chunks through the extension's bulk write path
+  (cint.populate_from_fd()), so a payload is never held in memory whole.
+
+  Recording and replaying:
+    strace -s 32 -e read=all -e write=all -o trace ...
+    build_payload_store('trace', 'trace.payloads')
+    set_payload_store(PayloadStore('trace.payloads'))
+
+"""
+
+
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+
+from trace_parser import join_split_calls
+from trace_parser import LINE_PREFIX_RE
+from trace_parser import parse_line
+from util import (cint,
+                  logging,
+                  read_iovecs,
+                  ReplayDeltaError,)
+
+
+INDEX_NAME = 'index'
+BLOBS_NAME = 'blobs'
+
+# How much of a payload is read at a time when digesting it
+DIGEST_CHUNK_SIZE = 65536
+
+# One line of an strace -e read=/-e write= dump, e.g.
+#  | 00000  68 65 6c 6c 6f 0a                                hello.           |
+# The hex column is padded out to the width of 16 bytes, so the match stops
+# at the last byte on the line rather than running into the text column
+DUMP_LINE_RE = re.compile(r'\s*\|\s+[0-9a-f]{5,}  '
+                          r'((?:[0-9a-f]{2} {1,2}){1,16})')
+
+_store = {'current': None}
+
+
+class PayloadWriter(object):
+  """
+  <Purpose>
+    A payload on its way into a PayloadStore, written to a temporary file
+    and hashed as it arrives and only added to the store on commit().
+
+  """
+
+  def __init__(self, store, syscall_index):
+    self.store = store
+    self.syscall_index = syscall_index
+    self.length = 0
+    self._hash = hashlib.sha256()
+    fd, self._path = tempfile.mkstemp(dir=store.blobs_directory)
+    self._file = os.fdopen(fd, 'wb')
+
+
+  def write(self, data):
+    self._file.write(data)
+    self._hash.update(data)
+    self.length += len(data)
+
+
+  def commit(self):
+    self._file.close()
+    digest = self._hash.hexdigest()
+    path = self.store.blob_path(digest)
+    if os.path.exists(path):
+      os.remove(self._path)
+    else:
+      if not os.path.isdir(os.path.dirname(path)):
+        os.mkdir(os.path.dirname(path))
+      os.rename(self._path, path)
+    self.store._index_payload(self.syscall_index, digest)
+    return digest
+
+
+  def discard(self):
+    self._file.close()
+    os.remove(self._path)
+
+
+class PayloadStore(object):
+  """
+  <Purpose>
+    A sidecar directory of payloads, see the module docstring.  With create
+    set the directory is made if it doesn't exist yet.
+
+  """
+
+  def __init__(self, directory, create=False):
+    self.directory = directory
+    self.blobs_directory = os.path.join(directory, BLOBS_NAME)
+    self._index_path = os.path.join(directory, INDEX_NAME)
+    self._index_file = None
+    # Digests by trace index
+    self._digests = {}
+    if create and not os.path.isdir(self.blobs_directory):
+      os.makedirs(self.blobs_directory)
+    if os.path.exists(self._index_path):
+      with open(self._index_path) as f:
+        for line in f:
+          syscall_index, digest = line.split()
+          self._digests[int(syscall_index)] = digest
+
+
+  def __contains__(self, syscall_index):
+    return syscall_index in self._digests
+
+
+  def __len__(self):
+    return len(self._digests)
+
+
+  def blob_path(self, digest):
+    return os.path.join(self.blobs_directory, digest[:2], digest[2:])
+
+
+  def digest(self, syscall_index):
+    return self._digests.get(syscall_index)
+
+
+  def payload_length(self, syscall_index):
+    return os.path.getsize(self.blob_path(self._digests[syscall_index]))
+
+
+  def payload_digest(self, syscall_index):
+    """
+    <Purpose>
+      Digest the payload of the call at syscall_index the way verification
+      digests the child's buffers, reading it a chunk at a time.
+
+    <Returns>
+      A (length, digest) tuple
+
+    """
+
+    length = 0
+    digest = cint.digest_buffer('')
+    with open(self.blob_path(self._digests[syscall_index]), 'rb') as f:
+      for chunk in iter(lambda: f.read(DIGEST_CHUNK_SIZE), ''):
+        digest = cint.digest_buffer(chunk, digest)
+        length += len(chunk)
+    return (length, digest)
+
+
+  def writer(self, syscall_index):
+    """
+    <Purpose>
+      Start adding the payload of the call at syscall_index piece by piece.
+
+    <Returns>
+      A PayloadWriter
+
+    """
+
+    return PayloadWriter(self, syscall_index)
+
+
+  def add(self, syscall_index, chunks):
+    """
+    <Purpose>
+      Add the payload of the call at syscall_index, given as an iterable of
+      strings.
+
+    <Returns>
+      The payload's digest
+
+    """
+
+    writer = self.writer(syscall_index)
+    try:
+      for chunk in chunks:
+        writer.write(chunk)
+    except:
+      writer.discard()
+      raise
+    return writer.commit()
+
+
+  def _index_payload(self, syscall_index, digest):
+    if self._index_file is None:
+      self._index_file = open(self._index_path, 'a')
+    self._index_file.write('{} {}\n'.format(syscall_index, digest))
+    self._digests[syscall_index] = digest
+
+
+  def populate(self, pid, address, syscall_index, length):
+    """
+    <Purpose>
+      Stream the payload of the call at syscall_index into pid's memory at
+      address, first making sure it is length bytes long.
+
+    <Returns>
+      The number of bytes written
+
+    """
+
+    with self._open_payload(syscall_index, length) as f:
+      written = cint.populate_from_fd(pid, address, f.fileno(), length)
+    if written != length:
+      raise ReplayDeltaError('Only {} of the {} byte stored payload of call '
+                             '{} could be written'
+                             .format(written, length, syscall_index))
+    return written
+
+
+  def populate_vectors(self, pid, iovecs, syscall_index, length):
+    """
+    <Purpose>
+      Stream the payload of the readv() at syscall_index across the buffers
+      in iovecs, (address, length) pairs, in order, the way the kernel fills
+      them, first making sure it is length bytes long.
+
+    <Returns>
+      The number of bytes written
+
+    """
+
+    written = 0
+    with self._open_payload(syscall_index, length) as f:
+      for address, iov_len in iovecs:
+        if written == length:
+          break
+        chunk_length = min(iov_len, length - written)
+        if cint.populate_from_fd(pid, address, f.fileno(), chunk_length,
+                                 written) != chunk_length:
+          break
+        written += chunk_length
+    if written != length:
+      raise ReplayDeltaError('Only {} of the {} byte stored payload of call '
+                             '{} could be written'
+                             .format(written, length, syscall_index))
+    return written
+
+
+  def _open_payload(self, syscall_index, length):
+    f = open(self.blob_path(self._digests[syscall_index]), 'rb')
+    stored_length = os.fstat(f.fileno()).st_size
+    if stored_length != length:
+      f.close()
+      raise ReplayDeltaError('Stored payload length ({}) does not equal '
+                             'return value from trace ({})'
+                             .format(stored_length, length))
+    return f
+
+
+  def close(self):
+    if self._index_file is not None:
+      self._index_file.close()
+      self._index_file = None
+
+
+def set_payload_store(store):
+  """
+  <Purpose>
+    Select the PayloadStore the read handlers fill buffers from, or None to
+    fill them from the trace alone.
+
+  <Returns>
+    None
+
+  """
+
+  if store is not None and not isinstance(store, PayloadStore):
+    raise ValueError('Not a payload store: {!r}'.format(store))
+  _store['current'] = store
+
+
+def get_payload_store():
+  """
+  <Purpose>
+    Report the PayloadStore the read handlers fill buffers from.
+
+  <Returns>
+    The PayloadStore, or None if there isn't one
+
+  """
+
+  return _store['current']
+
+
+def populate_stored_payload(pid, address, length):
+  """
+  <Purpose>
+    Fill the buffer at address in pid with the stored payload of the call
+    being replayed, if the payload store has one for it.
+
+  <Returns>
+    True if the buffer was filled from the store, False if it is left for
+    the caller to fill from the trace
+
+  """
+
+  store = _store['current']
+  if store is None or cint.syscall_index not in store:
+    return False
+  logging.debug('Populating %d bytes of call %d from the payload store',
+                length, cint.syscall_index)
+  store.populate(pid, address, cint.syscall_index, length)
+  return True
+
+
+def stored_payload_digest():
+  """
+  <Purpose>
+    Digest the stored payload of the call being replayed, for checking a
+    write strace cut short.
+
+  <Returns>
+    A (length, digest) tuple, or None if the payload store has no payload
+    for the call
+
+  """
+
+  store = _store['current']
+  if store is None or cint.syscall_index not in store:
+    return None
+  return store.payload_digest(cint.syscall_index)
+
+
+def populate_stored_vectors(pid, address, count, length):
+  """
+  <Purpose>
+    Fill the count iovecs at address in pid with the stored payload of the
+    readv() being replayed, if the payload store has one for it.
+
+  <Returns>
+    True if the buffers were filled from the store, False if they are left
+    for the caller to fill from the trace
+
+  """
+
+  store = _store['current']
+  if store is None or cint.syscall_index not in store:
+    return False
+  logging.debug('Populating %d bytes of call %d across %d iovecs from the '
+                'payload store', length, cint.syscall_index, count)
+  store.populate_vectors(pid, read_iovecs(pid, address, count),
+                         cint.syscall_index, length)
+  return True
+
+
+def build_payload_store(trace_path, directory, join_split=False):
+  """
+  <Purpose>
+    Build a payload store in directory from the -e read=/-e write= dumps in
+    the strace output at trace_path.  Calls are indexed as parse_trace()
+    with the same join_split would number them.  The buffers of a readv()
+    or writev() are stored as one payload, in order.
+
+  <Returns>
+    The PayloadStore
+
+  """
+
+  store = PayloadStore(directory, create=True)
+  syscall_index = -1
+  writer = None
+  with open(trace_path) as f:
+    lines = join_split_calls(f) if join_split else f
+    for line in lines:
+      prefix = LINE_PREFIX_RE.match(line)
+      dump = DUMP_LINE_RE.match(line, prefix.end())
+      if dump is not None:
+        if writer is None:
+          if syscall_index < 0:
+            raise ValueError('Data dump before the first call in {}'
+                             .format(trace_path))
+          writer = store.writer(syscall_index)
+        writer.write(binascii.unhexlify(dump.group(1).replace(' ', '')))
+        continue
+      if parse_line(line) is not None:
+        if writer is not None:
+          writer.commit()
+          writer = None
+        syscall_index += 1
+  if writer is not None:
+    writer.commit()
+  store.close()
+  return store
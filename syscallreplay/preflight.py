@@ -0,0 +1,140 @@
+"""
+<Program Name>
+  preflight
+
+<Purpose>
+  Check a trace ahead of time for lines the replay would stop on.  Every
+  line is parsed and run through its handler's parse stage (see
+  handler_registry), which raises NotImplementedError for anything the
+  handler can't replay, so unsupported calls are reported with their line
+  numbers before a target is ever started rather than part way through a
+  long replay.
+
+  The trace is split into chunks of lines that are checked in parallel by a
+  multiprocessing pool.  Results come back in trace order.
+
+  Only what can be decided from the trace is checked here.  Calls whose
+  support depends on the state of the replay, e.g. recvmsg() on a socket
+  being tracked or getsockopt() on an execution parameter, are still only
+  caught when they are replayed.
+
+"""
+
+
+import collections
+import multiprocessing
+
+from handler_registry import HANDLERS
+from handler_registry import resolve_syscall_name
+from trace_parser import parse_line
+
+
+DEFAULT_CHUNK_SIZE = 4096
+
+PreflightProblem = collections.namedtuple('PreflightProblem',
+                                          ['line_number', 'name', 'message'])
+
+
+def check_line(line_number, line, handlers=HANDLERS):
+  """
+  <Purpose>
+    Check a single trace line against handlers.
+
+  <Returns>
+    A PreflightProblem, or None if the line can be replayed or isn't a
+    complete system call
+
+  """
+
+  syscall_object = parse_line(line)
+  if syscall_object is None:
+    return None
+  name = syscall_object.name
+  ids = resolve_syscall_name(name)
+  if ids is None or handlers.get_entry_handler(*ids) is None:
+    return PreflightProblem(line_number, name, 'no handler')
+  parser = handlers.get_parser(*ids)
+  if parser is None:
+    return None
+  try:
+    parser(syscall_object)
+  except NotImplementedError as e:
+    return PreflightProblem(line_number, name, 'unsupported: {}'.format(e))
+  except (ValueError, IndexError, KeyError, AttributeError) as e:
+    return PreflightProblem(line_number, name,
+                            'could not parse: {}: {}'
+                            .format(type(e).__name__, e))
+  return None
+
+
+def _check_chunk(numbered_lines):
+  problems = []
+  for line_number, line in numbered_lines:
+    problem = check_line(line_number, line)
+    if problem is not None:
+      problems.append(problem)
+  return problems
+
+
+def _read_chunks(path, chunk_size):
+  chunk = []
+  with open(path) as f:
+    for line_number, line in enumerate(f, 1):
+      chunk.append((line_number, line))
+      if len(chunk) == chunk_size:
+        yield chunk
+        chunk = []
+  if chunk:
+    yield chunk
+
+
+def preflight_trace(path, processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+  """
+  <Purpose>
+    Check every line of the strace output at path using a pool of processes
+    worker processes (the number of CPUs by default).  Only the default
+    registry's handlers are checked since the workers look them up
+    themselves.
+
+  <Returns>
+    A list of PreflightProblems in trace order, empty if the whole trace
+    can be replayed
+
+  """
+
+  pool = multiprocessing.Pool(processes)
+  try:
+    problems = []
+    for chunk_problems in pool.imap(_check_chunk,
+                                    _read_chunks(path, chunk_size)):
+      problems.extend(chunk_problems)
+    pool.close()
+  except:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+  return problems
+
+
+def format_report(problems):
+  """
+  <Purpose>
+    Render preflight problems one per line, followed by a count of each
+    unsupported system call.
+
+  <Returns>
+    The report as a string
+
+  """
+
+  if not problems:
+    return 'No problems found'
+  lines = ['line {}: {}: {}'.format(p.line_number, p.name, p.message)
+           for p in problems]
+  counts = collections.Counter(p.name for p in problems)
+  lines.append('')
+  lines.append('{} problem lines'.format(len(problems)))
+  for name, count in counts.most_common():
+    lines.append('  {:<20} {}'.format(name, count))
+  return '\n'.join(lines)
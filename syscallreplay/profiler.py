@@ -0,0 +1,157 @@
+"""
+<Program Name>
+  profiler
+
+<Purpose>
+  Account for where replay time goes.  Handlers are wrapped so each call
+  records, per system call name and handler, the wall time spent, the
+  ptrace() and process_vm_*() calls the C extension made, the bytes moved
+  to and from the child, and the number of times the call was no-op'd.  The
+  totals can be rendered as a sorted report or dumped as JSON.
+
+"""
+
+
+import json
+import time
+
+from util import (cint,
+                  replay_counters,)
+
+
+PROFILE_FIELDS = ('calls',
+                  'wall_time',
+                  'ptrace_calls',
+                  'process_vm_calls',
+                  'bytes_read',
+                  'bytes_written',
+                  'noops')
+
+
+class ReplayProfiler(object):
+  """
+  <Purpose>
+    Collect per handler totals for a replay.  Wrap individual handlers with
+    wrap() or a whole handler table with wrap_handler_table(), run the
+    replay, then ask for report() or write_json().
+
+  """
+
+  def __init__(self):
+    self.stats = {}
+
+
+  def wrap(self, handler):
+    """
+    <Purpose>
+      Wrap a handler taking (syscall_id, syscall_object, pid) so its calls
+      are accounted for under the system call's name and the handler's name.
+
+    <Returns>
+      The wrapped handler
+
+    """
+
+    def profiled_handler(syscall_id, syscall_object, pid):
+      counters = cint.get_counters()
+      noops = replay_counters['noops']
+      start = time.time()
+      try:
+        return handler(syscall_id, syscall_object, pid)
+      finally:
+        self._record(syscall_object.name,
+                     handler.__name__,
+                     time.time() - start,
+                     counters,
+                     replay_counters['noops'] - noops)
+    profiled_handler.__name__ = handler.__name__
+    profiled_handler.__doc__ = handler.__doc__
+    return profiled_handler
+
+
+  def wrap_handler_table(self, handlers):
+    """
+    <Purpose>
+      Wrap every handler in a dict of handlers, leaving the keys alone.
+
+    <Returns>
+      A new dict with the same keys and wrapped handlers
+
+    """
+
+    return {key: self.wrap(handler) for key, handler in handlers.iteritems()}
+
+
+  def _record(self, syscall_name, handler_name, elapsed, before, noops):
+    after = cint.get_counters()
+    entry = self.stats.get((syscall_name, handler_name))
+    if entry is None:
+      entry = dict.fromkeys(PROFILE_FIELDS, 0)
+      self.stats[(syscall_name, handler_name)] = entry
+    entry['calls'] += 1
+    entry['wall_time'] += elapsed
+    entry['noops'] += noops
+    for field in ('ptrace_calls', 'process_vm_calls',
+                  'bytes_read', 'bytes_written'):
+      entry[field] += after[field] - before[field]
+
+
+  def rows(self, sort_key='wall_time'):
+    """
+    <Purpose>
+      Flatten the collected totals into one dict per (system call, handler)
+      pair, sorted by sort_key with the largest first.
+
+    <Returns>
+      A list of dicts
+
+    """
+
+    if sort_key not in PROFILE_FIELDS:
+      raise ValueError('Can\'t sort profile by {}'.format(sort_key))
+    rows = []
+    for (syscall_name, handler_name), entry in self.stats.iteritems():
+      row = {'syscall': syscall_name, 'handler': handler_name}
+      row.update(entry)
+      rows.append(row)
+    rows.sort(key=lambda row: row[sort_key], reverse=True)
+    return rows
+
+
+  def report(self, sort_key='wall_time'):
+    """
+    <Purpose>
+      Render the collected totals as a table sorted by sort_key.
+
+    <Returns>
+      The report as a string
+
+    """
+
+    lines = ['{:<20} {:<36} {:>8} {:>10} {:>8} {:>8} {:>12} {:>12} {:>6}'
+             .format('syscall', 'handler', 'calls', 'time (s)', 'ptrace',
+                     'vm', 'bytes in', 'bytes out', 'noops')]
+    for row in self.rows(sort_key):
+      lines.append('{syscall:<20} {handler:<36} {calls:>8} {wall_time:>10.4f} '
+                   '{ptrace_calls:>8} {process_vm_calls:>8} {bytes_read:>12} '
+                   '{bytes_written:>12} {noops:>6}'.format(**row))
+    return '\n'.join(lines)
+
+
+  def write_json(self, path, sort_key='wall_time'):
+    """
+    <Purpose>
+      Write the collected totals to path as JSON, one object per
+      (system call, handler) pair.
+
+    <Returns>
+      None
+
+    """
+
+    with open(path, 'w') as f:
+      json.dump(self.rows(sort_key), f, indent=2)
+
+
+  def reset(self):
+    self.stats = {}
@@ -1,5 +1,6 @@
 from __future__ import print_function
 import logging
+import payload_store
 import util
 
 
@@ -97,11 +98,10 @@ def recv_subcall_entry_handler(syscall_id, syscall_object, pid):
     logging.info('Replaying this system call')
     util.noop_current_syscall(pid)
     buffer_address = params[1]
-    data = util.cleanup_quotes(syscall_object.args[1].value)
-    data = data.decode('string_escape')
-    util.cint.populate_char_buffer(pid,
-                                   buffer_address,
-                                   data)
+    if not payload_store.populate_stored_payload(pid,
+                                                 buffer_address,
+                                                 syscall_object.ret[0]):
+      util.populate_trace_string(pid, buffer_address, syscall_object.args[1])
     util.apply_return_conditions(pid, syscall_object)
   else:
     logging.info("Not replaying this system call")
@@ -161,9 +161,6 @@ def recvfrom_subcall_entry_handler(syscall_id, syscall_object, pid):
   sockaddr_length_addr_e = params[5]
 
   fd_t = syscall_object.args[0].value
-  data = syscall_object.args[1].value
-  data = util.cleanup_quotes(data)
-  data = data.decode('string_escape')
   sockfields = syscall_object.args[4].value
   port = int(sockfields[1].value)
   ip = sockfields[2].value
@@ -175,23 +172,23 @@ def recvfrom_subcall_entry_handler(syscall_id, syscall_object, pid):
   if should_replay_based_on_fd(fd_t):
     logging.info('Replaying this system call')
     util.noop_current_syscall(pid)
-    if len(data) != ret_val:
-      raise util.ReplayDeltaError('Decoded bytes length ({}) does not equal '
-                             'return value from trace ({})'
-                             .format(len(data), ret_val))
-    util.cint.populate_char_buffer(pid, data_buf_addr_e, data)
+    if not payload_store.populate_stored_payload(pid,
+                                                 data_buf_addr_e,
+                                                 ret_val):
+      decoded_length = util.populate_trace_string(pid,
+                                                  data_buf_addr_e,
+                                                  syscall_object.args[1],
+                                                  ret_val)
+      if decoded_length != ret_val:
+        raise util.ReplayDeltaError('Decoded bytes length ({}) does not '
+                                    'equal return value from trace ({})'
+                                    .format(decoded_length, ret_val))
     util.cint.populate_af_inet_sockaddr(pid,
                                    sockaddr_addr_e,
                                    port,
                                    ip,
                                    sockaddr_length_addr_e,
                                    sockaddr_length_t)
-    buf = util.cint.copy_address_range(pid,
-                                  data_buf_addr_e,
-                                  data_buf_addr_e + data_buf_length_e)
-    if buf[:ret_val] != data:
-      raise util.ReplayDeltaError('Data copied by read() handler doesn\'t '
-                                  'match after copy')
     util.apply_return_conditions(pid, syscall_object)
     print(util.cint.peek_register(pid, util.cint.RAX))
   else:
@@ -0,0 +1,420 @@
+"""
+<Program Name>
+  replay_engine
+
+<Purpose>
+  Replay traces of programs that start other threads and processes.  strace
+  -f interleaves the calls of everything it follows and tags each with its
+  pid; here the trace is split back into one stream per recorded pid and
+  every thread or process the target starts is matched to one of them.  The
+  target is traced with PTRACE_O_TRACECLONE, PTRACE_O_TRACEFORK and
+  PTRACE_O_TRACEVFORK so new tracees are picked up as they are created, and
+  the tid the kernel reports for one is matched to the stream whose
+  recorded pid is the return value of the clone(), fork() or vfork() call
+  being made in its parent's stream.
+
+  Each tracee has its own cursor into its stream, its own entering flag and
+  its own table of the file descriptors open in the trace.  The table is
+  shared between threads created with CLONE_FILES and copied for anything
+  else.  Handlers still read cint.entering_syscall and cint.syscall_index,
+  so a tracee's state is swapped into them while one of its stops is
+  handled.
+
+  The file descriptor tables are bookkeeping only: they follow the trace
+  (see update_fd_table()) and are what a caller would checkpoint with a
+  tracee, but no handler consults them yet when deciding whether a call on
+  a file descriptor is replayed.
+
+  Stops are handled in whatever order the tracees reach them, so calls only
+  have to be made in trace order within a stream, not across streams.
+  Calls that start or end tracees (clone(), fork(), vfork(), exit() and
+  exit_group()) are always let through.
+
+  Replaying a multi-threaded trace:
+    syscall_objects = parse_trace(path, join_split=True)
+    ReplayEngine(syscall_objects).run(pid)
+
+"""
+
+
+import collections
+import itertools
+import re
+import signal
+
+import syscallreplay as cint
+
+from handler_registry import dispatch_ids
+from handler_registry import HANDLERS
+from util import ReplayDeltaError
+from util import clear_syscall_info
+from util import get_syscall_suppression
+from util import keep_syscall_arguments
+from util import logging
+from util import resume_child
+from util import run_emulated_syscall
+from util import SUPPRESS_SYSEMU
+from util import validate_subcall
+from util import validate_syscall
+
+
+PROCESS_CREATION_CALLS = ('clone', 'fork', 'vfork')
+PROCESS_EXIT_CALLS = ('exit', 'exit_group')
+
+# Calls that return a new file descriptor
+FD_RETURNING_CALLS = ('open', 'openat', 'creat', 'socket', 'accept',
+                      'accept4', 'dup', 'dup2', 'dup3', 'epoll_create',
+                      'epoll_create1', 'eventfd', 'eventfd2',
+                      'timerfd_create', 'signalfd', 'signalfd4',
+                      'inotify_init', 'inotify_init1')
+
+# Calls that return a file descriptor referring to an existing open file
+FD_DUPLICATING_CALLS = ('dup', 'dup2', 'dup3')
+
+# fcntl() commands that do the same
+FCNTL_DUPLICATING_COMMANDS = ('F_DUPFD', 'F_DUPFD_CLOEXEC')
+
+# Calls that return a pair of new file descriptors in an array
+FD_PAIR_CALLS = ('pipe', 'pipe2', 'socketpair')
+
+FD_PAIR_RE = re.compile(r'\[(\d+),\s*(\d+)\]')
+
+TRACE_OPTIONS = (cint.PTRACE_O_TRACECLONE |
+                 cint.PTRACE_O_TRACEFORK |
+                 cint.PTRACE_O_TRACEVFORK |
+                 cint.PTRACE_O_TRACEEXEC |
+                 cint.PTRACE_O_TRACESYSGOOD |
+                 cint.PTRACE_O_EXITKILL)
+
+CREATION_EVENTS = (cint.PTRACE_EVENT_CLONE,
+                   cint.PTRACE_EVENT_FORK,
+                   cint.PTRACE_EVENT_VFORK)
+
+
+def split_streams(syscall_objects, indices=None):
+  """
+  <Purpose>
+    Split an strace -f trace into one stream per recorded pid.  strace
+    leaves the pid off while it is only following one process, so calls
+    with no pid belong to the process the trace started with: the first pid
+    that isn't returned by a clone(), fork() or vfork() in the trace.
+    syscall_objects can be part of a trace, with the index of each call in
+    the whole trace given in indices.
+
+  <Returns>
+    An OrderedDict mapping each recorded pid to a list of (trace index,
+    system call object) pairs, with the process the trace started with
+    first
+
+  """
+
+  children = set()
+  for syscall_object in syscall_objects:
+    if syscall_object.name in PROCESS_CREATION_CALLS:
+      children.add(syscall_object.ret[0])
+  root = None
+  for syscall_object in syscall_objects:
+    if syscall_object.pid is not None and syscall_object.pid not in children:
+      root = syscall_object.pid
+      break
+  streams = collections.OrderedDict()
+  streams[root] = []
+  if indices is None:
+    indexed = enumerate(syscall_objects)
+  else:
+    indexed = itertools.izip(indices, syscall_objects)
+  for index, syscall_object in indexed:
+    pid = root if syscall_object.pid is None else syscall_object.pid
+    streams.setdefault(pid, []).append((index, syscall_object))
+  return streams
+
+
+def _fd_argument(syscall_object):
+  try:
+    return int(syscall_object.args[0].value)
+  except (IndexError, ValueError):
+    return None
+
+
+def _fd_pair(syscall_object):
+  # The parser may split the array into an argument per element, so match
+  # against the arguments joined back together
+  match = FD_PAIR_RE.search(', '.join(str(arg.value)
+                                      for arg in syscall_object.args))
+  if match is None:
+    return ()
+  return tuple(int(fd) for fd in match.groups())
+
+
+def update_fd_table(fds, syscall_object, opener=None):
+  """
+  <Purpose>
+    Apply a completed call's effect on a table of open file descriptors,
+    going by the trace.  fds maps each file descriptor to the recorded pid
+    that opened it (None for those the trace started with); new file
+    descriptors are opened by opener, and duplicates made by dup(), dup2(),
+    dup3() or fcntl(F_DUPFD) keep the opener of the file descriptor they
+    copy.
+
+  <Returns>
+    Nothing
+
+  """
+
+  name = syscall_object.name
+  ret = syscall_object.ret[0]
+  if name == 'close':
+    fds.pop(_fd_argument(syscall_object), None)
+    return
+  if not isinstance(ret, int) or ret < 0:
+    return
+  if name in FD_DUPLICATING_CALLS \
+     or (name in ('fcntl', 'fcntl64') and len(syscall_object.args) > 1
+         and syscall_object.args[1].value in FCNTL_DUPLICATING_COMMANDS):
+    fds[ret] = fds.get(_fd_argument(syscall_object))
+  elif name in FD_PAIR_CALLS:
+    for fd in _fd_pair(syscall_object):
+      fds[fd] = opener
+  elif name in FD_RETURNING_CALLS:
+    fds[ret] = opener
+
+
+class Tracee(object):
+  """
+  <Purpose>
+    The replay state of one live thread or process: the trace stream it is
+    matched to, how far through it the replay is, whether it is entering or
+    exiting a call and the file descriptors open in the trace (see
+    update_fd_table()).
+
+  """
+
+  def __init__(self, tid, recorded_pid, stream, fds):
+    self.tid = tid
+    self.recorded_pid = recorded_pid
+    self.stream = stream
+    self.fds = fds
+    self.cursor = 0
+    self.syscall_index = None
+    self.entering_syscall = True
+    # (syscall_id, subcall_id, syscall_object) of a call that was let run
+    # and hasn't reached its exit yet
+    self.pending = None
+    # Whether the SIGSTOP every new tracee starts with has been seen
+    self.started = False
+
+
+  def remaining(self):
+    return len(self.stream) - self.cursor
+
+
+  def next_syscall_object(self):
+    if self.cursor >= len(self.stream):
+      raise ReplayDeltaError('Thread {} (pid {} in the trace) made a system '
+                             'call after the end of its trace'
+                             .format(self.tid, self.recorded_pid))
+    self.syscall_index, syscall_object = self.stream[self.cursor]
+    self.cursor += 1
+    return syscall_object
+
+
+  def activate(self):
+    cint.entering_syscall = self.entering_syscall
+    cint.syscall_index = self.syscall_index
+
+
+  def deactivate(self):
+    self.entering_syscall = cint.entering_syscall
+    self.syscall_index = cint.syscall_index
+
+
+class ReplayEngine(object):
+  """
+  <Purpose>
+    Drive the handlers in handlers against a target and every thread and
+    process it starts, matching each to its stream of syscall_objects.
+
+  """
+
+  def __init__(self, syscall_objects, handlers=HANDLERS, indices=None):
+    self.handlers = handlers
+    self.streams = split_streams(syscall_objects, indices)
+    self.tracees = {}
+    # tids whose first stop beat the event announcing them to their parent
+    self._unclaimed = set()
+    self.stops = 0
+
+
+  def run(self, pid, attached=False):
+    """
+    <Purpose>
+      Replay the trace against pid, stopped after its execve(), following
+      everything it starts until all of it has exited.  If the tracer
+      attached to pid rather than starting it, the SIGSTOP that attaching
+      queued is swallowed rather than passed on.
+
+    <Returns>
+      The number of stops handled
+
+    """
+
+    self.start(pid, attached)
+    while self.tracees:
+      self.handle_stop(cint.wait_stop(-1))
+    return self.stops
+
+
+  def start(self, pid, attached=False):
+    """
+    <Purpose>
+      Set pid off without waiting for it, for callers that wait for stops
+      themselves and pass them to handle_stop().  See run().
+
+    <Returns>
+      Nothing
+
+    """
+
+    cint.set_options(pid, TRACE_OPTIONS)
+    tracee = self._add_tracee(pid, next(iter(self.streams)), {})
+    tracee.started = not attached
+    self._resume(tracee)
+
+
+  def _add_tracee(self, tid, recorded_pid, fds):
+    logging.debug('Following tid %d as pid %s from the trace', tid,
+                  recorded_pid)
+    tracee = Tracee(tid, recorded_pid, self.streams.get(recorded_pid, []),
+                    fds)
+    self.tracees[tid] = tracee
+    return tracee
+
+
+  def _resume(self, tracee, signal_number=0):
+    if tracee.pending is not None:
+      # Let the call it is in run to its exit
+      clear_syscall_info()
+      cint.syscall(tracee.tid, signal_number)
+    else:
+      resume_child(tracee.tid, signal_number)
+
+
+  def handle_stop(self, stop):
+    """
+    <Purpose>
+      Handle a stop, as cint.wait_stop() returns it, of one of this engine's
+      tracees and set the tracee off again.  Stops of tids the engine doesn't
+      know yet are taken to be new tracees announcing themselves.
+
+    <Returns>
+      Nothing
+
+    """
+
+    kind, tid, nr, args, retval = stop
+    self.stops += 1
+    tracee = self.tracees.get(tid)
+    if kind in (cint.STOP_EXITED, cint.STOP_KILLED):
+      self._reap(tid, tracee)
+    elif tracee is None:
+      self._unclaimed.add(tid)
+    elif kind in (cint.STOP_SYSCALL_ENTRY, cint.STOP_SECCOMP):
+      self._handle_entry(tracee, nr, args)
+    elif kind == cint.STOP_SYSCALL_EXIT:
+      self._handle_exit(tracee)
+    elif kind == cint.STOP_EVENT:
+      if nr in CREATION_EVENTS:
+        self._add_child(tracee, nr, retval)
+      self._resume(tracee)
+    elif not tracee.started and nr == signal.SIGSTOP:
+      self._start(tracee)
+    else:
+      # Pass the signal on
+      self._resume(tracee, nr)
+
+
+  def _handle_entry(self, tracee, syscall_id, args):
+    syscall_object = tracee.next_syscall_object()
+    tracee.entering_syscall = True
+    tracee.activate()
+    # Handlers read the arguments from the stop rather than the registers
+    keep_syscall_arguments(tracee.tid, args)
+    ids = dispatch_ids(syscall_id, args)
+    if ids is None:
+      raise NotImplementedError('No handlers for system call {} ({} in the '
+                                'trace)'.format(syscall_id,
+                                                syscall_object.name))
+    syscall_id, subcall_id = ids
+    if subcall_id is not None:
+      validate_subcall(subcall_id, syscall_object)
+    else:
+      validate_syscall(syscall_id, syscall_object)
+    if syscall_object.name not in PROCESS_CREATION_CALLS + PROCESS_EXIT_CALLS:
+      handler = self.handlers.get_entry_handler(syscall_id, subcall_id)
+      if handler is None:
+        raise NotImplementedError('No entry handler for {}'
+                                  .format(syscall_object.name))
+      handler(syscall_id, syscall_object, tracee.tid)
+    tracee.deactivate()
+    if tracee.entering_syscall:
+      # The call is being let run, so its exit comes next
+      if get_syscall_suppression() == SUPPRESS_SYSEMU:
+        run_emulated_syscall(tracee.tid)
+      tracee.pending = (syscall_id, subcall_id, syscall_object)
+    else:
+      update_fd_table(tracee.fds, syscall_object, tracee.recorded_pid)
+      tracee.entering_syscall = True
+    self._resume(tracee)
+
+
+  def _handle_exit(self, tracee):
+    if tracee.pending is None:
+      raise ReplayDeltaError('Thread {} stopped at the exit of a system call '
+                             'that was replayed'.format(tracee.tid))
+    syscall_id, subcall_id, syscall_object = tracee.pending
+    tracee.pending = None
+    if syscall_object.name not in PROCESS_CREATION_CALLS:
+      exit_handler = self.handlers.get_exit_handler(syscall_id, subcall_id)
+      if exit_handler is not None:
+        tracee.activate()
+        exit_handler(syscall_id, syscall_object, tracee.tid)
+        tracee.deactivate()
+    update_fd_table(tracee.fds, syscall_object, tracee.recorded_pid)
+    tracee.entering_syscall = True
+    self._resume(tracee)
+
+
+  def _add_child(self, parent, event, tid):
+    if parent.pending is None \
+       or parent.pending[2].name not in PROCESS_CREATION_CALLS:
+      raise ReplayDeltaError('Thread {} started thread {} outside of a '
+                             'clone(), fork() or vfork() call'
+                             .format(parent.tid, tid))
+    syscall_object = parent.pending[2]
+    if event == cint.PTRACE_EVENT_CLONE \
+       and 'CLONE_FILES' in syscall_object.original_line:
+      fds = parent.fds
+    else:
+      fds = dict(parent.fds)
+    child = self._add_tracee(tid, syscall_object.ret[0], fds)
+    if tid in self._unclaimed:
+      self._unclaimed.discard(tid)
+      self._start(child)
+
+
+  def _start(self, tracee):
+    # tracee is at the SIGSTOP it started with
+    tracee.started = True
+    self._resume(tracee)
+
+
+  def _reap(self, tid, tracee):
+    self._unclaimed.discard(tid)
+    if tracee is None:
+      return
+    del self.tracees[tid]
+    if tracee.remaining():
+      raise ReplayDeltaError('Thread {} (pid {} in the trace) exited with {} '
+                             'system calls left in its trace'
+                             .format(tid, tracee.recorded_pid,
+                                     tracee.remaining()))
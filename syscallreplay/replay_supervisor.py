@@ -0,0 +1,292 @@
+"""
+<Program Name>
+  replay_supervisor
+
+<Purpose>
+  Drive many replays from one process without blocking in a wait for any
+  one of them.  Each replay is a ReplayEngine run as a coroutine (a
+  generator that is sent its tracees' stops) and the supervisor's event
+  loop waits on an epoll set for something to happen to any tracee.
+
+  There's no asyncio on Python 2, so the loop is built from select.epoll
+  and generators directly.  Stops are noticed through a signalfd for
+  SIGCHLD, which the kernel sends the tracer on every ptrace stop, and each
+  process being replayed also has a pidfd in the set that becomes readable
+  when it exits (pidfds aren't readable on ptrace stops, so they can't
+  replace the signalfd).  Whenever either is readable every stop that is
+  waiting is collected with a non-blocking wait and sent to the coroutine
+  of the replay that owns the tid.  Nothing polls; the loop sleeps in
+  epoll_wait() until the kernel has something for it.
+
+  Handlers were written for a process replaying one program and keep their
+  state in module globals: cint.injected_state, the stop util decoded last,
+  the syscall suppression mode and tracee architecture, the output sink,
+  the write verification policy and the payload store.  Each replay gets its
+  own copy of these, taken from the globals when it is added, and the
+  supervisor swaps them in before sending a stop to a different replay.
+  When run() returns the globals are those of the replay advanced last.
+
+  The loop only avoids blocking between stops.  A handler that noops or
+  injects a system call still resumes its tracee and waits for it in
+  next_syscall(pid) (a waitpid on that one pid), so for that long the other
+  replays are held up.
+
+  Creating a supervisor blocks SIGCHLD for the calling thread so the
+  signalfd can read it.  The supervisor reaps every child of the process,
+  not only the tracees it was given.
+
+  Supervising several replays:
+    supervisor = ReplaySupervisor()
+    for pid, syscall_objects in targets:
+      supervisor.add_replay(pid, syscall_objects)
+    results = supervisor.run()
+
+"""
+
+
+import collections
+import copy
+import errno
+import os
+import select
+import signal
+
+import syscallreplay as cint
+
+import output_sink
+import payload_store
+import util
+import verification
+
+from handler_registry import HANDLERS
+from replay_engine import ReplayEngine
+from util import logging
+
+
+ReplayResult = collections.namedtuple('ReplayResult',
+                                      ['pid', 'stops', 'error'])
+
+
+def _capture_context():
+  # Handlers may change the globals in place, so everything that isn't an
+  # output or a store shared with the caller is copied
+  return {'injected_state': copy.deepcopy(getattr(cint, 'injected_state',
+                                                  None)),
+          'stop_info': dict(util._stop_info),
+          'suppression': util.get_syscall_suppression(),
+          'tracee_arch': util.get_tracee_arch(),
+          'replay_counters': dict(util.replay_counters),
+          'output_sink': output_sink.get_output_sink(),
+          'verification': dict(verification._settings),
+          'payload_store': payload_store.get_payload_store()}
+
+
+def _apply_context(context):
+  cint.injected_state = context['injected_state']
+  util._stop_info.update(context['stop_info'])
+  util.set_syscall_suppression(context['suppression'])
+  util.set_tracee_arch(context['tracee_arch'])
+  util.replay_counters.update(context['replay_counters'])
+  output_sink._sink['current'] = context['output_sink']
+  verification._settings.update(context['verification'])
+  payload_store.set_payload_store(context['payload_store'])
+
+
+def _replay(engine, pid, attached):
+  engine.start(pid, attached)
+  while engine.tracees:
+    stop = yield
+    engine.handle_stop(stop)
+
+
+class SupervisedReplay(object):
+  """
+  <Purpose>
+    A replay being run by a ReplaySupervisor: its engine, the coroutine
+    stops are sent to and the module globals its handlers see.
+
+  """
+
+  def __init__(self, pid, engine, attached):
+    self.pid = pid
+    self.engine = engine
+    self.coroutine = _replay(engine, pid, attached)
+    self.context = _capture_context()
+
+
+class ReplaySupervisor(object):
+  """
+  <Purpose>
+    An event loop running any number of replays side by side.
+
+  """
+
+  def __init__(self):
+    self.replays = []
+    self.results = []
+    # tid -> the SupervisedReplay it belongs to
+    self._owners = {}
+    # pidfd -> tid, and back
+    self._pidfds = {}
+    self._tid_pidfds = {}
+    # Stops of tids no replay has claimed yet, by tid
+    self._orphans = {}
+    # The replay whose context is in the module globals
+    self._active = None
+    self._epoll = select.epoll()
+    self._sigchld = cint.sigchld_fd()
+    self._epoll.register(self._sigchld, select.EPOLLIN)
+
+
+  def add_replay(self, pid, syscall_objects, handlers=HANDLERS,
+                 attached=False):
+    """
+    <Purpose>
+      Start replaying syscall_objects against pid, stopped after its
+      execve() (or just attached to), with handlers.  The replay goes on
+      once run() is called.
+
+    <Returns>
+      The SupervisedReplay
+
+    """
+
+    replay = SupervisedReplay(pid,
+                              ReplayEngine(syscall_objects, handlers),
+                              attached)
+    self.replays.append(replay)
+    self._advance(replay, None)
+    return replay
+
+
+  def run(self):
+    """
+    <Purpose>
+      Run every replay added to completion.
+
+    <Returns>
+      A list of ReplayResults in the order the replays finished
+
+    """
+
+    # Anything that stopped before SIGCHLD was blocked sent no notification
+    self._collect_stops()
+    while self.replays:
+      for fd, _ in self._epoll.poll():
+        if fd == self._sigchld:
+          self._drain_signalfd()
+      self._collect_stops()
+    return self.results
+
+
+  def close(self):
+    self._epoll.close()
+    os.close(self._sigchld)
+    for fd in self._pidfds:
+      os.close(fd)
+    self._pidfds = {}
+    self._tid_pidfds = {}
+
+
+  def _drain_signalfd(self):
+    while True:
+      try:
+        os.read(self._sigchld, 4096)
+      except OSError as e:
+        if e.errno == errno.EAGAIN:
+          return
+        raise
+
+
+  def _collect_stops(self):
+    while True:
+      try:
+        stop = cint.wait_stop(-1, os.WNOHANG)
+      except cint.error as e:
+        if e.args[0] == errno.ECHILD:
+          return
+        raise
+      if stop is None:
+        return
+      self._dispatch(stop)
+
+
+  def _dispatch(self, stop):
+    kind, tid = stop[0], stop[1]
+    replay = self._owners.get(tid)
+    if replay is not None:
+      self._advance(replay, stop)
+    elif kind not in (cint.STOP_EXITED, cint.STOP_KILLED):
+      # A new tracee stopping before the event announcing it
+      self._orphans[tid] = stop
+
+
+  def _activate(self, replay):
+    if self._active is replay:
+      return
+    if self._active in self.replays:
+      self._active.context = _capture_context()
+    _apply_context(replay.context)
+    self._active = replay
+
+
+  def _advance(self, replay, stop):
+    self._activate(replay)
+    try:
+      if stop is None:
+        next(replay.coroutine)
+      else:
+        replay.coroutine.send(stop)
+    except StopIteration:
+      self._finish(replay, None)
+    except Exception as e:
+      logging.debug('Replay of pid %d stopped: %s', replay.pid, e)
+      self._finish(replay, '{}: {}'.format(type(e).__name__, e))
+    else:
+      self._track(replay)
+
+
+  def _track(self, replay):
+    tracees = replay.engine.tracees
+    for tid, owner in self._owners.items():
+      if owner is replay and tid not in tracees:
+        self._forget(tid)
+    for tid in tracees:
+      if tid not in self._owners:
+        self._owners[tid] = replay
+        self._watch(tid)
+    for tid in [t for t in self._orphans if t in self._owners]:
+      self._dispatch(self._orphans.pop(tid))
+
+
+  def _watch(self, tid):
+    try:
+      fd = cint.pidfd_open(tid)
+    except cint.error:
+      # Threads other than the leader don't get pidfds
+      return
+    self._pidfds[fd] = tid
+    self._tid_pidfds[tid] = fd
+    self._epoll.register(fd, select.EPOLLIN)
+
+
+  def _forget(self, tid):
+    del self._owners[tid]
+    fd = self._tid_pidfds.pop(tid, None)
+    if fd is not None:
+      del self._pidfds[fd]
+      self._epoll.unregister(fd)
+      os.close(fd)
+
+
+  def _finish(self, replay, error):
+    self.replays.remove(replay)
+    self.results.append(ReplayResult(replay.pid, replay.engine.stops, error))
+    for tid, owner in self._owners.items():
+      if owner is replay:
+        self._forget(tid)
+        if error is not None:
+          try:
+            os.kill(tid, signal.SIGKILL)
+          except OSError:
+            pass
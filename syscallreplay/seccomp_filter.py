@@ -0,0 +1,166 @@
+"""
+<Program Name>
+  seccomp_filter
+
+<Purpose>
+  Filtered tracing.  Normally every system call the target makes stops it
+  twice, once on entry and once on exit, even when the handler just lets the
+  call run and looks at its return value.  Here the target is started with
+  a seccomp-BPF filter that lets those passthrough calls run without the
+  tracer and raises a PTRACE_EVENT_SECCOMP stop for everything else, so the
+  target only stops for calls a handler has to intervene in.
+
+  The filter is generated from the trace: a system call is let through only
+  if it appears in the trace and its registered entry handler is one of
+  PASSTHROUGH_ENTRY_HANDLERS.  Everything else, including calls that aren't
+  in the trace at all, still stops, so unexpected calls are caught as
+  before.  Calls through socketcall() always stop since the filter can't
+  tell the subcalls apart.  The filter is built from i386 system call
+  numbers, so it is only for i386 tracees.
+
+  The return value checks the passthrough exit handlers would make are
+  skipped for calls that are let through.
+
+  Replaying under the filter:
+    allowed = allowed_syscalls(syscall_objects)
+    pid = spawn_filtered([binary, ...], allowed)
+    for syscall_object in stopping_syscalls(syscall_objects, allowed):
+      syscall_id, args = next_seccomp_stop(pid)
+      ... dispatch the entry handler as usual; handlers that let the call
+      run reach its exit with cint.syscall() as before
+
+"""
+
+
+import os
+import signal
+
+import syscallreplay as cint
+
+from generic_handlers import check_return_value_entry_handler
+from handler_registry import HANDLERS
+from handler_registry import resolve_syscall_name
+from kernel_handlers import futex_entry_handler
+from util import ReplayDeltaError
+from util import require_i386_tracee
+from util import step
+
+
+PASSTHROUGH_ENTRY_HANDLERS = [check_return_value_entry_handler,
+                              futex_entry_handler]
+
+SECCOMP_STOP_STATUS = signal.SIGTRAP | (cint.PTRACE_EVENT_SECCOMP << 8)
+
+
+def allowed_syscalls(syscall_objects, handlers=HANDLERS):
+  """
+  <Purpose>
+    Work out which of the system calls in a trace can run without stopping
+    the target.
+
+  <Returns>
+    A sorted list of system call numbers
+
+  """
+
+  require_i386_tracee('Filtered tracing')
+  allowed = set()
+  seen = set()
+  for syscall_object in syscall_objects:
+    name = syscall_object.name
+    if name in seen:
+      continue
+    seen.add(name)
+    ids = resolve_syscall_name(name)
+    if ids is None or ids[1] is not None:
+      continue
+    if handlers.get_entry_handler(ids[0]) in PASSTHROUGH_ENTRY_HANDLERS:
+      allowed.add(ids[0])
+  return sorted(allowed)
+
+
+def stopping_syscalls(syscall_objects, allowed):
+  """
+  <Purpose>
+    Drop the calls the filter lets through from a trace, leaving the calls
+    the target will stop for in the order it will stop for them.
+
+  <Returns>
+    A list of system call objects
+
+  """
+
+  allowed = set(allowed)
+  stopping = []
+  for syscall_object in syscall_objects:
+    ids = resolve_syscall_name(syscall_object.name)
+    if ids is None or ids[0] not in allowed:
+      stopping.append(syscall_object)
+  return stopping
+
+
+def is_seccomp_stop(status):
+  return os.WIFSTOPPED(status) and status >> 8 == SECCOMP_STOP_STATUS
+
+
+def spawn_filtered(argv, allowed, arch=cint.AUDIT_ARCH_I386):
+  """
+  <Purpose>
+    Start argv under ptrace with a filter that lets the system call numbers
+    in allowed, made under the arch audit architecture, run without
+    stopping.  The child stops itself so PTRACE_O_TRACESECCOMP can be set
+    before the filter goes in.  PTRACE_O_TRACESYSGOOD is set too so
+    util.load_syscall_info() and util.step() work.
+
+  <Returns>
+    The pid of the target, stopped after its execve()
+
+  """
+
+  require_i386_tracee('Filtered tracing')
+  pid = os.fork()
+  if pid == 0:
+    try:
+      cint.traceme()
+      os.kill(os.getpid(), signal.SIGSTOP)
+      cint.install_seccomp_filter(allowed, arch)
+      os.execv(argv[0], argv)
+    finally:
+      os._exit(127)
+  _, status = os.waitpid(pid, 0)
+  if not os.WIFSTOPPED(status):
+    raise ReplayDeltaError('Target did not stop before installing its '
+                           'seccomp filter')
+  cint.set_options(pid, cint.PTRACE_O_TRACESECCOMP |
+                        cint.PTRACE_O_TRACESYSGOOD |
+                        cint.PTRACE_O_EXITKILL)
+  while True:
+    cint.cont(pid)
+    _, status = os.waitpid(pid, 0)
+    # Calls the child makes between installing the filter and exec (the
+    # execve() itself at least) are in the tracer's architecture and stop
+    if is_seccomp_stop(status):
+      continue
+    if os.WIFSTOPPED(status) and os.WSTOPSIG(status) == signal.SIGTRAP:
+      return pid
+    raise ReplayDeltaError('Target failed to start under its seccomp filter '
+                           '(status {:#x})'.format(status))
+
+
+def next_seccomp_stop(pid):
+  """
+  <Purpose>
+    Let the target run until its next filtered system call.
+
+  <Returns>
+    A (system call number, arguments) tuple for the call
+
+  """
+
+  kind, _, syscall_id, args, _ = step(pid, 0, cint.PTRACE_CONT)
+  if kind in (cint.STOP_EXITED, cint.STOP_KILLED):
+    raise ReplayDeltaError('Target exited before the trace was exhausted')
+  if kind != cint.STOP_SECCOMP:
+    raise ReplayDeltaError('Expected a seccomp stop, got stop kind {}'
+                           .format(kind))
+  return syscall_id, args
@@ -197,7 +197,7 @@ def sendmmsg_entry_handler(syscall_id, syscall_object, pid):
       else:
         addr = util.cint.peek_register(pid, util.cint.ECX)
       logging.debug('Number of messages %d', number_of_messages)
-      logging.debug('Address of buffer %x', addr & 0xffffffff)
+      logging.debug('Address of buffer %x', util.unsigned_word(addr))
       lengths = [int(syscall_object.args[x].value.rstrip('}'))
                  for x in range(6, (number_of_messages * 6) + 1, 6)]
       logging.debug('Lengths: %s', lengths)
@@ -0,0 +1,305 @@
+"""
+<Program Name>
+  sharded_replay
+
+<Purpose>
+  Replay independent parts of a process tree at the same time, each in its
+  own tracer process.  Traces of build systems and shell pipelines are
+  mostly made of processes that never touch each other's replayed
+  resources; there is no need to replay them one stop at a time through a
+  single tracer.
+
+  plan_shards() works out ahead of time which processes in the trace can
+  be split off.  A process can be if it was started with fork() or a
+  clone() without CLONE_VM, and no process in its subtree uses a file
+  descriptor opened outside of that subtree (file descriptors the trace
+  started with, like the standard streams, don't count, so output from
+  different shards can be interleaved differently than it was recorded).
+  Everything else is replayed in the shard of its nearest ancestor that
+  could be split off.
+
+  During the replay, a ShardedReplay hands each new process that starts a
+  shard to a worker process: the tracee is detached with SIGSTOP pending so
+  it stays stopped, and the worker attaches to it and replays its subtree
+  with a ShardedReplay of its own.  The subtree's calls keep their indices
+  in the whole trace, so cint.syscall_index means the same in every
+  shard.  Results, including the delta that stopped a shard, are collected
+  from every worker once the shard that started it is done, whether or not
+  that shard hit a delta itself.
+
+  Which process opened each file descriptor is worked out with the
+  engine's own file descriptor tables (replay_engine.update_fd_table()).
+
+  Attaching needs the tracer to be allowed to ptrace processes that aren't
+  its descendants (CAP_SYS_PTRACE, or Yama's ptrace_scope at 0).
+
+  Replaying a process tree:
+    results = ShardedReplay(syscall_objects).run_shards(pid)
+
+"""
+
+
+import collections
+import itertools
+import multiprocessing
+import signal
+
+import syscallreplay as cint
+
+from handler_registry import HANDLERS
+from replay_engine import PROCESS_CREATION_CALLS
+from replay_engine import ReplayEngine
+from replay_engine import split_streams
+from replay_engine import update_fd_table
+from util import logging
+from util import next_syscall
+
+
+# Calls whose first argument is a file descriptor
+FD_ARGUMENT_CALLS = ('read', 'write', 'readv', 'writev', 'pread64',
+                     'pwrite64', 'close', 'fstat64', 'fstatfs64', 'fcntl64',
+                     'ioctl', 'lseek', '_llseek', 'getdents', 'getdents64',
+                     'fsync', 'fdatasync', 'ftruncate', 'ftruncate64',
+                     'fchmod', 'fchown', 'fchdir', 'flock', 'dup', 'dup2',
+                     'dup3', 'epoll_ctl', 'epoll_wait', 'sendfile64',
+                     'send', 'recv', 'sendto', 'recvfrom', 'sendmsg',
+                     'recvmsg', 'sendmmsg', 'shutdown', 'getsockopt',
+                     'setsockopt', 'connect', 'bind', 'listen', 'accept',
+                     'accept4', 'getsockname', 'getpeername')
+
+ShardResult = collections.namedtuple('ShardResult',
+                                     ['recorded_pid', 'stops', 'error'])
+
+
+def _is_separate_process(syscall_object):
+  return syscall_object.name == 'fork' \
+         or (syscall_object.name == 'clone'
+             and 'CLONE_VM' not in syscall_object.original_line)
+
+
+def process_parents(syscall_objects):
+  """
+  <Purpose>
+    Find the recorded pid that started each process or thread in the trace.
+
+  <Returns>
+    A dict mapping recorded pids to (parent pid, creating system call
+    object) tuples
+
+  """
+
+  streams = split_streams(syscall_objects)
+  parents = {}
+  for pid, stream in streams.iteritems():
+    for _, syscall_object in stream:
+      if syscall_object.name in PROCESS_CREATION_CALLS:
+        parents[syscall_object.ret[0]] = (pid, syscall_object)
+  return parents
+
+
+def _fd_uses(syscall_objects, parents):
+  # Replay the trace's file descriptor tables the way the engine keeps them,
+  # noting every (user, opener) pair
+  streams = split_streams(syscall_objects)
+  root = next(iter(streams))
+  pids = dict((index, pid)
+              for pid, stream in streams.iteritems()
+              for index, _ in stream)
+  tables = {root: {}}
+  uses = set()
+
+  def table_for(pid):
+    if pid not in tables:
+      parent, syscall_object = parents.get(pid, (root, None))
+      parent_table = table_for(parent)
+      if syscall_object is not None \
+         and 'CLONE_FILES' in syscall_object.original_line:
+        tables[pid] = parent_table
+      else:
+        tables[pid] = dict(parent_table)
+    return tables[pid]
+
+  for index, syscall_object in enumerate(syscall_objects):
+    pid = pids[index]
+    table = table_for(pid)
+    if syscall_object.name in FD_ARGUMENT_CALLS and syscall_object.args:
+      try:
+        fd = int(syscall_object.args[0].value)
+      except ValueError:
+        fd = None
+      if table.get(fd) is not None:
+        uses.add((pid, table[fd]))
+    update_fd_table(table, syscall_object, pid)
+  return uses
+
+
+def plan_shards(syscall_objects):
+  """
+  <Purpose>
+    Decide which processes in the trace can be replayed apart from the
+    process that started them.  See the module docstring.
+
+  <Returns>
+    A dict mapping every recorded pid to the recorded pid of the process at
+    the root of the shard it is replayed in
+
+  """
+
+  parents = process_parents(syscall_objects)
+  streams = split_streams(syscall_objects)
+  root = next(iter(streams))
+
+  def ancestors(pid):
+    # pid itself first, then its parent and so on up to the root
+    chain = [pid]
+    while pid in parents:
+      pid = parents[pid][0]
+      chain.append(pid)
+    return chain
+
+  candidates = set(pid for pid, (_, syscall_object) in parents.iteritems()
+                   if _is_separate_process(syscall_object))
+  for user, opener in _fd_uses(syscall_objects, parents):
+    for pid in ancestors(user):
+      if pid in candidates and pid not in ancestors(opener):
+        # user reaches outside pid's subtree for this file descriptor
+        candidates.discard(pid)
+  shards = {}
+  for pid in streams:
+    shards[pid] = root
+    for ancestor in ancestors(pid):
+      if ancestor in candidates:
+        shards[pid] = ancestor
+        break
+  return shards
+
+
+def _replay_shard(tid, indices, syscall_objects, handlers, shards,
+                  connection):
+  # Runs in the worker process
+  recorded_pid = next(iter(split_streams(syscall_objects)))
+  engine = ShardedReplay(syscall_objects, handlers, shards, indices)
+  try:
+    cint.attach(tid)
+    next_syscall(tid)
+    results = engine.run_shards(tid, attached=True)
+  except Exception as e:
+    logging.debug('Shard for pid %s stopped: %s', recorded_pid, e)
+    results = [ShardResult(recorded_pid, engine.stops,
+                           '{}: {}'.format(type(e).__name__, e))]
+    results.extend(engine.collect_shards())
+  connection.send(results)
+  connection.close()
+
+
+class ShardedReplay(ReplayEngine):
+  """
+  <Purpose>
+    A ReplayEngine that hands the processes that start new shards off to
+    worker processes instead of following them itself.
+
+  """
+
+  def __init__(self, syscall_objects, handlers=HANDLERS, shards=None,
+               indices=None):
+    ReplayEngine.__init__(self, syscall_objects, handlers, indices)
+    self.syscall_objects = syscall_objects
+    # The index of each call in the whole trace, which is what handlers see
+    # in cint.syscall_index, when syscall_objects is only part of it
+    self.indices = indices
+    self.shards = plan_shards(syscall_objects) if shards is None else shards
+    self.parents = process_parents(syscall_objects)
+    self.root = next(iter(self.streams))
+    # (process, connection) for each shard handed off
+    self.workers = []
+
+
+  def run_shards(self, pid, attached=False):
+    """
+    <Purpose>
+      Replay this engine's shard against pid, handing off the shards it
+      starts, and wait for all of them.
+
+    <Returns>
+      A list of ShardResults, this shard's first
+
+    """
+
+    try:
+      result = ShardResult(self.root, self.run(pid, attached), None)
+    except Exception as e:
+      # The shards already handed off carry on regardless and are still
+      # collected
+      logging.debug('Shard for pid %s stopped: %s', self.root, e)
+      result = ShardResult(self.root, self.stops,
+                           '{}: {}'.format(type(e).__name__, e))
+    return [result] + self.collect_shards()
+
+
+  def collect_shards(self):
+    """
+    <Purpose>
+      Wait for every worker this engine started.
+
+    <Returns>
+      A list of the ShardResults they sent back
+
+    """
+
+    results = []
+    for process, connection in self.workers:
+      try:
+        results.extend(connection.recv())
+      except EOFError:
+        results.append(ShardResult(None, 0, 'Worker {} died'
+                                            .format(process.pid)))
+      # The worker may already have been reaped as a stop by wait_stop(-1)
+      process.join()
+    self.workers = []
+    return results
+
+
+  def _subtree(self, recorded_pid):
+    # The subtree's calls and their indices in the whole trace
+    if self.indices is None:
+      indexed = enumerate(self.syscall_objects)
+    else:
+      indexed = itertools.izip(self.indices, self.syscall_objects)
+    indices = []
+    syscall_objects = []
+    for index, syscall_object in indexed:
+      if self._in_subtree(syscall_object.pid, recorded_pid):
+        indices.append(index)
+        syscall_objects.append(syscall_object)
+    return indices, syscall_objects
+
+
+  def _in_subtree(self, pid, ancestor):
+    while pid is not None:
+      if pid == ancestor:
+        return True
+      pid = self.parents.get(pid, (None,))[0]
+    return False
+
+
+  def _start(self, tracee):
+    recorded_pid = tracee.recorded_pid
+    if recorded_pid == self.root or self.shards.get(recorded_pid) != recorded_pid:
+      ReplayEngine._start(self, tracee)
+      return
+    logging.debug('Handing tid %d (pid %s in the trace) to a new shard',
+                  tracee.tid, recorded_pid)
+    del self.tracees[tracee.tid]
+    cint.detach(tracee.tid, signal.SIGSTOP)
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    indices, syscall_objects = self._subtree(recorded_pid)
+    process = multiprocessing.Process(target=_replay_shard,
+                                      args=(tracee.tid,
+                                            indices,
+                                            syscall_objects,
+                                            self.handlers,
+                                            self.shards,
+                                            sender))
+    process.start()
+    sender.close()
+    self.workers.append((process, receiver))
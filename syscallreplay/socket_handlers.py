@@ -10,7 +10,8 @@ from util import (extract_socketcall_parameters,
                   noop_current_syscall,
                   apply_return_conditions,
                   validate_integer_argument,
-                  subcall_return_success_handler,)
+                  subcall_return_success_handler,
+                  unsigned_word,)
 
 def bind_entry_handler(syscall_id, syscall_object, pid):
     logging.debug('Entering bind entry handler')
@@ -115,8 +116,8 @@ def getsockname_entry_handler(syscall_id, syscall_object, pid):
         addr = params[1]
         length_addr = params[2]
         length = int(syscall_object.args[2].value.strip('[]'))
-        logging.debug('Addr: %d', addr & 0xffffffff)
-        logging.debug('Length addr: %d', length_addr & 0xffffffff)
+        logging.debug('Addr: %d', unsigned_word(addr))
+        logging.debug('Length addr: %d', unsigned_word(length_addr))
         logging.debug('Length: %d', length)
         sockfields = syscall_object.args[1].value
         family = sockfields[0].value
@@ -189,6 +190,22 @@ def setsockopt_entry_handler(syscall_id, syscall_object, pid):
     apply_return_conditions(pid, syscall_object)
 
 
+def getsockopt_parse(syscall_object):
+    """Parse stage of the getsockopt handler: the (optval, optval_len) pair
+    from the trace.  Only SO_ERROR at SOL_SOCKET with a 4 byte option value
+    can be replayed.
+    """
+    if(syscall_object.args[1].value != 'SOL_SOCKET'
+       or syscall_object.args[2].value != 'SO_ERROR'):
+        raise NotImplementedError('Unimplemented getsockopt level or optname')
+    optval_len = int(syscall_object.args[4].value.strip('[]'))
+    if optval_len != 4:
+        raise NotImplementedError('getsockopt() not implemented for '
+                                      'optval sizes other than 4')
+    optval = int(syscall_object.args[3].value.strip('[]'))
+    return optval, optval_len
+
+
 def getsockopt_entry_handler(syscall_id, syscall_object, pid):
     """Replay Always
     Checks:
@@ -213,15 +230,11 @@ def getsockopt_entry_handler(syscall_id, syscall_object, pid):
     # This if is sufficient for now for the implemented options
     if params[1] != 1 or params[2] != 4:
         raise NotImplementedError('Unimplemented getsockopt level or optname')
-    optval_len = int(syscall_object.args[4].value.strip('[]'))
-    if optval_len != 4:
-        raise NotImplementedError('getsockopt() not implemented for '
-                                      'optval sizes other than 4')
-    optval = int(syscall_object.args[3].value.strip('[]'))
+    optval, optval_len = getsockopt_parse(syscall_object)
     logging.debug('Optval: %s', optval)
     logging.debug('Optval Length: %s', optval_len)
-    logging.debug('Optval addr: %x', optval_addr & 0xffffffff)
-    logging.debug('Optval Lenght addr: %d', optval_len_addr & 0xffffffff)
+    logging.debug('Optval addr: %x', unsigned_word(optval_addr))
+    logging.debug('Optval Lenght addr: %d', unsigned_word(optval_len_addr))
     noop_current_syscall(pid)
     cint.populate_int(pid, optval_addr, optval)
     cint.populate_int(pid, optval_len_addr, 4)
@@ -320,6 +333,14 @@ def socket_entry_handler(syscall_id, syscall_object, pid):
         logging.info('Ignoring non-PF_INET call to socket')
 
 
+def accept_subcall_parse(syscall_object):
+    """Parse stage of the accept handler.  Interrupted accept()s can't be
+    replayed.
+    """
+    if syscall_object.ret[0] == '?':
+        raise NotImplementedError('Interrupted accept()s not implemented')
+
+
 def accept_subcall_entry_handler(syscall_id, syscall_object, pid):
     """Replay Always
     Checks:
@@ -333,8 +354,7 @@ def accept_subcall_entry_handler(syscall_id, syscall_object, pid):
       mess of checking
     """
     logging.debug('Checking if line from trace is interrupted accept')
-    if syscall_object.ret[0] == '?':
-        raise NotImplementedError('Interrupted accept()s not implemented')
+    accept_subcall_parse(syscall_object)
     ecx = cint.peek_register(pid, cint.ECX)
     params = extract_socketcall_parameters(pid, ecx, 3)
     sockaddr_addr = params[1]
@@ -353,9 +373,9 @@ def accept_subcall_entry_handler(syscall_id, syscall_object, pid):
         logging.debug('Port: %s', port)
         logging.debug('IP: %s', ip)
         logging.debug('sockaddr Length: %s', sockaddr_length)
-        logging.debug('sockaddr addr: %x', sockaddr_addr & 0xffffffff)
+        logging.debug('sockaddr addr: %x', unsigned_word(sockaddr_addr))
         logging.debug('sockaddr length addr: %x',
-                      sockaddr_len_addr & 0xffffffff)
+                      unsigned_word(sockaddr_len_addr))
         logging.debug('pid: %s', pid)
         cint.populate_af_inet_sockaddr(pid,
                                               sockaddr_addr,
@@ -0,0 +1,265 @@
+"""
+<Program Name>
+  syscall_record
+
+<Purpose>
+  A compact form for the system call objects a replay holds in memory.  A
+  trace of millions of calls held as parser objects spends most of its
+  memory on their per-instance dicts.  SyscallRecord and SyscallArgument use
+  __slots__ instead, call names are interned so every record of a call
+  shares one string, args and ret are tuples and each argument carries its
+  integer form, worked out once when the record is made, and the bytes a
+  quoted string stands for once they're first asked for.  Records have the
+  shape handlers expect of posix-omni-parser's objects (.name, .args[i].value,
+  .ret, .original_line and .pid) plus .number, the number the call is
+  dispatched under, .decoded (see util.decoded_structure()) and
+  .payload_digest (see verification).
+
+  The source line is optional.  It can be kept, dropped, or left in the
+  trace file and read back the first time original_line is asked for, which
+  is what parse_trace_records() does unless told to keep lines.
+
+  Converting parser output:
+    syscall_objects = to_records(parse_trace(path))
+
+"""
+
+
+from trace_parser import decode_string_token
+from trace_parser import parse_line
+
+
+# Tokens this short (descriptors, sizes, flags) repeat throughout a trace
+# and are interned so records share them
+INTERN_TOKEN_LENGTH = 16
+
+# Numbers syscall_number() has looked up, by name
+_numbers = {}
+
+
+def _token_integer(token):
+  try:
+    return int(token)
+  except ValueError:
+    pass
+  if token.startswith('0x'):
+    try:
+      return int(token, 16)
+    except ValueError:
+      pass
+  return None
+
+
+def _intern_token(token):
+  if type(token) is str and len(token) <= INTERN_TOKEN_LENGTH:
+    return intern(token)
+  return token
+
+
+class SyscallArgument(object):
+  """
+  <Purpose>
+    One argument of a SyscallRecord: the raw strace token in value, its
+    value in integer if it's a decimal or hex integer (None otherwise) and
+    the bytes a quoted string stands for in decoded.
+
+  """
+
+  __slots__ = ('value', 'integer', '_decoded')
+
+  def __init__(self, value):
+    self.value = _intern_token(value)
+    self.integer = _token_integer(value)
+    self._decoded = None
+
+
+  @property
+  def decoded(self):
+    if self._decoded is None:
+      self._decoded = decode_string_token(self.value)
+    return self._decoded
+
+
+  def __repr__(self):
+    return 'SyscallArgument({!r})'.format(self.value)
+
+
+class TraceSource(object):
+  """
+  <Purpose>
+    The trace file records read their source lines back from, shared by
+    every record parsed from it.
+
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self._file = None
+
+
+  def line_at(self, offset):
+    if self._file is None:
+      self._file = open(self.path, 'rb')
+    self._file.seek(offset)
+    return self._file.readline().rstrip('\n')
+
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+
+
+class SyscallRecord(object):
+  """
+  <Purpose>
+    One system call from a trace.  See the module docstring.
+
+  """
+
+  __slots__ = ('name', 'number', 'args', 'ret', 'pid', 'decoded',
+               'payload_digest', '_line', '_source')
+
+  def __init__(self, name, number, args, ret, original_line=None, pid=None,
+               decoded=None, source=None):
+    self.name = intern(name)
+    self.number = number
+    self.args = tuple(args)
+    self.ret = tuple(ret)
+    self.pid = pid
+    self.decoded = decoded
+    self.payload_digest = None
+    # The line, or with a source its offset in the source's file
+    self._line = original_line
+    self._source = source
+
+
+  @property
+  def original_line(self):
+    if self._source is not None:
+      self._line = self._source.line_at(self._line)
+      self._source = None
+    return self._line
+
+
+  @original_line.setter
+  def original_line(self, line):
+    self._line = line
+    self._source = None
+
+
+  def __repr__(self):
+    return 'SyscallRecord({}, {} args, ret={!r})'.format(self.name,
+                                                         len(self.args),
+                                                         self.ret)
+
+
+def syscall_number(name):
+  """
+  <Purpose>
+    Look up the number a call named name is dispatched under, socket calls
+    made through socketcall() having the socketcall number.
+
+  <Returns>
+    The system call number, or None if the name isn't known
+
+  """
+
+  if name not in _numbers:
+    # handler_registry imports the handler modules, which make records
+    from handler_registry import resolve_syscall_name
+    ids = resolve_syscall_name(name)
+    _numbers[name] = ids[0] if ids is not None else None
+  return _numbers[name]
+
+
+def new_record(name, args=(), ret=(0, None), original_line=None, pid=None):
+  """
+  <Purpose>
+    Make a record of a call that isn't in the trace, e.g. one a forger
+    makes up.  args are raw strace tokens.
+
+  <Returns>
+    A SyscallRecord
+
+  """
+
+  return SyscallRecord(name,
+                       syscall_number(name),
+                       [SyscallArgument(a) for a in args],
+                       ret,
+                       original_line,
+                       pid)
+
+
+def to_record(syscall_object, keep_line=True):
+  """
+  <Purpose>
+    Convert a system call object from posix-omni-parser, trace_parser or
+    the parallel parser (or anything shaped like one) into a record,
+    dropping its source line unless keep_line is set.
+
+  <Returns>
+    A SyscallRecord
+
+  """
+
+  line = getattr(syscall_object, 'original_line', None) if keep_line else None
+  return _record(syscall_object, line)
+
+
+def _record(syscall_object, line, source=None):
+  return SyscallRecord(syscall_object.name,
+                       syscall_number(syscall_object.name),
+                       [SyscallArgument(a.value) for a in syscall_object.args],
+                       syscall_object.ret,
+                       line,
+                       getattr(syscall_object, 'pid', None),
+                       getattr(syscall_object, 'decoded', None),
+                       source)
+
+
+def to_records(syscall_objects, keep_lines=True):
+  """
+  <Purpose>
+    Convert every system call object in syscall_objects with to_record().
+
+  <Returns>
+    A list of SyscallRecords in the same order
+
+  """
+
+  return [to_record(s, keep_lines) for s in syscall_objects]
+
+
+def parse_trace_records(path, keep_lines=False):
+  """
+  <Purpose>
+    Parse every complete system call in the strace output at path straight
+    into records.  Unless keep_lines is set, each record only remembers
+    where its line is in the file and reads it back when original_line is
+    first used.  Calls strace split across lines are skipped.
+
+  <Returns>
+    A list of SyscallRecords in trace order
+
+  """
+
+  source = TraceSource(path)
+  records = []
+  with open(path, 'rb') as f:
+    position = 0
+    while True:
+      line = f.readline()
+      if not line:
+        break
+      offset = position
+      position += len(line)
+      syscall_object = parse_line(line)
+      if syscall_object is None:
+        continue
+      if keep_lines:
+        records.append(_record(syscall_object, syscall_object.original_line))
+      else:
+        records.append(_record(syscall_object, offset, source))
+  return records
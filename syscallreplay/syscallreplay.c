@@ -8,6 +8,7 @@
 #define _LARGEFILE64_SOURCE
 
 #include <python2.7/Python.h>
+#include <python2.7/structseq.h>
 #include <sys/ptrace.h>
 #include <sys/wait.h>
 #include <errno.h>
@@ -38,6 +39,59 @@
 #include <inttypes.h>
 #include <sys/epoll.h>
 #include <string.h>
+#include <limits.h>
+#include <stddef.h>
+#include <sys/prctl.h>
+#include <sys/user.h>
+#include <linux/audit.h>
+#include <linux/filter.h>
+#include <linux/seccomp.h>
+#include <sys/signalfd.h>
+#include <fcntl.h>
+
+// Transfer accounting.  Every ptrace() and process_vm_*() call this module
+// makes is counted along with the bytes moved in and out of the child so a
+// profiler can attribute them to whichever handler caused them.  The ptrace()
+// macro wraps every call site below; PEEKDATA and POKEDATA move a word each.
+static struct {
+    unsigned long long ptrace_calls;
+    unsigned long long process_vm_calls;
+    unsigned long long bytes_read;
+    unsigned long long bytes_written;
+} transfer_counters;
+
+static inline void count_ptrace(enum __ptrace_request request) {
+    transfer_counters.ptrace_calls++;
+    if(request == PTRACE_PEEKDATA) {
+        transfer_counters.bytes_read += sizeof(long);
+    }
+    else if(request == PTRACE_POKEDATA) {
+        transfer_counters.bytes_written += sizeof(long);
+    }
+}
+
+static inline void count_process_vm(ssize_t moved, bool to_child) {
+    transfer_counters.process_vm_calls++;
+    if(moved > 0) {
+        if(to_child) {
+            transfer_counters.bytes_written += moved;
+        }
+        else {
+            transfer_counters.bytes_read += moved;
+        }
+    }
+}
+
+#define ptrace(request, ...) (count_ptrace(request), ptrace(request, __VA_ARGS__))
+
+// stop kinds reported by step() and wait_stop()
+#define STOP_SYSCALL_ENTRY 1
+#define STOP_SYSCALL_EXIT 2
+#define STOP_SECCOMP 3
+#define STOP_SIGNAL 4
+#define STOP_EVENT 5
+#define STOP_EXITED 6
+#define STOP_KILLED 7
 
 struct kepoll_event {
     uint32_t events;
@@ -100,66 +154,75 @@ static PyObject *SyscallReplayError;
 bool DEBUG = false;
 bool INFO = false;
 
+// The architecture of the tracee, AUDIT_ARCH_I386 or AUDIT_ARCH_X86_64.  An
+// i386 tracee's addresses are 32 bits wide and handlers get them from
+// peek_register(), which returns them sign extended, so addresses passed in
+// are cut back to 32 bits.  An x86-64 tracee's addresses are used whole and
+// peeks of its registers and memory return whole 64-bit words.
+static unsigned int tracee_arch = AUDIT_ARCH_I386;
+
+static bool tracee_is_64bit(void) {
+    return tracee_arch == AUDIT_ARCH_X86_64;
+}
+
+// PyArg_ParseTuple() "O&" converter for an address in the tracee.  Stores
+// an unsigned long (pointers and unsigned longs are the same size here).
+static int parse_address(PyObject *object, void *result) {
+    unsigned long address;
+    if(PyInt_Check(object)) {
+        address = PyInt_AsUnsignedLongMask(object);
+    }
+    else if(PyLong_Check(object)) {
+        address = PyLong_AsUnsignedLongMask(object);
+    }
+    else {
+        PyErr_SetString(PyExc_TypeError, "address must be an integer");
+        return 0;
+    }
+    if(!tracee_is_64bit()) {
+        address &= 0xffffffffUL;
+    }
+    *(unsigned long *)result = address;
+    return 1;
+}
+
+// ptrace based copies.  PEEKDATA and POKEDATA move one of our words (a long)
+// at a time, so the child's memory is walked in long-aligned words: whole
+// words are moved as they are and the partial words at either end of the
+// buffer are peeked first so the bytes around the buffer are written back
+// unchanged.  Aligned words never straddle a page, so a buffer that ends
+// just short of an unmapped page can still be copied.
 int copy_child_process_memory_into_buffer(pid_t child,
                                           void *addr,
                                           unsigned char *buffer,
                                           size_t buf_length){
-    unsigned char *buf_addr = buffer;
-    size_t peeks = buf_length - (sizeof(int) - 1 );
-    unsigned int i;
+    unsigned long start = (unsigned long)addr;
+    unsigned long word_addr = start & ~(sizeof(long) - 1);
+    size_t copied = 0;
+    size_t offset = start - word_addr;
+    size_t chunk;
+    long word;
     if(DEBUG) {
-        printf("C: peek_buffer: number of peeks: %zu\n", peeks);
+        printf("C: peek_buffer: %zu bytes at %p\n", buf_length, addr);
     }
-    // Special case for buffers smaller than one int-sized write
-    if(buf_length < sizeof(int)) {
-        if(DEBUG) {
-            printf("C: peek_buffer: got a small peek\n");
-        }
-        union {
-            unsigned int data;
-            unsigned char bytes[sizeof(int)];
-        } temp_buffer = {0};
-        size_t num_rest = sizeof temp_buffer - buf_length;
-        temp_buffer.data = ptrace(PTRACE_PEEKDATA, child, addr, NULL);
-        if(DEBUG) {
-            printf("Peeked data: ");
-            for(i = 0; i < sizeof temp_buffer; i++) {
-                printf("%02X ", temp_buffer.bytes[i]);
-            }
-            printf("\n");
-        }
-        memcpy(buf_addr, temp_buffer.bytes, buf_length);
-        memcpy(temp_buffer.bytes + buf_length, buf_addr + buf_length, num_rest);
-        if(DEBUG) {
-            printf("'Diff'd data: ");
-            for(i = 0; i < sizeof temp_buffer; i++) {
-                printf("%02X ", temp_buffer.bytes[i]);
-            }
-            printf("\n");
+    while(copied < buf_length) {
+        errno = 0;
+        word = ptrace(PTRACE_PEEKDATA, child, word_addr, NULL);
+        if(errno != 0) {
+            perror("C: peek_data: error string: ");
+            PyErr_SetString(SyscallReplayError,
+                            "peek failed in copy child\n");
+            return -1;
         }
-    }
-    else {
-        unsigned int t;
-        for(i = 0; i < peeks; i++) {
-            if(DEBUG) {
-                printf("%zu\n", peeks);
-                printf("C: peek_buffer: peeking %p into %p\n", addr, (void *)&buf_addr[i]);
-            }
-            errno = 0;
-            t = ptrace(PTRACE_PEEKDATA, child, addr, NULL);
-            if(errno != 0) {
-                perror("C: peek_data: error string: ");
-                PyErr_SetString(SyscallReplayError,
-                                "large peek failed in copy child\n");
-            }
-            if(DEBUG) {
-                printf("%02X\n", t);
-            }
-            memcpy(&buf_addr[i], &t, sizeof(int));
-            addr = (char *)addr + 1;
+        chunk = sizeof(long) - offset;
+        if(chunk > buf_length - copied) {
+            chunk = buf_length - copied;
         }
+        memcpy(buffer + copied, (unsigned char *)&word + offset, chunk);
+        copied += chunk;
+        word_addr += sizeof(long);
+        offset = 0;
     }
-
     return 0;
 }
 
@@ -167,132 +230,373 @@ int copy_buffer_into_child_process_memory(pid_t child,
                                           void *addr,
                                           const unsigned char *const buffer,
                                           size_t buf_length){
-    size_t writes = buf_length - (sizeof(int) - 1 );
+    unsigned long start = (unsigned long)addr;
+    unsigned long word_addr = start & ~(sizeof(long) - 1);
+    size_t copied = 0;
+    size_t offset = start - word_addr;
+    size_t chunk;
     unsigned int i;
+    long word;
     if(DEBUG) {
-        printf("C: copy_buffer: number of writes: %zu\n", writes);
+        printf("C: copy_buffer: %zu bytes to %p\n", buf_length, addr);
         printf("C: copy_buffer: buffer data: \n");
         for(i = 0; i < buf_length; i++) {
             printf("%02X ", buffer[i]);
         }
-        printf("C: copy_buffer: buffer data(ASCII): \n");
-        for(i = 0; i < buf_length; i++) {
-                    printf("%c ", buffer[i]);
-        }
         printf("\n");
     }
-    // Special case for buffers smaller than one 4 byte write
-    if(buf_length < 4) {
-        if(DEBUG) {
-            printf("C: copy_buffer: got a small write\n");
+    while(copied < buf_length) {
+        chunk = sizeof(long) - offset;
+        if(chunk > buf_length - copied) {
+            chunk = buf_length - copied;
         }
-        unsigned char temp_buffer[sizeof(long)] = {0};
-        long res = ptrace(PTRACE_PEEKDATA, child, addr, NULL);
-        memcpy(temp_buffer, &res, sizeof res);
-        if(DEBUG) {
-            printf("Peeked data: ");
-            for(i = 0; i < sizeof(long); i++) {
-                printf("%02X ", temp_buffer[i]);
+        if(chunk < sizeof(long)) {
+            // Keep the bytes of this word that aren't part of the buffer
+            errno = 0;
+            word = ptrace(PTRACE_PEEKDATA, child, word_addr, NULL);
+            if(errno != 0) {
+                PyErr_SetString(SyscallReplayError,
+                                "Failed to peek partial word in copy buffer");
+                return -1;
             }
-            printf("\n");
         }
-        for(i = 0; i < buf_length; i++) {
-            temp_buffer[i] = buffer[i];
+        memcpy((unsigned char *)&word + offset, buffer + copied, chunk);
+        if(ptrace(PTRACE_POKEDATA, child, word_addr, word) == -1) {
+            PyErr_SetString(SyscallReplayError,
+                            "Failed to poke word in copy buffer");
+            return -1;
         }
-        if(DEBUG) {
-            printf("'Diff'd data: ");
-            for(i = 0; i < sizeof(long); i++) {
-                printf("%02X ", temp_buffer[i]);
-            }
-            printf("\n");
+        copied += chunk;
+        word_addr += sizeof(long);
+        offset = 0;
+    }
+    return 0;
+}
+
+// Bulk transfer helpers.  These move a whole buffer between our address space
+// and the child's with a single process_vm_readv()/process_vm_writev() call
+// rather than one ptrace() call per word.  If the kernel refuses (e.g. the
+// target page isn't writable, which POKEDATA ignores but process_vm_writev()
+// does not) we fall back to the ptrace based copy routines above.
+//
+// set_transfer_backend("ptrace") turns the bulk path off entirely so the two
+// strategies can be compared against the same replay.
+static bool bulk_transfers = true;
+
+int read_child_memory(pid_t child,
+                      void *addr,
+                      unsigned char *buffer,
+                      size_t buf_length) {
+    struct iovec local = { buffer, buf_length };
+    struct iovec remote = { addr, buf_length };
+    ssize_t moved;
+    if(buf_length == 0) {
+        return 0;
+    }
+    if(!bulk_transfers) {
+        return copy_child_process_memory_into_buffer(child, addr, buffer, buf_length);
+    }
+    moved = process_vm_readv(child, &local, 1, &remote, 1, 0);
+    count_process_vm(moved, false);
+    if(moved == (ssize_t)buf_length) {
+        return 0;
+    }
+    if(DEBUG) {
+        printf("C: read_child_memory: bulk read of %zu bytes at %p failed, "
+               "falling back to ptrace\n", buf_length, addr);
+    }
+    return copy_child_process_memory_into_buffer(child, addr, buffer, buf_length);
+}
+
+int write_child_memory(pid_t child,
+                       void *addr,
+                       const unsigned char *const buffer,
+                       size_t buf_length) {
+    struct iovec local = { (void *)buffer, buf_length };
+    struct iovec remote = { addr, buf_length };
+    ssize_t moved;
+    if(buf_length == 0) {
+        return 0;
+    }
+    if(!bulk_transfers) {
+        return copy_buffer_into_child_process_memory(child, addr, buffer, buf_length);
+    }
+    moved = process_vm_writev(child, &local, 1, &remote, 1, 0);
+    count_process_vm(moved, true);
+    if(moved == (ssize_t)buf_length) {
+        return 0;
+    }
+    if(DEBUG) {
+        printf("C: write_child_memory: bulk write of %zu bytes at %p failed, "
+               "falling back to ptrace\n", buf_length, addr);
+    }
+    return copy_buffer_into_child_process_memory(child, addr, buffer, buf_length);
+}
+
+// Pull the child's iovec array at addr into a freshly malloc()'d array of
+// our struct iovec in one transfer.  An i386 tracee's iovecs are pairs of
+// 32-bit words, so they are widened on the way in.  Caller frees.
+static struct iovec *read_child_iovecs(pid_t child, void *addr, size_t count) {
+    struct iovec *remote_iovs;
+    uint32_t *compat_iovs;
+    size_t i;
+    if((remote_iovs = malloc(sizeof(struct iovec) * (count ? count : 1))) == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if(tracee_is_64bit()) {
+        read_child_memory(child,
+                          addr,
+                          (unsigned char *)remote_iovs,
+                          sizeof(struct iovec) * count);
+        if(PyErr_Occurred()) {
+            free(remote_iovs);
+            return NULL;
         }
-        if((ptrace(PTRACE_POKEDATA, child, addr, (long *)temp_buffer) == -1)) {
-            PyErr_SetString(SyscallReplayError,
-                            "Failed to poke small buffer in copy buffer");
+        return remote_iovs;
+    }
+    if((compat_iovs = malloc(2 * sizeof(uint32_t) * (count ? count : 1))) == NULL) {
+        free(remote_iovs);
+        PyErr_NoMemory();
+        return NULL;
+    }
+    read_child_memory(child,
+                      addr,
+                      (unsigned char *)compat_iovs,
+                      2 * sizeof(uint32_t) * count);
+    if(PyErr_Occurred()) {
+        free(compat_iovs);
+        free(remote_iovs);
+        return NULL;
+    }
+    for(i = 0; i < count; i++) {
+        remote_iovs[i].iov_base = (void *)(unsigned long)compat_iovs[2 * i];
+        remote_iovs[i].iov_len = compat_iovs[2 * i + 1];
+    }
+    free(compat_iovs);
+    return remote_iovs;
+}
+
+// Cut the iovecs back so together they cover no more than limit bytes, the
+// amount a short writev() actually wrote.  A negative limit leaves them as
+// they are.
+static void limit_iovecs(struct iovec *iovs, size_t count, Py_ssize_t limit) {
+    size_t left = (size_t)limit;
+    size_t i;
+    if(limit < 0) {
+        return;
+    }
+    for(i = 0; i < count; i++) {
+        if(iovs[i].iov_len > left) {
+            iovs[i].iov_len = left;
         }
+        left -= iovs[i].iov_len;
     }
-    else {
-        for(i = 0; i < writes; i++) {
-            if(DEBUG) {
-                printf("C: copy_buffer: poking (%p)%08X into %p\n", (void *)&buffer[i],
-                    *((int *)&buffer[i]), addr);
+}
+
+// Move count local/remote vector pairs in as few process_vm_*() calls as
+// IOV_MAX allows.  Any batch that doesn't transfer completely is redone one
+// vector at a time through the ptrace fallback.
+static void transfer_child_vectors(pid_t child,
+                                   struct iovec *local_iovs,
+                                   struct iovec *remote_iovs,
+                                   size_t count,
+                                   bool to_child) {
+    size_t done = 0;
+    size_t batch;
+    size_t expected;
+    size_t i;
+    ssize_t moved;
+    while(done < count) {
+        batch = count - done > IOV_MAX ? IOV_MAX : count - done;
+        expected = 0;
+        for(i = done; i < done + batch; i++) {
+            expected += local_iovs[i].iov_len;
+        }
+        if(!bulk_transfers) {
+            moved = -1;
+        }
+        else if(to_child) {
+            moved = process_vm_writev(child, &local_iovs[done], batch,
+                                      &remote_iovs[done], batch, 0);
+            count_process_vm(moved, to_child);
+        }
+        else {
+            moved = process_vm_readv(child, &local_iovs[done], batch,
+                                     &remote_iovs[done], batch, 0);
+            count_process_vm(moved, to_child);
+        }
+        if(moved != (ssize_t)expected) {
+            if(DEBUG && bulk_transfers) {
+                printf("C: transfer_child_vectors: vectored transfer moved %zd "
+                       "of %zu bytes, falling back to ptrace\n", moved, expected);
             }
-            if((ptrace(PTRACE_POKEDATA, child, addr, *((int *)&buffer[i])) == -1)) {
-                PyErr_SetString(SyscallReplayError,
-                                "Failed to poke large buffer in copy buffer\n");
+            for(i = done; i < done + batch; i++) {
+                if(local_iovs[i].iov_len == 0) {
+                    continue;
+                }
+                if(to_child) {
+                    copy_buffer_into_child_process_memory(child,
+                                                          remote_iovs[i].iov_base,
+                                                          local_iovs[i].iov_base,
+                                                          local_iovs[i].iov_len);
+                }
+                else {
+                    copy_child_process_memory_into_buffer(child,
+                                                          remote_iovs[i].iov_base,
+                                                          local_iovs[i].iov_base,
+                                                          local_iovs[i].iov_len);
+                }
             }
-            addr = (char *)addr + 1;
         }
+        done += batch;
     }
-    return 0;
 }
 
 static PyObject *syscallreplay_populate_readv_vectors(PyObject *self,
                                                     PyObject *args) {
     pid_t child;
-    void *addr;
+    unsigned long addr;
     PyObject *iovs;
-    if(!PyArg_ParseTuple(args, "IIO", &child, &addr, &iovs)) {
+    if(!PyArg_ParseTuple(args, "IO&O", &child, parse_address, &addr, &iovs)) {
         PyErr_SetString(SyscallReplayError,
                         "populate_readv_vectors arg parse failed");
+        return NULL;
     }
     if(DEBUG) {
         printf("C: readv: pid: %d\n", child);
-        printf("C: readv: addr: %p\n", addr);
+        printf("C: readv: addr: %lx\n", addr);
     }
     if(!PyList_Check(iovs)) {
         PyErr_SetString(SyscallReplayError,
                         "list of iovs is not a list");
+        return NULL;
     }
-    PyObject *iter;
     PyObject *next;
     PyObject *iov_data_obj;
     PyObject *iov_len_obj;
-    char *iov_data;
-    unsigned int iov_struct_idx = 0;
-    void *iov_base_ptr;
-    unsigned int iov_len;
-    size_t len_from_struct;
-
-    iter = PyObject_GetIter(iovs);
-    next = PyIter_Next(iter);
+    Py_ssize_t iov_count = PyList_GET_SIZE(iovs);
+    Py_ssize_t i;
+    struct iovec *remote_iovs;
+    struct iovec *local_iovs;
+    size_t iov_len;
 
-    while(next){
+    if((remote_iovs = read_child_iovecs(child, (void *)addr, iov_count)) == NULL) {
+        return NULL;
+    }
+    if((local_iovs = malloc(sizeof(struct iovec) * (iov_count ? iov_count : 1))) == NULL) {
+        free(remote_iovs);
+        return PyErr_NoMemory();
+    }
+    for(i = 0; i < iov_count; i++) {
+        next = PyList_GET_ITEM(iovs, i);
         if(!PyDict_Check(next)) {
             PyErr_SetString(SyscallReplayError,
                             "Encountered non-dict object in iovs list");
+            goto error;
         }
         iov_data_obj = PyDict_GetItemString(next, "iov_data");
-        if(!PyString_Check(iov_data_obj)) {
+        if(iov_data_obj == NULL || !PyString_Check(iov_data_obj)) {
             PyErr_SetString(SyscallReplayError,
                             "Encountered non-string object in iov_data");
+            goto error;
         }
         iov_len_obj = PyDict_GetItemString(next, "iov_len");
-        if(!PyInt_Check(iov_len_obj)) {
+        if(iov_len_obj == NULL || !PyInt_Check(iov_len_obj)) {
             PyErr_SetString(SyscallReplayError,
                             "Encountered non-int object in iov_len");
+            goto error;
         }
-
-        iov_data = PyString_AsString(iov_data_obj);
-        iov_base_ptr = ((struct iovec*)addr)[iov_struct_idx].iov_base;
-        len_from_struct = ((struct iovec*)addr)[iov_struct_idx].iov_len;
         iov_len = PyInt_AS_LONG(iov_len_obj);
-        if(DEBUG) {
-            printf("C: readv: iov_struct_idx: %u\n", iov_struct_idx);
-            printf("C: readv: iov_base_ptr: %p\n", iov_base_ptr);
-            printf("C: readv: iov_len: %u\n", iov_len);
-            printf("C: readv: len_from_struct: %zu\n", len_from_struct);
+        if(iov_len > (size_t)PyString_GET_SIZE(iov_data_obj)) {
+            PyErr_SetString(SyscallReplayError,
+                            "iov_len is longer than the supplied iov_data");
+            goto error;
         }
-        if(iov_len != 0) {
-            copy_buffer_into_child_process_memory(child,
-                                                  iov_base_ptr,
-                                                  (unsigned char *)iov_data,
-                                                  iov_len);
+        if(iov_len > remote_iovs[i].iov_len) {
+            PyErr_SetString(SyscallReplayError,
+                            "iov_len from trace is larger than the iovec "
+                            "buffer in the child");
+            goto error;
         }
-        next = PyIter_Next(iter);
-        iov_struct_idx++;
+        if(DEBUG) {
+            printf("C: readv: iov_struct_idx: %zd\n", i);
+            printf("C: readv: iov_base_ptr: %p\n", remote_iovs[i].iov_base);
+            printf("C: readv: iov_len: %zu\n", iov_len);
+            printf("C: readv: len_from_struct: %zu\n", remote_iovs[i].iov_len);
+        }
+        local_iovs[i].iov_base = PyString_AS_STRING(iov_data_obj);
+        local_iovs[i].iov_len = iov_len;
+        remote_iovs[i].iov_len = iov_len;
+    }
+    transfer_child_vectors(child, local_iovs, remote_iovs, iov_count, true);
+    free(local_iovs);
+    free(remote_iovs);
+    if(PyErr_Occurred()) {
+        return NULL;
     }
     Py_RETURN_NONE;
+
+error:
+    free(local_iovs);
+    free(remote_iovs);
+    return NULL;
+}
+
+static PyObject *syscallreplay_gather_writev_vectors(PyObject *self,
+                                                   PyObject *args) {
+    pid_t child;
+    unsigned long addr;
+    unsigned int iov_count;
+    Py_ssize_t limit = -1;
+    if(!PyArg_ParseTuple(args, "IO&I|n", &child, parse_address, &addr,
+                         &iov_count, &limit)) {
+        PyErr_SetString(SyscallReplayError,
+                        "gather_writev_vectors arg parse failed");
+        return NULL;
+    }
+    if(DEBUG) {
+        printf("C: writev: pid: %d\n", child);
+        printf("C: writev: addr: %lx\n", addr);
+        printf("C: writev: iov_count: %u\n", iov_count);
+    }
+    struct iovec *remote_iovs;
+    struct iovec *local_iovs;
+    PyObject *result;
+    char *write_ptr;
+    size_t total = 0;
+    unsigned int i;
+
+    if((remote_iovs = read_child_iovecs(child, (void *)addr, iov_count)) == NULL) {
+        return NULL;
+    }
+    limit_iovecs(remote_iovs, iov_count, limit);
+    for(i = 0; i < iov_count; i++) {
+        total += remote_iovs[i].iov_len;
+    }
+    if((local_iovs = malloc(sizeof(struct iovec) * (iov_count ? iov_count : 1))) == NULL) {
+        free(remote_iovs);
+        return PyErr_NoMemory();
+    }
+    if((result = PyString_FromStringAndSize(NULL, total)) == NULL) {
+        free(local_iovs);
+        free(remote_iovs);
+        return NULL;
+    }
+    write_ptr = PyString_AS_STRING(result);
+    for(i = 0; i < iov_count; i++) {
+        local_iovs[i].iov_base = write_ptr;
+        local_iovs[i].iov_len = remote_iovs[i].iov_len;
+        write_ptr += remote_iovs[i].iov_len;
+    }
+    transfer_child_vectors(child, local_iovs, remote_iovs, iov_count, false);
+    free(local_iovs);
+    free(remote_iovs);
+    if(PyErr_Occurred()) {
+        Py_DECREF(result);
+        return NULL;
+    }
+    return result;
 }
 
 static PyObject *syscallreplay_populate_getdents64_structure(PyObject *self,
@@ -301,7 +605,7 @@ static PyObject *syscallreplay_populate_getdents64_structure(PyObject *self,
     void *addr;
     PyObject *dents;
     size_t retlen;
-    if(!PyArg_ParseTuple(args, "IIOI", &child, &addr, &dents, &retlen)) {
+    if(!PyArg_ParseTuple(args, "IO&OI", &child, parse_address, &addr, &dents, &retlen)) {
         PyErr_SetString(SyscallReplayError,
                         "populate_getdents64_structure arg parse failed");
     }
@@ -408,10 +712,10 @@ static PyObject *syscallreplay_populate_getdents64_structure(PyObject *self,
             printf("C: populate_getdents64: write_ptr: %p\n", (void *)write_ptr);
         }
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&c_dents,
-                                          retlen);
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&c_dents,
+                       retlen);
     Py_RETURN_NONE;
 }
 
@@ -421,7 +725,7 @@ static PyObject *syscallreplay_populate_getdents_structure(PyObject *self,
     void *addr;
     PyObject *dents;
     size_t retlen;
-    if(!PyArg_ParseTuple(args, "IIOI", &child, &addr, &dents, &retlen)) {
+    if(!PyArg_ParseTuple(args, "IO&OI", &child, parse_address, &addr, &dents, &retlen)) {
         PyErr_SetString(SyscallReplayError,
                         "populate_getdents64_structure arg parse failed");
     }
@@ -523,10 +827,10 @@ static PyObject *syscallreplay_populate_getdents_structure(PyObject *self,
             printf("C: populate_getdents: write_ptr: %p\n", (void *)write_ptr);
         }
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&c_dents,
-                                          retlen);
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&c_dents,
+                       retlen);
     Py_RETURN_NONE;
 }
 static PyObject *syscallreplay_populate_pipefd_array(PyObject *self,
@@ -535,7 +839,7 @@ static PyObject *syscallreplay_populate_pipefd_array(PyObject *self,
     void *addr;
     unsigned int read_end;
     unsigned int write_end;
-    if(!PyArg_ParseTuple(args, "IIII", &child, &addr, &read_end, &write_end)) {
+    if(!PyArg_ParseTuple(args, "IO&II", &child, parse_address, &addr, &read_end, &write_end)) {
         PyErr_SetString(SyscallReplayError,
                         "populate_pipefd_array arg parse failed");
     }
@@ -548,10 +852,10 @@ static PyObject *syscallreplay_populate_pipefd_array(PyObject *self,
     int r[2];
     r[0] = read_end;
     r[1] = write_end;
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&r,
-                                          (sizeof(int) *2));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&r,
+                       (sizeof(int) *2));
     Py_RETURN_NONE;
 }
 
@@ -562,9 +866,10 @@ static PyObject *syscallreplay_copy_address_range(PyObject *self,
     void *start;
     void *end;
     unsigned char *buf;
-    if(!PyArg_ParseTuple(args, "III", &child, &start, &end)) {
+    if(!PyArg_ParseTuple(args, "IO&O&", &child, parse_address, &start, parse_address, &end)) {
         PyErr_SetString(SyscallReplayError,
                         "copy_address_range arg parse failed");
+        return NULL;
     }
     if(DEBUG) {
         printf("C: copy_address_range: child: %d\n", child);
@@ -576,12 +881,278 @@ static PyObject *syscallreplay_copy_address_range(PyObject *self,
         printf("C: copy_address_range: size: %zu\n", size);
     }
     buf = (unsigned char *)malloc(size);
-    copy_child_process_memory_into_buffer(child, start, buf, size);
+    read_child_memory(child, start, buf, size);
     PyObject *result = Py_BuildValue("s#", buf, size);
     free(buf);
     return result;
 }
 
+// Payload digests.  Write verification compares a 64-bit FNV-1a digest of
+// the buffer in the child against one computed from the trace rather than
+// copying the whole buffer out into a Python string.  The child's memory is
+// streamed through a fixed size chunk so large writes never need a buffer
+// of their own.
+#define DIGEST_CHUNK_SIZE 65536
+#define FNV1A_64_OFFSET 14695981039346656037ULL
+#define FNV1A_64_PRIME 1099511628211ULL
+
+static unsigned char digest_chunk[DIGEST_CHUNK_SIZE];
+
+static uint64_t fnv1a_64_update(uint64_t hash,
+                                const unsigned char *data,
+                                size_t length) {
+    size_t i;
+    for(i = 0; i < length; i++) {
+        hash ^= data[i];
+        hash *= FNV1A_64_PRIME;
+    }
+    return hash;
+}
+
+static uint64_t digest_child_memory(pid_t child,
+                                    unsigned char *addr,
+                                    size_t length,
+                                    uint64_t hash) {
+    size_t chunk_length;
+    while(length > 0) {
+        chunk_length = length > DIGEST_CHUNK_SIZE ? DIGEST_CHUNK_SIZE : length;
+        read_child_memory(child, addr, digest_chunk, chunk_length);
+        hash = fnv1a_64_update(hash, digest_chunk, chunk_length);
+        addr += chunk_length;
+        length -= chunk_length;
+    }
+    return hash;
+}
+
+static PyObject *syscallreplay_digest_buffer(PyObject *self,
+                                             PyObject *args) {
+    unsigned char *data;
+    int data_length;
+    // The digest of the data before this, to digest a payload in pieces
+    unsigned long long hash = FNV1A_64_OFFSET;
+    if(!PyArg_ParseTuple(args, "s#|K", &data, &data_length, &hash)) {
+        PyErr_SetString(SyscallReplayError, "digest_buffer arg parse failed");
+        return NULL;
+    }
+    return Py_BuildValue("K", (unsigned long long)
+                         fnv1a_64_update(hash, data, data_length));
+}
+
+static PyObject *syscallreplay_digest_address_range(PyObject *self,
+                                                    PyObject *args) {
+    pid_t child;
+    unsigned long start;
+    unsigned long end;
+    uint64_t hash;
+    if(!PyArg_ParseTuple(args, "IO&O&", &child, parse_address, &start, parse_address, &end)) {
+        PyErr_SetString(SyscallReplayError,
+                        "digest_address_range arg parse failed");
+        return NULL;
+    }
+    if(DEBUG) {
+        printf("C: digest_address_range: child: %d\n", child);
+        printf("C: digest_address_range: start: %lx\n", start);
+        printf("C: digest_address_range: end: %lx\n", end);
+    }
+    if(end < start) {
+        PyErr_SetString(SyscallReplayError,
+                        "digest_address_range end is before start");
+        return NULL;
+    }
+    hash = digest_child_memory(child, (unsigned char *)start, end - start,
+                               FNV1A_64_OFFSET);
+    if(PyErr_Occurred()) {
+        return NULL;
+    }
+    return Py_BuildValue("K", (unsigned long long)hash);
+}
+
+static PyObject *syscallreplay_digest_writev_vectors(PyObject *self,
+                                                     PyObject *args) {
+    pid_t child;
+    unsigned long addr;
+    unsigned int iov_count;
+    struct iovec *remote_iovs;
+    uint64_t hash = FNV1A_64_OFFSET;
+    size_t total = 0;
+    unsigned int i;
+    Py_ssize_t limit = -1;
+    if(!PyArg_ParseTuple(args, "IO&I|n", &child, parse_address, &addr,
+                         &iov_count, &limit)) {
+        PyErr_SetString(SyscallReplayError,
+                        "digest_writev_vectors arg parse failed");
+        return NULL;
+    }
+    if((remote_iovs = read_child_iovecs(child, (void *)addr, iov_count)) == NULL) {
+        return NULL;
+    }
+    limit_iovecs(remote_iovs, iov_count, limit);
+    for(i = 0; i < iov_count; i++) {
+        hash = digest_child_memory(child,
+                                   remote_iovs[i].iov_base,
+                                   remote_iovs[i].iov_len,
+                                   hash);
+        total += remote_iovs[i].iov_len;
+    }
+    free(remote_iovs);
+    if(PyErr_Occurred()) {
+        return NULL;
+    }
+    return Py_BuildValue("(nK)", (Py_ssize_t)total, (unsigned long long)hash);
+}
+
+static PyObject *syscallreplay_get_counters(PyObject *self,
+                                            PyObject *args) {
+    return Py_BuildValue("{s:K,s:K,s:K,s:K}",
+                         "ptrace_calls", transfer_counters.ptrace_calls,
+                         "process_vm_calls", transfer_counters.process_vm_calls,
+                         "bytes_read", transfer_counters.bytes_read,
+                         "bytes_written", transfer_counters.bytes_written);
+}
+
+static PyObject *syscallreplay_reset_counters(PyObject *self,
+                                              PyObject *args) {
+    memset(&transfer_counters, 0, sizeof(transfer_counters));
+    Py_RETURN_NONE;
+}
+
+static PyObject *syscallreplay_set_transfer_backend(PyObject *self,
+                                                    PyObject *args) {
+    char *backend;
+    if(!PyArg_ParseTuple(args, "s", &backend)) {
+        PyErr_SetString(SyscallReplayError,
+                        "set_transfer_backend arg parse failed");
+        return NULL;
+    }
+    if(strcmp(backend, "bulk") == 0) {
+        bulk_transfers = true;
+    }
+    else if(strcmp(backend, "ptrace") == 0) {
+        bulk_transfers = false;
+    }
+    else {
+        PyErr_Format(SyscallReplayError,
+                     "Unknown transfer backend: %s", backend);
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+static PyObject *syscallreplay_get_transfer_backend(PyObject *self,
+                                                    PyObject *args) {
+    return Py_BuildValue("s", bulk_transfers ? "bulk" : "ptrace");
+}
+
+static PyObject *syscallreplay_set_tracee_arch(PyObject *self,
+                                               PyObject *args) {
+    unsigned int arch;
+    if(!PyArg_ParseTuple(args, "I", &arch)) {
+        PyErr_SetString(SyscallReplayError,
+                        "set_tracee_arch arg parse failed");
+        return NULL;
+    }
+    if(arch != AUDIT_ARCH_I386 && arch != AUDIT_ARCH_X86_64) {
+        PyErr_Format(SyscallReplayError, "Unsupported tracee arch: %#x", arch);
+        return NULL;
+    }
+    tracee_arch = arch;
+    Py_RETURN_NONE;
+}
+
+static PyObject *syscallreplay_get_tracee_arch(PyObject *self,
+                                               PyObject *args) {
+    return Py_BuildValue("I", tracee_arch);
+}
+
+static PyObject *syscallreplay_set_options(PyObject *self, PyObject *args) {
+    pid_t child;
+    unsigned long options;
+    if(!PyArg_ParseTuple(args, "ik", &child, &options)) {
+        PyErr_SetString(SyscallReplayError, "set_options arg parse failed");
+        return NULL;
+    }
+    if(ptrace(PTRACE_SETOPTIONS, child, NULL, (void *)options) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+// Install a seccomp filter in the calling process that lets the system calls
+// in allowed run without the tracer and raises a PTRACE_EVENT_SECCOMP stop
+// for everything else.  Calls made under any architecture other than arch
+// always stop, since their numbers mean something else.  This is meant to be
+// called in a freshly forked child after traceme() and before exec, with the
+// tracer already having set PTRACE_O_TRACESECCOMP; without that option
+// traced calls fail with ENOSYS instead of stopping.
+static PyObject *syscallreplay_install_seccomp_filter(PyObject *self,
+                                                      PyObject *args) {
+    PyObject *allowed;
+    PyObject *seq;
+    unsigned int arch = AUDIT_ARCH_I386;
+    struct sock_filter *filter;
+    struct sock_fprog prog;
+    Py_ssize_t count;
+    Py_ssize_t i;
+    unsigned short n = 0;
+    long nr;
+    if(!PyArg_ParseTuple(args, "O|I", &allowed, &arch)) {
+        PyErr_SetString(SyscallReplayError,
+                        "install_seccomp_filter arg parse failed");
+        return NULL;
+    }
+    seq = PySequence_Fast(allowed, "allowed system calls must be a sequence");
+    if(seq == NULL) {
+        return NULL;
+    }
+    count = PySequence_Fast_GET_SIZE(seq);
+    // Two instructions per allowed call plus the arch check, the load of
+    // the call number and the final return
+    if(count > (BPF_MAXINSNS - 5) / 2) {
+        Py_DECREF(seq);
+        PyErr_SetString(SyscallReplayError, "Too many allowed system calls");
+        return NULL;
+    }
+    filter = PyMem_New(struct sock_filter, count * 2 + 5);
+    if(filter == NULL) {
+        Py_DECREF(seq);
+        return PyErr_NoMemory();
+    }
+    filter[n++] = (struct sock_filter)
+        BPF_STMT(BPF_LD | BPF_W | BPF_ABS, offsetof(struct seccomp_data, arch));
+    filter[n++] = (struct sock_filter)
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, arch, 1, 0);
+    filter[n++] = (struct sock_filter)
+        BPF_STMT(BPF_RET | BPF_K, SECCOMP_RET_TRACE);
+    filter[n++] = (struct sock_filter)
+        BPF_STMT(BPF_LD | BPF_W | BPF_ABS, offsetof(struct seccomp_data, nr));
+    for(i = 0; i < count; i++) {
+        nr = PyInt_AsLong(PySequence_Fast_GET_ITEM(seq, i));
+        if(nr == -1 && PyErr_Occurred()) {
+            PyMem_Free(filter);
+            Py_DECREF(seq);
+            return NULL;
+        }
+        filter[n++] = (struct sock_filter)
+            BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, (unsigned int)nr, 0, 1);
+        filter[n++] = (struct sock_filter)
+            BPF_STMT(BPF_RET | BPF_K, SECCOMP_RET_ALLOW);
+    }
+    filter[n++] = (struct sock_filter)
+        BPF_STMT(BPF_RET | BPF_K, SECCOMP_RET_TRACE);
+    Py_DECREF(seq);
+    prog.len = n;
+    prog.filter = filter;
+    if(prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) == -1
+       || prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER, &prog) == -1) {
+        PyMem_Free(filter);
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    PyMem_Free(filter);
+    Py_RETURN_NONE;
+}
+
 static PyObject *syscallreplay_copy_string(PyObject *self,
                                            PyObject *args) {
     pid_t child;
@@ -592,7 +1163,7 @@ static PyObject *syscallreplay_copy_string(PyObject *self,
     char *value_ptr;
     bool got_null;
     PyObject *result;
-    if(!PyArg_ParseTuple(args, "II", &child, &addr)) {
+    if(!PyArg_ParseTuple(args, "IO&", &child, parse_address, &addr)) {
         PyErr_SetString(SyscallReplayError, "copy_string arg parse failed");
         Py_RETURN_NONE;
     }
@@ -633,7 +1204,7 @@ static PyObject *syscallreplay_copy_string(PyObject *self,
         printf("C: copy_string: search_index: %zu\n", search_index);
     }
     buf = (unsigned char *)malloc(search_index + 1);
-    copy_child_process_memory_into_buffer(child, addr, buf, search_index+1);
+    read_child_memory(child, addr, buf, search_index+1);
     if((result = Py_BuildValue("s", buf)) == NULL) {
         PyErr_SetString(SyscallReplayError,
                         "copy_string build result failed");
@@ -650,7 +1221,7 @@ static PyObject *syscallreplay_populate_tms_structure(PyObject *self,
     clock_t stime;
     clock_t cutime;
     clock_t cstime;
-    if(!PyArg_ParseTuple(args, "IIiiii", &child,  &addr, &utime, &stime,
+    if(!PyArg_ParseTuple(args, "IO&iiii", &child, parse_address, &addr, &utime, &stime,
                          &cutime, &cstime)) {
         PyErr_SetString(SyscallReplayError,
                         "populte_tms_structure arg parse failed");
@@ -667,10 +1238,10 @@ static PyObject *syscallreplay_populate_tms_structure(PyObject *self,
     s.tms_cutime = cutime;
     s.tms_cstime = cstime;
 
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -680,7 +1251,7 @@ static PyObject *syscallreplay_populate_timespec_structure(PyObject *self,
     void *addr;
     unsigned long seconds;
     long int nanoseconds;
-    if(!PyArg_ParseTuple(args, "IIkl", &child, &addr, &seconds, &nanoseconds)) {
+    if(!PyArg_ParseTuple(args, "IO&kl", &child, parse_address, &addr, &seconds, &nanoseconds)) {
         PyErr_SetString(SyscallReplayError,
                         "copy_bytes failed parse failed");
     }
@@ -699,7 +1270,7 @@ static PyObject *syscallreplay_populate_timespec_structure(PyObject *self,
         printf("C: timespec: tv_sec: %lu\n", t.tv_sec);
         printf("C: timespec: tv_nsec: %ld\n", t.tv_nsec);
     }
-    copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&t, sizeof(t));
+    write_child_memory(child, addr, (unsigned char *)&t, sizeof(t));
     Py_RETURN_NONE;
 }
 
@@ -713,7 +1284,7 @@ static PyObject *syscallreplay_populate_itimerspec_structure(PyObject *self,
     time_t  value_seconds;
     long    value_nanoseconds;
 
-    if(!PyArg_ParseTuple(args, "IIilil", &child, &addr,
+    if(!PyArg_ParseTuple(args, "IO&ilil", &child, parse_address, &addr,
                          &interval_seconds, &interval_nanoseconds,
                          &value_seconds, &value_nanoseconds)) {
         PyErr_SetString(SyscallReplayError,
@@ -744,7 +1315,7 @@ static PyObject *syscallreplay_populate_itimerspec_structure(PyObject *self,
         printf("C: check itimerspec: value tv_sec: %zu\n", t.it_value.tv_sec);
         printf("C: check itimerspec: value tv_nsec: %ld\n", t.it_value.tv_nsec);
     }
-    copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&t, sizeof(t));
+    write_child_memory(child, addr, (unsigned char *)&t, sizeof(t));
 
     Py_RETURN_NONE;
 }
@@ -757,7 +1328,7 @@ static PyObject *syscallreplay_populate_timer_t_structure(PyObject *self,
   void * addr;
   int    timerid;
 
-  if(!PyArg_ParseTuple(args, "iIi", &child, &addr, &timerid)) {
+  if(!PyArg_ParseTuple(args, "iO&i", &child, parse_address, &addr, &timerid)) {
     PyErr_SetString(SyscallReplayError, "copy_bytes failed parse failed");
   }
 
@@ -773,7 +1344,7 @@ static PyObject *syscallreplay_populate_timer_t_structure(PyObject *self,
     printf("C: check timer_t: timerid: %lu \n", (unsigned long)(void *)id);
   }
 
-  copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&id, sizeof(id));
+  write_child_memory(child, addr, (unsigned char *)&id, sizeof(id));
 
   Py_RETURN_NONE;
 }
@@ -784,7 +1355,7 @@ static PyObject *syscallreplay_populate_timeval_structure(PyObject *self,
     void *addr;
     long seconds;
     long microseconds;
-    if(!PyArg_ParseTuple(args, "IIll", &child, &addr, &seconds, &microseconds)) {
+    if(!PyArg_ParseTuple(args, "IO&ll", &child, parse_address, &addr, &seconds, &microseconds)) {
         PyErr_SetString(SyscallReplayError,
                         "copy_bytes failed parse failed");
     }
@@ -805,7 +1376,7 @@ static PyObject *syscallreplay_populate_timeval_structure(PyObject *self,
         printf("C: timeval: sizeof(tv_sec): %zu\n", sizeof(t.tv_sec));
         printf("C: timeval: sizeof(tv_usec): %zu\n", sizeof(t.tv_usec));
     }
-    copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&t, sizeof(t));
+    write_child_memory(child, addr, (unsigned char *)&t, sizeof(t));
     Py_RETURN_NONE;
 }
 
@@ -815,7 +1386,7 @@ static PyObject *syscallreplay_copy_bytes_into_child_process(PyObject *self,
     void *addr;
     unsigned char *bytes;
     Py_ssize_t num_bytes;
-    if(!PyArg_ParseTuple(args, "iIs#", &child, &addr, &bytes, &num_bytes)) {
+    if(!PyArg_ParseTuple(args, "iO&s#", &child, parse_address, &addr, &bytes, &num_bytes)) {
         PyErr_SetString(SyscallReplayError,
                         "copy_bytes failed parse failed");
     }
@@ -828,7 +1399,7 @@ static PyObject *syscallreplay_copy_bytes_into_child_process(PyObject *self,
             printf("%02X ", bytes[i]);
         }
     }
-    copy_buffer_into_child_process_memory(child, addr, bytes, num_bytes);
+    write_child_memory(child, addr, bytes, num_bytes);
 
     Py_RETURN_NONE;
 }
@@ -841,7 +1412,7 @@ static PyObject *syscallreplay_populate_winsize_structure(PyObject *self,
     unsigned short ws_col;
     unsigned short ws_xpixel;
     unsigned short ws_ypixel;
-    if(!PyArg_ParseTuple(args, "IIhhhh", &child, &addr, &ws_row, &ws_col,
+    if(!PyArg_ParseTuple(args, "IO&hhhh", &child, parse_address, &addr, &ws_row, &ws_col,
                          &ws_xpixel, &ws_ypixel)) {
         PyErr_SetString(SyscallReplayError,
                         "pop_winsize parse fialed");
@@ -855,7 +1426,7 @@ static PyObject *syscallreplay_populate_winsize_structure(PyObject *self,
         printf("ws_ypixel: %d\n", ws_ypixel);
     }
     struct winsize w;
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&w, sizeof(w));
+    read_child_memory(child, addr, (unsigned char *)&w, sizeof(w));
     w.ws_row = ws_row;
     w.ws_col = ws_col;
     w.ws_xpixel = ws_xpixel;
@@ -866,9 +1437,9 @@ static PyObject *syscallreplay_populate_winsize_structure(PyObject *self,
         printf("w.ws_xpixel: %d\n", w.ws_xpixel);
         printf("w.ws_ypixel: %d\n", w.ws_ypixel);
     }
-    copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&w, sizeof(w));
+    write_child_memory(child, addr, (unsigned char *)&w, sizeof(w));
     struct winsize r;
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&r, sizeof(r));
+    read_child_memory(child, addr, (unsigned char *)&r, sizeof(r));
     if(DEBUG) {
         printf("r.ws_row: %d\n", r.ws_row);
         printf("r.ws_col: %d\n", r.ws_col);
@@ -887,8 +1458,8 @@ static PyObject *syscallreplay_populate_af_inet_sockaddr(PyObject *self,
     void *length_addr;
     socklen_t length;
 
-    PyArg_ParseTuple(args, "IIHsii", &child, &addr,
-                     &port, &ip, &length_addr, &length);
+    PyArg_ParseTuple(args, "IO&HsO&i", &child, parse_address, &addr,
+                     &port, &ip, parse_address, &length_addr, &length);
     if(DEBUG) {
         printf("C: pop af_inet: child: %u\n", child);
         printf("C: pop af_inet: addr: %p\n", addr);
@@ -901,20 +1472,20 @@ static PyObject *syscallreplay_populate_af_inet_sockaddr(PyObject *self,
     if(DEBUG) {
         printf("C: pop af_inet: sizeof(s.sin_port): %zu\n", sizeof(s.sin_port));
     }
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&s, sizeof(s));
+    read_child_memory(child, addr, (unsigned char *)&s, sizeof(s));
     s.sin_family = AF_INET;
     s.sin_port = htons(port);
     inet_aton(ip, &s.sin_addr);
     memset(&s.sin_zero, 0, 8);
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
-
-    copy_buffer_into_child_process_memory(child,
-                                          length_addr,
-                                          (unsigned char *)&length,
-                                          sizeof(length));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
+
+    write_child_memory(child,
+                       length_addr,
+                       (unsigned char *)&length,
+                       sizeof(length));
     Py_RETURN_NONE;
 }
 
@@ -935,7 +1506,7 @@ static PyObject *tracreplay_populate_statfs64_structure(PyObject *self,
     long f_frsize;
     long f_flags;
 
-    PyArg_ParseTuple(args, "IIkkkkkkkkkkkk", &child, &addr, &f_type, &f_bsize,
+    PyArg_ParseTuple(args, "IO&kkkkkkkkkkkk", &child, parse_address, &addr, &f_type, &f_bsize,
                      &f_blocks, &f_bfree, &f_bavail, &f_files, &f_ffree,
                      &f_fsid1, &f_fsid2, &f_namelen, &f_frsize, &f_flags);
     if(DEBUG) {
@@ -955,7 +1526,7 @@ static PyObject *tracreplay_populate_statfs64_structure(PyObject *self,
         printf("C: statfs64: f_flags: %ld\n", f_flags);
     }
     struct statfs64 s;
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&s, sizeof(s));
+    read_child_memory(child, addr, (unsigned char *)&s, sizeof(s));
     s.f_type = f_type;
     s.f_bsize = f_bsize;
     s.f_blocks = f_blocks;
@@ -968,7 +1539,7 @@ static PyObject *tracreplay_populate_statfs64_structure(PyObject *self,
     s.f_frsize = f_frsize;
     s.f_flags = f_flags;
 
-    copy_buffer_into_child_process_memory(child, addr, (unsigned char *)&s, sizeof(s));
+    write_child_memory(child, addr, (unsigned char *)&s, sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -986,7 +1557,7 @@ static PyObject *syscallreplay_populate_tcgets_response(PyObject *self,
     Py_ssize_t cc_bytes_length;
     int i;
 
-    PyArg_ParseTuple(args, "IIIIIIbs#", (int *)&child, (int *)&addr, (unsigned int *)&c_iflag,
+    PyArg_ParseTuple(args, "IO&IIIIbs#", (int *)&child, parse_address, &addr, (unsigned int *)&c_iflag,
                      (unsigned int *)&c_oflag, (unsigned int *)&c_cflag, (unsigned int *)&c_lflag,
                      (unsigned char *)&c_line, &cc_bytes, &cc_bytes_length);
     if(DEBUG) {
@@ -1028,10 +1599,10 @@ static PyObject *syscallreplay_populate_tcgets_response(PyObject *self,
         }
         printf("\n");
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&t,
-                                          17 + 19);
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&t,
+                       17 + 19);
     Py_RETURN_NONE;
 }
 
@@ -1042,7 +1613,7 @@ static PyObject *syscallreplay_populate_rlimit_structure(PyObject *self,
     rlim_t rlim_cur;
     rlim_t rlim_max;
 
-    PyArg_ParseTuple(args, "IILL", (int *)&child, (int *)&addr,
+    PyArg_ParseTuple(args, "IO&LL", (int *)&child, parse_address, &addr,
                      (long long *)&rlim_cur, (long long *)&rlim_max);
     if(DEBUG) {
         printf("C: getrlimit: child %u\n", (int)child);
@@ -1062,10 +1633,10 @@ static PyObject *syscallreplay_populate_rlimit_structure(PyObject *self,
         printf("C: sizeof(max) %zu\n", sizeof(s.rlim_max));
         printf("C: max %lx\n", s.rlim_max);
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -1079,7 +1650,7 @@ static PyObject *syscallreplay_populate_uname_structure(PyObject *self,
     char *version;
     char *machine;
     char *domainname;
-    PyArg_ParseTuple(args, "IIssssss", (int *)&child, (int *)&addr, &sysname,
+    PyArg_ParseTuple(args, "IO&ssssss", (int *)&child, parse_address, &addr, &sysname,
                      &nodename, &release, &version, &machine, &domainname);
     if(DEBUG) {
         printf("C: uname: child %u\n", (int)child);
@@ -1098,10 +1669,10 @@ static PyObject *syscallreplay_populate_uname_structure(PyObject *self,
     strncpy(s.version, version, 64);
     strncpy(s.machine, machine, 64);
     strncpy(s.domainname, domainname, 64);
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -1111,7 +1682,7 @@ static PyObject *syscallreplay_populate_char_buffer(PyObject *self,
     void *addr;
     unsigned char *data;
     int data_length;
-    PyArg_ParseTuple(args, "IIs#", (int *)&child, (int *)&addr,
+    PyArg_ParseTuple(args, "IO&s#", (int *)&child, parse_address, &addr,
                      &data, &data_length);
     if(DEBUG) {
         printf("C: pop_char_buf: child: %u\n", child);
@@ -1119,66 +1690,305 @@ static PyObject *syscallreplay_populate_char_buffer(PyObject *self,
         printf("C: pop_char_buf: data: %s\n", data);
         printf("C: pop_char_buf: data_length %u\n", data_length);
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          data,
-                                          data_length);
+    write_child_memory(child,
+                       addr,
+                       data,
+                       data_length);
     Py_RETURN_NONE;
 }
 
-static PyObject *syscallreplay_populate_int(PyObject *self,
-                                          PyObject *args) {
-    pid_t child;
-    void *addr;
-    int data;
-    if(!PyArg_ParseTuple(args, "IIi", &child, &addr, &data)) {
-        PyErr_SetString(SyscallReplayError,
-                        "populate_int arg parse failed");
-    }
-    if(DEBUG) {
-        printf("C: pop_int: child: %u\n", child);
-        printf("C: pop_int: addr: %p\n", addr);
-        printf("C: pop_int: data: %u\n", data);
+static int hex_digit_value(char c) {
+    if(c >= '0' && c <= '9') {
+        return c - '0';
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&data,
-                                          sizeof(int));
-    Py_RETURN_NONE;
-}
-
-static PyObject *syscallreplay_populate_unsigned_int(PyObject *self,
-                                          PyObject *args) {
-    pid_t child;
-    void *addr;
-    int data;
-    if(!PyArg_ParseTuple(args, "III", &child, &addr, &data)) {
-        PyErr_SetString(SyscallReplayError,
-                        "populate_int arg parse failed");
+    if(c >= 'a' && c <= 'f') {
+        return c - 'a' + 10;
     }
-    if(DEBUG) {
-        printf("C: pop_unsigned_int: child: %u\n", child);
-        printf("C: pop_unsigned_int: addr: %p\n", addr);
-        printf("C: pop_unsigned_int: data: %u\n", data);
+    if(c >= 'A' && c <= 'F') {
+        return c - 'A' + 10;
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&data,
-                                          sizeof(int));
-    Py_RETURN_NONE;
+    return -1;
 }
 
-static PyObject *syscallreplay_populate_stack_structure(PyObject *self,
-                                                        PyObject *args) {
-    pid_t child;
-    void *addr;
-    void *ss_sp;
+// Decode the strace-quoted string whose opening quote is at text[-1] into
+// out, stopping at its closing quote (anything after it, like the ... strace
+// appends to a truncated string, is ignored) or after length characters.
+// Handles the escapes strace and Python's string_escape produce: \n, \t,
+// \r, \v, \f, \a, \b, \\, \", \', \xNN and octal \NNN.  Unknown escapes are
+// kept as they are.  Decoding never grows, so out needs at most length
+// bytes.  Returns the number of bytes decoded.
+static size_t decode_strace_escapes(const char *text,
+                                    size_t length,
+                                    unsigned char *out) {
+    const char *end = text + length;
+    unsigned char *o = out;
+    int value;
+    int digits;
+    int nibble;
+    char c;
+    while(text < end) {
+        // Copy everything up to the next escape or quote
+        while(text < end && *text != '\\' && *text != '"') {
+            *o++ = *text++;
+        }
+        if(text == end || *text == '"') {
+            break;
+        }
+        if(++text == end) {
+            *o++ = '\\';
+            break;
+        }
+        c = *text++;
+        switch(c) {
+        case 'n': *o++ = '\n'; break;
+        case 't': *o++ = '\t'; break;
+        case 'r': *o++ = '\r'; break;
+        case 'v': *o++ = '\v'; break;
+        case 'f': *o++ = '\f'; break;
+        case 'a': *o++ = '\a'; break;
+        case 'b': *o++ = '\b'; break;
+        case '\\':
+        case '"':
+        case '\'':
+            *o++ = c;
+            break;
+        case 'x':
+            if(text == end || (value = hex_digit_value(*text)) == -1) {
+                *o++ = '\\';
+                *o++ = 'x';
+                break;
+            }
+            text++;
+            if(text < end && (nibble = hex_digit_value(*text)) != -1) {
+                value = value * 16 + nibble;
+                text++;
+            }
+            *o++ = value;
+            break;
+        case '0': case '1': case '2': case '3':
+        case '4': case '5': case '6': case '7':
+            value = c - '0';
+            digits = 1;
+            while(digits < 3 && text < end && *text >= '0' && *text <= '7') {
+                value = value * 8 + (*text++ - '0');
+                digits++;
+            }
+            *o++ = value & 0xff;
+            break;
+        default:
+            *o++ = '\\';
+            *o++ = c;
+        }
+    }
+    return o - out;
+}
+
+// Check that token[start] opens a quoted string and return where its
+// contents start, or -1 with an exception set.
+static Py_ssize_t strace_string_contents(const char *token,
+                                         int token_length,
+                                         Py_ssize_t start) {
+    if(start < 0 || start >= token_length || token[start] != '"') {
+        PyErr_Format(SyscallReplayError,
+                     "no quoted string at offset %zd", start);
+        return -1;
+    }
+    return start + 1;
+}
+
+static PyObject *syscallreplay_decode_strace_string(PyObject *self,
+                                                    PyObject *args) {
+    const char *token;
+    int token_length;
+    Py_ssize_t start = 0;
+    PyObject *buffer = Py_None;
+    PyObject *result;
+    Py_ssize_t contents;
+    size_t decoded;
+    if(!PyArg_ParseTuple(args, "s#|nO", &token, &token_length, &start, &buffer)) {
+        PyErr_SetString(SyscallReplayError,
+                        "decode_strace_string arg parse failed");
+        return NULL;
+    }
+    if((contents = strace_string_contents(token, token_length, start)) == -1) {
+        return NULL;
+    }
+    if(buffer == Py_None) {
+        result = PyString_FromStringAndSize(NULL, token_length - contents);
+        if(result == NULL) {
+            return NULL;
+        }
+        decoded = decode_strace_escapes(token + contents,
+                                        token_length - contents,
+                                        (unsigned char *)PyString_AS_STRING(result));
+        if(_PyString_Resize(&result, decoded) == -1) {
+            return NULL;
+        }
+        return result;
+    }
+    if(!PyByteArray_Check(buffer)) {
+        PyErr_SetString(SyscallReplayError,
+                        "decode_strace_string buffer must be a bytearray");
+        return NULL;
+    }
+    if(PyByteArray_GET_SIZE(buffer) < token_length - contents
+       && PyByteArray_Resize(buffer, token_length - contents) == -1) {
+        return NULL;
+    }
+    decoded = decode_strace_escapes(token + contents,
+                                    token_length - contents,
+                                    (unsigned char *)PyByteArray_AS_STRING(buffer));
+    return PyInt_FromSsize_t(decoded);
+}
+
+static PyObject *syscallreplay_populate_strace_string(PyObject *self,
+                                                      PyObject *args) {
+    pid_t child;
+    void *addr;
+    const char *token;
+    int token_length;
+    Py_ssize_t length = -1;
+    Py_ssize_t start = 0;
+    Py_ssize_t contents;
+    unsigned char *buffer;
+    size_t decoded;
+    if(!PyArg_ParseTuple(args, "IO&s#|nn", &child, parse_address, &addr,
+                         &token, &token_length, &length, &start)) {
+        PyErr_SetString(SyscallReplayError,
+                        "populate_strace_string arg parse failed");
+        return NULL;
+    }
+    if((contents = strace_string_contents(token, token_length, start)) == -1) {
+        return NULL;
+    }
+    if((buffer = malloc(token_length - contents + 1)) == NULL) {
+        return PyErr_NoMemory();
+    }
+    decoded = decode_strace_escapes(token + contents,
+                                    token_length - contents,
+                                    buffer);
+    if(DEBUG) {
+        printf("C: pop_strace_string: child: %u\n", child);
+        printf("C: pop_strace_string: addr: %lx\n", (unsigned long)addr);
+        printf("C: pop_strace_string: decoded %zu bytes\n", decoded);
+    }
+    if(length < 0 || (size_t)length == decoded) {
+        if(write_child_memory(child, addr, buffer, decoded) == -1) {
+            free(buffer);
+            return NULL;
+        }
+    }
+    free(buffer);
+    return PyInt_FromSize_t(decoded);
+}
+
+// Stream length bytes of the file open on fd, from offset on, into the
+// child at addr through a fixed size chunk, so a payload of any size is
+// written without being held in memory whole.  Stops early at end of file.
+#define PAYLOAD_CHUNK_SIZE 65536
+
+static unsigned char payload_chunk[PAYLOAD_CHUNK_SIZE];
+
+static PyObject *syscallreplay_populate_from_fd(PyObject *self,
+                                                PyObject *args) {
+    pid_t child;
+    unsigned char *addr;
+    int fd;
+    Py_ssize_t length;
+    long long offset = 0;
+    size_t written = 0;
+    size_t chunk_length;
+    ssize_t got;
+    if(!PyArg_ParseTuple(args, "IO&in|L", &child, parse_address, &addr,
+                         &fd, &length, &offset)) {
+        PyErr_SetString(SyscallReplayError,
+                        "populate_from_fd arg parse failed");
+        return NULL;
+    }
+    if(DEBUG) {
+        printf("C: populate_from_fd: child: %u\n", child);
+        printf("C: populate_from_fd: addr: %lx\n", (unsigned long)addr);
+        printf("C: populate_from_fd: fd: %d\n", fd);
+        printf("C: populate_from_fd: length: %zd\n", length);
+    }
+    while(length > 0 && (size_t)length > written) {
+        chunk_length = (size_t)length - written;
+        if(chunk_length > PAYLOAD_CHUNK_SIZE) {
+            chunk_length = PAYLOAD_CHUNK_SIZE;
+        }
+        got = pread(fd, payload_chunk, chunk_length, offset + written);
+        if(got == -1) {
+            if(errno == EINTR) {
+                continue;
+            }
+            PyErr_SetFromErrno(PyExc_OSError);
+            return NULL;
+        }
+        if(got == 0) {
+            break;
+        }
+        if(write_child_memory(child, addr + written, payload_chunk, got) == -1) {
+            return NULL;
+        }
+        written += got;
+    }
+    return PyInt_FromSize_t(written);
+}
+
+static PyObject *syscallreplay_populate_int(PyObject *self,
+                                          PyObject *args) {
+    pid_t child;
+    void *addr;
+    int data;
+    if(!PyArg_ParseTuple(args, "IO&i", &child, parse_address, &addr, &data)) {
+        PyErr_SetString(SyscallReplayError,
+                        "populate_int arg parse failed");
+    }
+    if(DEBUG) {
+        printf("C: pop_int: child: %u\n", child);
+        printf("C: pop_int: addr: %p\n", addr);
+        printf("C: pop_int: data: %u\n", data);
+    }
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&data,
+                       sizeof(int));
+    Py_RETURN_NONE;
+}
+
+static PyObject *syscallreplay_populate_unsigned_int(PyObject *self,
+                                          PyObject *args) {
+    pid_t child;
+    void *addr;
+    int data;
+    if(!PyArg_ParseTuple(args, "IO&I", &child, parse_address, &addr, &data)) {
+        PyErr_SetString(SyscallReplayError,
+                        "populate_int arg parse failed");
+        return NULL;
+    }
+    if(DEBUG) {
+        printf("C: pop_unsigned_int: child: %u\n", child);
+        printf("C: pop_unsigned_int: addr: %p\n", addr);
+        printf("C: pop_unsigned_int: data: %u\n", data);
+    }
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&data,
+                       sizeof(int));
+    Py_RETURN_NONE;
+}
+
+static PyObject *syscallreplay_populate_stack_structure(PyObject *self,
+                                                        PyObject *args) {
+    pid_t child;
+    void *addr;
+    void *ss_sp;
     int ss_flags;
     size_t ss_size;
 
-    if(!PyArg_ParseTuple(args, "IIiiI", (int *)&child,
-                         (int *)&addr,
-                         &ss_sp,
+    if(!PyArg_ParseTuple(args, "IO&O&iI", (int *)&child,
+                         parse_address, &addr,
+                         parse_address, &ss_sp,
                          &ss_flags,
                          (unsigned int *)&ss_size)) {
         PyErr_SetString(SyscallReplayError,
@@ -1196,10 +2006,10 @@ static PyObject *syscallreplay_populate_stack_structure(PyObject *self,
     s.ss_sp = ss_sp;
     s.ss_flags = ss_flags;
     s.ss_size = ss_size;
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -1208,8 +2018,8 @@ static PyObject *syscallreplay_populate_cpu_set(PyObject *self,
     pid_t child;
     void *addr;
     int cpu_value;
-    if(!PyArg_ParseTuple(args, "IIi", (int *)&child,
-                                      (int *)&addr,
+    if(!PyArg_ParseTuple(args, "IO&i", (int *)&child,
+                                      parse_address, &addr,
                                       &cpu_value)) {
         PyErr_SetString(SyscallReplayError,
                         "populate_cpu_set arg parse failed");
@@ -1221,10 +2031,10 @@ static PyObject *syscallreplay_populate_cpu_set(PyObject *self,
     }
     cpu_set_t set;
     CPU_SET(cpu_value, &set);
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&set,
-                                          sizeof(set));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&set,
+                       sizeof(set));
     Py_RETURN_NONE;
 }
 
@@ -1233,16 +2043,21 @@ static PyObject *syscallreplay_populate_llseek_result(PyObject *self,
     pid_t child;
     void *addr;
     loff_t result;
-    PyArg_ParseTuple(args, "IIL", (int *)&child, (int *)&addr, (int *)&result);
+    if(!PyArg_ParseTuple(args, "IO&L", (int *)&child, parse_address, &addr,
+                         (long long *)&result)) {
+        PyErr_SetString(SyscallReplayError,
+                        "populate_llseek_result arg parse failed");
+        return NULL;
+    }
     if(DEBUG) {
         printf("C: llseek: child: %u\n", (unsigned)child);
         printf("C: llseek: addr: %lx\n", (unsigned long)addr);
         printf("C: llseek: result: %lld\n", (long long)result);
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&result,
-                                          sizeof(long long));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&result,
+                       sizeof(long long));
     Py_RETURN_NONE;
 }
 
@@ -1264,12 +2079,14 @@ static PyObject *syscallreplay_populate_rt_sigaction_struct(PyObject *self,
   /* void         *old_sa_sigaction = NULL; // use not implemented yet, see kernelhandlers.py */
 
   bool argument_population_failed = !PyArg_ParseTuple(args,
-                                                      "IIIOII",
+                                                      "IO&kOIO&",
                                                       &child,
+                                                      parse_address,
                                                       &oldact_addr,
                                                       &old_sa_handler,
                                                       &mask_sig_list,
                                                       &old_sa_flags,
+                                                      parse_address,
                                                       &old_sa_restorer);
 
   if (argument_population_failed) {
@@ -1286,7 +2103,7 @@ static PyObject *syscallreplay_populate_rt_sigaction_struct(PyObject *self,
 
 
   // setup memory for copying oldact in
-    copy_child_process_memory_into_buffer(child, oldact_addr, (unsigned char *)&oldact, sizeof(oldact));
+    read_child_memory(child, oldact_addr, (unsigned char *)&oldact, sizeof(oldact));
 
   // Note: cant set handler and sigaction at same time as use same memory
   oldact.k_sa_handler = (void (*)(int))old_sa_handler;
@@ -1315,11 +2132,11 @@ static PyObject *syscallreplay_populate_rt_sigaction_struct(PyObject *self,
   }
 
   // copy oldact into memory
-  copy_buffer_into_child_process_memory(child, oldact_addr, (unsigned char *)&oldact, sizeof(oldact));
+  write_child_memory(child, oldact_addr, (unsigned char *)&oldact, sizeof(oldact));
 
   // copy back out of memory to read / test values
   struct ksigaction test;
-  copy_child_process_memory_into_buffer(child, oldact_addr, (unsigned char *)&test, sizeof(test));
+  read_child_memory(child, oldact_addr, (unsigned char *)&test, sizeof(test));
 
 
    if (DEBUG) {
@@ -1359,8 +2176,9 @@ static PyObject *syscallreplay_populate_stat64_struct(PyObject *self,
 
     char buffer[100];
 
-    if(!PyArg_ParseTuple(args, "IIIIkkIkkIILkKkkk",
+    if(!PyArg_ParseTuple(args, "IO&IIkkIkkIILkKkkk",
                          &child,
+                         parse_address,
                          &addr,
                          &st_dev1,
                          &st_dev2,
@@ -1440,10 +2258,10 @@ static PyObject *syscallreplay_populate_stat64_struct(PyObject *self,
         strftime(buffer, 20, "%Y/%m/%zu %H:%M:%S", localtime((long int *)&s.st__atime));
         printf("s.st_atime: %s\n", buffer);
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -1452,7 +2270,7 @@ static PyObject *syscallreplay_get_select_fds(PyObject *self,
     pid_t child;
     void *addr;
 
-    if(!PyArg_ParseTuple(args, "II", &child, &addr)) {
+    if(!PyArg_ParseTuple(args, "IO&", &child, parse_address, &addr)) {
         PyErr_SetString(SyscallReplayError,
                         "C: get_select_fds: arg parse failed");
     }
@@ -1463,10 +2281,10 @@ static PyObject *syscallreplay_get_select_fds(PyObject *self,
     PyObject *list = PyList_New(0);
     int i;
     fd_set t;
-    copy_child_process_memory_into_buffer(child,
-                                          addr,
-                                          (unsigned char *)&t,
-                                          sizeof(fd_set));
+    read_child_memory(child,
+                      addr,
+                      (unsigned char *)&t,
+                      sizeof(fd_set));
     for(i = 0; i < FD_SETSIZE; i++) {
         if(FD_ISSET(i, &t)) {
             if(DEBUG) {
@@ -1488,13 +2306,13 @@ static PyObject *syscallreplay_populate_select_bitmaps(PyObject *self,
     void *exceptfds_addr;
     PyObject *exceptfds_list;
 
-    PyArg_ParseTuple(args, "IIOIOIO",
+    PyArg_ParseTuple(args, "IO&OO&OO&O",
                      &child,
-                     &readfds_addr,
+                     parse_address, &readfds_addr,
                      &readfds_list,
-                     &writefds_addr,
+                     parse_address, &writefds_addr,
                      &writefds_list,
-                     &exceptfds_addr,
+                     parse_address, &exceptfds_addr,
                      &exceptfds_list);
     fd_set tmp;
     if(DEBUG) {
@@ -1520,7 +2338,7 @@ static PyObject *syscallreplay_populate_select_bitmaps(PyObject *self,
                         "except_list received in C code is not a list");
     }
     PyObject *iter;
-    copy_child_process_memory_into_buffer(child, readfds_addr,
+    read_child_memory(child, readfds_addr,
                                          (unsigned char *)&tmp, sizeof(tmp));
     FD_ZERO(&tmp);
     if(readfds_addr != 0) {
@@ -1545,9 +2363,9 @@ static PyObject *syscallreplay_populate_select_bitmaps(PyObject *self,
             next = PyIter_Next(iter);
         }
     }
-    copy_buffer_into_child_process_memory(child, readfds_addr,
+    write_child_memory(child, readfds_addr,
                                         (unsigned char *)&tmp, sizeof(tmp));
-    copy_child_process_memory_into_buffer(child, writefds_addr,
+    read_child_memory(child, writefds_addr,
                                          (unsigned char *)&tmp, sizeof(tmp));
     FD_ZERO(&tmp);
     if(writefds_addr != 0 ) {
@@ -1572,9 +2390,9 @@ static PyObject *syscallreplay_populate_select_bitmaps(PyObject *self,
             next = PyIter_Next(iter);
         }
     }
-    copy_buffer_into_child_process_memory(child, writefds_addr,
+    write_child_memory(child, writefds_addr,
                                         (unsigned char *)&tmp, sizeof(tmp));
-    copy_child_process_memory_into_buffer(child, exceptfds_addr,
+    read_child_memory(child, exceptfds_addr,
                                          (unsigned char *)&tmp, sizeof(tmp));
     FD_ZERO(&tmp);
     if(exceptfds_addr != 0) {
@@ -1599,7 +2417,7 @@ static PyObject *syscallreplay_populate_select_bitmaps(PyObject *self,
             next = PyIter_Next(iter);
         }
     }
-    copy_buffer_into_child_process_memory(child, exceptfds_addr,
+    write_child_memory(child, exceptfds_addr,
                                         (unsigned char *)&tmp, sizeof(tmp));
     Py_RETURN_NONE;
 }
@@ -1608,7 +2426,7 @@ static PyObject *syscallreplay_is_select_fd_set(PyObject *self, PyObject *args)
     pid_t child;
     void *fdset_addr;
     int fd;
-    if(!PyArg_ParseTuple(args, "IIi", &child, &fdset_addr, &fd)) {
+    if(!PyArg_ParseTuple(args, "IO&i", &child, parse_address, &fdset_addr, &fd)) {
         PyErr_SetString(SyscallReplayError,
                         "is_selet_fd_set arg parse failed");
     }
@@ -1618,10 +2436,10 @@ static PyObject *syscallreplay_is_select_fd_set(PyObject *self, PyObject *args)
         printf("C: is_select_fd: fd: %d\n", fd);
     }
     fd_set tmp;
-    copy_child_process_memory_into_buffer(child,
-                                          fdset_addr,
-                                          (unsigned char *)&tmp,
-                                          sizeof(tmp));
+    read_child_memory(child,
+                      fdset_addr,
+                      (unsigned char *)&tmp,
+                      sizeof(tmp));
     unsigned int i;
     if(DEBUG) {
         printf("C: is_select_fd: ");
@@ -1680,6 +2498,52 @@ void init_constants(PyObject *m) {
     if(PyModule_AddIntConstant(m, "RBP", RBP) == -1) {
         return;
     }
+    if(PyModule_AddIntConstant(m, "RIP", RIP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "RSP", RSP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "R8", R8) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "R9", R9) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "R10", R10) == -1) {
+        return;
+    }
+
+    // The handlers follow the i386 system call convention.  A 32-bit tracee's
+    // registers land in the low halves of the x86-64 user_regs_struct slots,
+    // so the i386 names are aliases for the same offsets.
+    if(PyModule_AddIntConstant(m, "EAX", RAX) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "EBX", RBX) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "ECX", RCX) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "EDX", RDX) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "ESI", RSI) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "EDI", RDI) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "EBP", RBP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "EIP", RIP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "ORIG_EAX", ORIG_RAX) == -1) {
+        return;
+    }
 
     if(PyModule_AddIntConstant(m, "STDIN", STDIN_FILENO) == -1) {
         return;
@@ -1717,6 +2581,106 @@ void init_constants(PyObject *m) {
                                CLOCK_PROCESS_CPUTIME_ID) == -1) {
         return;
     }
+
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACESYSGOOD",
+                               PTRACE_O_TRACESYSGOOD) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACESECCOMP",
+                               PTRACE_O_TRACESECCOMP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_EXITKILL",
+                               PTRACE_O_EXITKILL) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_EVENT_SECCOMP",
+                               PTRACE_EVENT_SECCOMP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACECLONE", PTRACE_O_TRACECLONE) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACEFORK", PTRACE_O_TRACEFORK) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACEVFORK", PTRACE_O_TRACEVFORK) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_O_TRACEEXEC", PTRACE_O_TRACEEXEC) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_EVENT_CLONE", PTRACE_EVENT_CLONE) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_EVENT_FORK", PTRACE_EVENT_FORK) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_EVENT_VFORK", PTRACE_EVENT_VFORK) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_EVENT_EXEC", PTRACE_EVENT_EXEC) == -1) {
+        return;
+    }
+    // waitpid() flag for waiting on threads as well as processes
+    if(PyModule_AddIntConstant(m, "WALL", __WALL) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "SYSCALL_INFO_NONE",
+                               PTRACE_SYSCALL_INFO_NONE) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "SYSCALL_INFO_ENTRY",
+                               PTRACE_SYSCALL_INFO_ENTRY) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "SYSCALL_INFO_EXIT",
+                               PTRACE_SYSCALL_INFO_EXIT) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "SYSCALL_INFO_SECCOMP",
+                               PTRACE_SYSCALL_INFO_SECCOMP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_SYSCALL", PTRACE_SYSCALL) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_SYSEMU", PTRACE_SYSEMU) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "PTRACE_CONT", PTRACE_CONT) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_SYSCALL_ENTRY",
+                               STOP_SYSCALL_ENTRY) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_SYSCALL_EXIT",
+                               STOP_SYSCALL_EXIT) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_SECCOMP", STOP_SECCOMP) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_SIGNAL", STOP_SIGNAL) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_EVENT", STOP_EVENT) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_EXITED", STOP_EXITED) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "STOP_KILLED", STOP_KILLED) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "AUDIT_ARCH_I386", AUDIT_ARCH_I386) == -1) {
+        return;
+    }
+    if(PyModule_AddIntConstant(m, "AUDIT_ARCH_X86_64",
+                               AUDIT_ARCH_X86_64) == -1) {
+        return;
+    }
 }
 
 static PyObject *syscallreplay_peek_register(PyObject *self, PyObject *args) {
@@ -1731,6 +2695,9 @@ static PyObject *syscallreplay_peek_register(PyObject *self, PyObject *args) {
         perror("Register Peek Failed");
         return NULL;
     }
+    if(tracee_is_64bit()) {
+        return Py_BuildValue("l", extracted_register);
+    }
     return Py_BuildValue("i", extracted_register);
 }
 
@@ -1747,6 +2714,9 @@ static PyObject *syscallreplay_peek_register_unsigned(PyObject *self,
         perror("Register Peek Failed");
         return NULL;
     }
+    if(tracee_is_64bit()) {
+        return Py_BuildValue("k", extracted_register);
+    }
     return Py_BuildValue("I", extracted_register);
 }
 
@@ -1754,7 +2724,7 @@ static PyObject *syscallreplay_poke_register(PyObject *self, PyObject *args) {
     pid_t child;
     int reg;
     long int value;
-    PyArg_ParseTuple(args, "IIi", &child, &reg, &value);
+    PyArg_ParseTuple(args, "IIl", &child, &reg, &value);
     if(DEBUG) {
         printf("C: poke_register: child: %u\n", child);
         printf("C: poke_register: reg: %u\n", reg);
@@ -1773,7 +2743,7 @@ static PyObject *syscallreplay_poke_register_unsigned(PyObject *self,
     pid_t child;
     int reg;
     unsigned long int value;
-    PyArg_ParseTuple(args, "III", &child, &reg, &value);
+    PyArg_ParseTuple(args, "IIk", &child, &reg, &value);
     if(DEBUG) {
         printf("C: poke_register: child: %u\n", child);
         printf("C: poke_register: reg: %u\n", reg);
@@ -1826,6 +2796,308 @@ static PyObject *syscallreplay_syscall(PyObject *self, PyObject *args) {
     Py_RETURN_NONE;
 }
 
+static PyObject *syscallreplay_sysemu(PyObject *self, PyObject *args) {
+    pid_t child;
+    int signal;
+    if(!PyArg_ParseTuple(args, "ii", &child, &signal)) {
+        PyErr_SetString(SyscallReplayError, "sysemu arg parse failed");
+        return NULL;
+    }
+    if(ptrace(PTRACE_SYSEMU, child, NULL, signal) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+// Back a child stopped at a PTRACE_SYSEMU system call entry up so the call is
+// made again when it resumes: the instruction pointer goes back over the two
+// byte int $0x80 or syscall instruction and the call number, which the
+// kernel replaced with -ENOSYS, is put back in EAX.
+static PyObject *syscallreplay_rewind_syscall(PyObject *self, PyObject *args) {
+    pid_t child;
+    struct user_regs_struct regs;
+    if(!PyArg_ParseTuple(args, "i", &child)) {
+        PyErr_SetString(SyscallReplayError, "rewind_syscall arg parse failed");
+        return NULL;
+    }
+    if(ptrace(PTRACE_GETREGS, child, NULL, &regs) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    regs.rip -= 2;
+    regs.rax = regs.orig_rax;
+    if(ptrace(PTRACE_SETREGS, child, NULL, &regs) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    Py_RETURN_NONE;
+}
+
+// get_syscall_info() decodes a system call stop with a single
+// PTRACE_GET_SYSCALL_INFO rather than a PTRACE_PEEKUSER per register.  Fields
+// that don't apply to the kind of stop are None.  Arguments of i386 calls are
+// sign extended from 32 bits so they compare the same as peek_register()'s
+// results.  The kernel only recognises system call stops as such if the
+// tracer set PTRACE_O_TRACESYSGOOD; otherwise op is SYSCALL_INFO_NONE.
+static PyTypeObject SyscallInfoType;
+
+static PyStructSequence_Field syscall_info_fields[] = {
+    {"op", "SYSCALL_INFO_ENTRY, SYSCALL_INFO_EXIT, SYSCALL_INFO_SECCOMP or "
+           "SYSCALL_INFO_NONE"},
+    {"arch", "AUDIT_ARCH_* of the call"},
+    {"nr", "system call number (entry and seccomp stops)"},
+    {"args", "tuple of the six arguments (entry and seccomp stops)"},
+    {"ret", "return value (exit stops) or SECCOMP_RET_DATA (seccomp stops)"},
+    {"is_error", "whether ret is an error (exit stops)"},
+    {NULL, NULL}
+};
+
+static PyStructSequence_Desc syscall_info_desc = {
+    "syscallreplay.SyscallInfo",
+    "A decoded system call stop",
+    syscall_info_fields,
+    6
+};
+
+static PyObject *syscall_info_arg(__u32 arch, __u64 value) {
+    if(arch == AUDIT_ARCH_I386) {
+        return PyInt_FromLong((int32_t)value);
+    }
+    return PyLong_FromLongLong((long long)value);
+}
+
+// entry and seccomp stops share their leading nr and args layout
+static PyObject *syscall_info_args(struct __ptrace_syscall_info *info) {
+    PyObject *call_args;
+    PyObject *arg;
+    int i;
+    call_args = PyTuple_New(6);
+    if(call_args == NULL) {
+        return NULL;
+    }
+    for(i = 0; i < 6; i++) {
+        arg = syscall_info_arg(info->arch, info->entry.args[i]);
+        if(arg == NULL) {
+            Py_DECREF(call_args);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(call_args, i, arg);
+    }
+    return call_args;
+}
+
+static PyObject *syscallreplay_get_syscall_info(PyObject *self,
+                                                PyObject *args) {
+    pid_t child;
+    struct __ptrace_syscall_info info;
+    PyObject *result;
+    PyObject *call_args;
+    int i;
+    if(!PyArg_ParseTuple(args, "i", &child)) {
+        PyErr_SetString(SyscallReplayError, "get_syscall_info arg parse failed");
+        return NULL;
+    }
+    memset(&info, 0, sizeof(info));
+    if(ptrace(PTRACE_GET_SYSCALL_INFO, child, sizeof(info), &info) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    result = PyStructSequence_New(&SyscallInfoType);
+    if(result == NULL) {
+        return NULL;
+    }
+    PyStructSequence_SET_ITEM(result, 0, PyInt_FromLong(info.op));
+    PyStructSequence_SET_ITEM(result, 1, PyLong_FromUnsignedLong(info.arch));
+    for(i = 2; i < 6; i++) {
+        Py_INCREF(Py_None);
+        PyStructSequence_SET_ITEM(result, i, Py_None);
+    }
+    if(info.op == PTRACE_SYSCALL_INFO_ENTRY
+       || info.op == PTRACE_SYSCALL_INFO_SECCOMP) {
+        call_args = syscall_info_args(&info);
+        if(call_args == NULL) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(Py_None);
+        PyStructSequence_SET_ITEM(result, 2, PyInt_FromLong(info.entry.nr));
+        Py_DECREF(Py_None);
+        PyStructSequence_SET_ITEM(result, 3, call_args);
+        if(info.op == PTRACE_SYSCALL_INFO_SECCOMP) {
+            Py_DECREF(Py_None);
+            PyStructSequence_SET_ITEM(result, 4,
+                                      PyLong_FromUnsignedLong(info.seccomp.ret_data));
+        }
+    }
+    else if(info.op == PTRACE_SYSCALL_INFO_EXIT) {
+        Py_DECREF(Py_None);
+        PyStructSequence_SET_ITEM(result, 4,
+                                  PyLong_FromLongLong(info.exit.rval));
+        Py_DECREF(Py_None);
+        PyStructSequence_SET_ITEM(result, 5, PyBool_FromLong(info.exit.is_error));
+    }
+    if(PyErr_Occurred()) {
+        Py_DECREF(result);
+        return NULL;
+    }
+    return result;
+}
+
+// The native stop loop.  step() resumes a child and waits for its next stop,
+// wait_stop() just waits, and both classify the stop and return
+//   (kind, pid, nr, args, retval)
+// in a single call:
+//   STOP_SYSCALL_ENTRY  nr and args of the call
+//   STOP_SECCOMP        nr and args, SECCOMP_RET_DATA in retval
+//   STOP_SYSCALL_EXIT   the return value in retval
+//   STOP_SIGNAL         the signal in nr
+//   STOP_EVENT          the PTRACE_EVENT_* in nr, PTRACE_GETEVENTMSG in retval
+//   STOP_EXITED         the exit status in retval
+//   STOP_KILLED         the terminating signal in retval
+// Anything that doesn't apply is None.  System call stops can only be told
+// from SIGTRAPs if the child has PTRACE_O_TRACESYSGOOD set; without it they
+// come back as STOP_SIGNAL.
+static PyObject *classify_stop(pid_t child, int status) {
+    struct __ptrace_syscall_info info;
+    unsigned long message;
+    PyObject *call_args;
+    int event;
+    if(WIFEXITED(status)) {
+        return Py_BuildValue("(iiOOi)", STOP_EXITED, child, Py_None, Py_None,
+                             WEXITSTATUS(status));
+    }
+    if(WIFSIGNALED(status)) {
+        return Py_BuildValue("(iiOOi)", STOP_KILLED, child, Py_None, Py_None,
+                             WTERMSIG(status));
+    }
+    event = status >> 16;
+    if(WSTOPSIG(status) == (SIGTRAP | 0x80) || event == PTRACE_EVENT_SECCOMP) {
+        memset(&info, 0, sizeof(info));
+        if(ptrace(PTRACE_GET_SYSCALL_INFO, child, sizeof(info), &info) == -1) {
+            PyErr_SetFromErrno(SyscallReplayError);
+            return NULL;
+        }
+        if(info.op == PTRACE_SYSCALL_INFO_ENTRY) {
+            if((call_args = syscall_info_args(&info)) == NULL) {
+                return NULL;
+            }
+            return Py_BuildValue("(iiKNO)", STOP_SYSCALL_ENTRY, child,
+                                 (unsigned long long)info.entry.nr, call_args,
+                                 Py_None);
+        }
+        if(info.op == PTRACE_SYSCALL_INFO_SECCOMP) {
+            if((call_args = syscall_info_args(&info)) == NULL) {
+                return NULL;
+            }
+            return Py_BuildValue("(iiKNk)", STOP_SECCOMP, child,
+                                 (unsigned long long)info.seccomp.nr, call_args,
+                                 (unsigned long)info.seccomp.ret_data);
+        }
+        if(info.op == PTRACE_SYSCALL_INFO_EXIT) {
+            return Py_BuildValue("(iiOOL)", STOP_SYSCALL_EXIT, child, Py_None,
+                                 Py_None, (long long)info.exit.rval);
+        }
+    }
+    if(event != 0) {
+        message = 0;
+        if(ptrace(PTRACE_GETEVENTMSG, child, NULL, &message) == -1) {
+            PyErr_SetFromErrno(SyscallReplayError);
+            return NULL;
+        }
+        return Py_BuildValue("(iiiOk)", STOP_EVENT, child, event, Py_None,
+                             message);
+    }
+    return Py_BuildValue("(iiiOO)", STOP_SIGNAL, child, WSTOPSIG(status),
+                         Py_None, Py_None);
+}
+
+static PyObject *wait_and_classify(pid_t child, int options) {
+    pid_t stopped;
+    int status;
+    do {
+        Py_BEGIN_ALLOW_THREADS
+        stopped = waitpid(child, &status, __WALL | options);
+        Py_END_ALLOW_THREADS
+    } while(stopped == -1 && errno == EINTR);
+    if(stopped == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    if(stopped == 0) {
+        // WNOHANG and nothing has stopped
+        Py_RETURN_NONE;
+    }
+    return classify_stop(stopped, status);
+}
+
+static PyObject *syscallreplay_wait_stop(PyObject *self, PyObject *args) {
+    pid_t child = -1;
+    int options = 0;
+    if(!PyArg_ParseTuple(args, "|ii", &child, &options)) {
+        PyErr_SetString(SyscallReplayError, "wait_stop arg parse failed");
+        return NULL;
+    }
+    return wait_and_classify(child, options);
+}
+
+// Readiness notifications for supervising tracees from an event loop.
+// pidfds only become readable when their process exits, so ptrace stops are
+// noticed through the SIGCHLD each one sends the tracer.
+static PyObject *syscallreplay_pidfd_open(PyObject *self, PyObject *args) {
+    pid_t child;
+    int fd;
+    if(!PyArg_ParseTuple(args, "i", &child)) {
+        PyErr_SetString(SyscallReplayError, "pidfd_open arg parse failed");
+        return NULL;
+    }
+    fd = syscall(SYS_pidfd_open, child, 0);
+    if(fd == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    return PyInt_FromLong(fd);
+}
+
+static PyObject *syscallreplay_sigchld_fd(PyObject *self, PyObject *args) {
+    sigset_t mask;
+    int fd;
+    sigemptyset(&mask);
+    sigaddset(&mask, SIGCHLD);
+    // The signal has to be blocked for the signalfd to see it
+    if(sigprocmask(SIG_BLOCK, &mask, NULL) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    fd = signalfd(-1, &mask, SFD_NONBLOCK | SFD_CLOEXEC);
+    if(fd == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    return PyInt_FromLong(fd);
+}
+
+static PyObject *syscallreplay_step(PyObject *self, PyObject *args) {
+    pid_t child;
+    int signal = 0;
+    int request = PTRACE_SYSCALL;
+    if(!PyArg_ParseTuple(args, "i|ii", &child, &signal, &request)) {
+        PyErr_SetString(SyscallReplayError, "step arg parse failed");
+        return NULL;
+    }
+    if(request != PTRACE_SYSCALL && request != PTRACE_SYSEMU
+       && request != PTRACE_CONT) {
+        PyErr_Format(SyscallReplayError,
+                     "step can't resume with ptrace request %d", request);
+        return NULL;
+    }
+    if(ptrace(request, child, NULL, signal) == -1) {
+        PyErr_SetFromErrno(SyscallReplayError);
+        return NULL;
+    }
+    return wait_and_classify(child, 0);
+}
+
 static PyObject *syscallreplay_attach(PyObject *self, PyObject *args) {
   pid_t child;
   if(!PyArg_ParseTuple(args, "I", &child)) {
@@ -1841,12 +3113,17 @@ static PyObject *syscallreplay_attach(PyObject *self, PyObject *args) {
 
 static PyObject *syscallreplay_detach(PyObject *self, PyObject *args) {
     pid_t child;
-    if(!PyArg_ParseTuple(args, "I", &child)) {
+    int signal = 0;
+    if(!PyArg_ParseTuple(args, "I|i", &child, &signal)) {
         PyErr_SetString(SyscallReplayError, "Detach parsetuple failed");
+        return NULL;
     }
-    if(ptrace(PTRACE_DETACH, child, NULL, NULL) == -1) {
+    // signal is delivered as the child is let go, e.g. SIGSTOP to leave it
+    // stopped for another tracer to attach to
+    if(ptrace(PTRACE_DETACH, child, NULL, signal) == -1) {
         perror("Detach failed");
         PyErr_SetString(SyscallReplayError, "Detach failed");
+        return NULL;
     }
     Py_RETURN_NONE;
 }
@@ -1878,17 +3155,32 @@ static PyObject *syscallreplay_waitpid(PyObject *self, PyObject *args) {
 
 static PyObject *syscallreplay_poke_address(PyObject *self, PyObject *args) {
     pid_t child;
-    int address;
-    int data;
-    PyArg_ParseTuple(args, "IIi", &child, &address, &data);
+    void *address;
+    long data;
+    int32_t word;
+    if(!PyArg_ParseTuple(args, "IO&l", &child, parse_address, &address,
+                         &data)) {
+        PyErr_SetString(SyscallReplayError, "poke_address arg parse failed");
+        return NULL;
+    }
     if(DEBUG) {
         printf("C: poke_address: child: %u\n", child);
-        printf("C: poke_address: address: %x\n", address);
-        printf("C: poke_address: data: %u\n", data);
+        printf("C: poke_address: address: %p\n", address);
+        printf("C: poke_address: data: %ld\n", data);
     }
-    errno = 0;
-    if(ptrace(PTRACE_POKEDATA, child, address, data) == -1) {
-        perror("Poke into userspace failed");
+    // Write one of the tracee's words, not one of ours, so a poke into an
+    // i386 tracee doesn't clobber the four bytes after the address
+    if(tracee_is_64bit()) {
+        write_child_memory(child, address, (unsigned char *)&data,
+                           sizeof(data));
+    }
+    else {
+        word = (int32_t)data;
+        write_child_memory(child, address, (unsigned char *)&word,
+                           sizeof(word));
+    }
+    if(PyErr_Occurred()) {
+        return NULL;
     }
     Py_RETURN_NONE;
 }
@@ -1897,13 +3189,19 @@ static PyObject *syscallreplay_peek_address(PyObject *self, PyObject *args) {
     pid_t child;
     void *address;
     long int value;
-    PyArg_ParseTuple(args, "II", &child, &address);
+    if(!PyArg_ParseTuple(args, "IO&", &child, parse_address, &address)) {
+        PyErr_SetString(SyscallReplayError, "peek_address arg parse failed");
+        return NULL;
+    }
     errno = 0;
     value = ptrace(PTRACE_PEEKDATA, child, address, NULL);
     if(errno != 0) {
         perror("Peek into userspace failed");
         PyErr_SetString(SyscallReplayError, "peek_address peek failed");
     }
+    if(tracee_is_64bit()) {
+        return Py_BuildValue("l", value);
+    }
     return Py_BuildValue("i", value);
 }
 
@@ -1911,26 +3209,100 @@ static PyObject *syscallreplay_peek_address_unsigned(PyObject *self, PyObject *a
     pid_t child;
     void *address;
     long int value;
-    PyArg_ParseTuple(args, "II", &child, &address);
+    if(!PyArg_ParseTuple(args, "IO&", &child, parse_address, &address)) {
+        PyErr_SetString(SyscallReplayError, "peek_address arg parse failed");
+        return NULL;
+    }
     errno = 0;
     value = ptrace(PTRACE_PEEKDATA, child, address, NULL);
     if(errno != 0) {
         perror("Peek into userspace failed");
         PyErr_SetString(SyscallReplayError, "peek_address peek failed");
     }
+    if(tracee_is_64bit()) {
+        return Py_BuildValue("k", value);
+    }
     return Py_BuildValue("I", value);
 }
 
+// socketcall() passes its subcall's arguments as an array of ints pointed to
+// by ECX.  Handlers want several of them at every call, so the whole array
+// is read with one transfer rather than one PEEKDATA per argument.
+#define SOCKETCALL_MAX_ARGS 6
+
+static PyObject *syscallreplay_read_socketcall_parameters(PyObject *self,
+                                                          PyObject *args) {
+    pid_t child;
+    void *addr;
+    unsigned int num;
+    int32_t params[SOCKETCALL_MAX_ARGS];
+    unsigned int i;
+    if(!PyArg_ParseTuple(args, "IO&I", &child, parse_address, &addr, &num)) {
+        PyErr_SetString(SyscallReplayError,
+                        "read_socketcall_parameters arg parse failed");
+        return NULL;
+    }
+    if(num > SOCKETCALL_MAX_ARGS) {
+        PyErr_Format(SyscallReplayError,
+                     "socketcall takes at most %d parameters, not %u",
+                     SOCKETCALL_MAX_ARGS, num);
+        return NULL;
+    }
+    read_child_memory(child, addr, (unsigned char *)params,
+                      sizeof(int32_t) * num);
+    if(PyErr_Occurred()) {
+        return NULL;
+    }
+    PyObject *result = PyTuple_New(num);
+    if(result == NULL) {
+        return NULL;
+    }
+    for(i = 0; i < num; i++) {
+        PyTuple_SET_ITEM(result, i, PyInt_FromLong(params[i]));
+    }
+    return result;
+}
+
+// Write one socketcall argument slot, leaving its neighbours alone (a
+// POKEDATA of a whole long would overwrite the next slot on x86-64), and read
+// the slot back so the caller can check it took.
+static PyObject *syscallreplay_write_socketcall_parameter(PyObject *self,
+                                                          PyObject *args) {
+    pid_t child;
+    void *addr;
+    unsigned int pos;
+    int32_t value;
+    int32_t written;
+    if(!PyArg_ParseTuple(args, "IO&Ii", &child, parse_address, &addr, &pos, &value)) {
+        PyErr_SetString(SyscallReplayError,
+                        "write_socketcall_parameter arg parse failed");
+        return NULL;
+    }
+    if(pos >= SOCKETCALL_MAX_ARGS) {
+        PyErr_Format(SyscallReplayError,
+                     "socketcall has no parameter %u", pos);
+        return NULL;
+    }
+    addr = (int32_t *)addr + pos;
+    write_child_memory(child, addr, (unsigned char *)&value, sizeof(value));
+    read_child_memory(child, addr, (unsigned char *)&written, sizeof(written));
+    if(PyErr_Occurred()) {
+        return NULL;
+    }
+    return Py_BuildValue("i", written);
+}
+
 static PyObject *syscallreplay_write_poll_result(PyObject *self, PyObject *args) {
     pid_t child;
     void *addr;
     short fd;
     short re;
     struct pollfd s;
-    if(!PyArg_ParseTuple(args, "IIhh", &child, (int *)&addr, &fd, &re)) {
+    if(!PyArg_ParseTuple(args, "IO&hh", &child, parse_address, &addr, &fd, &re)) {
         PyErr_SetString(SyscallReplayError, "write_poll_result arg parse failed");
+        return NULL;
     }
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&s, sizeof(s));
+    read_child_memory(child, addr, (unsigned char *)&s, sizeof(s));
     s.fd = fd;
     s.revents = re;
     if(DEBUG) {
@@ -1944,12 +3316,12 @@ static PyObject *syscallreplay_write_poll_result(PyObject *self, PyObject *args)
         printf("C: E %u\n", s.events);
         printf("C: RE %u\n", s.revents);
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(struct pollfd));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(struct pollfd));
     struct pollfd r;
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&r, sizeof(r));
+    read_child_memory(child, addr, (unsigned char *)&r, sizeof(r));
     if(DEBUG) {
         printf("C: FD %u\n", r.fd);
         printf("C: E %u\n", r.events);
@@ -1965,8 +3337,9 @@ static PyObject *syscallreplay_write_epoll_struct(PyObject *self, PyObject *args
     uint32_t events;
     uint64_t data;
 
-    if(!PyArg_ParseTuple(args, "IIIK", &child, (int *)&addr, &events, &data)) {
-        PyErr_SetString(SyscallReplayError, "write_poll_result arg parse failed");
+    if(!PyArg_ParseTuple(args, "IO&IK", &child, parse_address, &addr, &events, &data)) {
+        PyErr_SetString(SyscallReplayError, "write_epoll_struct arg parse failed");
+        return NULL;
     }
     struct kepoll_event s;
     s.events = events;
@@ -1977,10 +3350,10 @@ static PyObject *syscallreplay_write_epoll_struct(PyObject *self, PyObject *args
         printf("C: epoll_wait: s.data: %" PRIu64 "\n", s.data);
     }
 
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&s,
-                                          sizeof(s));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&s,
+                       sizeof(s));
     Py_RETURN_NONE;
 }
 
@@ -1990,9 +3363,9 @@ static PyObject *syscallreplay_write_sendmmsg_lengths(PyObject *self,
     void *addr;
     size_t num;
     PyObject *list_of_lengths;
-    if(!PyArg_ParseTuple(args, "IIiO",
+    if(!PyArg_ParseTuple(args, "IO&nO",
                          &child,
-                         (int *)&addr,
+                         parse_address, &addr,
                          &num,
                          &list_of_lengths)) {
         PyErr_SetString(SyscallReplayError,
@@ -2016,7 +3389,7 @@ static PyObject *syscallreplay_write_sendmmsg_lengths(PyObject *self,
     Py_ssize_t length;
     struct mmsghdr m[num];
     unsigned char *b = (unsigned char *)m;
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&m, (sizeof(struct mmsghdr) *num));
+    read_child_memory(child, addr, (unsigned char *)&m, (sizeof(struct mmsghdr) *num));
     unsigned int i;
     for(i = 0; i < sizeof(m); i++) {
         printf("%02X ", b[i]);
@@ -2036,12 +3409,12 @@ static PyObject *syscallreplay_write_sendmmsg_lengths(PyObject *self,
         next = PyIter_Next(iter);
         msghdr_index++;
     }
-    copy_buffer_into_child_process_memory(child,
-                                          addr,
-                                          (unsigned char *)&m,
-                                          (sizeof(struct mmsghdr) *num));
+    write_child_memory(child,
+                       addr,
+                       (unsigned char *)&m,
+                       (sizeof(struct mmsghdr) *num));
     struct mmsghdr r[num];
-    copy_child_process_memory_into_buffer(child, addr, (unsigned char *)&r, sizeof(r));
+    read_child_memory(child, addr, (unsigned char *)&r, sizeof(r));
     if(DEBUG) {
         for(i = 0; i < num; i++) {
             printf("C: sendmmsg_lengths: length %u: %u\n", i, r[i].msg_len);
@@ -2066,6 +3439,10 @@ static PyMethodDef SyscallReplayMethods[]  = {
     {"peek_address", syscallreplay_peek_address, METH_VARARGS, "peek address"},
     {"peek_address_unsigned", syscallreplay_peek_address_unsigned,
       METH_VARARGS, "peek address"},
+    {"read_socketcall_parameters", syscallreplay_read_socketcall_parameters,
+      METH_VARARGS, "read socketcall parameters in one transfer"},
+    {"write_socketcall_parameter", syscallreplay_write_socketcall_parameter,
+      METH_VARARGS, "write one socketcall parameter"},
     {"poke_address", syscallreplay_poke_address, METH_VARARGS, "poke address"},
     {"peek_register", syscallreplay_peek_register,
       METH_VARARGS, "peek register value"},
@@ -2087,6 +3464,12 @@ static PyMethodDef SyscallReplayMethods[]  = {
      METH_VARARGS, "populate llseek result"},
     {"populate_char_buffer", syscallreplay_populate_char_buffer,
      METH_VARARGS, "populate char buffer"},
+    {"populate_strace_string", syscallreplay_populate_strace_string,
+     METH_VARARGS, "decode a quoted string from a trace into the child"},
+    {"populate_from_fd", syscallreplay_populate_from_fd,
+     METH_VARARGS, "stream part of an open file into the child"},
+    {"decode_strace_string", syscallreplay_decode_strace_string,
+     METH_VARARGS, "decode a quoted string from a trace"},
     {"populate_int", syscallreplay_populate_int,
      METH_VARARGS, "populate int"},
     {"populate_unsigned_int", syscallreplay_populate_unsigned_int,
@@ -2137,8 +3520,46 @@ static PyMethodDef SyscallReplayMethods[]  = {
      METH_VARARGS, "populate_stack_structure"},
     {"populate_readv_vectors", syscallreplay_populate_readv_vectors,
     METH_VARARGS, "populate_readv_vectors"},
+    {"gather_writev_vectors", syscallreplay_gather_writev_vectors,
+    METH_VARARGS, "gather writev vectors"},
+    {"digest_buffer", syscallreplay_digest_buffer,
+    METH_VARARGS, "digest buffer"},
+    {"digest_address_range", syscallreplay_digest_address_range,
+    METH_VARARGS, "digest address range"},
+    {"digest_writev_vectors", syscallreplay_digest_writev_vectors,
+    METH_VARARGS, "digest writev vectors"},
+    {"get_counters", syscallreplay_get_counters,
+    METH_VARARGS, "get transfer counters"},
+    {"reset_counters", syscallreplay_reset_counters,
+    METH_VARARGS, "reset transfer counters"},
+    {"set_transfer_backend", syscallreplay_set_transfer_backend,
+    METH_VARARGS, "set transfer backend"},
+    {"get_transfer_backend", syscallreplay_get_transfer_backend,
+    METH_VARARGS, "get transfer backend"},
+    {"set_tracee_arch", syscallreplay_set_tracee_arch,
+    METH_VARARGS, "set the tracee's AUDIT_ARCH_*"},
+    {"get_tracee_arch", syscallreplay_get_tracee_arch,
+    METH_VARARGS, "get the tracee's AUDIT_ARCH_*"},
     {"write_epoll_struct", syscallreplay_write_epoll_struct,
     METH_VARARGS, "write epoll struct"},
+    {"set_options", syscallreplay_set_options,
+    METH_VARARGS, "set ptrace options"},
+    {"install_seccomp_filter", syscallreplay_install_seccomp_filter,
+    METH_VARARGS, "install seccomp filter"},
+    {"sysemu", syscallreplay_sysemu,
+    METH_VARARGS, "continue to the next system call without running it"},
+    {"rewind_syscall", syscallreplay_rewind_syscall,
+    METH_VARARGS, "make the current emulated system call again"},
+    {"get_syscall_info", syscallreplay_get_syscall_info,
+    METH_VARARGS, "decode the current system call stop"},
+    {"step", syscallreplay_step,
+    METH_VARARGS, "resume a child and classify its next stop"},
+    {"wait_stop", syscallreplay_wait_stop,
+    METH_VARARGS, "wait for and classify a child's next stop"},
+    {"pidfd_open", syscallreplay_pidfd_open,
+    METH_VARARGS, "get a file descriptor that is readable once pid exits"},
+    {"sigchld_fd", syscallreplay_sigchld_fd,
+    METH_VARARGS, "block SIGCHLD and get a signalfd that reads it"},
     {NULL, NULL, 0, NULL}
 };
 
@@ -2153,5 +3574,8 @@ PyMODINIT_FUNC initsyscallreplay(void) {
                                          );
     Py_INCREF(SyscallReplayError);
     PyModule_AddObject(m, "error", SyscallReplayError);
+    PyStructSequence_InitType(&SyscallInfoType, &syscall_info_desc);
+    Py_INCREF(&SyscallInfoType);
+    PyModule_AddObject(m, "SyscallInfo", (PyObject *)&SyscallInfoType);
     init_constants(m);
 }
@@ -11,9 +11,33 @@
 import logging
 import time
 
+import syscall_record
 import util
 
 
+def timer_create_parse(syscall_object):
+  """
+  <Purpose>
+    Parse stage of the timer_create handler.  Only successful calls with a
+    SIGEV_NONE sigevent can be replayed.
+
+  <Returns>
+    The timer id from the trace
+
+  """
+  if syscall_object.ret[0] == -1:
+    raise NotImplementedError('Unsuccessful calls not implemented')
+  # only SIGEV_NONE is supported as other sigevents can't be replicated as of now
+  sigev_type = syscall_object.args[3].value.strip()
+  logging.debug("Sigevent type: %s", str(sigev_type))
+  if sigev_type != 'SIGEV_NONE':
+    raise NotImplementedError("Sigevent type %s is not supported" % (sigev_type))
+  return int(syscall_object.args[-1].value.strip('{}'))
+
+
+
+
+
 def timer_create_entry_handler(syscall_id, syscall_object, pid):
   """
   <Purpose>
@@ -41,26 +65,16 @@ def timer_create_entry_handler(syscall_id, syscall_object, pid):
 
   """
   logging.debug("Entering the timer_create entry handler")
-  if syscall_object.ret[0] == -1:
-    raise NotImplementedError('Unsuccessful calls not implemented')
-  else:
-    # only SIGEV_NONE is supported as other sigevents can't be replicated as of now
-    sigev_type = syscall_object.args[3].value.strip()
-    logging.debug("Sigevent type: %s", str(sigev_type))
-
-    if sigev_type != 'SIGEV_NONE':
-      raise NotImplementedError("Sigevent type %s is not supported" % (sigev_type))
-
-    addr = util.cint.peek_register(pid, util.cint.EDX)
-    logging.debug('timerid address: %x', addr)
+  timerid = timer_create_parse(syscall_object)
 
-    timerid = int(syscall_object.args[-1].value.strip('{}'))
-    logging.debug(str(timerid))
+  addr = util.cint.peek_register(pid, util.cint.EDX)
+  logging.debug('timerid address: %x', addr)
+  logging.debug(str(timerid))
 
-    util.cint.populate_timer_t_structure(pid, addr, timerid)
+  util.cint.populate_timer_t_structure(pid, addr, timerid)
 
-    util.noop_current_syscall(pid)
-    util.apply_return_conditions(pid, syscall_object)
+  util.noop_current_syscall(pid)
+  util.apply_return_conditions(pid, syscall_object)
 
 
 
@@ -221,6 +235,24 @@ def timer_delete_entry_handler(syscall_id, syscall_object, pid):
 
 
 
+def time_parse(syscall_object):
+  """
+  <Purpose>
+    Parse stage of the time handler.  Only successful calls can be
+    replayed.
+
+  <Returns>
+    The time from the trace
+
+  """
+  if syscall_object.ret[0] == -1:
+    raise NotImplementedError('Unsuccessful calls not implemented')
+  return int(syscall_object.ret[0])
+
+
+
+
+
 def time_entry_handler(syscall_id, syscall_object, pid):
   """
   <Purpose>
@@ -245,19 +277,16 @@ def time_entry_handler(syscall_id, syscall_object, pid):
 
   """
   logging.debug('Entering time entry handler')
-  if syscall_object.ret[0] == -1:
-    raise NotImplementedError('Unsuccessful calls not implemented')
-  else:
-    addr = util.cint.peek_register(pid, util.cint.EBX)
-    util.noop_current_syscall(pid)
-    logging.debug('Got successful time call')
-    t = int(syscall_object.ret[0])
-    logging.debug('time: %d', t)
-    logging.debug('addr: %d', addr)
-    if syscall_object.args[0].value != 'NULL' or addr != 0:
-      logging.debug('Populating the time_t')
-      util.cint.populate_unsigned_int(pid, addr, t)
-    util.apply_return_conditions(pid, syscall_object)
+  t = time_parse(syscall_object)
+  addr = util.cint.peek_register(pid, util.cint.EBX)
+  util.noop_current_syscall(pid)
+  logging.debug('Got successful time call')
+  logging.debug('time: %d', t)
+  logging.debug('addr: %d', addr)
+  if syscall_object.args[0].value != 'NULL' or addr != 0:
+    logging.debug('Populating the time_t')
+    util.cint.populate_unsigned_int(pid, addr, t)
+  util.apply_return_conditions(pid, syscall_object)
 
 
 
@@ -285,10 +314,7 @@ def time_forger(pid):
   times = util.cint.injected_state['times']
   new_t = t + _get_avg_time_result_delta(times)
   util.cint.injected_state['times'].append(new_t)
-  syscall_object = lambda: None
-  syscall_object.name = 'time'
-  syscall_object.ret = []
-  syscall_object.ret.append(t)
+  syscall_object = syscall_record.new_record('time', ret=(t, None))
   addr = util.cint.peek_register(pid, util.cint.EBX)
   if addr != 0:
     util.cint.populate_unsigned_int(pid, addr, t)
@@ -340,10 +366,7 @@ def gettimeofday_forger(pid):
   util.cint.injected_state['gettimeofdays'].append({'seconds': seconds,
                                            'microseconds': microseconds})
   logging.debug('Using seconds: %d microseconds: %d', seconds, microseconds)
-  syscall_object = lambda: None
-  syscall_object.name = 'gettimeofday'
-  syscall_object.ret = []
-  syscall_object.ret.append(0)
+  syscall_object = syscall_record.new_record('gettimeofday')
   util.noop_current_syscall(pid)
   util.cint.populate_timeval_structure(pid, time_addr, seconds, microseconds)
   util.apply_return_conditions(pid, syscall_object)
@@ -381,6 +404,36 @@ def _get_avg_time_result_delta(times):
 
 
 
+def gettimeofday_parse(syscall_object):
+  """
+  <Purpose>
+    Parse stage of the gettimeofday handler.  Only successful calls without
+    a timezone can be replayed.
+
+  <Returns>
+    A (seconds, microseconds) tuple from the trace
+
+  """
+  if syscall_object.ret[0] == -1:
+    raise NotImplementedError('Unsuccessful calls not implemented')
+  elif syscall_object.args[2].value != 'NULL':
+    raise NotImplementedError('time zones not implemented')
+  seconds = syscall_object.args[0].value.strip('{}, ')
+  # gettimeofday() call might have the tv_sec and tv_usec labels in the
+  # output structure.  If it does, we need to split() it off.
+  if 'tv_sec' in seconds:
+    seconds = seconds.split('=')[1]
+  seconds = int(seconds)
+  microseconds = syscall_object.args[1].value.strip('{}')
+  if 'tv_usec' in microseconds:
+    microseconds = microseconds.split('=')[1]
+  microseconds = int(microseconds)
+  return seconds, microseconds
+
+
+
+
+
 def gettimeofday_entry_handler(syscall_id, syscall_object, pid):
   """
   <Purpose>
@@ -404,31 +457,15 @@ def gettimeofday_entry_handler(syscall_id, syscall_object, pid):
 
   """
   logging.debug('Entering gettimeofday entry handler')
-  if syscall_object.ret[0] == -1:
-    raise NotImplementedError('Unsuccessful calls not implemented')
-  elif syscall_object.args[2].value != 'NULL':
-      raise NotImplementedError('time zones not implemented')
-  else:
-    util.noop_current_syscall(pid)
-    addr = util.cint.peek_register_unsigned(pid, util.cint.EBX)
-    seconds = syscall_object.args[0].value.strip('{}, ')
-    # gettimeofday() call might have the tv_sec and tv_usec labels in the
-    # output structure.  If it does, we need to split() it off.
-    if 'tv_sec' in seconds:
-      seconds = seconds.split('=')[1]
-    seconds = int(seconds)
-    # gettimeofday() call might have the tv_sec and tv_usec labels in the
-    # output structure.  If it does, we need to split() it off.
-    microseconds = syscall_object.args[1].value.strip('{}')
-    if 'tv_usec' in microseconds:
-      microseconds = microseconds.split('=')[1]
-    microseconds = int(microseconds)
-    logging.debug('Address: %x', addr)
-    logging.debug('Seconds: %d', seconds)
-    logging.debug('Microseconds: %d', microseconds)
-    logging.debug('Populating timeval structure')
-    util.cint.populate_timeval_structure(pid, addr, seconds, microseconds)
-    util.apply_return_conditions(pid, syscall_object)
+  seconds, microseconds = gettimeofday_parse(syscall_object)
+  util.noop_current_syscall(pid)
+  addr = util.cint.peek_register_unsigned(pid, util.cint.EBX)
+  logging.debug('Address: %x', addr)
+  logging.debug('Seconds: %d', seconds)
+  logging.debug('Microseconds: %d', microseconds)
+  logging.debug('Populating timeval structure')
+  util.cint.populate_timeval_structure(pid, addr, seconds, microseconds)
+  util.apply_return_conditions(pid, syscall_object)
 
 
 
@@ -460,6 +497,27 @@ def clock_gettime_forger(pid):
 
 
 
+def clock_gettime_parse(syscall_object):
+  """
+  <Purpose>
+    Parse stage of the clock_gettime handler.  Only successful calls can be
+    replayed.
+
+  <Returns>
+    A (clock type, seconds, nanoseconds) tuple from the trace
+
+  """
+  if syscall_object.ret[0] == -1:
+    raise NotImplementedError('Unsuccessful calls not implemented')
+  clock_type = syscall_object.args[0].value
+  seconds = int(syscall_object.args[1].value.strip('{}'))
+  nanoseconds = int(syscall_object.args[2].value.strip('{}'))
+  return clock_type, seconds, nanoseconds
+
+
+
+
+
 def clock_gettime_entry_handler(syscall_id, syscall_object, pid):
   """
   <Purpose>
@@ -484,39 +542,35 @@ def clock_gettime_entry_handler(syscall_id, syscall_object, pid):
 
   """
   logging.debug('Entering clock_gettime entry handler')
-  if syscall_object.ret[0] == -1:
-    raise NotImplementedError('Unsuccessful calls not implemented')
-  else:
-    logging.debug('Got successful clock_gettime call')
-    logging.debug('Replaying this system call')
-    util.noop_current_syscall(pid)
-    clock_type_from_trace = syscall_object.args[0].value
-    clock_type_from_execution = util.cint.peek_register(pid,
-                                                 util.cint.EBX)
-    # The first arg from execution must be CLOCK_MONOTONIC
-    # The first arg from the trace must be CLOCK_MONOTONIC
-    if clock_type_from_trace == 'CLOCK_MONOTONIC':
-      if clock_type_from_execution != util.cint.CLOCK_MONOTONIC:
-        raise util.ReplayDeltaError('Clock type ({}) from execution '
-                                 'differs from trace'
-                                 .format(clock_type_from_execution))
-    if clock_type_from_trace == 'CLOCK_PROCESS_CPUTIME_ID':
-      if clock_type_from_execution != util.cint.CLOCK_PROCESS_CPUTIME_ID:
-        raise util.ReplayDeltaError('Clock type ({}) from execution '
-                                 'differs from trace'
-                                 .format(clock_type_from_execution))
-    seconds = int(syscall_object.args[1].value.strip('{}'))
-    nanoseconds = int(syscall_object.args[2].value.strip('{}'))
-    addr = util.cint.peek_register(pid, util.cint.ECX)
-    logging.debug('Seconds: %d', seconds)
-    logging.debug('Nanoseconds: %d', nanoseconds)
-    logging.debug('Address: %x', addr)
-    logging.debug('Populating timespec strucutre')
-    util.cint.populate_timespec_structure(pid,
-                                   addr,
-                                   seconds,
-                                   nanoseconds)
-    util.apply_return_conditions(pid, syscall_object)
+  clock_type_from_trace, seconds, nanoseconds = \
+    clock_gettime_parse(syscall_object)
+  logging.debug('Got successful clock_gettime call')
+  logging.debug('Replaying this system call')
+  util.noop_current_syscall(pid)
+  clock_type_from_execution = util.cint.peek_register(pid,
+                                                      util.cint.EBX)
+  # The first arg from execution must be CLOCK_MONOTONIC
+  # The first arg from the trace must be CLOCK_MONOTONIC
+  if clock_type_from_trace == 'CLOCK_MONOTONIC':
+    if clock_type_from_execution != util.cint.CLOCK_MONOTONIC:
+      raise util.ReplayDeltaError('Clock type ({}) from execution '
+                                  'differs from trace'
+                                  .format(clock_type_from_execution))
+  if clock_type_from_trace == 'CLOCK_PROCESS_CPUTIME_ID':
+    if clock_type_from_execution != util.cint.CLOCK_PROCESS_CPUTIME_ID:
+      raise util.ReplayDeltaError('Clock type ({}) from execution '
+                                  'differs from trace'
+                                  .format(clock_type_from_execution))
+  addr = util.cint.peek_register(pid, util.cint.ECX)
+  logging.debug('Seconds: %d', seconds)
+  logging.debug('Nanoseconds: %d', nanoseconds)
+  logging.debug('Address: %x', addr)
+  logging.debug('Populating timespec strucutre')
+  util.cint.populate_timespec_structure(pid,
+                                        addr,
+                                        seconds,
+                                        nanoseconds)
+  util.apply_return_conditions(pid, syscall_object)
 
 
 
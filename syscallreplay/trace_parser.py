@@ -0,0 +1,299 @@
+"""
+<Program Name>
+  trace_parser
+
+<Purpose>
+  A minimal parser for strace output that produces system call objects with
+  the same shape as posix-omni-parser's: a name, a list of arguments each
+  carrying the raw strace token in .value, a (return value, errno) tuple in
+  .ret and the untouched line in .original_line.  It does not try to
+  understand argument types; like posix-omni-parser, arguments are split on
+  commas that are not inside a quoted string, so structures and arrays are
+  spread across several arguments and the handlers pick them back apart.
+
+  Arguments are kept as spans of the line they came from: an argument's
+  token is only sliced out when its value is asked for, and a quoted
+  string's bytes are only decoded when its decoded value is first asked for
+  (and cached from then on).  Large buffers nothing looks at cost nothing
+  beyond the line itself.
+
+  This is enough to drive the handlers from generated traces without pulling
+  in posix-omni-parser and its system call definitions.
+
+"""
+
+
+import re
+
+import syscallreplay as cint
+
+
+# Optional "[pid N]" or "N" prefix and optional timestamp ahead of the call
+LINE_PREFIX_RE = re.compile(r'^(?:\[pid\s+(\d+)\]\s+|(\d+)\s+)?'
+                            r'(?:\d+(?::\d+:\d+)?(?:\.\d+)?\s+)?')
+
+CALL_NAME_RE = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\(')
+
+RETURN_RE = re.compile(r'^=\s+(\S+)(?:\s+([A-Z][A-Z0-9_]*)\s+\(.*\))?')
+
+UNFINISHED_MARKER = '<unfinished ...>'
+
+RESUMED_RE = re.compile(r'^<\.\.\.\s+([A-Za-z_][A-Za-z0-9_]*)\s+resumed>')
+
+# A quoted string (closed or not), a parenthesis, or a run of anything else
+PAREN_PIECE_RE = re.compile(r'"(?:[^"\\]+|\\.)*"?|[()]|[^"()]+', re.S)
+
+# A quoted string (closed or not), a comma, or a run of anything else
+ARGUMENT_PIECE_RE = re.compile(r'"(?:[^"\\]+|\\.)*"?|,|[^",]+', re.S)
+
+
+def decode_string_token(token):
+  """
+  <Purpose>
+    Decode the quoted string in an argument token, e.g. "ab\\n" or
+    [{iov_base="ab\\n", into the bytes it stands for with the extension's
+    strace escape decoder.  Anything after the closing quote (like strace's
+    ... for a truncated string) is ignored.  Tokens without quotes are
+    returned as they are.
+
+  <Returns>
+    The decoded string
+
+  """
+
+  first = token.find('"')
+  if first == -1:
+    return token
+  return cint.decode_strace_string(token, first)
+
+
+class TraceArgument(object):
+  """
+  <Purpose>
+    One argument of a call: its raw strace token in value and, for quoted
+    strings, the bytes they stand for in decoded.  Made from a line and a
+    span, the token stays in the line until value is asked for.
+
+  """
+
+  __slots__ = ('_text', '_start', '_end', '_decoded')
+
+  def __init__(self, value, start=None, end=None):
+    # With start and end, value is the line the argument is a span of
+    self._text = value
+    self._start = start
+    self._end = end
+    self._decoded = None
+
+
+  @property
+  def value(self):
+    if self._start is None:
+      return self._text
+    return self._text[self._start:self._end]
+
+
+  @value.setter
+  def value(self, value):
+    self._text = value
+    self._start = None
+    self._end = None
+    self._decoded = None
+
+
+  @property
+  def decoded(self):
+    if self._decoded is None:
+      self._decoded = decode_string_token(self.value)
+    return self._decoded
+
+
+  def __repr__(self):
+    return 'TraceArgument({!r})'.format(self.value)
+
+
+class TraceSyscall(object):
+
+  def __init__(self, name, args, ret, original_line, pid=None):
+    self.name = name
+    self.args = args
+    self.ret = ret
+    self.original_line = original_line
+    self.pid = pid
+
+
+  def __repr__(self):
+    return 'TraceSyscall({}, {} args, ret={!r})'.format(self.name,
+                                                        len(self.args),
+                                                        self.ret)
+
+
+def _find_closing_paren(line, start):
+  depth = 0
+  for match in PAREN_PIECE_RE.finditer(line, start):
+    piece = match.group()
+    if piece == '(':
+      depth += 1
+    elif piece == ')':
+      if depth == 0:
+        return match.start()
+      depth -= 1
+  return -1
+
+
+def split_arguments(args_str):
+  """
+  <Purpose>
+    Split the text between a call's parentheses into argument tokens at
+    every comma that is not inside a quoted string.
+
+  <Returns>
+    A list of stripped argument strings
+
+  """
+
+  return [args_str[start:end]
+          for start, end in split_argument_spans(args_str, 0, len(args_str))]
+
+
+def split_argument_spans(line, start, end):
+  """
+  <Purpose>
+    Find the arguments between start and end in line, as split_arguments()
+    splits them, without copying them out of it.
+
+  <Returns>
+    A list of (start, end) spans of the stripped arguments
+
+  """
+
+  spans = []
+  arg_start = start
+  for match in ARGUMENT_PIECE_RE.finditer(line, start, end):
+    if match.group() == ',':
+      spans.append(_stripped_span(line, arg_start, match.start()))
+      arg_start = match.end()
+  spans.append(_stripped_span(line, arg_start, end))
+  if len(spans) == 1 and spans[0][0] == spans[0][1]:
+    return []
+  return spans
+
+
+def _stripped_span(line, start, end):
+  while start < end and line[start].isspace():
+    start += 1
+  while end > start and line[end - 1].isspace():
+    end -= 1
+  return (start, end)
+
+
+def _parse_return(ret_str):
+  match = RETURN_RE.match(ret_str.strip())
+  if not match:
+    return None
+  value, errno = match.groups()
+  try:
+    value = int(value)
+  except ValueError:
+    pass
+  return (value, errno)
+
+
+def parse_line(line):
+  """
+  <Purpose>
+    Parse a single line of strace output.  Signal and exit notices
+    (--- and +++ lines) and calls that strace split across lines
+    (<unfinished ...> and <... resumed>) are skipped.
+
+  <Returns>
+    A TraceSyscall, or None if the line doesn't describe a complete call
+
+  """
+
+  line = line.rstrip('\n')
+  prefix = LINE_PREFIX_RE.match(line)
+  pid = prefix.group(1) or prefix.group(2)
+  call_start = prefix.end()
+  if line.startswith('---', call_start) or line.startswith('+++', call_start):
+    return None
+  if '<unfinished ...>' in line or line.startswith('<...', call_start):
+    return None
+  match = CALL_NAME_RE.match(line, call_start)
+  if not match:
+    return None
+  close = _find_closing_paren(line, match.end())
+  if close == -1:
+    return None
+  ret = _parse_return(line[close + 1:])
+  if ret is None:
+    return None
+  args = [TraceArgument(line, start, end)
+          for start, end in split_argument_spans(line, match.end(), close)]
+  return TraceSyscall(match.group(1),
+                      args,
+                      ret,
+                      line,
+                      int(pid) if pid is not None else None)
+
+
+def join_split_calls(lines):
+  """
+  <Purpose>
+    Put back together the calls strace -f splits when another process or
+    thread logs a line while one is blocked, e.g.
+      [pid 12] futex(0x804a000, FUTEX_WAIT, 0, NULL <unfinished ...>
+      [pid 11] write(1, "x", 1) = 1
+      [pid 12] <... futex resumed> ) = 0
+    The joined line is yielded where the call was resumed, i.e. in the
+    order the calls completed, carrying the resumed line's prefix.  Calls
+    that are never resumed (the process was killed while in them) are
+    dropped.
+
+  <Returns>
+    A generator of lines
+
+  """
+
+  unfinished = {}
+  for line in lines:
+    stripped = line.rstrip('\n')
+    prefix = LINE_PREFIX_RE.match(stripped)
+    pid = prefix.group(1) or prefix.group(2)
+    rest = stripped[prefix.end():]
+    if rest.endswith(UNFINISHED_MARKER):
+      unfinished[pid] = rest[:-len(UNFINISHED_MARKER)].rstrip()
+      continue
+    resumed = RESUMED_RE.match(rest)
+    if resumed:
+      head = unfinished.pop(pid, None)
+      if head is None:
+        continue
+      tail = rest[resumed.end():].lstrip()
+      if head.endswith(','):
+        head += ' '
+      yield stripped[:prefix.end()] + head + tail
+      continue
+    yield line
+
+
+def parse_trace(path, join_split=False):
+  """
+  <Purpose>
+    Parse every complete system call in the strace output at path.  Calls
+    strace split across lines are skipped unless join_split is set, in
+    which case they are joined back together with join_split_calls().
+
+  <Returns>
+    A list of TraceSyscall objects in trace order
+
+  """
+
+  syscalls = []
+  with open(path) as f:
+    lines = join_split_calls(f) if join_split else f
+    for line in lines:
+      syscall = parse_line(line)
+      if syscall is not None:
+        syscalls.append(syscall)
+  return syscalls
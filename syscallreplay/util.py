@@ -15,14 +15,20 @@ import binascii
 import logging
 import os
 import signal
+import struct
 import sys
 import time
 import syscallreplay as cint
 
+from abi import ABIS
+from abi import ARCH_I386
+from abi import ARCH_X86_64
+from abi import TRACEE_ARCHES
 from errno_dict import ERRNO_CODES
 from os_dict import OS_CONST
 from syscall_dict import SOCKET_SUBCALLS
 from syscall_dict import SYSCALLS
+from trace_parser import decode_string_token
 
 
 def process_is_alive(pid):
@@ -79,6 +85,303 @@ def dump_memory_to_file(pid, addr_start, addr_end, filename):
         f.close()
 
 
+# Counts of replay operations that don't go through the C extension's own
+# transfer counters.  Read by the profiler around each handler call.
+replay_counters = {'noops': 0}
+
+# How noop_current_syscall() keeps the child from running a replayed call:
+#   getpid -- swap it for getpid() and step to that call's exit (the default)
+#   sysemu -- nothing to do; the child was stopped with PTRACE_SYSEMU (see
+#             resume_child()) so the call never runs and there is no exit stop
+SUPPRESS_GETPID = 'getpid'
+SUPPRESS_SYSEMU = 'sysemu'
+
+SUPPRESSION_MODES = (SUPPRESS_GETPID, SUPPRESS_SYSEMU)
+
+_suppression = {'mode': SUPPRESS_GETPID}
+
+
+# The architecture of the tracee.  Handlers are written against the i386 ABI;
+# for an x86-64 tracee the helpers here read arguments from the x86-64
+# argument registers, socket calls take their arguments in registers rather
+# than a socketcall() parameter block and addresses are 64 bits wide.  Where
+# each architecture passes what is described by its Abi (see abi).
+_tracee_arch = {'arch': ARCH_I386, 'abi': ABIS[ARCH_I386]}
+
+
+# The arguments of the stop the replay loop last decoded with
+# load_syscall_info() or step()
+_stop_info = {'pid': None, 'args': None}
+
+
+def load_syscall_info(pid):
+  """
+  <Purpose>
+    Decode the system call stop the child is at with a single
+    PTRACE_GET_SYSCALL_INFO and keep it so argument validation reads the
+    arguments from it instead of peeking a register per argument.  The
+    replay loop calls this at each stop (the child needs
+    PTRACE_O_TRACESYSGOOD set); resuming the child through this module
+    drops it again.
+
+  <Returns>
+    A cint.SyscallInfo
+
+  """
+
+  info = cint.get_syscall_info(pid)
+  if info.op in (cint.SYSCALL_INFO_ENTRY, cint.SYSCALL_INFO_SECCOMP):
+    keep_syscall_arguments(pid, info.args)
+  else:
+    clear_syscall_info()
+  return info
+
+
+def keep_syscall_arguments(pid, args):
+  """
+  <Purpose>
+    Keep the arguments of the system call pid is entering, decoded by the
+    caller (e.g. from a cint.wait_stop() stop), for peek_argument() and
+    fetch_arguments() to read instead of peeking registers.  Resuming the
+    child through this module drops them.
+
+  <Returns>
+    None
+
+  """
+
+  _stop_info['pid'] = pid
+  _stop_info['args'] = args
+
+
+def clear_syscall_info():
+  _stop_info['pid'] = None
+  _stop_info['args'] = None
+
+
+def peek_argument(pid, pos):
+  """
+  <Purpose>
+    Read argument pos of the system call the child is entering, from the
+    decoded stop if there is one and from its register otherwise.
+
+  <Returns>
+    The argument as a signed integer, as peek_register() returns it
+
+  """
+
+  if _stop_info['pid'] == pid and _stop_info['args'] is not None:
+    return _stop_info['args'][pos]
+  return cint.peek_register(pid, _pos_to_reg(pos))
+
+
+def poke_argument(pid, pos, value):
+  """
+  <Purpose>
+    Change argument pos of the system call the child is entering, keeping
+    the decoded stop, if there is one, in step.
+
+  <Returns>
+    The argument as read back from its register
+
+  """
+
+  cint.poke_register(pid, _pos_to_reg(pos), value)
+  written = cint.peek_register(pid, _pos_to_reg(pos))
+  if _stop_info['pid'] == pid and _stop_info['args'] is not None:
+    args = list(_stop_info['args'])
+    args[pos] = written
+    _stop_info['args'] = tuple(args)
+  return written
+
+
+def fetch_arguments(pid, syscall_id, subcall_id=None):
+  """
+  <Purpose>
+    Fetch every argument of the system call, or socketcall subcall, the
+    child is entering in one go, from where the tracee's Abi says they are:
+    the whole socketcall() parameter block in a single transfer, or the
+    decoded stop if there is one.  Without a decoded stop the argument
+    registers are peeked; what they hold isn't kept, since a handler may
+    change them before the next fetch.
+
+  <Returns>
+    A tuple of the arguments, signed, in the order the call takes them
+
+  """
+
+  abi = _tracee_arch['abi']
+  slots = abi.argument_slots(syscall_id, subcall_id)
+  if subcall_id is not None and abi.socketcall_block:
+    return cint.read_socketcall_parameters(pid, peek_argument(pid, 1),
+                                           len(slots))
+  if _stop_info['pid'] == pid and _stop_info['args'] is not None:
+    return _stop_info['args'][:len(slots)]
+  return tuple(cint.peek_register(pid, register)
+               for register in abi.registers[:len(slots)])
+
+
+def set_syscall_suppression(mode):
+  """
+  <Purpose>
+    Select how replayed system calls are kept from running.  The replay
+    loop has to resume the child with resume_child() for sysemu to work.
+
+  <Returns>
+    None
+
+  """
+
+  if mode not in SUPPRESSION_MODES:
+    raise ValueError('Unknown system call suppression mode: {}'.format(mode))
+  _suppression['mode'] = mode
+
+
+def get_syscall_suppression():
+  return _suppression['mode']
+
+
+def set_tracee_arch(arch):
+  """
+  <Purpose>
+    Select the architecture of the tracee, ARCH_I386 (the default) or
+    ARCH_X86_64.  Set it before the replay starts; it applies to every
+    tracee.
+
+  <Returns>
+    None
+
+  """
+
+  if arch not in TRACEE_ARCHES:
+    raise ValueError('Unknown tracee architecture: {}'.format(arch))
+  cint.set_tracee_arch(ABIS[arch].audit_arch)
+  _tracee_arch['arch'] = arch
+  _tracee_arch['abi'] = ABIS[arch]
+
+
+def get_tracee_arch():
+  return _tracee_arch['arch']
+
+
+def get_tracee_abi():
+  return _tracee_arch['abi']
+
+
+def require_i386_tracee(feature):
+  """
+  <Purpose>
+    Refuse to go on with feature, which is only written for the i386 ABI
+    (system call numbers, registers or structure layouts), when the tracee
+    is x86-64.
+
+  <Returns>
+    None
+
+  """
+
+  if _tracee_arch['arch'] != ARCH_I386:
+    raise NotImplementedError('{} is not implemented for {} tracees'
+                              .format(feature, _tracee_arch['arch']))
+
+
+def unsigned_word(value):
+  """
+  <Purpose>
+    Convert the signed interpretation of a register or memory word
+    peek_register() and peek_address() return into an unsigned one, at the
+    tracee's word size.
+
+  <Returns>
+    The value as an unsigned integer
+
+  """
+
+  return value & _tracee_arch['abi'].word_mask
+
+
+def resume_child(pid, signal_number=0):
+  """
+  <Purpose>
+    Let the child run to its next system call entry.  Under sysemu
+    suppression it is resumed with PTRACE_SYSEMU, so the call it stops at
+    won't be run unless run_emulated_syscall() is used.
+
+  <Returns>
+    Nothing
+
+  """
+
+  clear_syscall_info()
+  if _suppression['mode'] == SUPPRESS_SYSEMU:
+    cint.sysemu(pid, signal_number)
+  else:
+    cint.syscall(pid, signal_number)
+
+
+def step(pid, signal_number=0, request=None):
+  """
+  <Purpose>
+    Resume the child and wait for its next stop in a single call into the
+    extension, which also classifies the stop and, for system call stops,
+    fetches the call with PTRACE_GET_SYSCALL_INFO.  Without a request the
+    child is resumed the way resume_child() would resume it.  The arguments
+    of an entry or seccomp stop are kept for peek_argument() as
+    load_syscall_info() would keep them.  The child needs
+    PTRACE_O_TRACESYSGOOD set for its system call stops to be told apart
+    from signals.
+
+  <Returns>
+    A (kind, pid, nr, args, retval) tuple as cint.step() returns it
+
+  """
+
+  if request is None:
+    if _suppression['mode'] == SUPPRESS_SYSEMU:
+      request = cint.PTRACE_SYSEMU
+    else:
+      request = cint.PTRACE_SYSCALL
+  stop = cint.step(pid, signal_number, request)
+  kind, stopped_pid, _, args, _ = stop
+  if kind in (cint.STOP_SYSCALL_ENTRY, cint.STOP_SECCOMP):
+    keep_syscall_arguments(stopped_pid, args)
+  else:
+    clear_syscall_info()
+  return stop
+
+
+def run_emulated_syscall(pid):
+  """
+  <Purpose>
+    Make a child stopped at a PTRACE_SYSEMU entry actually run the call, for
+    handlers that let it through.  The call is rewound and made again with
+    PTRACE_SYSCALL, leaving the child at the new call's entry stop so the
+    caller can step to its exit as usual.  Some kernels report an exit stop
+    for the emulated call first, which is skipped.
+
+  <Returns>
+    The number of stops it took
+
+  """
+
+  syscall_id = cint.peek_register(pid, cint.ORIG_EAX)
+  clear_syscall_info()
+  cint.rewind_syscall(pid)
+  cint.syscall(pid, 0)
+  next_syscall(pid)
+  stops = 1
+  # The kernel puts -ENOSYS in EAX on entry
+  if cint.peek_register(pid, cint.EAX) != -ERRNO_CODES['ENOSYS']:
+    cint.syscall(pid, 0)
+    next_syscall(pid)
+    stops += 1
+  if cint.peek_register(pid, cint.ORIG_EAX) != syscall_id:
+    raise ReplayDeltaError('Rerunning emulated system call {} stopped at {}'
+                           .format(syscall_id,
+                                   cint.peek_register(pid, cint.ORIG_EAX)))
+  return stops
+
+
 def noop_current_syscall(pid):
   """
   <Purpose>
@@ -103,9 +406,17 @@ def noop_current_syscall(pid):
   """
 
   logging.debug('Nooping the current system call in pid: %s', pid)
+  replay_counters['noops'] += 1
+  clear_syscall_info()
+  if _suppression['mode'] == SUPPRESS_SYSEMU:
+    # The child is at a PTRACE_SYSEMU stop so the call will never be run and
+    # there's no exit to wait for
+    cint.entering_syscall = False
+    return
   # Transform the current system call in the child process into a call to
-  # getpid() by poking 20 into ORIG_EAX
-  cint.poke_register(pid, cint.ORIG_EAX, 20)
+  # getpid() by poking its number (20 on i386) into ORIG_EAX
+  getpid = _tracee_arch['abi'].getpid
+  cint.poke_register(pid, cint.ORIG_EAX, getpid)
   # Tell ptrace we want the child process to stop at the next system call
   # event and restart its execution.
   cint.syscall(pid, 0)
@@ -113,12 +424,12 @@ def noop_current_syscall(pid):
   # receives a system call event notification.  The notification we receive
   # at this point (if all goes according to plan) is the EXIT notification
   # for the getpid() call we forced the application to make.
-  next_syscall()
+  next_syscall(pid)
   # Take a look at the current system call (i.e. the one that triggered the
   # notification we just received from ptrace).  It should be getpid().  If
   # it isnt, something has gone horribly wrong and we must bail out.
   skipping = cint.peek_register(pid, cint.ORIG_EAX)
-  if skipping != 20:
+  if skipping != getpid:
     raise Exception('Nooping did not result in getpid exit. Got {}'
                     .format(skipping))
   # Because we are exiting the getpid() call so we need to set the entering
@@ -128,18 +439,24 @@ def noop_current_syscall(pid):
   cint.entering_syscall = False
 
 
-def next_syscall():
+def next_syscall(pid=None):
   """
   <Purpose>
     Wait for the child process to pause at the next system call entry/exit.
     Returns whether or not there IS a next system call (or if the process
     actually exited)
 
+    With a pid only that process or thread is waited for, so stops other
+    tracees reach in the meantime are left for the replay loop.
+
   <Returns>
     True if there is a next system call available
     False if there is not another system call available
   """
-  s = os.wait()
+  if pid is None:
+    s = os.wait()
+  else:
+    s = os.waitpid(pid, cint.WALL)
   if os.WIFEXITED(s[1]):
       return False
   return True
@@ -150,21 +467,42 @@ def extract_socketcall_parameters(pid, address, num):
   <Purpose>
     Socket subcall parameters are passed as an array of integers of some
     length pointed to by the address in ECX at the time the socket_subcall
-    system call is made.  This code picks them out and returns them as a list
-    of integers.
+    system call is made.  This code picks them out, reading the whole array
+    in one transfer, and returns them as a list of integers.  x86-64 has no
+    socketcall(); socket calls take their arguments in registers like any
+    other call, so for an x86-64 tracee address is ignored and the first num
+    arguments are returned instead.
 
   <Returns>
     List of socketcall parameters extracted from PID's memory at address
 
   """
-  params = []
-  for i in range(num):
-      params += [cint.peek_address(pid, address)]
-      address = address + 4
+  if _tracee_arch['abi'].socketcall_block:
+    params = list(cint.read_socketcall_parameters(pid, address, num))
+  else:
+    params = [peek_argument(pid, pos) for pos in range(num)]
   logging.debug('Extracted socketcall parameters: %s', params)
   return params
 
 
+def read_iovecs(pid, address, count):
+  """
+  <Purpose>
+    Read the array of count struct iovecs at address in pid, laid out for
+    the tracee's architecture, in one transfer.
+
+  <Returns>
+    A list of (iov_base, iov_len) tuples
+
+  """
+
+  width = _tracee_arch['abi'].word_width
+  data = cint.copy_address_range(pid, address, address + 2 * width * count)
+  words = struct.unpack('<{}{}'.format(2 * count, 'I' if width == 4 else 'Q'),
+                        data)
+  return zip(words[0::2], words[1::2])
+
+
 def validate_syscall(syscall_id, syscall_object):
     """
     <Purpose>
@@ -175,10 +513,17 @@ def validate_syscall(syscall_id, syscall_object):
 
       TODO: reduce the number of hacks for name discrepancies somehow.
 
+      Records (see syscall_record) carry the number their name resolves to,
+      so most calls are validated by comparing it and the name is only
+      looked at when it doesn't match.
+
     <Returns>
       Nothing
     """
 
+    if getattr(syscall_object, 'number', None) == syscall_id:
+        return
+
     # format system call from syscall_dict for comparison with parameters
     #   i.e sys_waitpid = waitpid
     compare_syscall = SYSCALLS[syscall_id][4:]
@@ -245,12 +590,37 @@ def validate_subcall(subcall_id, syscall_object):
                                        syscall_object.name))
 
 
+# Return value resolution.  Most return values come out of the parser as
+# plain integers and are used as they are.  The rest (hex addresses, flag
+# lists, errno failures) mean trying int(), int(..., 16) and the OS_CONST table
+# in turn, and the same handful of those tokens show up over and over in a
+# trace, so each distinct one is resolved once and the result cached.
+_cleaned_return_values = {}
+_resolved_return_values = {}
+
+# strace reports fcntl64(F_GETFD) returning the flag name rather than its
+# value.  Such calls all share this key and resolve to 1.
+FCNTL_FD_CLOEXEC_KEY = ('FD_CLOEXEC', 'fcntl64')
+
+
 def cleanup_return_value(val):
     '''Strace does some weird things with return values.  This function
     attempts to account for any weird things I've encountered.  Its purpose is
     to tranform whatever weird stuff strace gave us into an integer return
-    value that can be poked into EAX at the end of a handler.
+    value that can be poked into EAX at the end of a handler.  Plain integers
+    are returned as they are; any other token's result is cached.
     '''
+    if type(val) is int:
+        return val
+    key = tuple(val) if type(val) is list else val
+    ret_val = _cleaned_return_values.get(key)
+    if ret_val is None:
+        ret_val = _cleanup_return_value(val)
+        _cleaned_return_values[key] = ret_val
+    return ret_val
+
+
+def _cleanup_return_value(val):
     if val == '?':
         logging.debug('Heads up! We\'re going to -1 for a "?" value')
         return -1
@@ -282,21 +652,115 @@ def list_of_flags_to_int(lof):
     version of Linux and OR'ing them together (including any unnamed octal
     values)
     '''
-    logging.debug('Parsing list of flags into an int')
     int_val = 0
     for i in lof:
         try:
-            logging.debug('looking up value')
-            tmp = OS_CONST[i]
+            int_val |= OS_CONST[i]
         except KeyError:
             raise ValueError('Couldn\'t look up value ({}) from OS_CONST dict'
                              .format(i))
-        logging.debug('Found value: %d', tmp)
-        int_val = int_val | tmp
-    logging.debug('Resultant int: %d', int_val)
+    logging.debug('Parsed list of flags %s into int: %d', lof, int_val)
     return int_val
 
 
+def _return_value_key(syscall_object):
+    ret_val = syscall_object.ret[0]
+    # HACK: deal with the way strace reports flags in return values for fcntl
+    if ret_val == 'FD_CLOEXEC' and syscall_object.name == 'fcntl64':
+        return FCNTL_FD_CLOEXEC_KEY
+    if type(ret_val) is list:
+        ret_val = tuple(ret_val)
+    if ret_val == -1:
+        return (ret_val, syscall_object.ret[1])
+    return (ret_val, None)
+
+
+def resolve_return_value(syscall_object):
+    """
+    <Purpose>
+      Turn the return value and errno strace recorded for a system call into
+      the integer that should be poked into EAX.  A plain integer that isn't
+      a failure is returned as it is.  Anything else is cached by (return
+      value, errno) so each distinct pair is only worked out once.
+
+    <Returns>
+      The integer return value
+
+    """
+
+    ret_val = syscall_object.ret[0]
+    if type(ret_val) is int and ret_val != -1:
+        return ret_val
+    key = _return_value_key(syscall_object)
+    ret_val = _resolved_return_values.get(key)
+    if ret_val is None:
+        ret_val = _resolve_return_value(key)
+        _resolved_return_values[key] = ret_val
+    return ret_val
+
+
+def _resolve_return_value(key):
+    if key == FCNTL_FD_CLOEXEC_KEY:
+        logging.debug('Got fcntl64 call, real return value is in ret[0]')
+        return 0x1
+    ret_val, errno = key
+    if errno is not None:
+        logging.debug('Got non-None errno value: %s', errno)
+        try:
+            error_code = ERRNO_CODES[errno]
+        except KeyError:
+            raise NotImplementedError('Unrecognized errno code: {}'
+                                      .format(errno))
+        logging.debug('Looked up error number: %s', error_code)
+        return -error_code
+    if type(ret_val) is tuple:
+        ret_val = list(ret_val)
+    return cleanup_return_value(ret_val)
+
+
+def precompute_return_values(syscall_objects):
+    """
+    <Purpose>
+      Resolve the return value of every system call in a trace ahead of
+      replay so apply_return_conditions() never has to parse a token.
+      Plain integers need no resolving and aren't cached.  Tokens that can't
+      be resolved are left alone; they only matter if a handler actually
+      tries to apply them.
+
+    <Returns>
+      The number of distinct (return value, errno) pairs that needed parsing
+
+    """
+
+    for syscall_object in syscall_objects:
+        try:
+            resolve_return_value(syscall_object)
+        except (ValueError, NotImplementedError):
+            logging.debug('Couldn\'t precompute return value for: %s',
+                          syscall_object.ret)
+    return len(_resolved_return_values)
+
+
+def decoded_structure(syscall_object, decoder):
+    """
+    <Purpose>
+      Get the structure decoder makes of syscall_object's arguments, e.g. the
+      pollfds from parse_poll_results().  The parallel trace parser runs the
+      decoder for each call in its workers and stores the result on the
+      object as decoded; objects that weren't decoded ahead of time are
+      decoded now.
+
+    <Returns>
+      Whatever decoder returns
+
+    """
+
+    decoded = getattr(syscall_object, 'decoded', None)
+    if decoded is None:
+        decoded = decoder(syscall_object)
+    return decoded
+
+
 def apply_return_conditions(pid, syscall_object):
     """
     <Purpose>
@@ -316,27 +780,7 @@ def apply_return_conditions(pid, syscall_object):
 
     """
 
-    logging.debug('Applying return conditions')
-    ret_val = syscall_object.ret[0]
-    # HACK: deal with the way strace reports flags in return values for fcntl
-    if (syscall_object.name == 'fcntl64'
-       and syscall_object.ret[0] == 'FD_CLOEXEC'):
-        logging.debug('Got fcntl64 call, real return value is in ret[0]')
-        ret_val = 0x1
-    elif syscall_object.ret[0] == -1 and syscall_object.ret[1] is not None:
-        logging.debug('Got non-None errno value: %s', syscall_object.ret[1])
-        try:
-            error_code = ERRNO_CODES[syscall_object.ret[1]]
-        except KeyError:
-            raise NotImplementedError('Unrecognized errno code: {}'
-                                      .format(syscall_object.ret[1]))
-        logging.debug('Looked up error number: %s', error_code)
-        ret_val = -error_code
-        logging.debug('Will return: %s instead of %s',
-                      ret_val,
-                      syscall_object.ret[0])
-    else:
-        ret_val = cleanup_return_value(ret_val)
+    ret_val = resolve_return_value(syscall_object)
     logging.debug('Injecting return value %s', ret_val)
     cint.poke_register(pid, cint.EAX, ret_val)
 
@@ -390,37 +834,48 @@ class ReplayDeltaError(Exception):
 '''
 
 
+def trace_integer(arg):
+    '''Get the value of an integer argument from the trace.  Records carry
+    the integer form of each argument, worked out once when the record was
+    made (see syscall_record); other system call objects' tokens are parsed
+    here.
+    '''
+    value = getattr(arg, 'integer', None)
+    if value is None:
+        value = int(arg.value)
+    return value
+
+
+def trace_address(arg):
+    '''Get the value of an address argument (hex or NULL) from the trace,
+    from the record's integer form when the token has a 0x prefix like
+    trace_integer().  Without the prefix the token is still hex.
+    '''
+    token = arg.value
+    if token == 'NULL':
+        return 0
+    value = getattr(arg, 'integer', None)
+    if value is None or not token.startswith('0x'):
+        value = int(token, 16)
+    return value
+
+
 def validate_integer_argument(pid,
                               syscall_object,
                               trace_arg,
                               exec_arg,
                               params=None,
                               except_on_mismatch=True):
-    logging.debug('Validating integer argument (trace position: %d '
-                  'execution position: %d)',
-                  trace_arg,
-                  exec_arg)
-    # EAX is the system call number
-    POS_TO_REG = {0: cint.EBX,
-                  1: cint.ECX,
-                  2: cint.EDX,
-                  3: cint.ESI,
-                  4: cint.EDI}
     if not params:
-        arg = cint.peek_register(pid, POS_TO_REG[exec_arg])
+        arg = peek_argument(pid, exec_arg)
     else:
         arg = params[exec_arg]
-    arg_from_trace = int(syscall_object.args[trace_arg].value)
-    logging.debug('Argument from execution: %d', arg)
-    logging.debug('Argument from trace: %d', arg_from_trace)
+    arg_from_trace = trace_integer(syscall_object.args[trace_arg])
     # Check to make sure everything is the same
     # Decide if this is a system call we want to replay
     if arg_from_trace != arg:
-        message = 'Argument value at trace position: {}, ' \
-                  'execution position: {} from execution  ({}) ' \
-                  'differs argument value from trace ({})' \
-                  .format(trace_arg, exec_arg, arg, arg_from_trace)
-        _except_or_warn(message, except_on_mismatch)
+        _argument_mismatch(trace_arg, exec_arg, arg, arg_from_trace,
+                           except_on_mismatch)
 
 def validate_address_argument(pid,
                               syscall_object,
@@ -428,26 +883,54 @@ def validate_address_argument(pid,
                               exec_arg,
                               params=None,
                               except_on_mismatch=True):
-    logging.debug('Validating address argument (trace position: %d '
-                  'execution position: %d)',
-                  trace_arg,
-                  exec_arg)
     if not params:
-        arg = cint.peek_register(pid, _pos_to_reg(exec_arg))
+        arg = peek_argument(pid, exec_arg)
     else:
         arg = params[exec_arg]
     # Convert signed interpretation from peek register to unsigned
-    arg = arg & 0xffffffff
-    if syscall_object.args[trace_arg].value == 'NULL':
-        arg_from_trace = 0
-    else:
-        arg_from_trace = int(syscall_object.args[trace_arg].value, 16)
+    arg &= _tracee_arch['abi'].word_mask
+    arg_from_trace = trace_address(syscall_object.args[trace_arg])
     if arg_from_trace != arg:
-        message = 'Argument value at trace position: {}, ' \
-                  'execution position: {} from execution  ({}) ' \
-                  'differs argument value from trace ({})' \
-                  .format(trace_arg, exec_arg, arg, arg_from_trace)
-        _except_or_warn(message, except_on_mismatch)
+        _argument_mismatch(trace_arg, exec_arg, arg, arg_from_trace,
+                           except_on_mismatch)
+
+
+def validate_arguments(pid,
+                       syscall_object,
+                       syscall_id,
+                       subcall_id=None,
+                       integers=(),
+                       addresses=(),
+                       except_on_mismatch=True):
+    '''Validate several arguments of the call the child is entering against
+    a single fetch_arguments() vector.  integers and addresses are the
+    positions of integer and address arguments, the same in the trace and
+    in the execution.  Addresses are compared unsigned at the width the
+    tracee's Abi gives their slot.
+    '''
+    slots = _tracee_arch['abi'].argument_slots(syscall_id, subcall_id)
+    args = fetch_arguments(pid, syscall_id, subcall_id)
+    trace_args = syscall_object.args
+    for pos in integers:
+        arg_from_trace = trace_integer(trace_args[pos])
+        if arg_from_trace != args[pos]:
+            _argument_mismatch(pos, pos, args[pos], arg_from_trace,
+                               except_on_mismatch)
+    for pos in addresses:
+        arg = args[pos] & slots[pos].mask
+        arg_from_trace = trace_address(trace_args[pos])
+        if arg_from_trace != arg:
+            _argument_mismatch(pos, pos, arg, arg_from_trace,
+                               except_on_mismatch)
+
+
+def _argument_mismatch(trace_arg, exec_arg, arg, arg_from_trace,
+                       except_on_mismatch):
+    message = 'Argument value at trace position: {}, ' \
+              'execution position: {} from execution  ({}) ' \
+              'differs argument value from trace ({})' \
+              .format(trace_arg, exec_arg, arg, arg_from_trace)
+    _except_or_warn(message, except_on_mismatch)
 
 
 def validate_return_value(pid, syscall_object, except_on_mismatch=True):
@@ -461,7 +944,7 @@ def validate_return_value(pid, syscall_object, except_on_mismatch=True):
         if errno_retval == ret_from_execution:
             return
     if ret_from_execution < 0:
-        ret_from_execution &= 0xffffffff
+        ret_from_execution = unsigned_word(ret_from_execution)
     if ret_from_execution != ret_from_trace:
         message = 'Return value from execution ({}, {:02x}) differs ' \
                   'from return value from trace ({}, {:02x})' \
@@ -480,29 +963,24 @@ def _except_or_warn(message, except_on_mismatch):
 
 
 def _pos_to_reg(pos):
-    POS_TO_REG = {0: cint.EBX,
-                  1: cint.ECX,
-                  2: cint.EDX,
-                  3: cint.ESI,
-                  4: cint.EDI}
-    return POS_TO_REG[pos]
+    return _tracee_arch['abi'].registers[pos]
 
 
 def update_socketcall_paramater(pid, params_addr, pos, value):
     logging.debug('We are going to update a socketcall_parameter')
-    LONG_SIZE = 4
-    addr = params_addr + (pos * LONG_SIZE)
     logging.debug('Params addr: %x', params_addr)
-    logging.debug('Specific parameter addr: %x', addr)
+    logging.debug('Parameter position: %d', pos)
     value = int(value)
     logging.debug('Value: %d', value)
-    cint.poke_address(pid, addr, value)
-    logging.debug('Re-extracting socketcall parameters')
-    p = extract_socketcall_parameters(pid, params_addr, pos + 1)
-    if p[pos] != value:
+    if _tracee_arch['abi'].socketcall_block:
+        written = cint.write_socketcall_parameter(pid, params_addr, pos,
+                                                  value)
+    else:
+        written = poke_argument(pid, pos, value)
+    if written != value:
         raise ReplayDeltaError('Populated socketcall parameter value: ({}) '
                                'was not updated to correct value: ({})'
-                               .format(p[pos], value))
+                               .format(written, value))
 
 
 def find_arg_matching_string(args, arg_to_find):
@@ -530,6 +1008,29 @@ def get_stack_start_and_end(pid):
         return (start, end)
 
 
+def trace_string(arg):
+    '''Get the bytes a quoted string argument from the trace stands for.
+    Arguments from trace_parser and syscall_record decode them the first
+    time they're asked for and keep them; anything else (e.g.
+    posix-omni-parser's arguments) is decoded on every call.
+    '''
+    decoded = getattr(arg, 'decoded', None)
+    if decoded is None:
+        decoded = decode_string_token(arg.value)
+    return decoded
+
+
+def populate_trace_string(pid, address, arg, length=-1):
+    '''Decode a quoted string argument from the trace straight into the
+    child's memory at address, without making a Python string of it.  With
+    a length, nothing is written unless the string decodes to exactly that
+    many bytes.  Returns the number of bytes it decodes to.
+    '''
+    token = arg.value
+    return cint.populate_strace_string(pid, address, token, length,
+                                       token.find('"'))
+
+
 def cleanup_quotes(quo):
     if quo.startswith('"'):
         quo = quo[1:]
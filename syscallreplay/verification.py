@@ -0,0 +1,199 @@
+"""
+<Program Name>
+  verification
+
+<Purpose>
+  Decide whether, and how, the payload of a write-like system call is checked
+  against the trace during replay.  Rather than copying the child's buffer
+  out into a Python string and comparing it byte for byte, the trace payload
+  is reduced to a (length, digest) pair ahead of time and compared against a
+  digest the C extension streams out of the child's memory.
+
+  Supported policies:
+    off      -- never verify payloads
+    sampled  -- verify one in every sample_interval payloads
+    hash     -- verify every payload (the default)
+
+"""
+
+
+from payload_store import stored_payload_digest
+from util import (cint,
+                  logging,)
+
+
+VERIFY_OFF = 'off'
+VERIFY_SAMPLED = 'sampled'
+VERIFY_HASH = 'hash'
+
+VERIFICATION_POLICIES = (VERIFY_OFF, VERIFY_SAMPLED, VERIFY_HASH)
+
+DEFAULT_SAMPLE_INTERVAL = 100
+
+_settings = {'policy': VERIFY_HASH,
+             'sample_interval': DEFAULT_SAMPLE_INTERVAL,
+             'seen': 0}
+
+
+def set_write_verification(policy, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+  """
+  <Purpose>
+    Select the payload verification policy used by the write handlers.
+
+  <Returns>
+    None
+
+  """
+
+  if policy not in VERIFICATION_POLICIES:
+    raise ValueError('Unknown write verification policy: {}'.format(policy))
+  if sample_interval < 1:
+    raise ValueError('Sample interval must be at least 1, got {}'
+                     .format(sample_interval))
+  _settings['policy'] = policy
+  _settings['sample_interval'] = sample_interval
+  _settings['seen'] = 0
+
+
+def get_write_verification():
+  """
+  <Purpose>
+    Report the active payload verification policy.
+
+  <Returns>
+    A (policy, sample_interval) tuple
+
+  """
+
+  return (_settings['policy'], _settings['sample_interval'])
+
+
+def should_verify_payload():
+  """
+  <Purpose>
+    Decide whether the payload of the current system call should be
+    verified.  Under the sampled policy every call counts towards the
+    interval so the choice is deterministic for a given trace.
+
+  <Returns>
+    True if the payload should be verified, False otherwise
+
+  """
+
+  policy = _settings['policy']
+  if policy == VERIFY_OFF:
+    return False
+  if policy == VERIFY_HASH:
+    return True
+  seen = _settings['seen']
+  _settings['seen'] = seen + 1
+  return seen % _settings['sample_interval'] == 0
+
+
+def payload_digest(data):
+  """
+  <Purpose>
+    Reduce a payload to the (length, digest) pair the C extension produces
+    for buffers in the child.
+
+  <Returns>
+    A (length, digest) tuple
+
+  """
+
+  return (len(data), cint.digest_buffer(data))
+
+
+def trace_payload_digest(syscall_object, trace_payload):
+  """
+  <Purpose>
+    Get the (length, digest) pair for the payload recorded in the trace.
+    Digests computed by compile_payload_digests() are used if present,
+    otherwise the payload is extracted with trace_payload() and the result
+    is stored on the system call object.  trace_payload() returns None for
+    payloads strace didn't record in full; those are digested from the
+    payload store's copy of the call being replayed, if it has one.
+
+  <Returns>
+    A (length, digest) tuple, or None if neither the trace nor the payload
+    store holds the whole payload
+
+  """
+
+  digest = getattr(syscall_object, 'payload_digest', None)
+  if digest is None:
+    data = trace_payload(syscall_object)
+    if data is None:
+      digest = stored_payload_digest()
+      if digest is None:
+        return None
+    else:
+      digest = payload_digest(data)
+    syscall_object.payload_digest = digest
+  return digest
+
+
+def compile_payload_digests(syscall_objects, trace_payloads):
+  """
+  <Purpose>
+    Walk a trace ahead of replay and store the (length, digest) pair of each
+    payload carrying system call on the object as payload_digest.
+    trace_payloads maps system call names to a function that extracts the
+    payload from a system call object.  Calls that failed in the trace carry
+    no payload worth checking and are skipped, as are payloads strace cut
+    short.
+
+  <Returns>
+    The number of system call objects that were given a digest
+
+  """
+
+  compiled = 0
+  for syscall_object in syscall_objects:
+    trace_payload = trace_payloads.get(syscall_object.name)
+    if trace_payload is None or syscall_object.ret[0] == -1:
+      continue
+    data = trace_payload(syscall_object)
+    if data is None:
+      continue
+    syscall_object.payload_digest = payload_digest(data)
+    compiled += 1
+  return compiled
+
+
+def check_payload_digest(syscall_object,
+                         trace_payload,
+                         execution_digest,
+                         execution_payload):
+  """
+  <Purpose>
+    Compare the digest of the child's buffer against the trace.  On a
+    mismatch the digests are logged and, if debug logging is on, both
+    payloads are materialized so they can be dumped as hex.  Payloads strace
+    cut short are checked against the payload store, or taken to match if
+    it doesn't have them.
+
+  <Returns>
+    True if the payloads match, False otherwise
+
+  """
+
+  trace_digest = trace_payload_digest(syscall_object, trace_payload)
+  if trace_digest is None:
+    logging.debug('Trace doesn\'t hold the whole payload, not verifying it')
+    return True
+  if trace_digest == execution_digest:
+    return True
+  logging.warning('Bytes from trace don\'t match bytes from execution!')
+  logging.warning('Trace: %d bytes (digest %016x), execution: %d bytes '
+                  '(digest %016x)',
+                  trace_digest[0],
+                  trace_digest[1],
+                  execution_digest[0],
+                  execution_digest[1])
+  if logging.getLogger().isEnabledFor(logging.DEBUG):
+    data = trace_payload(syscall_object)
+    if data is not None:
+      logging.debug(data.encode('hex'))
+    logging.debug(execution_payload().encode('hex'))
+  return False
@@ -0,0 +1,108 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+
+import signal
+import unittest
+
+import mock
+
+import syscallreplay.checkpoint
+import syscallreplay.util
+from syscallreplay import syscallreplay as cint
+
+
+class TestCheckpointer(unittest.TestCase):
+
+
+  @mock.patch('syscallreplay.checkpoint.take_checkpoint')
+  def test_checkpoints_taken_and_found(self, mock_take):
+    """ Ensure checkpoints are taken at the chosen indices and every interval
+    calls, once each, and the latest one at or before an index is found
+
+    """
+
+    mock_take.side_effect = lambda pid, options, fds: (pid, fds)
+    checkpointer = syscallreplay.checkpoint.Checkpointer(7, indices=[15],
+                                                         interval=10)
+    for index in range(25):
+      checkpointer.maybe_checkpoint(555, index, fds=set([index]))
+    self.assertIsNone(checkpointer.maybe_checkpoint(555, 10))
+    self.assertEqual(sorted(checkpointer.checkpoints), [0, 10, 15, 20])
+    mock_take.assert_called_with(555, 7, set([20]))
+    self.assertEqual(checkpointer.nearest(14), (555, set([10])))
+    self.assertEqual(checkpointer.nearest(15), (555, set([15])))
+    self.assertEqual(checkpointer.nearest(3000000), (555, set([20])))
+    self.assertIsNone(
+        syscallreplay.checkpoint.Checkpointer(7, indices=[5]).nearest(4))
+
+
+class TestTakeCheckpoint(unittest.TestCase):
+
+
+  def tearDown(self):
+    syscallreplay.util.set_syscall_suppression(
+        syscallreplay.util.SUPPRESS_GETPID)
+    syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_I386)
+
+
+  @mock.patch.object(cint, 'wait_stop')
+  @mock.patch.object(cint, 'step')
+  @mock.patch.object(cint, 'rewind_syscall')
+  @mock.patch.object(cint, 'set_options')
+  @mock.patch.object(cint, 'poke_register')
+  @mock.patch.object(cint, 'peek_register', return_value=0)
+  def test_sysemu_checkpoint(self, mock_peek, mock_poke, mock_options,
+                             mock_rewind, mock_step, mock_wait):
+    """ Ensure that under sysemu suppression the fork() is made by rewinding
+    the skipped call, passing over an exit stop for it, and the target is
+    left at a PTRACE_SYSEMU entry
+
+    """
+
+    syscallreplay.util.set_syscall_suppression(
+        syscallreplay.util.SUPPRESS_SYSEMU)
+    mock_step.side_effect = [
+        (cint.STOP_SYSCALL_EXIT, 555, 0, None, 0),
+        (cint.STOP_SYSCALL_ENTRY, 555, syscallreplay.checkpoint.FORK, None,
+         None),
+        (cint.STOP_EVENT, 555, cint.PTRACE_EVENT_FORK, None, 556),
+        (cint.STOP_SYSCALL_EXIT, 555, None, None, 556),
+        (cint.STOP_SYSCALL_ENTRY, 555, 0, None, None)]
+    mock_wait.return_value = (cint.STOP_SIGNAL, 556, signal.SIGSTOP, None,
+                              None)
+    checkpoint = syscallreplay.checkpoint.take_checkpoint(555, 0)
+    self.assertEqual(checkpoint.pid, 556)
+    mock_rewind.assert_called_once_with(555)
+    mock_poke.assert_any_call(555, cint.ORIG_EAX,
+                              syscallreplay.checkpoint.FORK)
+    self.assertEqual(mock_step.call_args_list[0],
+                     mock.call(555, 0, cint.PTRACE_SYSCALL))
+    self.assertEqual(mock_step.call_args_list[-1],
+                     mock.call(555, 0, cint.PTRACE_SYSEMU))
+
+
+  @mock.patch.object(cint, 'set_options')
+  @mock.patch.object(cint, 'peek_register')
+  def test_x86_64_refused(self, mock_peek, mock_options):
+    """ Ensure an x86-64 tracee isn't checkpointed with i386 registers and
+    system call numbers
+
+    """
+
+    syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_X86_64)
+    self.assertRaises(NotImplementedError,
+                      syscallreplay.checkpoint.take_checkpoint, 555, 0)
+    self.assertFalse(mock_peek.called)
+    self.assertFalse(mock_options.called)
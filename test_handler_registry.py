@@ -0,0 +1,114 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import types
+import unittest
+import bunch
+
+import syscallreplay.file_handlers
+import syscallreplay.handler_registry
+import syscallreplay.socket_handlers
+import syscallreplay.time_handlers
+import syscallreplay.util
+
+
+class TestHandlerRegistry(unittest.TestCase):
+
+
+  def test_convention_handlers_registered(self):
+    """ Ensure handlers, subcall handlers and forgers found by naming
+    convention land in the slots for their numbers
+
+    """
+
+    registry = syscallreplay.handler_registry.HANDLERS
+    self.assertIs(registry.get_entry_handler(140),
+                  syscallreplay.file_handlers.llseek_entry_handler)
+    self.assertIs(registry.get_exit_handler(4),
+                  syscallreplay.file_handlers.write_exit_handler)
+    self.assertIs(registry.get_entry_handler(102, 13),
+                  syscallreplay.socket_handlers.shutdown_subcall_entry_handler)
+    self.assertIs(registry.get_entry_handler(102, 2),
+                  syscallreplay.socket_handlers.bind_entry_handler)
+    self.assertIs(registry.get_forger(13),
+                  syscallreplay.time_handlers.time_forger)
+    self.assertIsNone(registry.get_entry_handler(100000))
+
+
+  def test_plugin_registration(self):
+    """ Ensure a plugin module's handlers are registered and replacing an
+    existing handler needs override
+
+    """
+
+    def uname_entry_handler(syscall_id, syscall_object, pid):
+      pass
+    def getpid_entry_handler(syscall_id, syscall_object, pid):
+      pass
+    plugin = types.ModuleType('replay_plugin')
+    uname_entry_handler.__module__ = plugin.__name__
+    getpid_entry_handler.__module__ = plugin.__name__
+    plugin.uname_entry_handler = uname_entry_handler
+    plugin.getpid_entry_handler = getpid_entry_handler
+    registry = syscallreplay.handler_registry.HandlerRegistry()
+    registry.register_handler('uname',
+                              entry_handler=lambda *args: None)
+    self.assertRaises(ValueError, registry.register_module, plugin)
+    self.assertEqual(registry.register_module(plugin, override=True), 2)
+    self.assertIs(registry.get_entry_handler(20), getpid_entry_handler)
+    self.assertIs(registry.get_entry_handler(122), uname_entry_handler)
+    self.assertRaises(ValueError, registry.register_handler, 'no_such_call',
+                      entry_handler=getpid_entry_handler)
+
+
+  def test_find_unhandled(self):
+    """ Ensure calls without an entry handler are reported with their trace
+    indices, including strace spellings that need translating
+
+    """
+
+    registry = syscallreplay.handler_registry.HANDLERS
+    syscall_objects = [bunch.Bunch(name='_llseek'),
+                       bunch.Bunch(name='vfork'),
+                       bunch.Bunch(name='send'),
+                       bunch.Bunch(name='made_up'),
+                       bunch.Bunch(name='vfork')]
+    unhandled = registry.find_unhandled(syscall_objects)
+    self.assertEqual(unhandled.items(), [('vfork', [1, 4]), ('made_up', [3])])
+
+
+  def test_x86_64_dispatch(self):
+    """ Ensure x86-64 stops of ported calls are dispatched to the handlers of
+    the i386 call with the same name, socket calls to their socketcall
+    subcall, and stops of other calls to nothing
+
+    """
+
+    dispatch_ids = syscallreplay.handler_registry.dispatch_ids
+    args = (3, 0, 0, 0, 0, 0)
+    self.assertEqual(dispatch_ids(102, args), (102, 3))
+    self.assertEqual(dispatch_ids(3, args), (3, None))
+    syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_X86_64)
+    try:
+      self.assertEqual(dispatch_ids(3, args), (6, None))
+      self.assertEqual(dispatch_ids(42, args), (102, 3))
+      # read() and mmap() handlers peek i386 registers
+      self.assertIsNone(dispatch_ids(0, args))
+      self.assertIsNone(dispatch_ids(9, args))
+      self.assertIsNone(dispatch_ids(158, args))
+      # ftruncate() and sendto() handlers call undefined fd helpers
+      self.assertIsNone(dispatch_ids(77, args))
+      self.assertIsNone(dispatch_ids(44, args))
+    finally:
+      syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_I386)
@@ -0,0 +1,136 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import StringIO
+import unittest
+import mock
+import bunch
+
+import syscallreplay.output_sink
+import syscallreplay.file_handlers
+import syscallreplay.trace_parser
+
+
+class TestOutputSink(unittest.TestCase):
+
+
+  @mock.patch('os.write', side_effect=lambda fd, data: len(data))
+  def test_fd_sink_buffers_until_flush(self, mock_write):
+    """ Ensure output is held back until flushed, then written with one
+    call per run of chunks bound for the same descriptor
+
+    """
+
+    sink = syscallreplay.output_sink.OutputSink()
+    sink.write(1, 'a')
+    sink.write(1, 'b')
+    sink.write(2, 'err')
+    sink.write(1, 'c')
+    mock_write.assert_not_called()
+    sink.flush()
+    self.assertEqual(mock_write.call_args_list,
+                     [mock.call(1, 'ab'), mock.call(2, 'err'), mock.call(1, 'c')])
+
+
+  @mock.patch('os.write', side_effect=lambda fd, data: min(len(data), 2))
+  def test_fd_sink_threshold_and_short_writes(self, mock_write):
+    """ Ensure crossing the threshold flushes and short writes are retried
+
+    """
+
+    sink = syscallreplay.output_sink.OutputSink(target=9, threshold=4)
+    sink.write(1, 'abc')
+    mock_write.assert_not_called()
+    sink.write(2, 'de')
+    self.assertEqual(mock_write.call_args_list,
+                     [mock.call(9, 'abc'), mock.call(9, 'c'),
+                      mock.call(9, 'de')])
+
+
+  def test_file_and_discard_sinks(self):
+    """ Ensure the file sink interleaves both streams and the discard sink
+    drops everything
+
+    """
+
+    out = StringIO.StringIO()
+    sink = syscallreplay.output_sink.OutputSink('file', out)
+    sink.write(1, 'out ')
+    sink.write(2, 'err')
+    sink.close()
+    self.assertEqual(out.getvalue(), 'out err')
+    sink = syscallreplay.output_sink.OutputSink('discard')
+    sink.write(1, 'gone')
+    sink.flush()
+    with self.assertRaises(ValueError):
+      syscallreplay.output_sink.OutputSink('console')
+
+
+class TestWriteEntryHandlerOutput(unittest.TestCase):
+
+
+  @mock.patch('syscallreplay.file_handlers.replay_output')
+  @mock.patch('syscallreplay.file_handlers.should_verify_payload',
+              return_value=False)
+  @mock.patch('syscallreplay.file_handlers.noop_current_syscall')
+  @mock.patch('syscallreplay.file_handlers.apply_return_conditions')
+  @mock.patch('syscallreplay.file_handlers.validate_arguments')
+  def test_stdout_write_goes_to_sink(self, mock_validate, mock_apply,
+                                     mock_noop, mock_verify, mock_output):
+    """ Ensure only the bytes the traced write reported as written are
+    passed to the output sink, and only for stdout/stderr
+
+    """
+
+    syscall_object = bunch.Bunch()
+    syscall_object.args = [bunch.Bunch(value='1'),
+                           bunch.Bunch(value='"hello\\n"'),
+                           bunch.Bunch(value='6')]
+    syscall_object.ret = (3,)
+    syscallreplay.file_handlers.write_entry_handler(4, syscall_object, 555)
+    mock_output.assert_called_once_with(1, 'hel')
+    syscall_object.args[0].value = '3'
+    syscallreplay.file_handlers.write_entry_handler(4, syscall_object, 555)
+    mock_output.assert_called_once_with(1, 'hel')
+
+
+  @mock.patch('syscallreplay.file_handlers.cint')
+  @mock.patch('syscallreplay.file_handlers.replay_output')
+  @mock.patch('syscallreplay.file_handlers.should_verify_payload',
+              return_value=False)
+  @mock.patch('syscallreplay.file_handlers.noop_current_syscall')
+  @mock.patch('syscallreplay.file_handlers.apply_return_conditions')
+  @mock.patch('syscallreplay.file_handlers.validate_integer_argument')
+  def test_writev_output(self, mock_validate, mock_apply, mock_noop,
+                         mock_verify, mock_output, mock_cint):
+    """ Ensure writev output is taken from the trace when strace printed it
+    whole, and gathered from the child, up to the bytes written, when strace
+    cut it short
+
+    """
+
+    parse_line = syscallreplay.trace_parser.parse_line
+    syscall_object = parse_line('writev(1, [{iov_base="ab", iov_len=2}, '
+                                '{iov_base="c\\n", iov_len=2}], 2) = 4')
+    syscallreplay.file_handlers.writev_entry_handler(146, syscall_object, 555)
+    mock_output.assert_called_once_with(1, 'abc\n')
+    mock_cint.gather_writev_vectors.assert_not_called()
+    mock_cint.peek_register.return_value = 0x8049000
+    mock_cint.gather_writev_vectors.return_value = 'x' * 40
+    syscall_object = parse_line('writev(2, [{iov_base="xxxx"..., '
+                                'iov_len=100}], 1) = 40')
+    syscallreplay.file_handlers.writev_entry_handler(146, syscall_object, 555)
+    mock_cint.gather_writev_vectors.assert_called_once_with(555, 0x8049000,
+                                                            1, 40)
+    mock_output.assert_called_with(2, 'x' * 40)
@@ -0,0 +1,78 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import os
+import tempfile
+import unittest
+
+import syscallreplay.parallel_parser
+import syscallreplay.trace_parser
+
+
+TRACE_LINES = ['close(3) = 0\n',
+               '--- SIGCHLD {si_signo=SIGCHLD} ---\n',
+               'poll([{fd=3, events=POLLIN}], 1, 0) = 1 '
+               '([{fd=3, revents=POLLIN}])\n',
+               'poll([{fd=3, events=POLLIN}], 1, 0) = 0 (Timeout)\n',
+               'fstat64(3, {st_dev=makedev(8, 1), st_ino=42, '
+               'st_mode=S_IFREG|0644, st_nlink=1, st_uid=0, st_gid=0, '
+               'st_blksize=4096, st_blocks=8, st_size=20, '
+               'st_atime=1500000000 /* 2017-07-14T02:40:00 */, '
+               'st_mtime=1500000000 /* 2017-07-14T02:40:00 */, '
+               'st_ctime=1500000000 /* 2017-07-14T02:40:00 */}) = 0\n',
+               'write(1, "a, b) \\"c\\"\\n", 12) = 12\n']
+
+
+class TestParallelParser(unittest.TestCase):
+
+
+  def setUp(self):
+    fd, self.path = tempfile.mkstemp()
+    os.write(fd, ''.join(TRACE_LINES * 10))
+    os.close(fd)
+
+
+  def tearDown(self):
+    os.unlink(self.path)
+
+
+  def test_matches_serial_parse(self):
+    """ Ensure chunks that split lines anywhere still produce every call
+    once, in trace order
+
+    """
+
+    serial = syscallreplay.trace_parser.parse_trace(self.path)
+    for chunk_bytes in (7, 100, 1 << 20):
+      parallel = syscallreplay.parallel_parser.parse_trace_parallel(
+          self.path, processes=2, chunk_bytes=chunk_bytes)
+      self.assertEqual([(s.original_line, s.ret) for s in parallel],
+                       [(s.original_line, s.ret) for s in serial])
+      self.assertEqual([[a.value for a in s.args] for s in parallel],
+                       [[a.value for a in s.args] for s in serial])
+
+
+  def test_structures_decoded_in_workers(self):
+    """ Ensure poll results and stat fields are decoded ahead of time and
+    calls that can't be decoded are left for the handler
+
+    """
+
+    syscalls = syscallreplay.parallel_parser.parse_trace_parallel(
+        self.path, processes=2, chunk_bytes=64)
+    self.assertEqual(syscalls[1].decoded, [{'fd': 3, 'revents': 1}])
+    self.assertFalse(hasattr(syscalls[2], 'decoded'))
+    self.assertEqual(syscalls[3].decoded.st_ino, 42)
+    self.assertEqual(syscalls[3].decoded.st_size, 20)
+    self.assertFalse(hasattr(syscalls[4], 'decoded'))
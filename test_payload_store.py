@@ -0,0 +1,153 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+
+import syscallreplay.payload_store
+import syscallreplay.util
+import syscallreplay.verification
+
+
+TRACE = '''\
+open("data", O_RDONLY) = 3
+read(3, "0123456789abcdef"..., 4096) = 20
+ | 00000  30 31 32 33 34 35 36 37  38 39 61 62 63 64 65 66  0123456789abcdef |
+ | 00010  67 68 69 0a                                       ghi.             |
+[pid 12] read(3, "0123"..., 4096) = 4
+[pid 12]  | 00000  30 31 32 33                                       0123             |
+write(1, "x", 1) = 1
+ | 00000  78                                                x                |
+read(3, "", 4096) = 0
+'''
+
+
+class TestPayloadStore(unittest.TestCase):
+
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.trace_path = os.path.join(self.directory, 'trace')
+    with open(self.trace_path, 'w') as f:
+      f.write(TRACE)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+    syscallreplay.payload_store.set_payload_store(None)
+
+
+  def test_build_payload_store(self):
+    """ Ensure the data dumps following each call are stored in full under
+    the call's trace index, identical payloads sharing a blob, and that the
+    index is read back from disk
+
+    """
+
+    directory = os.path.join(self.directory, 'payloads')
+    syscallreplay.payload_store.build_payload_store(self.trace_path,
+                                                    directory)
+    store = syscallreplay.payload_store.PayloadStore(directory)
+    self.assertEqual(len(store), 3)
+    self.assertNotIn(0, store)
+    self.assertNotIn(4, store)
+    self.assertEqual(store.payload_length(1), 20)
+    with open(store.blob_path(store.digest(1)), 'rb') as f:
+      self.assertEqual(f.read(), '0123456789abcdefghi\n')
+    with open(store.blob_path(store.digest(3)), 'rb') as f:
+      self.assertEqual(f.read(), 'x')
+    self.assertEqual(store.digest(2), store.add(5, ['01', '23']))
+    self.assertEqual(len(os.listdir(store.blobs_directory)), 3)
+
+
+  @mock.patch('syscallreplay.payload_store.cint')
+  def test_populate_stored_payload(self, mock_cint):
+    """ Ensure the payload of the call being replayed is streamed into the
+    child from the store, calls without one are left to the caller and
+    payloads that don't match the return value are refused
+
+    """
+
+    directory = os.path.join(self.directory, 'payloads')
+    store = syscallreplay.payload_store.PayloadStore(directory, create=True)
+    store.add(7, ['abc', 'def'])
+    syscallreplay.payload_store.set_payload_store(store)
+    mock_cint.populate_from_fd.return_value = 6
+    mock_cint.syscall_index = 6
+    self.assertFalse(syscallreplay.payload_store
+                     .populate_stored_payload(555, 0x8049000, 6))
+    mock_cint.syscall_index = 7
+    self.assertTrue(syscallreplay.payload_store
+                    .populate_stored_payload(555, 0x8049000, 6))
+    args = mock_cint.populate_from_fd.call_args[0]
+    self.assertEqual(args[:2], (555, 0x8049000))
+    self.assertEqual(args[3], 6)
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      syscallreplay.payload_store.populate_stored_payload,
+                      555, 0x8049000, 5)
+    self.assertRaises(ValueError,
+                      syscallreplay.payload_store.set_payload_store,
+                      directory)
+
+
+  @mock.patch('syscallreplay.payload_store.read_iovecs')
+  @mock.patch('syscallreplay.payload_store.cint')
+  def test_populate_stored_vectors(self, mock_cint, mock_read_iovecs):
+    """ Ensure a readv() payload is streamed across the child's iovecs in
+    order, stopping at the return value, and a payload the iovecs can't
+    hold is refused
+
+    """
+
+    directory = os.path.join(self.directory, 'payloads')
+    store = syscallreplay.payload_store.PayloadStore(directory, create=True)
+    store.add(7, ['abcdefg'])
+    syscallreplay.payload_store.set_payload_store(store)
+    mock_cint.syscall_index = 7
+    mock_cint.populate_from_fd.side_effect = \
+        lambda pid, address, fd, length, offset: length
+    mock_read_iovecs.return_value = [(0x1000, 4), (0x2000, 4), (0x3000, 4)]
+    self.assertTrue(syscallreplay.payload_store
+                    .populate_stored_vectors(555, 0x8049000, 3, 7))
+    mock_read_iovecs.assert_called_once_with(555, 0x8049000, 3)
+    self.assertEqual([c[0][:2] + c[0][3:]
+                      for c in mock_cint.populate_from_fd.call_args_list],
+                     [(555, 0x1000, 4, 0), (555, 0x2000, 3, 4)])
+    mock_read_iovecs.return_value = [(0x1000, 4)]
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      syscallreplay.payload_store.populate_stored_vectors,
+                      555, 0x8049000, 1, 7)
+
+
+  def test_stored_payload_digest(self):
+    """ Ensure a stored payload digested a chunk at a time matches the
+    digest of the whole payload
+
+    """
+
+    directory = os.path.join(self.directory, 'payloads')
+    store = syscallreplay.payload_store.PayloadStore(directory, create=True)
+    data = os.urandom(3 * syscallreplay.payload_store.DIGEST_CHUNK_SIZE + 5)
+    store.add(7, [data])
+    syscallreplay.payload_store.set_payload_store(store)
+    with mock.patch.object(syscallreplay.util.cint, 'syscall_index', 7,
+                           create=True):
+      self.assertEqual(syscallreplay.payload_store.stored_payload_digest(),
+                       syscallreplay.verification.payload_digest(data))
+    with mock.patch.object(syscallreplay.util.cint, 'syscall_index', 6,
+                           create=True):
+      self.assertIsNone(syscallreplay.payload_store.stored_payload_digest())
@@ -0,0 +1,69 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import os
+import tempfile
+import unittest
+
+import syscallreplay.preflight
+
+
+class TestPreflight(unittest.TestCase):
+
+
+  def test_check_line(self):
+    """ Ensure unsupported arguments are reported by the handler's parse stage
+    and lines it can replay pass
+
+    """
+
+    check_line = syscallreplay.preflight.check_line
+    self.assertIsNone(check_line(1, 'close(3) = 0'))
+    self.assertIsNone(check_line(2, 'prlimit64(0, RLIMIT_NOFILE, NULL, '
+                                    '{rlim_cur=1024, rlim_max=4*1024}) = 0'))
+    problem = check_line(3, 'prlimit64(0, RLIMIT_STACK, NULL, '
+                            '{rlim_cur=8192*1024, rlim_max=RLIM64_INFINITY}) = 0')
+    self.assertEqual(problem.line_number, 3)
+    self.assertEqual(problem.name, 'prlimit64')
+    self.assertTrue(problem.message.startswith('unsupported:'))
+    problem = check_line(4, 'vfork() = 12')
+    self.assertEqual(problem.message, 'no handler')
+    self.assertIsNone(check_line(5, '--- SIGCHLD {si_signo=SIGCHLD} ---'))
+
+
+  def test_preflight_trace_in_order(self):
+    """ Ensure problems found across chunks come back in trace order with
+    their line numbers
+
+    """
+
+    lines = ['close(3) = 0\n',
+             'fcntl64(3, F_GETLK, {}) = 0\n',
+             'time(NULL) = 1500000000\n',
+             'vfork() = 12\n',
+             'select(4, [3], NULL, NULL, NULL) = 1 (in [3], exc [3])\n',
+             'close(4) = 0\n']
+    fd, path = tempfile.mkstemp()
+    try:
+      os.write(fd, ''.join(lines))
+      os.close(fd)
+      problems = syscallreplay.preflight.preflight_trace(path, processes=2,
+                                                         chunk_size=2)
+    finally:
+      os.unlink(path)
+    self.assertEqual([(p.line_number, p.name) for p in problems],
+                     [(2, 'fcntl64'), (4, 'vfork'), (5, 'select')])
+    report = syscallreplay.preflight.format_report(problems)
+    self.assertIn('line 2: fcntl64: unsupported:', report)
+    self.assertIn('3 problem lines', report)
@@ -0,0 +1,111 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import json
+import os
+import tempfile
+import unittest
+import mock
+import bunch
+
+import syscallreplay.profiler
+import syscallreplay.util
+
+
+def read_entry_handler(syscall_id, syscall_object, pid):
+  syscallreplay.util.replay_counters['noops'] += 1
+
+
+def close_entry_handler(syscall_id, syscall_object, pid):
+  raise syscallreplay.util.ReplayDeltaError('boom')
+
+
+class TestReplayProfiler(unittest.TestCase):
+
+
+  def setUp(self):
+    self.counters = {'ptrace_calls': 0, 'process_vm_calls': 0,
+                     'bytes_read': 0, 'bytes_written': 0}
+    def _get_counters():
+      current = dict(self.counters)
+      self.counters['ptrace_calls'] += 3
+      self.counters['bytes_read'] += 16
+      return current
+    patcher = mock.patch('syscallreplay.profiler.cint')
+    mock_cint = patcher.start()
+    mock_cint.get_counters = mock.Mock(side_effect=_get_counters)
+    self.addCleanup(patcher.stop)
+
+
+  def test_handler_totals(self):
+    """ Ensure calls, transfer counters and noops are attributed to the
+    system call and handler that caused them
+
+    """
+
+    profiler = syscallreplay.profiler.ReplayProfiler()
+    handlers = profiler.wrap_handler_table({(3, True): read_entry_handler})
+    syscall_object = bunch.Bunch(name='read')
+    handlers[(3, True)](3, syscall_object, 555)
+    handlers[(3, True)](3, syscall_object, 555)
+    self.assertEqual(handlers[(3, True)].__name__, 'read_entry_handler')
+    rows = profiler.rows()
+    self.assertEqual(len(rows), 1)
+    self.assertEqual(rows[0]['syscall'], 'read')
+    self.assertEqual(rows[0]['handler'], 'read_entry_handler')
+    self.assertEqual(rows[0]['calls'], 2)
+    self.assertEqual(rows[0]['ptrace_calls'], 6)
+    self.assertEqual(rows[0]['bytes_read'], 32)
+    self.assertEqual(rows[0]['noops'], 2)
+
+
+  def test_failed_handler_still_recorded(self):
+    """ Ensure a handler that raises is still accounted for and the
+    exception propagates
+
+    """
+
+    profiler = syscallreplay.profiler.ReplayProfiler()
+    handler = profiler.wrap(close_entry_handler)
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      handler, 6, bunch.Bunch(name='close'), 555)
+    self.assertEqual(profiler.rows()[0]['calls'], 1)
+
+
+  def test_report_and_json(self):
+    """ Ensure the report is sorted and the JSON dump round trips
+
+    """
+
+    profiler = syscallreplay.profiler.ReplayProfiler()
+    read_handler = profiler.wrap(read_entry_handler)
+    close_handler = profiler.wrap(close_entry_handler)
+    read_handler(3, bunch.Bunch(name='read'), 555)
+    read_handler(3, bunch.Bunch(name='read'), 555)
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      close_handler, 6, bunch.Bunch(name='close'), 555)
+    report = profiler.report('calls').splitlines()
+    self.assertTrue(report[1].startswith('read'))
+    self.assertTrue(report[2].startswith('close'))
+    self.assertRaises(ValueError, profiler.report, 'syscall')
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+      profiler.write_json(path, 'calls')
+      with open(path) as f:
+        rows = json.load(f)
+    finally:
+      os.unlink(path)
+    self.assertEqual([row['handler'] for row in rows],
+                     ['read_entry_handler', 'close_entry_handler'])
@@ -0,0 +1,122 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+
+import signal
+import unittest
+
+import bunch
+import mock
+
+import syscallreplay.kernel_handlers
+import syscallreplay.replay_engine
+from syscallreplay import syscallreplay as cint
+from syscallreplay.trace_parser import parse_line
+
+
+TRACE_LINES = ['clone(child_stack=0xb7500000, flags=CLONE_VM|CLONE_FS|'
+               'CLONE_FILES|CLONE_SIGHAND|CLONE_THREAD) = 201',
+               '[pid 201] open("/etc/hosts", O_RDONLY) = 3',
+               '[pid 200] close(4) = 0',
+               '[pid 201] exit(0) = ?']
+
+
+class TestReplayEngine(unittest.TestCase):
+
+
+  def test_split_streams(self):
+    """ Ensure calls are grouped by recorded pid and calls made before strace
+    started tagging them go to the process the trace started with
+
+    """
+
+    syscall_objects = [parse_line(l) for l in TRACE_LINES]
+    streams = syscallreplay.replay_engine.split_streams(syscall_objects)
+    self.assertEqual(streams.keys(), [200, 201])
+    self.assertEqual([i for i, _ in streams[200]], [0, 2])
+    self.assertEqual([s.name for _, s in streams[201]], ['open', 'exit'])
+
+
+  @mock.patch('syscallreplay.replay_engine.resume_child')
+  @mock.patch.object(cint, 'syscall')
+  def test_thread_matched_to_its_stream(self, mock_syscall, mock_resume):
+    """ Ensure a thread whose first stop beats its parent's clone event is
+    matched to the stream clone() returned in the trace and shares its
+    parent's file descriptor table
+
+    """
+
+    def replayed(syscall_id, syscall_object, pid):
+      cint.entering_syscall = False
+
+    handlers = bunch.Bunch(get_entry_handler=lambda *ids: replayed,
+                           get_exit_handler=lambda *ids: None)
+    engine = syscallreplay.replay_engine.ReplayEngine(
+        [parse_line(l) for l in TRACE_LINES], handlers)
+    root = engine._add_tracee(5000, 200, {4: None})
+    root.started = True
+    engine.handle_stop((cint.STOP_SYSCALL_ENTRY, 5000, 120, (0,) * 6, None))
+    mock_syscall.assert_called_with(5000, 0)
+    engine.handle_stop((cint.STOP_SIGNAL, 5001, signal.SIGSTOP, None, None))
+    self.assertFalse(mock_resume.called)
+    engine.handle_stop((cint.STOP_EVENT, 5000, cint.PTRACE_EVENT_CLONE, None,
+                        5001))
+    mock_resume.assert_called_with(5001, 0)
+    thread = engine.tracees[5001]
+    self.assertEqual(thread.recorded_pid, 201)
+    self.assertIs(thread.fds, root.fds)
+    engine.handle_stop((cint.STOP_SYSCALL_ENTRY, 5001, 5, (0,) * 6, None))
+    self.assertEqual(root.fds, {3: 201, 4: None})
+    engine.handle_stop((cint.STOP_SYSCALL_EXIT, 5000, None, None, 5001))
+    engine.handle_stop((cint.STOP_SYSCALL_ENTRY, 5000, 6, (4,) * 6, None))
+    self.assertEqual(thread.fds, {3: 201})
+    self.assertEqual((root.cursor, thread.cursor), (2, 1))
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      engine.handle_stop,
+                      (cint.STOP_EXITED, 5001, None, None, 0))
+
+
+  def test_fd_table(self):
+    """ Ensure the file descriptor table follows pipes, socket pairs and
+    duplicates, duplicates keeping the opener of the file descriptor they
+    copy
+
+    """
+
+    update_fd_table = syscallreplay.replay_engine.update_fd_table
+    fds = {0: None}
+    for line in ['pipe([3, 4]) = 0',
+                 'socketpair(AF_UNIX, SOCK_STREAM, 0, [5, 6]) = 0',
+                 'fcntl64(0, F_DUPFD, 10) = 10',
+                 'fcntl64(3, F_DUPFD_CLOEXEC, 0) = 7',
+                 'fcntl64(3, F_GETFD) = 0',
+                 'dup2(5, 1) = 1',
+                 'close(4) = 0',
+                 'pipe2([8, 9], O_CLOEXEC) = -1 EMFILE (Too many open files)']:
+      update_fd_table(fds, parse_line(line), 200)
+    self.assertEqual(fds, {0: None, 1: 200, 3: 200, 5: 200, 6: 200, 7: 200,
+                           10: None})
+
+
+  def test_futex_operations(self):
+    """ Ensure futex operations are read as strace spells them, including
+    the numbers it prints for operations it can't decode
+
+    """
+
+    futex_op_to_int = syscallreplay.kernel_handlers._futex_op_to_int
+    self.assertEqual(futex_op_to_int('FUTEX_WAKE_PRIVATE'), 0x81)
+    self.assertEqual(futex_op_to_int('FUTEX_WAIT_BITSET_PRIVATE|'
+                                     'FUTEX_CLOCK_REALTIME'), 0x189)
+    self.assertEqual(futex_op_to_int('0x8c /* FUTEX_??? */'), 0x8c)
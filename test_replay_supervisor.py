@@ -0,0 +1,117 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+import os
+import signal
+import unittest
+
+import bunch
+import mock
+
+import syscallreplay.replay_supervisor
+import syscallreplay.util
+from syscallreplay import syscallreplay as cint
+from syscallreplay.trace_parser import parse_line
+
+
+class TestReplaySupervisor(unittest.TestCase):
+
+
+  @mock.patch('syscallreplay.replay_supervisor.os.kill')
+  @mock.patch('syscallreplay.replay_engine.resume_child')
+  @mock.patch.object(cint, 'set_options')
+  @mock.patch.object(cint, 'pidfd_open')
+  @mock.patch.object(cint, 'sigchld_fd')
+  def test_stops_routed_to_their_replay(self, mock_sigchld_fd,
+                                        mock_pidfd_open, mock_set_options,
+                                        mock_resume, mock_kill):
+    """ Ensure each stop is sent to the replay that owns its tid, stops of
+    unknown tids are held back, and a replay that fails is killed without
+    stopping the others
+
+    """
+
+    def replayed(syscall_id, syscall_object, pid):
+      cint.entering_syscall = False
+
+    read_end, write_end = os.pipe()
+    self.addCleanup(os.close, write_end)
+    mock_sigchld_fd.return_value = read_end
+    mock_pidfd_open.side_effect = cint.error('No pidfds here')
+    handlers = bunch.Bunch(get_entry_handler=lambda *ids: replayed,
+                           get_exit_handler=lambda *ids: None)
+    supervisor = syscallreplay.replay_supervisor.ReplaySupervisor()
+    self.addCleanup(supervisor.close)
+    trace = [parse_line('close(4) = 0')]
+    supervisor.add_replay(5000, trace, handlers)
+    supervisor.add_replay(6000, trace, handlers)
+    mock_resume.assert_called_with(6000, 0)
+    supervisor._dispatch((cint.STOP_SIGNAL, 7000, signal.SIGSTOP, None,
+                          None))
+    self.assertIn(7000, supervisor._orphans)
+    supervisor._dispatch((cint.STOP_SYSCALL_ENTRY, 5000, 6, (4,) * 6, None))
+    mock_resume.assert_called_with(5000, 0)
+    supervisor._dispatch((cint.STOP_SYSCALL_ENTRY, 6000, 5, (4,) * 6, None))
+    mock_kill.assert_called_once_with(6000, signal.SIGKILL)
+    supervisor._dispatch((cint.STOP_EXITED, 5000, None, None, 0))
+    results = supervisor.results
+    self.assertEqual([r.pid for r in results], [6000, 5000])
+    self.assertIn('ReplayDeltaError', results[0].error)
+    self.assertEqual((results[1].stops, results[1].error), (2, None))
+    self.assertEqual(supervisor.replays, [])
+    self.assertEqual(supervisor._owners, {})
+
+
+  @mock.patch('syscallreplay.replay_engine.resume_child')
+  @mock.patch.object(cint, 'set_options')
+  @mock.patch.object(cint, 'pidfd_open')
+  @mock.patch.object(cint, 'sigchld_fd')
+  def test_replays_keep_their_globals(self, mock_sigchld_fd, mock_pidfd_open,
+                                      mock_set_options, mock_resume):
+    """ Ensure each replay's handlers see the injected state and counters
+    they left behind, not those of the replay advanced in between
+
+    """
+
+    seen = []
+
+    def replayed(syscall_id, syscall_object, pid):
+      cint.entering_syscall = False
+      counters = syscallreplay.util.replay_counters
+      seen.append((pid, cint.injected_state['pid'], counters['noops']))
+      cint.injected_state = {'pid': pid}
+      counters['noops'] += 1
+
+    read_end, write_end = os.pipe()
+    self.addCleanup(os.close, write_end)
+    mock_sigchld_fd.return_value = read_end
+    mock_pidfd_open.side_effect = cint.error('No pidfds here')
+    old_state = getattr(cint, 'injected_state', None)
+    self.addCleanup(setattr, cint, 'injected_state', old_state)
+    self.addCleanup(syscallreplay.util.replay_counters.update,
+                    dict(syscallreplay.util.replay_counters))
+    cint.injected_state = {'pid': None}
+    noops = syscallreplay.util.replay_counters['noops']
+    handlers = bunch.Bunch(get_entry_handler=lambda *ids: replayed,
+                           get_exit_handler=lambda *ids: None)
+    supervisor = syscallreplay.replay_supervisor.ReplaySupervisor()
+    self.addCleanup(supervisor.close)
+    trace = [parse_line('close(4) = 0'), parse_line('close(4) = 0')]
+    supervisor.add_replay(5000, trace, handlers)
+    supervisor.add_replay(6000, trace, handlers)
+    for pid in (5000, 6000, 5000, 6000):
+      supervisor._dispatch((cint.STOP_SYSCALL_ENTRY, pid, 6, (4,) * 6, None))
+    self.assertEqual(seen, [(5000, None, noops),
+                            (6000, None, noops),
+                            (5000, 5000, noops + 1),
+                            (6000, 6000, noops + 1)])
@@ -0,0 +1,55 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import unittest
+import bunch
+
+import syscallreplay.seccomp_filter
+import syscallreplay.util
+
+
+class TestSeccompFilter(unittest.TestCase):
+
+
+  def test_only_passthrough_calls_allowed(self):
+    """ Ensure only calls in the trace with passthrough entry handlers are
+    let through and the rest of the trace is kept in order
+
+    """
+
+    syscall_objects = [bunch.Bunch(name='futex'),
+                       bunch.Bunch(name='time'),
+                       bunch.Bunch(name='futex'),
+                       bunch.Bunch(name='send'),
+                       bunch.Bunch(name='made_up')]
+    allowed = syscallreplay.seccomp_filter.allowed_syscalls(syscall_objects)
+    self.assertEqual(allowed, [240])
+    stopping = syscallreplay.seccomp_filter.stopping_syscalls(syscall_objects,
+                                                              allowed)
+    self.assertEqual([s.name for s in stopping], ['time', 'send', 'made_up'])
+
+
+  def test_x86_64_refused(self):
+    """ Ensure the filter, built from i386 numbers, isn't built for an x86-64
+    tracee
+
+    """
+
+    syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_X86_64)
+    try:
+      self.assertRaises(NotImplementedError,
+                        syscallreplay.seccomp_filter.allowed_syscalls,
+                        [bunch.Bunch(name='futex')])
+    finally:
+      syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_I386)
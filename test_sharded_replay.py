@@ -0,0 +1,194 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+
+import multiprocessing
+import signal
+import unittest
+
+import mock
+
+import syscallreplay.sharded_replay
+from syscallreplay import syscallreplay as cint
+from syscallreplay.sharded_replay import ShardedReplay
+from syscallreplay.sharded_replay import ShardResult
+from syscallreplay.trace_parser import parse_line
+from syscallreplay.util import ReplayDeltaError
+
+
+SHARD_LINES = ['open("/etc/hosts", O_RDONLY) = 3',
+               'fork() = 31',
+               '[pid 31] open("/tmp/a", O_RDONLY) = 4',
+               '[pid 30] close(3) = 0',
+               '[pid 31] read(4, "a", 1) = 1',
+               '[pid 31] exit_group(0) = ?']
+
+
+def _send_results(connection):
+  connection.send([ShardResult(31, 3, None)])
+  connection.close()
+
+
+class TestPlanShards(unittest.TestCase):
+
+
+  def test_independent_children_split_off(self):
+    """ Ensure forked children that only use their own file descriptors get
+    shards of their own, along with their descendants, and threads stay with
+    the process that started them
+
+    """
+
+    lines = ['open("/etc/hosts", O_RDONLY) = 3',
+             'clone(child_stack=NULL, flags=SIGCHLD) = 11',
+             '[pid 10] clone(child_stack=NULL, flags=SIGCHLD) = 12',
+             '[pid 11] open("/tmp/a", O_WRONLY) = 4',
+             '[pid 11] write(4, "a", 1) = 1',
+             '[pid 11] clone(child_stack=0xb7500000, flags=CLONE_VM|'
+             'CLONE_FILES|CLONE_THREAD) = 13',
+             '[pid 13] write(4, "b", 1) = 1',
+             '[pid 11] clone(child_stack=NULL, flags=SIGCHLD) = 14',
+             '[pid 14] write(1, "c", 1) = 1',
+             '[pid 12] read(3, "x", 1) = 1',
+             '[pid 10] close(3) = 0']
+    shards = syscallreplay.sharded_replay.plan_shards(
+        [parse_line(l) for l in lines])
+    self.assertEqual(shards, {10: 10, 11: 11, 12: 10, 13: 11, 14: 14})
+
+
+  def test_pipeline_kept_together(self):
+    """ Ensure the two ends of a pipe set up by their parent are replayed in
+    the parent's shard
+
+    """
+
+    lines = ['pipe([3, 4]) = 0',
+             'fork() = 21',
+             '[pid 20] fork() = 22',
+             '[pid 21] write(4, "x", 1) = 1',
+             '[pid 22] read(3, "x", 1) = 1',
+             '[pid 20] fork() = 23',
+             '[pid 23] close(3) = 0',
+             '[pid 23] open("/tmp/b", O_RDONLY) = 3',
+             '[pid 23] read(3, "y", 1) = 1']
+    shards = syscallreplay.sharded_replay.plan_shards(
+        [parse_line(l) for l in lines])
+    self.assertEqual(shards, {20: 20, 21: 20, 22: 20, 23: 20})
+
+
+class TestShardHandoff(unittest.TestCase):
+
+
+  @mock.patch('multiprocessing.Process')
+  @mock.patch.object(cint, 'detach')
+  def test_start_hands_off_shard(self, mock_detach, mock_process):
+    """ Ensure a process that starts a shard is detached with SIGSTOP
+    pending and handed to a worker along with its subtree, whose calls keep
+    their indices in the whole trace
+
+    """
+
+    engine = ShardedReplay([parse_line(l) for l in SHARD_LINES])
+    child = engine._add_tracee(6001, 31, {})
+    engine._start(child)
+    mock_detach.assert_called_once_with(6001, signal.SIGSTOP)
+    self.assertNotIn(6001, engine.tracees)
+    kwargs = mock_process.call_args[1]
+    self.assertIs(kwargs['target'],
+                  syscallreplay.sharded_replay._replay_shard)
+    tid, indices, syscall_objects = kwargs['args'][:3]
+    self.assertEqual(tid, 6001)
+    self.assertEqual(indices, [2, 4, 5])
+    self.assertEqual([s.name for s in syscall_objects],
+                     ['open', 'read', 'exit_group'])
+    mock_process.return_value.start.assert_called_once_with()
+    self.assertEqual(len(engine.workers), 1)
+
+
+  @mock.patch('syscallreplay.sharded_replay.next_syscall')
+  @mock.patch.object(cint, 'attach')
+  def test_replay_shard(self, mock_attach, mock_next_syscall):
+    """ Ensure a worker attaches to the stopped process, replays it as an
+    attached tracee with the calls' trace indices, and reports a delta that
+    stops it rather than raising
+
+    """
+
+    syscall_objects = [parse_line(l) for l in SHARD_LINES]
+    indices = [2, 4, 5]
+    subtree = [syscall_objects[i] for i in indices]
+    engines = []
+
+    def run_shards(engine, tid, attached=False):
+      engines.append(engine)
+      self.assertEqual((tid, attached), (6001, True))
+      return [ShardResult(31, 3, None)]
+
+    connection = mock.Mock()
+    with mock.patch.object(ShardedReplay, 'run_shards', run_shards):
+      syscallreplay.sharded_replay._replay_shard(6001, indices, subtree, {},
+                                                 {31: 31}, connection)
+    mock_attach.assert_called_once_with(6001)
+    mock_next_syscall.assert_called_once_with(6001)
+    connection.send.assert_called_once_with([ShardResult(31, 3, None)])
+    self.assertEqual([i for i, _ in engines[0].streams[31]], indices)
+    with mock.patch.object(ShardedReplay, 'run_shards',
+                           side_effect=ReplayDeltaError('bad read')):
+      syscallreplay.sharded_replay._replay_shard(6001, indices, subtree, {},
+                                                 {31: 31}, connection)
+    connection.send.assert_called_with([ShardResult(31, 0,
+                                                    'ReplayDeltaError: '
+                                                    'bad read')])
+
+
+  def test_workers_reaped_as_stops(self):
+    """ Ensure a worker reaped by the replay loop's wait_stop(-1), as the
+    tracer's own child, is passed over as a stop and its results are still
+    collected
+
+    """
+
+    engine = ShardedReplay([parse_line(l) for l in SHARD_LINES])
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_send_results, args=(sender,))
+    process.start()
+    sender.close()
+    engine.workers.append((process, receiver))
+    stop = cint.wait_stop(-1)
+    self.assertEqual(stop[:2], (cint.STOP_EXITED, process.pid))
+    engine.handle_stop(stop)
+    self.assertEqual(engine.collect_shards(), [ShardResult(31, 3, None)])
+    self.assertEqual(engine.workers, [])
+
+
+  def test_root_delta_collects_workers(self):
+    """ Ensure a delta in the root shard is reported in its result and the
+    shards it already handed off are still collected
+
+    """
+
+    engine = ShardedReplay([parse_line(l) for l in SHARD_LINES])
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_send_results, args=(sender,))
+    process.start()
+    sender.close()
+    engine.workers.append((process, receiver))
+    with mock.patch.object(ShardedReplay, 'run',
+                           side_effect=ReplayDeltaError('bad close')):
+      results = engine.run_shards(6000)
+    self.assertEqual(results, [ShardResult(30, 0,
+                                           'ReplayDeltaError: bad close'),
+                               ShardResult(31, 3, None)])
+    self.assertEqual(engine.workers, [])
+    self.assertFalse(process.is_alive())
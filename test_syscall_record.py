@@ -0,0 +1,80 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import os
+import tempfile
+import unittest
+import bunch
+
+import syscallreplay.syscall_record
+import syscallreplay.trace_parser
+
+
+class TestSyscallRecord(unittest.TestCase):
+
+
+  def test_to_record(self):
+    """ Ensure parser objects convert to records with the same shape, typed
+    arguments, a dispatch number and shared name strings
+
+    """
+
+    syscall_object = bunch.Bunch(name=''.join(['re', 'ad']),
+                                 args=[bunch.Bunch(value='3'),
+                                       bunch.Bunch(value='0x8049000'),
+                                       bunch.Bunch(value='"abc"')],
+                                 ret=(3, None),
+                                 original_line='read(3, "abc", 3) = 3')
+    record = syscallreplay.syscall_record.to_record(syscall_object)
+    self.assertIs(record.name, 'read')
+    self.assertEqual(record.number, 3)
+    self.assertEqual([a.value for a in record.args],
+                     ['3', '0x8049000', '"abc"'])
+    self.assertEqual([a.integer for a in record.args], [3, 0x8049000, None])
+    self.assertEqual(record.ret, (3, None))
+    self.assertEqual(record.original_line, syscall_object.original_line)
+    self.assertIsNone(record.pid)
+    self.assertRaises(AttributeError, setattr, record, 'extra', 1)
+    record = syscallreplay.syscall_record.to_record(syscall_object,
+                                                    keep_line=False)
+    self.assertIsNone(record.original_line)
+    forged = syscallreplay.syscall_record.new_record('socket')
+    self.assertEqual(forged.number, 102)
+    self.assertEqual(forged.ret, (0, None))
+
+
+  def test_lines_read_back_lazily(self):
+    """ Ensure records parsed without keeping lines read them back from the
+    trace file when they're first asked for
+
+    """
+
+    lines = ['open("/etc/passwd", O_RDONLY) = 3\n',
+             '--- SIGCHLD {si_signo=SIGCHLD} ---\n',
+             'close(3) = 0\n']
+    fd, path = tempfile.mkstemp()
+    try:
+      os.write(fd, ''.join(lines))
+      os.close(fd)
+      records = syscallreplay.syscall_record.parse_trace_records(path)
+      self.assertEqual(len(records), 2)
+      self.assertEqual(records[1].original_line, 'close(3) = 0')
+      self.assertEqual(records[0].original_line,
+                       'open("/etc/passwd", O_RDONLY) = 3')
+      kept = syscallreplay.syscall_record.parse_trace_records(
+          path, keep_lines=True)
+      self.assertEqual([r.original_line for r in kept],
+                       [r.original_line for r in records])
+    finally:
+      os.unlink(path)
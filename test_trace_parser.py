@@ -0,0 +1,140 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import os
+import tempfile
+import unittest
+
+import syscallreplay.trace_parser
+
+
+class TestParseLine(unittest.TestCase):
+
+
+  def test_quoted_arguments(self):
+    """ Ensure commas and parentheses inside quoted strings don't split
+    arguments or end the argument list
+
+    """
+
+    line = 'write(1, "a, b) \\"c\\"\\n", 12) = 12'
+    syscall = syscallreplay.trace_parser.parse_line(line)
+    self.assertEqual(syscall.name, 'write')
+    self.assertEqual([a.value for a in syscall.args],
+                     ['1', '"a, b) \\"c\\"\\n"', '12'])
+    self.assertEqual(syscall.ret, (12, None))
+    self.assertEqual(syscall.original_line, line)
+
+
+  def test_structures_split_like_omni_parser(self):
+    """ Ensure structure arguments are split at their commas and trailing
+    return value annotations are handled
+
+    """
+
+    syscall = syscallreplay.trace_parser.parse_line(
+        '1234  gettimeofday({1500000000, 123}, NULL) = 0')
+    self.assertEqual(syscall.pid, 1234)
+    self.assertEqual([a.value for a in syscall.args],
+                     ['{1500000000', '123}', 'NULL'])
+    syscall = syscallreplay.trace_parser.parse_line(
+        'poll([{fd=3, events=POLLIN}], 1, 0) = 0 (Timeout)')
+    self.assertEqual(syscall.ret, (0, None))
+    syscall = syscallreplay.trace_parser.parse_line(
+        '[pid 77] 12:00:01.000001 open("/nope", O_RDONLY) = -1 ENOENT '
+        '(No such file or directory)')
+    self.assertEqual(syscall.pid, 77)
+    self.assertEqual(syscall.ret, (-1, 'ENOENT'))
+
+
+  def test_arguments_decoded_lazily(self):
+    """ Ensure arguments are spans of the line, decoded on first use and
+    cached until their value is replaced
+
+    """
+
+    line = 'read(3, "a\\tb\\x00\\\"c"..., 4096) = 4096'
+    syscall = syscallreplay.trace_parser.parse_line(line)
+    buffer_arg = syscall.args[1]
+    self.assertIs(buffer_arg._text, syscall.original_line)
+    self.assertIsNone(buffer_arg._decoded)
+    self.assertEqual(buffer_arg.value, '"a\\tb\\x00\\\"c"...')
+    self.assertEqual(buffer_arg.decoded, 'a\tb\x00"c')
+    self.assertIs(buffer_arg.decoded, buffer_arg.decoded)
+    buffer_arg.value = '"x"'
+    self.assertEqual(buffer_arg.decoded, 'x')
+    self.assertEqual(syscall.args[2].decoded, '4096')
+
+
+  def test_strace_escapes(self):
+    """ Ensure the native decoder understands strace's octal escapes and
+    decodes into a bytearray when given one
+
+    """
+
+    decode = syscallreplay.trace_parser.decode_string_token
+    self.assertEqual(decode('"\\0\\1\\377\\0101\\q"'), '\0\1\377\x081\\q')
+    self.assertEqual(decode('[{iov_base="a\\\\b"'), 'a\\b')
+    self.assertEqual(decode('NULL'), 'NULL')
+    buf = bytearray(2)
+    length = syscallreplay.trace_parser.cint.decode_strace_string(
+        'x="\\x41\\x42\\x43"', 2, buf)
+    self.assertEqual(str(buf[:length]), 'ABC')
+
+
+  def test_incomplete_lines_skipped(self):
+    """ Ensure signal notices and split calls are skipped when parsing a
+    whole trace
+
+    """
+
+    lines = ['--- SIGCHLD {si_signo=SIGCHLD} ---\n',
+             'read(3,  <unfinished ...>\n',
+             '<... read resumed> "x", 1) = 1\n',
+             'close(3) = 0\n',
+             '+++ exited with 0 +++\n']
+    fd, path = tempfile.mkstemp()
+    try:
+      os.write(fd, ''.join(lines))
+      os.close(fd)
+      syscalls = syscallreplay.trace_parser.parse_trace(path)
+    finally:
+      os.unlink(path)
+    self.assertEqual([s.name for s in syscalls], ['close'])
+
+
+  def test_split_calls_joined(self):
+    """ Ensure calls strace -f split around another thread's lines are put
+    back together where they were resumed
+
+    """
+
+    lines = ['[pid 12] futex(0x804a000, FUTEX_WAIT, 0, NULL <unfinished ...>\n',
+             '[pid 11] write(1, "x", 1) = 1\n',
+             '[pid 12] <... futex resumed> ) = 0\n',
+             '[pid 11] read(3,  <unfinished ...>\n',
+             '[pid 11] <... read resumed> "x", 1) = 1\n',
+             '[pid 13] nanosleep({1, 0},  <unfinished ...>\n']
+    fd, path = tempfile.mkstemp()
+    try:
+      os.write(fd, ''.join(lines))
+      os.close(fd)
+      syscalls = syscallreplay.trace_parser.parse_trace(path, join_split=True)
+    finally:
+      os.unlink(path)
+    self.assertEqual([(s.pid, s.name) for s in syscalls],
+                     [(11, 'write'), (12, 'futex'), (11, 'read')])
+    self.assertEqual([a.value for a in syscalls[1].args],
+                     ['0x804a000', 'FUTEX_WAIT', '0', 'NULL'])
+    self.assertEqual([a.value for a in syscalls[2].args], ['3', '"x"', '1'])
@@ -12,6 +12,8 @@ import unittest
 import mock
 import bunch
 
+import syscallreplay.syscallreplay as cint
+import syscallreplay.syscall_record
 import syscallreplay.util
 
 
@@ -248,19 +250,32 @@ class TestExtractSocketcallParameters(unittest.TestCase):
     address = 0xbf000000
     fake_params = [1, 2, 3, 0xa, 0xb, 0xc]
 
-    mock_syscallreplay.peek_address = mock.Mock(side_effect=iter(fake_params))
-    peek_calls = [mock.call(555, address),
-                  mock.call(555, address+4),
-                  mock.call(555, address+8),
-                  mock.call(555, address+12),
-                  mock.call(555, address+16),
-                  mock.call(555, address+20)]
+    mock_syscallreplay.read_socketcall_parameters = mock.Mock(
+        return_value=tuple(fake_params))
 
     self.assertEqual(syscallreplay.util.extract_socketcall_parameters(pid, address, num_params), fake_params)
-    mock_syscallreplay.peek_address.assert_has_calls(peek_calls)
+    mock_syscallreplay.read_socketcall_parameters.assert_called_once_with(
+        555, address, num_params)
     mock_logging.assert_called()
 
 
+  @mock.patch('syscallreplay.util.cint')
+  def test_update_parameter_checks_slot(self, mock_syscallreplay):
+    """ Ensure a socketcall parameter is written on its own and a slot that
+    didn't take the value is reported
+
+    """
+
+    address = 0xbf000000
+    mock_syscallreplay.write_socketcall_parameter.return_value = 7
+    syscallreplay.util.update_socketcall_paramater(555, address, 2, '7')
+    mock_syscallreplay.write_socketcall_parameter.assert_called_once_with(
+        555, address, 2, 7)
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      syscallreplay.util.update_socketcall_paramater,
+                      555, address, 2, 8)
+
+
 
 
 
@@ -294,6 +309,21 @@ class TestValidateSyscall(unittest.TestCase):
                       syscallreplay.util.validate_syscall, syscall_id, syscall_object)
 
 
+  def test_record_numbers(self):
+    """Ensure records are validated by the number their name resolves to
+    <Purpose>
+      A record of stat64 matches stat64's number, and not lstat64's, without
+      the name hacks
+
+    """
+
+    record = syscallreplay.syscall_record.new_record('stat64')
+    self.assertEqual(record.number, 195)
+    syscallreplay.util.validate_syscall(195, record)
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      syscallreplay.util.validate_syscall, 196, record)
+
+
 
 
 
@@ -323,3 +353,284 @@ class TestValidateSubcall(unittest.TestCase):
 
     self.assertRaises(syscallreplay.util.ReplayDeltaError,
                       syscallreplay.util.validate_subcall, subcall_id, syscall_object)
+
+
+
+class TestResolveReturnValue(unittest.TestCase):
+
+  def _syscall_object(self, name, ret):
+    syscall_object = bunch.Bunch()
+    syscall_object.name = name
+    syscall_object.ret = ret
+    return syscall_object
+
+  def test_tokens_resolve(self):
+    """Ensure each kind of return token resolves to the right integer
+    <Purpose>
+      Decimal, hex, OS_CONST flag lists, errno failures, "?" and the fcntl64
+      FD_CLOEXEC hack should all produce what gets poked into EAX
+
+    """
+    resolve = syscallreplay.util.resolve_return_value
+    self.assertEqual(resolve(self._syscall_object('read', (12, None))), 12)
+    self.assertEqual(resolve(self._syscall_object('mmap', ('0xb7700000', None))),
+                     0xb7700000)
+    self.assertEqual(resolve(self._syscall_object('open', (-1, 'ENOENT'))), -2)
+    self.assertEqual(resolve(self._syscall_object('close', ('?', None))), -1)
+    self.assertEqual(resolve(self._syscall_object('fcntl64',
+                                                  ('FD_CLOEXEC', None))), 1)
+    flags = ['O_RDWR', 'O_NONBLOCK']
+    expected = (syscallreplay.util.OS_CONST['O_RDWR']
+                | syscallreplay.util.OS_CONST['O_NONBLOCK'])
+    self.assertEqual(resolve(self._syscall_object('fcntl64', (flags, None))),
+                     expected)
+
+  def test_unknown_errno_raises(self):
+    """Ensure an errno we don't know about raises NotImplementedError
+
+    """
+    self.assertRaises(NotImplementedError,
+                      syscallreplay.util.resolve_return_value,
+                      self._syscall_object('open', (-1, 'EMADEUP')))
+
+  @mock.patch('syscallreplay.util._resolve_return_value', return_value=7)
+  def test_precomputed_values_are_reused(self, mock_resolve):
+    """Ensure precomputing a trace resolves each distinct pair only once
+    <Purpose>
+      Once a (return value, errno) pair has been resolved, applying it again
+      should be a cache hit
+
+    """
+    syscall_objects = [self._syscall_object('read', ('7 cached', None))
+                       for _ in range(5)]
+    syscallreplay.util.precompute_return_values(syscall_objects)
+    self.assertEqual(mock_resolve.call_count, 1)
+    self.assertEqual(syscallreplay.util.resolve_return_value(syscall_objects[0]),
+                     7)
+    self.assertEqual(mock_resolve.call_count, 1)
+
+
+  @mock.patch('syscallreplay.util._resolve_return_value')
+  def test_plain_integers_skip_the_cache(self, mock_resolve):
+    """Ensure plain integer return values are used without being cached
+    <Purpose>
+      A trace's byte counts and file descriptors are mostly distinct, so
+      only tokens that need parsing should go into the cache
+
+    """
+    syscall_objects = [self._syscall_object('read', (i, None))
+                       for i in range(1000, 1005)]
+    before = syscallreplay.util.precompute_return_values(syscall_objects)
+    self.assertEqual(syscallreplay.util.resolve_return_value(syscall_objects[2]),
+                     1002)
+    self.assertEqual(syscallreplay.util.cleanup_return_value(1003), 1003)
+    self.assertFalse(mock_resolve.called)
+    self.assertEqual(len(syscallreplay.util._resolved_return_values), before)
+    self.assertNotIn(1003, syscallreplay.util._cleaned_return_values)
+
+
+  def test_fcntl_cloexec_key(self):
+    """Ensure the fcntl64 FD_CLOEXEC hack has its own key
+    <Purpose>
+      Only fcntl64 calls reporting FD_CLOEXEC should share the key, and it
+      should resolve to 1
+
+    """
+    key = syscallreplay.util._return_value_key(
+        self._syscall_object('fcntl64', ('FD_CLOEXEC', None)))
+    self.assertEqual(key, syscallreplay.util.FCNTL_FD_CLOEXEC_KEY)
+    self.assertEqual(syscallreplay.util._resolve_return_value(key), 1)
+    key = syscallreplay.util._return_value_key(
+        self._syscall_object('fcntl', ('FD_CLOEXEC', None)))
+    self.assertNotEqual(key, syscallreplay.util.FCNTL_FD_CLOEXEC_KEY)
+
+
+
+
+
+class TestSyscallSuppression(unittest.TestCase):
+
+  def tearDown(self):
+    syscallreplay.util.set_syscall_suppression(
+        syscallreplay.util.SUPPRESS_GETPID)
+
+  @mock.patch('syscallreplay.util.next_syscall')
+  @mock.patch('syscallreplay.util.cint')
+  def test_sysemu_noop_has_no_extra_stop(self, mock_cint, mock_next):
+    """Ensure nooping under sysemu suppression doesn't touch the child
+    <Purpose>
+      The child is already at a PTRACE_SYSEMU stop, so there is no getpid()
+      to swap in and no exit stop to wait for
+
+    """
+    syscallreplay.util.set_syscall_suppression(
+        syscallreplay.util.SUPPRESS_SYSEMU)
+    mock_cint.entering_syscall = True
+    syscallreplay.util.noop_current_syscall(555)
+    self.assertFalse(mock_cint.entering_syscall)
+    self.assertFalse(mock_cint.poke_register.called)
+    self.assertFalse(mock_cint.syscall.called)
+    self.assertFalse(mock_next.called)
+    syscallreplay.util.resume_child(555)
+    mock_cint.sysemu.assert_called_with(555, 0)
+
+  def test_unknown_mode_raises(self):
+    """Ensure an unknown suppression mode is rejected
+
+    """
+    self.assertRaises(ValueError,
+                      syscallreplay.util.set_syscall_suppression,
+                      'teleport')
+
+
+
+
+
+class TestSyscallInfo(unittest.TestCase):
+
+  def tearDown(self):
+    syscallreplay.util.clear_syscall_info()
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_validation_reads_decoded_stop(self, mock_cint):
+    """Ensure argument validation uses the decoded stop instead of peeking
+    <Purpose>
+      Once the replay loop has loaded the stop with load_syscall_info(),
+      arguments come from it without further register peeks.  Resuming the
+      child drops it.
+
+    """
+    mock_cint.SYSCALL_INFO_ENTRY = 1
+    mock_cint.SYSCALL_INFO_SECCOMP = 3
+    mock_cint.get_syscall_info.return_value = bunch.Bunch(
+        op=1, nr=3, args=(3, 4096, 512, 0, 0, 0))
+    syscall_object = bunch.Bunch(args=[bunch.Bunch(value='3'),
+                                       bunch.Bunch(value='0x1000'),
+                                       bunch.Bunch(value='512')])
+    syscallreplay.util.load_syscall_info(555)
+    syscallreplay.util.validate_integer_argument(555, syscall_object, 0, 0)
+    syscallreplay.util.validate_address_argument(555, syscall_object, 1, 1)
+    syscallreplay.util.validate_integer_argument(555, syscall_object, 2, 2)
+    self.assertFalse(mock_cint.peek_register.called)
+    syscallreplay.util.resume_child(555)
+    mock_cint.peek_register.return_value = 3
+    syscallreplay.util.validate_integer_argument(555, syscall_object, 0, 0)
+    mock_cint.peek_register.assert_called_with(555, cint.EBX)
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_step_keeps_entry_arguments(self, mock_cint):
+    """Ensure step() resumes the way the suppression mode asks and keeps the
+    arguments of entry stops only
+    <Purpose>
+      A single cint.step() call resumes, waits and decodes the stop, so
+      validation after an entry stop needs no register peeks.
+
+    """
+    mock_cint.STOP_SYSCALL_ENTRY = 1
+    mock_cint.STOP_SYSCALL_EXIT = 2
+    mock_cint.STOP_SECCOMP = 3
+    syscall_object = bunch.Bunch(args=[bunch.Bunch(value='3')])
+    mock_cint.step.return_value = (1, 555, 6, (3, 0, 0, 0, 0, 0), None)
+    syscallreplay.util.step(555)
+    mock_cint.step.assert_called_with(555, 0, mock_cint.PTRACE_SYSCALL)
+    syscallreplay.util.validate_integer_argument(555, syscall_object, 0, 0)
+    self.assertFalse(mock_cint.peek_register.called)
+    mock_cint.step.return_value = (2, 555, None, None, 0)
+    syscallreplay.util.set_syscall_suppression(
+        syscallreplay.util.SUPPRESS_SYSEMU)
+    try:
+      syscallreplay.util.step(555)
+    finally:
+      syscallreplay.util.set_syscall_suppression(
+          syscallreplay.util.SUPPRESS_GETPID)
+    mock_cint.step.assert_called_with(555, 0, mock_cint.PTRACE_SYSEMU)
+    mock_cint.peek_register.return_value = 3
+    syscallreplay.util.validate_integer_argument(555, syscall_object, 0, 0)
+    mock_cint.peek_register.assert_called_with(555, cint.EBX)
+
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_x86_64_arguments(self, mock_cint):
+    """Ensure an x86-64 tracee's arguments come from the x86-64 argument
+    registers at full width
+    <Purpose>
+      Socket calls have no parameter block on x86-64, so their parameters
+      are read from the registers as well.
+
+    """
+    syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_X86_64)
+    try:
+      mock_cint.peek_register.return_value = -0x7f0000001000
+      syscallreplay.util.peek_argument(555, 3)
+      mock_cint.peek_register.assert_called_with(555, cint.R10)
+      params = syscallreplay.util.extract_socketcall_parameters(555, 0, 2)
+      mock_cint.peek_register.assert_called_with(555, cint.RSI)
+      self.assertFalse(mock_cint.read_socketcall_parameters.called)
+      self.assertEqual(params, [-0x7f0000001000] * 2)
+      self.assertEqual(syscallreplay.util.unsigned_word(params[0]),
+                       0xffff80fffffff000)
+    finally:
+      syscallreplay.util.set_tracee_arch(syscallreplay.util.ARCH_I386)
+    self.assertRaises(ValueError, syscallreplay.util.set_tracee_arch, 'arm')
+
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_validate_arguments_fetches_once(self, mock_cint):
+    """Ensure validate_arguments() compares against one argument vector
+    <Purpose>
+      A socketcall subcall's parameter block is read in a single transfer
+      of as many parameters as the subcall takes, and addresses are
+      compared unsigned.
+
+    """
+    mock_cint.read_socketcall_parameters.return_value = (3, -0x1000, 16)
+    mock_cint.peek_register.return_value = 0x7000
+    syscall_object = bunch.Bunch(args=[bunch.Bunch(value='3'),
+                                       bunch.Bunch(value='0xfffff000'),
+                                       bunch.Bunch(value='16')])
+    syscallreplay.util.validate_arguments(555, syscall_object, 102, 3,
+                                          integers=(0, 2), addresses=(1,))
+    mock_cint.read_socketcall_parameters.assert_called_once_with(555, 0x7000,
+                                                                 3)
+    syscall_object.args[2].value = '17'
+    self.assertRaises(syscallreplay.util.ReplayDeltaError,
+                      syscallreplay.util.validate_arguments, 555,
+                      syscall_object, 102, 3, integers=(0, 2))
+
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_fetch_arguments_without_stop(self, mock_cint):
+    """Ensure arguments peeked without a decoded stop aren't kept
+    <Purpose>
+      A handler may poke an argument register between fetches, so each
+      fetch without a decoded stop reads the registers again.
+
+    """
+    mock_cint.peek_register.return_value = 3
+    args = syscallreplay.util.fetch_arguments(555, 3)
+    self.assertEqual(args, (3,) * 6)
+    self.assertEqual(mock_cint.peek_register.call_count, 6)
+    mock_cint.peek_register.return_value = 4
+    self.assertEqual(syscallreplay.util.peek_argument(555, 0), 4)
+    self.assertEqual(syscallreplay.util.fetch_arguments(555, 3), (4,) * 6)
+
+
+  @mock.patch('syscallreplay.util.cint')
+  def test_validation_uses_record_integers(self, mock_cint):
+    """Ensure arguments of records are compared by the integer form the
+    record carries
+    <Purpose>
+      Tokens of other system call objects are parsed as they're compared,
+      addresses without a 0x prefix as hex.
+
+    """
+    mock_cint.peek_register.return_value = 0x1000
+    record = syscallreplay.syscall_record.new_record('close',
+                                                     ['3', '0x1000'])
+    record.args[0].integer = 0x1000
+    syscallreplay.util.validate_integer_argument(555, record, 0, 0)
+    syscallreplay.util.validate_address_argument(555, record, 1, 1)
+    syscall_object = bunch.Bunch(args=[bunch.Bunch(value='4096'),
+                                       bunch.Bunch(value='1000')])
+    syscallreplay.util.validate_arguments(555, syscall_object, 6,
+                                          integers=(0,), addresses=(1,))
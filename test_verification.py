@@ -0,0 +1,232 @@
+
+"""
+<Program Name>
+  syscallreplay
+
+<Purpose>
+  Provide functions necessary for examining posix-omni-parser provided system
+  call objects and writing them into the memory of a process using some
+  interface.  Right now this interface is uses ptrace and is provided by the
+  syscallreplay CPython extension.
+
+"""
+
+
+import logging
+import unittest
+import mock
+import bunch
+
+import syscallreplay.verification
+import syscallreplay.file_handlers
+
+
+def _fake_digest(data):
+  return hash(data) & 0xffffffffffffffff
+
+
+def _write_object(payload, ret=None):
+  syscall_object = bunch.Bunch()
+  syscall_object.name = 'write'
+  syscall_object.args = [bunch.Bunch(value='1'),
+                         bunch.Bunch(value='"' + payload + '"'),
+                         bunch.Bunch(value=str(len(payload)))]
+  syscall_object.ret = (len(payload) if ret is None else ret,)
+  return syscall_object
+
+
+class TestWriteVerificationPolicy(unittest.TestCase):
+
+
+  def tearDown(self):
+    syscallreplay.verification.set_write_verification('hash')
+
+
+  def test_unknown_policy_rejected(self):
+    """ Ensure an unknown verification policy is refused
+
+    """
+
+    with self.assertRaises(ValueError):
+      syscallreplay.verification.set_write_verification('full')
+    self.assertEqual(syscallreplay.verification.get_write_verification(),
+                     ('hash', 100))
+
+
+  def test_off_and_hash(self):
+    """ Ensure off never verifies and hash always does
+
+    """
+
+    syscallreplay.verification.set_write_verification('off')
+    self.assertFalse(any(syscallreplay.verification.should_verify_payload()
+                         for _ in range(10)))
+    syscallreplay.verification.set_write_verification('hash')
+    self.assertTrue(all(syscallreplay.verification.should_verify_payload()
+                        for _ in range(10)))
+
+
+  def test_sampled(self):
+    """ Ensure sampled verifies one in every sample_interval payloads,
+    starting with the first
+
+    """
+
+    syscallreplay.verification.set_write_verification('sampled', 4)
+    decisions = [syscallreplay.verification.should_verify_payload()
+                 for _ in range(9)]
+    self.assertEqual(decisions, [True, False, False, False,
+                                 True, False, False, False,
+                                 True])
+
+
+class TestPayloadDigests(unittest.TestCase):
+
+
+  @mock.patch('syscallreplay.verification.cint')
+  def test_compile_write_digests(self, mock_cint):
+    """ Ensure compiled digests are stored on payload carrying calls only
+
+    """
+
+    mock_cint.digest_buffer = mock.Mock(side_effect=_fake_digest)
+    good = _write_object('hi\\n')
+    failed = _write_object('nope', ret=-1)
+    other = bunch.Bunch(name='close', ret=(0,))
+    compiled = syscallreplay.file_handlers.compile_write_digests([good,
+                                                                  failed,
+                                                                  other])
+    self.assertEqual(compiled, 1)
+    self.assertEqual(good.payload_digest, (3, _fake_digest('hi\n')))
+    self.assertFalse('payload_digest' in failed)
+    self.assertFalse('payload_digest' in other)
+
+
+  @mock.patch.object(logging.getLogger(), 'isEnabledFor', return_value=False)
+  @mock.patch('logging.warning')
+  @mock.patch('syscallreplay.verification.cint')
+  def test_check_payload_digest(self, mock_cint, mock_warning, mock_enabled):
+    """ Ensure a matching digest passes quietly and a mismatch warns
+    without materializing the child's buffer
+
+    """
+
+    mock_cint.digest_buffer = mock.Mock(side_effect=_fake_digest)
+    syscall_object = _write_object('abc')
+    execution_payload = mock.Mock(return_value='abd')
+    trace_payload = syscallreplay.file_handlers._write_trace_payload
+    self.assertTrue(syscallreplay.verification.check_payload_digest(
+        syscall_object,
+        trace_payload,
+        (3, _fake_digest('abc')),
+        execution_payload))
+    mock_warning.assert_not_called()
+    self.assertFalse(syscallreplay.verification.check_payload_digest(
+        syscall_object,
+        trace_payload,
+        (3, _fake_digest('abd')),
+        execution_payload))
+    self.assertTrue(mock_warning.called)
+    execution_payload.assert_not_called()
+
+
+  @mock.patch('logging.warning')
+  @mock.patch('syscallreplay.verification.cint')
+  def test_truncated_payloads_skipped(self, mock_cint, mock_warning):
+    """ Ensure payloads strace cut short are neither compiled nor checked
+
+    """
+
+    mock_cint.digest_buffer = mock.Mock(side_effect=_fake_digest)
+    syscall_object = _write_object('abc')
+    syscall_object.args[1].value += '...'
+    syscall_object.ret = (100,)
+    self.assertEqual(
+        syscallreplay.file_handlers.compile_write_digests([syscall_object]),
+        0)
+    self.assertTrue(syscallreplay.verification.check_payload_digest(
+        syscall_object,
+        syscallreplay.file_handlers._write_trace_payload,
+        (100, _fake_digest('abc' * 33)),
+        mock.Mock()))
+    mock_warning.assert_not_called()
+
+
+  @mock.patch('logging.warning')
+  @mock.patch('syscallreplay.verification.stored_payload_digest')
+  @mock.patch('syscallreplay.verification.cint')
+  def test_truncated_payloads_checked_against_store(self, mock_cint,
+                                                    mock_stored_digest,
+                                                    mock_warning):
+    """ Ensure payloads strace cut short are checked against the payload
+    store's copy when it has one
+
+    """
+
+    mock_cint.digest_buffer = mock.Mock(side_effect=_fake_digest)
+    mock_stored_digest.return_value = (99, _fake_digest('abc' * 33))
+    syscall_object = _write_object('abc')
+    syscall_object.args[1].value += '...'
+    syscall_object.ret = (99,)
+    self.assertTrue(syscallreplay.verification.check_payload_digest(
+        syscall_object,
+        syscallreplay.file_handlers._write_trace_payload,
+        (99, _fake_digest('abc' * 33)),
+        mock.Mock()))
+    syscall_object.payload_digest = None
+    self.assertFalse(syscallreplay.verification.check_payload_digest(
+        syscall_object,
+        syscallreplay.file_handlers._write_trace_payload,
+        (99, _fake_digest('abd' * 33)),
+        mock.Mock(return_value='abd' * 33)))
+    self.assertTrue(mock_warning.called)
+
+
+class TestWriteEntryHandler(unittest.TestCase):
+
+
+  def tearDown(self):
+    syscallreplay.verification.set_write_verification('hash')
+
+
+  @mock.patch('syscallreplay.file_handlers.noop_current_syscall')
+  @mock.patch('syscallreplay.file_handlers.apply_return_conditions')
+  @mock.patch('syscallreplay.file_handlers.validate_arguments')
+  @mock.patch('syscallreplay.file_handlers.cint')
+  @mock.patch('syscallreplay.verification.cint')
+  def test_write_streams_digest(self, mock_vcint, mock_cint, mock_validate,
+                                mock_apply, mock_noop):
+    """ Ensure the write entry handler digests the child's buffer rather
+    than copying it out
+
+    """
+
+    mock_vcint.digest_buffer = mock.Mock(side_effect=_fake_digest)
+    mock_cint.peek_register = mock.Mock(side_effect=[0x1000, 3])
+    mock_cint.digest_address_range = mock.Mock(return_value=_fake_digest('abc'))
+    syscall_object = _write_object('abc')
+    syscall_object.args[0].value = '5'
+    syscallreplay.file_handlers.write_entry_handler(4, syscall_object, 555)
+    mock_cint.digest_address_range.assert_called_with(555, 0x1000, 0x1003)
+    mock_cint.copy_address_range.assert_not_called()
+    mock_noop.assert_called_with(555)
+    mock_apply.assert_called_with(555, syscall_object)
+
+
+  @mock.patch('syscallreplay.file_handlers.noop_current_syscall')
+  @mock.patch('syscallreplay.file_handlers.apply_return_conditions')
+  @mock.patch('syscallreplay.file_handlers.validate_arguments')
+  @mock.patch('syscallreplay.file_handlers.cint')
+  def test_write_verification_off(self, mock_cint, mock_validate, mock_apply,
+                                  mock_noop):
+    """ Ensure the child's buffer is left alone when verification is off
+
+    """
+
+    syscallreplay.verification.set_write_verification('off')
+    syscall_object = _write_object('abc')
+    syscall_object.args[0].value = '5'
+    syscallreplay.file_handlers.write_entry_handler(4, syscall_object, 555)
+    mock_cint.peek_register.assert_not_called()
+    mock_cint.digest_address_range.assert_not_called()
+    mock_noop.assert_called_with(555)